@@ -6,6 +6,8 @@
 # ¿Qué hace?
 #   Busca productos en Amazon usando keywords y guarda los ASINs encontrados.
 #   Los resultados se guardan en asins.txt para luego publicarlos.
+#   Los procesos paralelos comparten una cola de keywords (cada keyword se
+#   busca una sola vez) y un presupuesto global de requests a Amazon.
 # 
 # Comando:
 #   python3 01_search.py
@@ -14,7 +16,6 @@
 import os
 import sys
 import json
-import math
 import time
 import subprocess
 import tempfile
@@ -25,6 +26,11 @@ from dotenv import load_dotenv
 # Cargar .env (override=True para sobreescribir variables del sistema)
 load_dotenv(override=True)
 
+sys.path.insert(0, str(Path(__file__).parent.absolute()))
+from src.utils.job_queue import JobQueue
+
+SEARCH_QUEUE = "search"
+
 # Colores para consola
 class Colors:
     RED = '\033[0;31m'
@@ -69,8 +75,6 @@ def main():
     temp_dir = PROJECT_ROOT / f"temp_parallel_search_{os.getpid()}"
     temp_dir.mkdir(exist_ok=True)
 
-    log(f"🔍 Dividiendo keywords en {PARTS} partes...", Colors.BLUE)
-
     # Leer keywords (soporta .txt y .json)
     if keywords_path.suffix.lower() == '.json':
         # Formato JSON
@@ -94,79 +98,39 @@ def main():
     total_keywords = len(keywords)
     print(f"   Total keywords: {total_keywords}")
 
-    # Dividir en partes iguales
-    keywords_per_part = math.ceil(total_keywords / PARTS)
-
-    for i in range(PARTS):
-        start_idx = i * keywords_per_part
-        end_idx = min((i + 1) * keywords_per_part, total_keywords)
-        part_keywords = keywords[start_idx:end_idx]
-
-        # Guardar en archivo temporal (siempre JSON para procesos internos)
-        output_file = temp_dir / f"keywords_part_{i}.json"
-        part_data = {
-            "comment": f"Parte {i+1}/{PARTS} de keywords para búsqueda paralela",
-            "keywords": [{"keyword": kw} if isinstance(kw, str) else kw for kw in part_keywords]
-        }
-
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(part_data, f, indent=2, ensure_ascii=False)
-
-        print(f"   Parte {i+1}: {len(part_keywords)} keywords → {output_file.name}")
-
-    print(f"\n✅ Keywords divididas en {PARTS} archivos")
+    # Cola compartida: cada proceso reclama la próxima keyword libre (lease + heartbeat)
+    # → reparto exacto, sin keywords duplicadas y sin partes desbalanceadas.
+    # Una cola por corrida: lo que quedó pendiente de corridas abortadas no se busca.
+    queue_name = f"{SEARCH_QUEUE}:{datetime.now():%Y%m%d_%H%M%S}:{os.getpid()}"
+    queue = JobQueue(queue_name)
+    added = queue.enqueue_many(keywords)
+    print(f"   Encoladas en cola '{queue_name}': {added} keywords")
     print()
 
     log(f"🚀 Iniciando {PARTS} procesos de búsqueda en paralelo...", Colors.BLUE)
+    log("   (ritmo SP-API global compartido, sin delays escalonados)", Colors.YELLOW)
     print()
 
-    # Array para guardar procesos
     processes = []
+    env = os.environ.copy()
+    env['PYTHONPATH'] = str(PROJECT_ROOT)
 
-    # Iniciar procesos con delays escalonados
     for i in range(PARTS):
-        keywords_part = temp_dir / f"keywords_part_{i}.json"
         output_part = temp_dir / f"asins_part_{i}.txt"
         log_part = temp_dir / f"log_part_{i}.log"
 
-        # Delay escalonado para evitar rate limits (180 segundos entre cada proceso)
-        delay = i * 180
-
-        if i == 0:
-            log(f"▶ Proceso {i + 1}/{PARTS} iniciando ahora...", Colors.GREEN)
-        else:
-            log(f"⏳ Proceso {i + 1}/{PARTS} iniciará en {delay}s...", Colors.YELLOW)
-
-        # Crear comando con PYTHONPATH
-        env = os.environ.copy()
-        env['PYTHONPATH'] = str(PROJECT_ROOT)
-
         cmd = [
             "python3", "-u",
             str(PROJECT_ROOT / "scripts" / "autonomous" / "search_12_per_keyword.py"),
-            "--keywords-file", str(keywords_part),
+            "--queue", queue_name,
             "--output-file", str(output_part),
             "--asins-per-keyword", str(ASINS_PER_KEYWORD),
             "--process-id", str(i)
         ]
 
-        # Iniciar proceso en background con delay
-        if delay > 0:
-            # Crear un script que espera y luego ejecuta
-            subprocess.Popen(
-                ["bash", "-c", f"sleep {delay} && PYTHONPATH={PROJECT_ROOT} {' '.join(cmd)} >> {log_part} 2>&1"],
-                env=env
-            )
-        else:
-            # Iniciar inmediatamente
-            with open(log_part, "w") as log_f:
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=log_f,
-                    stderr=subprocess.STDOUT,
-                    env=env
-                )
-                processes.append(process)
+        log(f"▶ Proceso {i + 1}/{PARTS} iniciando...", Colors.GREEN)
+        with open(log_part, "w") as log_f:
+            processes.append(subprocess.Popen(cmd, stdout=log_f, stderr=subprocess.STDOUT, env=env))
 
     print()
     log("⏳ Esperando que terminen todos los procesos...", Colors.BLUE)
@@ -174,28 +138,16 @@ def main():
     log(f"   tail -f {temp_dir}/log_part_*.log", Colors.YELLOW)
     print()
 
-    # Monitorear progreso
-    completed = 0
-    while completed < PARTS:
-        completed = 0
-        for i in range(PARTS):
-            output_part = temp_dir / f"asins_part_{i}.txt"
-            if output_part.exists():
-                completed += 1
-        print(f"\r   Procesos completados: {completed}/{PARTS}", end="", flush=True)
+    # Monitorear progreso (los procesos salen solos cuando la cola queda vacía)
+    while any(process.poll() is None for process in processes):
+        stats = queue.stats()
+        finished = stats["done"] + stats["failed"]
+        print(f"\r   Keywords: {finished}/{finished + stats['pending'] + stats['running']} "
+              f"({stats['running']} en curso)", end="", flush=True)
         time.sleep(5)
 
     print("\n")
-
-    # Esperar a que terminen todos
-    for process in processes:
-        try:
-            process.wait()
-        except:
-            pass
-
-    print()
-    log("🔗 Uniendo resultados...", Colors.BLUE)
+    queue.purge()
 
     # Combinar todos los ASINs y eliminar duplicados
     all_asins = set()
@@ -30,7 +30,7 @@ from dotenv import load_dotenv
 
 # Importar la nueva integración de Glow Search
 sys.path.insert(0, str(Path(__file__).parent))
-from src.integrations.amazon_glow_search import search_multiple_keywords, get_product_variants
+from src.integrations.amazon_glow_search import search_multiple_keywords, VariantCrawler
 import requests
 
 # Cargar .env (override=True para sobreescribir variables del sistema)
@@ -113,40 +113,37 @@ def process_asins_directly(asins: list, zipcode: str, min_price: float, max_pric
     log("🔍 Procesando ASINs directamente...", Colors.BLUE)
     print()
 
-    for i, asin in enumerate(asins, 1):
-        log(f"  [{i}/{len(asins)}] ASIN: {asin}", Colors.CYAN)
-
-        # Agregar el ASIN principal
-        all_asins.add(asin)
-
-        # Buscar variantes
-        try:
-            variants = get_product_variants(
-                asin=asin,
-                session=session,
-                zipcode=zipcode,
-                min_price=min_price,
-                max_price=max_price,
-                max_delivery_days=max_delivery_days
-            )
-
-            if variants:
-                log(f"    ✅ {len(variants)} variantes encontradas", Colors.GREEN)
-                for variant in variants:
-                    if variant not in all_asins:
-                        all_asins.add(variant)
-                        total_variants += 1
-            else:
-                log(f"    ℹ️  Sin variantes válidas", Colors.YELLOW)
-
-        except Exception as e:
-            log(f"    ❌ Error: {str(e)}", Colors.RED)
-            failed_asins.append(asin)
-
-        # Pequeño delay entre ASINs
-        if i < len(asins):
-            import time
-            time.sleep(1.5)
+    # Todas las expansiones en paralelo (acotadas por GLOW_VARIANT_WORKERS / GLOW_PAGE_RATE)
+    crawler = VariantCrawler(session, min_price=min_price, max_price=max_price)
+    try:
+        expansions = [(asin, crawler.expand(asin)) for asin in asins]
+
+        for i, (asin, future) in enumerate(expansions, 1):
+            log(f"  [{i}/{len(asins)}] ASIN: {asin}", Colors.CYAN)
+
+            # Agregar el ASIN principal
+            all_asins.add(asin)
+
+            # Variantes
+            try:
+                variants = future.result()
+
+                if variants:
+                    log(f"    ✅ {len(variants)} variantes encontradas", Colors.GREEN)
+                    for variant in variants:
+                        if variant not in all_asins:
+                            all_asins.add(variant)
+                            total_variants += 1
+                else:
+                    log(f"    ℹ️  Sin variantes válidas", Colors.YELLOW)
+
+            except Exception as e:
+                log(f"    ❌ Error: {str(e)}", Colors.RED)
+                failed_asins.append(asin)
+    finally:
+        crawler.close()
+
+    print()
 
     return {
         "all_asins": all_asins,
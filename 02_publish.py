@@ -51,6 +51,8 @@ from src.pipeline.unified_transformer import transform_amazon_to_ml_unified
 from src.pipeline.ai_validators import validate_listing_complete
 from src.integrations.smart_categorizer import categorize_with_ai
 from src.integrations.mainglobal import publish_item
+from src.utils.publish_fix_engine import get_fix_engine, FIX_DROP_GTIN, FIX_BLOCK_CATEGORY
+from src.pipeline.preflight_validator import preflight_mini_ml, format_violations
 
 # Telegram notifications (optional)
 try:
@@ -91,6 +93,7 @@ class Config:
     # Flags
     DRY_RUN = False
     SKIP_VALIDATION = True  # Validación IA desactivada por defecto
+    PREFLIGHT_VALIDATION = False  # Validación offline contra schema cacheado (sin API, activar con --preflight)
     FORCE_REGENERATE = True  # SIEMPRE regenerar, NO usar caché
 
     @classmethod
@@ -611,7 +614,35 @@ class TransformPhase(PipelinePhase):
 
 
 class ValidationPhase(PipelinePhase):
-    """Fase de validación IA pre-publicación"""
+    """Fase de validación pre-publicación (preflight offline + IA opcional)"""
+
+    def preflight(self, asin: str, mini_path: Path) -> bool:
+        """
+        Valida el mini_ml contra el schema cacheado de la categoría (sin llamar a ML).
+        Corrige localmente lo que se puede (unidades, value_ids, título, inválidos)
+        y rechaza solo lo que igual fallaría en /global/items.
+        """
+        try:
+            mini_ml = load_json_file(str(mini_path))
+            result = preflight_mini_ml(mini_ml)
+        except Exception as e:
+            # El preflight nunca debe frenar la publicación por un error propio
+            self.log(asin, f"Preflight omitido: {str(e)[:50]}", "WARNING")
+            return True
+
+        if not result["schema_cached"]:
+            return True
+
+        if result["applied"]:
+            save_json_file(str(mini_path), result["mini"])
+            self.log(asin, f"Preflight: {len(result['applied'])} corrección(es) aplicadas", "INFO")
+
+        if result["blocking"]:
+            error_msg = format_violations(result["blocking"], limit=3)
+            self.log(asin, f"Preflight fallido: {error_msg[:60]}", "ERROR")
+            self.db.update_asin_status(asin, Status.FAILED, f"Preflight: {error_msg}")
+            return False
+        return True
 
     def execute(self, asin: str) -> bool:
         """Valida listing con IA antes de publicar"""
@@ -680,6 +711,8 @@ class PublishPhase(PipelinePhase):
         all_item_ids = []  # Trackear TODOS los item_ids generados (para cleanup si falla)
         item_id = None  # Inicializar antes del loop
         countries_failed = []  # Inicializar para evitar NameError en returns
+        fix_engine = get_fix_engine()
+        applied_fixes = []  # Fix aplicado antes del intento actual → se registra si funcionó o no
 
         for attempt in range(1, max_retries + 1):
             try:
@@ -704,6 +737,10 @@ class PublishPhase(PipelinePhase):
                 item_id = result.get("item_id") or result.get("id")
 
                 if item_id:
+                    if applied_fixes:
+                        fix_engine.record_outcome(None, applied_fixes, success=True)
+                        applied_fixes = []
+
                     # 🔹 Guardar este item_id para tracking
                     if item_id not in all_item_ids:
                         all_item_ids.append(item_id)
@@ -820,11 +857,22 @@ class PublishPhase(PipelinePhase):
             except Exception as e:
                 error_str = str(e)
 
+                # El fix aplicado antes de este intento no resolvió el error (si el mismo error se repite)
+                if applied_fixes:
+                    fix_engine.record_outcome(None, applied_fixes, success=False, error_text=error_str)
+                    applied_fixes = []
+
                 # Error de GTIN duplicado (código 3701)
                 if "3701" in error_str or "invalid_product_identifier" in error_str:
                     mini_ml = load_json_file(str(mini_path))
+                    current_category = mini_ml.get("category_id")
+
+                    # Memoria de fixes: en esta categoría publicar sin GTIN nunca funcionó → no gastar otro intento
+                    no_gtin_dead_end = fix_engine.is_known_dead_end(current_category, "gtin_reused", FIX_DROP_GTIN)
+                    if no_gtin_dead_end:
+                        self.log(asin, f"Cat {current_category}: sin GTIN nunca funcionó (memoria de fixes)", "WARNING")
 
-                    if mini_ml.get("force_no_gtin"):
+                    if mini_ml.get("force_no_gtin") or no_gtin_dead_end:
                         error_msg = "GTIN duplicado y sin GTIN rechazado"
                         self.log(asin, error_msg, "ERROR")
                         log_gtin_issue(
@@ -842,6 +890,7 @@ class PublishPhase(PipelinePhase):
                     mini_ml["force_no_gtin"] = True
                     mini_ml["last_error"] = "GTIN_REUSED"
                     save_json_file(str(mini_path), mini_ml)
+                    applied_fixes = [{"category_id": current_category, "error_key": "gtin_reused", "fix": FIX_DROP_GTIN}]
                     continue
 
                 # Error 7810: GTIN requerido pero no disponible
@@ -862,6 +911,7 @@ class PublishPhase(PipelinePhase):
                         mini_ml_regenerated = transform_phase.execute(asin, blocked_categories=blocked_categories)
 
                         if mini_ml_regenerated:
+                            applied_fixes = [{"category_id": current_category, "error_key": "gtin_required", "fix": FIX_BLOCK_CATEGORY}]
                             continue
                         else:
                             error_msg = "No hay categoría alternativa sin GTIN"
@@ -1002,6 +1052,7 @@ class PublishPhase(PipelinePhase):
                     mini_ml_regenerated = transform_phase.execute(asin, blocked_categories=blocked_categories)
 
                     if mini_ml_regenerated:
+                        applied_fixes = [{"category_id": current_category, "error_key": "category_not_allowed", "fix": FIX_BLOCK_CATEGORY}]
                         continue  # Reintentar con nueva categoría
                     else:
                         # No hay categoría alternativa
@@ -1227,6 +1278,15 @@ class Pipeline:
 
         print(f"✓{cat_info}")
 
+        # Preflight offline contra el schema cacheado (solo si está activado)
+        if Config.PREFLIGHT_VALIDATION:
+            print("  ↓ Preflight   ", end="", flush=True)
+            if not self.validation_phase.preflight(asin, Config.MINI_ML_DIR / f"{asin}_mini_ml.json"):
+                print("✗")
+                result["phase"] = "validation"
+                return result
+            print("✓")
+
         # Fase 3: Validation (skip si está desactivada)
         if not Config.SKIP_VALIDATION:
             print("  ↓ Validation  ", end="", flush=True)
@@ -1324,6 +1384,8 @@ class Pipeline:
             flags.append("DRY-RUN")
         if Config.SKIP_VALIDATION:
             flags.append("No-IA-Val")
+        if Config.PREFLIGHT_VALIDATION:
+            flags.append("Preflight")
 
         flags_str = f" [{', '.join(flags)}]" if flags else ""
         print(f"\n🚀 PIPELINE v2.0 | Run: {self.run_id} | {len(asins)} ASIN(s){flags_str}\n")
@@ -1452,6 +1514,7 @@ def main():
     parser = argparse.ArgumentParser(description="Pipeline Amazon → MercadoLibre CBT v2.0")
     parser.add_argument("--dry-run", action="store_true", help="Simular publicaciones sin enviar a ML")
     parser.add_argument("--enable-validation", action="store_true", help="Activar validación IA (está desactivada por defecto)")
+    parser.add_argument("--preflight", action="store_true", help="Validar offline contra el schema cacheado de la categoría")
     parser.add_argument("--force-regenerate", action="store_true", help="Forzar regeneración de archivos existentes")
     parser.add_argument("--skip-health-check", action="store_true", help="Saltar verificaciones de salud")
     parser.add_argument("--asin", type=str, help="Procesar solo un ASIN específico")
@@ -1465,6 +1528,8 @@ def main():
     if args.enable_validation:
         Config.SKIP_VALIDATION = False
     # De lo contrario, mantener el default de Config (True)
+    if args.preflight:
+        Config.PREFLIGHT_VALIDATION = True
     # Solo sobrescribir FORCE_REGENERATE si se pasa el flag explícitamente
     if args.force_regenerate:
         Config.FORCE_REGENERATE = True
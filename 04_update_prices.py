@@ -29,6 +29,7 @@ load_dotenv(override=True)
 # Agregar directorio raíz al path para imports
 sys.path.insert(0, str(Path(__file__).parent))
 from src.integrations.amazon_glow_api_v2_advanced import check_availability_v2_advanced
+from src.utils.listing_payloads import load_payloads
 
 # Colores
 class Colors:
@@ -186,22 +187,27 @@ def get_listings_to_update(asin_filter=None):
 
     if asin_filter:
         cursor.execute("""
-            SELECT asin, item_id, mini_ml_data, price_usd, site_items
+            SELECT id, asin, item_id, price_usd, site_items
             FROM listings
             WHERE asin = ? AND item_id IS NOT NULL
         """, (asin_filter,))
     else:
         cursor.execute("""
-            SELECT asin, item_id, mini_ml_data, price_usd, site_items
+            SELECT id, asin, item_id, price_usd, site_items
             FROM listings
             WHERE item_id IS NOT NULL
             ORDER BY date_published DESC
         """)
 
-    listings = cursor.fetchall()
+    rows = cursor.fetchall()
+    # mini_ml_data vive comprimido en listing_payloads: se carga en batch solo esa columna
+    payloads = load_payloads(conn, [row[0] for row in rows], ("mini_ml_data",))
     conn.close()
 
-    return listings
+    return [
+        (asin, item_id, payloads.get(listing_id, {}).get("mini_ml_data"), price_usd, site_items)
+        for listing_id, asin, item_id, price_usd, site_items in rows
+    ]
 
 def main():
     parser = argparse.ArgumentParser(description="Actualizar precios masivamente")
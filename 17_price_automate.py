@@ -9,7 +9,6 @@ Lee precios desde la DB y configura min_price (15% markup) y max_price (80% mark
 
 import os
 import sys
-import json
 import sqlite3
 import requests
 import time
@@ -18,6 +17,9 @@ from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
 
+sys.path.insert(0, str(Path(__file__).parent))
+from src.utils.site_items_store import load_site_items
+
 # Cargar .env
 load_dotenv(override=True)
 
@@ -70,22 +72,24 @@ def get_listings_from_db():
 
     Returns:
         Lista de tuplas (asin, item_id, costo_amazon, price_usd_current, site_items)
+        con site_items como lista (tabla normalizada site_items)
     """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
     cursor.execute("""
-        SELECT asin, item_id, costo_amazon, price_usd, site_items
+        SELECT asin, item_id, costo_amazon, price_usd
         FROM listings
         WHERE item_id IS NOT NULL
         AND costo_amazon IS NOT NULL
         AND costo_amazon > 0
     """)
 
-    listings = cursor.fetchall()
+    rows = cursor.fetchall()
+    site_items_by_item = load_site_items(conn, [row[1] for row in rows])
     conn.close()
 
-    return listings
+    return [row + (site_items_by_item.get(row[1], []),) for row in rows]
 
 def get_automation_status(item_id: str) -> dict:
     """
@@ -356,7 +360,7 @@ def main():
     }
 
     # Procesar cada listing
-    for i, (asin, item_id, costo_amazon, price_usd_current, site_items_json) in enumerate(listings, 1):
+    for i, (asin, item_id, costo_amazon, price_usd_current, site_items) in enumerate(listings, 1):
         stats["total"] += 1
 
         # Calcular precios
@@ -368,14 +372,6 @@ def main():
         log(f"[{i}/{len(listings)}] {asin} → {item_id}", Colors.CYAN)
         log(f"   Costo: ${costo_amazon:.2f} | Min: ${min_price:.2f} | Max: ${max_price:.2f}", Colors.BLUE)
 
-        # Parsear site_items
-        site_items = []
-        if site_items_json:
-            try:
-                site_items = json.loads(site_items_json) if isinstance(site_items_json, str) else site_items_json
-            except:
-                pass
-
         # Determinar si es CBT (global) o local
         is_cbt = item_id.startswith("CBT")
 
@@ -10,8 +10,10 @@ Flujo completo:
 1. Selecciona keyword (por prioridad)
 2. Busca ASINs en Amazon SP-API
 3. Filtra por marcas/categorías prohibidas
-4. Guarda ASINs en asins.txt
-5. Ejecuta pipeline de publicación (mainglobal.py)
+4. Encola los ASINs en la cola durable de publicación (storage/job_queue.db)
+   → workers de larga vida (publish_worker.py) publican en paralelo a la búsqueda
+   (modo legacy: guarda en asins.txt y ejecuta el pipeline como subprocess)
+5. Recoge el resultado de las keywords anteriores a medida que terminan
 6. Espera X minutos y repite
 
 Características:
@@ -44,8 +46,11 @@ sys.path.insert(0, str(project_root / 'scripts'))
 from autonomous.keyword_manager import KeywordManager
 from autonomous.brand_filter import ProductFilter
 from autonomous.product_quality_analyzer import ProductQualityAnalyzer
+from filters.ai_product_safety_filter import AIProductSafetyFilter
 from tools.search_asins_by_keyword import search_products_by_keyword
 from integrations.amazon_pricing import get_prime_offers_batch_optimized
+from utils.job_queue import JobQueue
+from utils.seen_asins import get_seen_index
 
 # Importar notificador de búsqueda
 try:
@@ -97,6 +102,10 @@ class AutonomousSystem:
         self.log_config = self.config.get("logging", {})
         self.safety_config = self.config.get("safety", {})
 
+        # Análisis semántico IA en batch (1 request por batch de ASINs, veredictos cacheados).
+        # Opt-in: cada batch nuevo es un request pago a OpenAI
+        self.safety_filter = AIProductSafetyFilter() if self.filter_config.get("enable_ai_safety", False) else None
+
         # Estado
         self.cycle_count = 0
         self.total_asins_searched = 0
@@ -114,6 +123,17 @@ class AutonomousSystem:
         # Crear directorios
         self.log_file.parent.mkdir(parents=True, exist_ok=True)
 
+        # Cola durable de publicación (búsqueda y publicación se solapan)
+        self.publish_queue = JobQueue("publish") if self.publish_config.get("use_job_queue", False) else None
+        self.worker_processes: List[subprocess.Popen] = []
+
+        # Índice global de ASINs ya vistos (publicados / en cola / rechazados): se consulta
+        # antes de cualquier request a Amazon
+        self.seen_index = get_seen_index(
+            rejected_file=str(self.rejected_file),
+            asins_file=self.publish_config.get("asins_file", "asins.txt"),
+        ) if self.filter_config.get("skip_already_published", True) else None
+
         self.log("═══════════════════════════════════════════════════════════")
         self.log("🤖 SISTEMA AUTÓNOMO DE BÚSQUEDA Y PUBLICACIÓN INICIADO")
         self.log("═══════════════════════════════════════════════════════════")
@@ -177,50 +197,22 @@ class AutonomousSystem:
 
     def filter_asins_by_brand_quick(self, asins: List[str]) -> Tuple[List[str], List[dict]]:
         """
-        Filtra ASINs por blacklist de ASINs previamente rechazados.
+        Descarta ASINs ya vistos (publicados, en cola o rechazados antes por marca/categoría/seguridad).
 
         Este filtro es RÁPIDO porque:
-        1. Solo verifica contra la blacklist local (sin API calls)
-        2. Verifica solo si el ASIN ya fue rechazado antes
-        3. NO obtiene datos completos del producto (eso se hace después si necesario)
-
-        NOTA: El filtro completo de marcas se hace DESPUÉS de ordenar por BSR,
-        solo sobre los ASINs top seleccionados (para optimizar API calls).
+        1. Solo consulta el índice global en memoria (sin API calls)
+        2. El índice combina listings DB, cola de publicación, asins.txt y rechazos previos
+        3. NO obtiene datos del producto (eso se hace después solo con los nuevos)
 
         Args:
             asins: Lista de ASINs a filtrar
 
         Returns:
-            Tuple[list, list]: (asins_permitidos, asins_rechazados)
+            Tuple[list, list]: (asins_nuevos, asins_ya_vistos)
         """
-        if not self.filter_config.get("enable_brand_blacklist", True):
-            self.log("⚠️ Filtrado de marcas deshabilitado - Todos los ASINs pasan")
+        if self.seen_index is None:
             return asins, []
-
-        allowed = []
-        rejected = []
-
-        # Cargar ASINs previamente rechazados (blacklist local)
-        blacklisted_asins = set()
-        if self.rejected_file.exists():
-            try:
-                with open(self.rejected_file, 'r', encoding='utf-8') as f:
-                    rejected_data = json.load(f)
-                    blacklisted_asins = {item.get("asin") for item in rejected_data if item.get("asin")}
-            except Exception as e:
-                self.log(f"⚠️ No se pudo cargar rejected_asins.json: {e}", "WARNING")
-
-        # Verificar contra blacklist
-        for asin in asins:
-            if asin in blacklisted_asins:
-                rejected.append({
-                    "asin": asin,
-                    "reason": "ASIN en blacklist (previamente rechazado)"
-                })
-            else:
-                allowed.append(asin)
-
-        return allowed, rejected
+        return self.seen_index.filter_new(asins)
 
     def filter_asins_by_brand_batch(self, asins: List[str]) -> Tuple[List[str], List[dict]]:
         """
@@ -277,11 +269,6 @@ class AutonomousSystem:
                 for asin in batch:
                     rejected.append({"asin": asin, "reason": f"Error batch: {str(e)[:50]}"})
 
-            # Delay entre batches
-            if i + batch_size < len(asins):
-                import time
-                time.sleep(2)
-
         return allowed, rejected
 
     def apply_quality_multiplier(self, asins: List[str], quality_analysis: dict) -> List[str]:
@@ -388,9 +375,10 @@ class AutonomousSystem:
 
         FLUJO OPTIMIZADO PARA CAPTAR LOS MEJORES PRODUCTOS:
         1. Buscar MUCHOS ASINs (500-1000) para tener un pool grande
-        2. ✅ Filtrar por MARCAS PROHIBIDAS primero (rápido, sin API)
-        3. ✅ Filtrar por Prime (ya solo procesamos marcas permitidas)
-        4. Luego en run_cycle() se ordenan por BSR y se seleccionan los mejores
+        2. ✅ Descartar ASINs ya vistos (índice local, sin API)
+        3. ✅ Filtrar por MARCAS PROHIBIDAS (batch API, solo ASINs nuevos)
+        4. ✅ Filtrar por Prime (ya solo procesamos marcas permitidas)
+        5. Luego en run_cycle() se ordenan por BSR y se seleccionan los mejores
 
         Args:
             keyword_data: Datos de la keyword
@@ -427,12 +415,22 @@ class AutonomousSystem:
                 self.log(f"   ⚠️ No se encontraron ASINs para '{keyword}'")
                 return []
 
+            # 1.5. Descartar ASINs ya publicados/en cola/rechazados (sin requests)
+            asins, seen_asins = self.filter_asins_by_brand_quick(asins)
+            if seen_asins:
+                self.log(f"   ⏭️  {len(seen_asins)} ASINs ya vistos (publicados/en cola/rechazados) - sin consultar Amazon")
+            if not asins:
+                self.log(f"   ⚠️ Todos los ASINs de '{keyword}' ya fueron vistos")
+                return []
+
             # 2. 🔥 FILTRAR POR MARCAS PROHIBIDAS CON BATCH API
             # Usa endpoint batch de Amazon (20 ASINs por request) - 50x más rápido que individual
             self.log(f"   [2/4] Filtrando por marcas prohibidas (usando BATCH API)...")
             self.log(f"   (Procesa 20 ASINs por llamada - mucho más rápido que individual)")
 
             allowed_asins, rejected_asins = self.filter_asins_by_brand_batch(asins)
+            if self.seen_index is not None:
+                self.seen_index.record_rejected(rejected_asins)
 
             self.log(f"   ✅ Filtro de marcas: {len(allowed_asins)}/{len(asins)} ASINs permitidos")
             if len(rejected_asins) > 0:
@@ -487,38 +485,18 @@ class AutonomousSystem:
         Returns:
             list: Top N ASINs ordenados por BSR (menor = más vendido)
         """
-        from integrations.amazon_api import get_product_bsr_only
+        from integrations.amazon_api import get_catalog_items, extract_bsr
 
-        self.log(f"   Obteniendo BSR para ordenar por ventas...", keyword=keyword)
-        self.log(f"   Esto tomará ~{len(asins) * 2 // 60} minutos (2s por ASIN)", keyword=keyword)
+        # salesRanks de 20 ASINs por request; los ya consultados salen de la caché de catálogo
+        self.log(f"   Obteniendo BSR de {len(asins)} ASINs para ordenar por ventas...", keyword=keyword)
 
-        asins_with_bsr = []
-
-        # Procesar en batches
-        batch_size = 10
-        total_batches = (len(asins) + batch_size - 1) // batch_size
-
-        for batch_num, i in enumerate(range(0, len(asins), batch_size), 1):
-            batch = asins[i:i+batch_size]
-
-            self.log(f"   Batch {batch_num}/{total_batches}: Obteniendo BSR de {len(batch)} ASINs...", keyword=keyword)
-
-            for asin in batch:
-                try:
-                    bsr = get_product_bsr_only(asin)
-
-                    if bsr:
-                        asins_with_bsr.append({"asin": asin, "bsr": bsr})
+        products_data = get_catalog_items(asins, include_data="salesRanks")
 
-                    # Delay entre requests
-                    time.sleep(2)
-
-                except Exception as e:
-                    self.log(f"⚠️ Error obteniendo BSR de {asin}: {e}", "WARNING", keyword=keyword)
-
-            # Delay entre batches
-            if i + batch_size < len(asins):
-                time.sleep(10)
+        asins_with_bsr = []
+        for asin in asins:
+            bsr = extract_bsr(products_data.get(asin))
+            if bsr:
+                asins_with_bsr.append({"asin": asin, "bsr": bsr})
 
         # Ordenar por BSR (menor = más vendido = primero)
         asins_with_bsr.sort(key=lambda x: x["bsr"])
@@ -550,28 +528,16 @@ class AutonomousSystem:
             dict: Análisis de calidad con score, tier, recomendación
         """
         import random
-        from integrations.amazon_api import get_product_data_from_asin
+        from integrations.amazon_api import get_catalog_items, CATALOG_ANALYSIS_DATA
 
         # Tomar muestra random (evitar sesgo)
         sample = random.sample(asins, min(sample_size, len(asins)))
 
         self.log(f"   Obteniendo datos de {len(sample)} ASINs random para análisis...")
 
-        products_data = []
-        for i, asin in enumerate(sample, 1):
-            try:
-                data = get_product_data_from_asin(asin)
-                if data:
-                    products_data.append(data)
-
-                # Delay entre requests
-                if i < len(sample):
-                    import time
-                    time.sleep(2)
-
-            except Exception as e:
-                self.log(f"   ⚠️ Error obteniendo datos de {asin}: {str(e)[:50]}", "WARNING")
-                continue
+        # Misma data que usan el filtro de marcas y el ranking → quedan cacheados para esos pasos
+        catalog = get_catalog_items(sample, include_data=CATALOG_ANALYSIS_DATA)
+        products_data = [catalog[asin] for asin in sample if asin in catalog]
 
         if not products_data:
             self.log(f"   ❌ No se pudo obtener datos de ningún ASIN", "ERROR")
@@ -594,46 +560,35 @@ class AutonomousSystem:
         Returns:
             Tuple[list, list]: (asins_permitidos, asins_rechazados)
         """
-        from integrations.amazon_api import get_product_data_from_asin
+        from integrations.amazon_api import get_catalog_items, CATALOG_ANALYSIS_DATA
 
         self.log(f"🔍 Filtrando {len(asins)} ASINs por marca...")
 
         allowed_products = []
         rejected = []
 
-        # Procesar en batches
-        batch_size = 10
-        for batch_num, i in enumerate(range(0, len(asins), batch_size), 1):
-            batch = asins[i:i+batch_size]
-
-            for asin in batch:
-                try:
-                    product_data = get_product_data_from_asin(asin)
-
-                    if not product_data:
-                        rejected.append({"asin": asin, "reason": "No se pudo obtener info"})
-                        continue
+        catalog = get_catalog_items(asins, include_data=CATALOG_ANALYSIS_DATA)
 
-                    # Filtro de marca
-                    is_ok, reason = self.product_filter.is_allowed(asin, product_data)
+        for asin in asins:
+            product_data = catalog.get(asin)
 
-                    if is_ok:
-                        product_data["asin"] = asin
-                        allowed_products.append(product_data)
-                    else:
-                        rejected.append({"asin": asin, "reason": reason, "product": product_data.get("title", "")})
+            if not product_data:
+                rejected.append({"asin": asin, "reason": "No se pudo obtener info"})
+                continue
 
-                    import time
-                    time.sleep(2)
+            try:
+                # Filtro de marca
+                is_ok, reason = self.product_filter.is_allowed(asin, product_data)
 
-                except Exception as e:
-                    self.log(f"⚠️ Error filtrando {asin}: {str(e)[:50]}", "WARNING")
-                    rejected.append({"asin": asin, "reason": f"Error: {str(e)[:50]}"})
+                if is_ok:
+                    product_data["asin"] = asin
+                    allowed_products.append(product_data)
+                else:
+                    rejected.append({"asin": asin, "reason": reason, "product": product_data.get("title", "")})
 
-            # Delay entre batches
-            if i + batch_size < len(asins):
-                import time
-                time.sleep(10)
+            except Exception as e:
+                self.log(f"⚠️ Error filtrando {asin}: {str(e)[:50]}", "WARNING")
+                rejected.append({"asin": asin, "reason": f"Error: {str(e)[:50]}"})
 
         self.log(f"✅ Filtro de marcas: {len(allowed_products)} permitidos, {len(rejected)} rechazados")
 
@@ -702,70 +657,68 @@ class AutonomousSystem:
             self.log("⚠️ Filtrado de marcas deshabilitado - Todos los ASINs pasan")
             return asins, [], {"avg_score": 0, "recommendation": "publish_all"}
 
+        from integrations.amazon_api import get_catalog_items, CATALOG_ANALYSIS_DATA
+
         self.log(f"🔍 Filtrando {len(asins)} ASINs por marca/categoría...")
-        self.log(f"   Procesando en batches de 10 para evitar rate limit...")
 
         allowed_products = []
         rejected = []
 
-        # Procesar en batches de 10 para evitar rate limit
+        # Batches de 10 para el análisis semántico IA (los datos de catálogo van de a 20 y con caché)
         batch_size = 10
         for batch_num, i in enumerate(range(0, len(asins), batch_size), 1):
             batch = asins[i:i+batch_size]
+            batch_allowed = []
             self.log(f"   Batch {batch_num}/{(len(asins) + batch_size - 1) // batch_size}: Procesando {len(batch)} ASINs...")
 
+            catalog = get_catalog_items(batch, include_data=CATALOG_ANALYSIS_DATA)
+
             for asin in batch:
-                try:
-                    # Obtener info del producto desde Amazon
-                    from integrations.amazon_api import get_product_data_from_asin
+                product_data = catalog.get(asin)
 
-                    product_data = get_product_data_from_asin(asin)
-
-                    if not product_data:
-                        rejected.append({"asin": asin, "reason": "No se pudo obtener info del producto"})
-                        continue
+                if not product_data:
+                    rejected.append({"asin": asin, "reason": "No se pudo obtener info del producto"})
+                    continue
 
+                try:
                     # Filtro de marca/categoría
                     is_ok, reason = self.product_filter.is_allowed(asin, product_data)
 
                     if is_ok:
                         # Agregar ASIN con datos completos para análisis de calidad
                         product_data["asin"] = asin
-                        allowed_products.append(product_data)
+                        batch_allowed.append(product_data)
                     else:
                         rejected.append({"asin": asin, "reason": reason, "product": product_data.get("title", "")})
 
-                    # Delay entre requests dentro del batch
-                    time.sleep(2)  # 2 segundos entre cada request
-
                 except Exception as e:
-                    error_msg = str(e)
-                    # Si es rate limit (429), esperar más tiempo
-                    if "429" in error_msg or "QuotaExceeded" in error_msg:
-                        self.log(f"⏱️ Rate limit detectado, esperando 30 segundos...", "WARNING")
-                        time.sleep(30)
-                        # Reintentar este ASIN
-                        try:
-                            product_data = get_product_data_from_asin(asin)
-                            if product_data:
-                                is_ok, reason = self.product_filter.is_allowed(asin, product_data)
-                                if is_ok:
-                                    product_data["asin"] = asin
-                                    allowed_products.append(product_data)
-                                else:
-                                    rejected.append({"asin": asin, "reason": reason, "product": product_data.get("title", "")})
-                        except:
-                            rejected.append({"asin": asin, "reason": f"Rate limit - No se pudo procesar"})
+                    self.log(f"⚠️ Error al filtrar ASIN {asin}: {e}", "WARNING")
+                    rejected.append({"asin": asin, "reason": f"Error: {e}"})
+
+            # Análisis semántico IA de todo el batch en un solo request (ASINs ya vistos → cache)
+            if self.safety_filter and batch_allowed:
+                safety_results = self.safety_filter.is_safe_to_publish_batch(
+                    [(p["asin"], p) for p in batch_allowed], use_ai=True
+                )
+                for product_data in batch_allowed:
+                    is_safe, reason, confidence = safety_results[product_data["asin"]]
+                    if is_safe:
+                        allowed_products.append(product_data)
                     else:
-                        self.log(f"⚠️ Error al filtrar ASIN {asin}: {e}", "WARNING")
-                        rejected.append({"asin": asin, "reason": f"Error: {e}"})
-
-            # Delay entre batches (10 segundos)
-            if i + batch_size < len(asins):
-                self.log(f"   Esperando 10 segundos antes del siguiente batch...")
-                time.sleep(10)
+                        # confidence 0 = fail-safe (IA falló / sin veredicto): no marcar el ASIN para siempre
+                        prefix = "Safety IA: " if confidence > 0 else "ia_sin_veredicto: "
+                        rejected.append({"asin": product_data["asin"], "reason": f"{prefix}{reason}",
+                                         "product": product_data.get("title", "")})
+            else:
+                allowed_products.extend(batch_allowed)
 
         self.log(f"✅ Filtrado completado: {len(allowed_products)} permitidos, {len(rejected)} rechazados")
+        if self.seen_index is not None:
+            self.seen_index.record_rejected(rejected)
+        if self.safety_filter:
+            safety_stats = self.safety_filter.get_stats()
+            self.log(f"   🤖 Safety IA acumulado: {safety_stats['ai_requests']} requests, "
+                     f"{safety_stats['ai_cache_hits']} ASINs desde cache")
 
         # Si no hay productos permitidos, retornar vacío
         if not allowed_products:
@@ -849,9 +802,74 @@ class AutonomousSystem:
         with open(output_file, mode, encoding='utf-8') as f:
             for asin in asins:
                 f.write(f"{asin}\n")
+        if self.seen_index is not None:
+            self.seen_index.mark_queued(asins)
 
         self.log(f"💾 {len(asins)} ASINs guardados en {file_path}")
 
+    def enqueue_for_publication(self, asins: List[str], keyword: str) -> int:
+        """
+        Encola ASINs en la cola de publicación (un lote por búsqueda: "keyword:timestamp").
+        Los ASINs pendientes, publicándose o ya publicados se ignoran (dedup por ASIN);
+        los que fallaron antes se re-encolan en este lote.
+        """
+        added = self.publish_queue.enqueue_many(asins, batch=f"{keyword}:{int(time.time())}")
+        if self.seen_index is not None:
+            self.seen_index.mark_queued(asins)
+        stats = self.publish_queue.stats()
+        self.log(f"📥 {added} ASINs encolados para publicar ({len(asins) - added} ya estaban en cola)", keyword=keyword)
+        self.log(f"   Cola: {stats['pending']} pendientes | {stats['running']} publicando | "
+                 f"{stats['done']} ok | {stats['failed']} fallidos")
+        return added
+
+    def ensure_publish_workers(self, dry_run: bool = False):
+        """Mantiene vivos N workers de publicación (arrancan una vez, no por ciclo)"""
+        if not self.publish_config.get("spawn_publish_workers", True):
+            return
+        wanted = self.publish_config.get("publish_workers", 1)
+        self.worker_processes = [p for p in self.worker_processes if p.poll() is None]
+
+        worker_log = self.log_file.parent / "publish_worker.log"
+        while len(self.worker_processes) < wanted:
+            cmd = [sys.executable, "-u", str(project_root / "scripts" / "autonomous" / "publish_worker.py")]
+            if dry_run:
+                cmd.append("--dry-run")
+            with open(worker_log, 'a', encoding='utf-8') as out:
+                proc = subprocess.Popen(cmd, cwd=str(project_root), stdout=out, stderr=subprocess.STDOUT)
+            self.worker_processes.append(proc)
+            self.log(f"👷 Worker de publicación iniciado (pid {proc.pid}) → {worker_log}")
+
+    def stop_publish_workers(self):
+        """SIGTERM: cada worker termina el ASIN actual; lo pendiente queda en la cola durable"""
+        for proc in self.worker_processes:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in self.worker_processes:
+            try:
+                proc.wait(timeout=600)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self.worker_processes = []
+
+    def collect_publication_feedback(self) -> int:
+        """
+        Actualiza las keywords cuyos ASINs ya terminaron de publicarse.
+
+        Returns:
+            int: Publicaciones exitosas reportadas en esta llamada
+        """
+        total = 0
+        for batch in self.publish_queue.pop_finished_batches():
+            keyword, _, stamp = batch["batch"].rpartition(":")
+            if not stamp.isdigit():
+                keyword = batch["batch"]  # Lote viejo (batch = keyword)
+            published = batch["done"]
+            self.keyword_manager.record_publications(keyword, published, batch["done"] + batch["failed"])
+            total += published
+            self.log(f"📬 Resultado de publicación: {published} OK / {batch['failed']} fallidos", keyword=keyword)
+        self.total_asins_published += total
+        return total
+
     def count_publications_from_log(self) -> int:
         """
         Lee el log de main2.py y cuenta publicaciones exitosas
@@ -943,6 +961,19 @@ class AutonomousSystem:
         with open(self.metrics_file, 'w', encoding='utf-8') as f:
             json.dump(metrics, f, indent=2, ensure_ascii=False)
 
+    def _mark_searched(self, keyword_data: dict, asins_found: int, successful_publications: int = 0,
+                       queue_mode: bool = False, enqueued: bool = False):
+        """
+        Registra la búsqueda en el KeywordManager. En modo cola el success_rate se
+        actualiza una sola vez por búsqueda: al terminar el lote (record_publications),
+        o acá mismo con 0 publicaciones si no se encoló nada.
+        """
+        self.keyword_manager.mark_as_searched(keyword_data, asins_found=asins_found,
+                                              successful_publications=successful_publications,
+                                              update_success_rate=not queue_mode)
+        if queue_mode and not enqueued:
+            self.keyword_manager.record_publications(keyword_data.get("keyword"), 0, asins_found)
+
     def run_cycle(self, dry_run: bool = False) -> bool:
         """
         Ejecuta un ciclo completo de búsqueda y publicación
@@ -959,6 +990,12 @@ class AutonomousSystem:
         self.log(f"🔄 CICLO #{self.cycle_count}")
         self.log("═"*60)
 
+        # Feedback de publicaciones de keywords anteriores (los workers corren en paralelo)
+        queue_mode = bool(self.publish_queue) and not dry_run
+        if queue_mode:
+            self.ensure_publish_workers()
+            self.collect_publication_feedback()
+
         # 1. Obtener siguiente keyword
         keyword_data = self.keyword_manager.get_next_keyword()
 
@@ -977,7 +1014,7 @@ class AutonomousSystem:
 
         if not asins:
             self.log("⚠️ No se encontraron ASINs para esta keyword", "WARNING", keyword=keyword)
-            self.keyword_manager.mark_as_searched(keyword_data, asins_found=0, successful_publications=0)
+            self._mark_searched(keyword_data, asins_found=0, queue_mode=queue_mode)
             return False
 
         self.total_asins_searched += len(asins)
@@ -998,7 +1035,7 @@ class AutonomousSystem:
 
         if not quality_analysis or quality_analysis.get("recommendation") == "skip":
             self.log(f"❌ Calidad muy baja, saltando...", "WARNING", keyword=keyword)
-            self.keyword_manager.mark_as_searched(keyword_data, asins_found=len(asins), successful_publications=0)
+            self._mark_searched(keyword_data, asins_found=len(asins), queue_mode=queue_mode)
             return False
 
         # 4. Según calidad, decidir cuántos ASINs tomar por BSR
@@ -1044,37 +1081,42 @@ class AutonomousSystem:
 
         if not final_asins:
             self.log("❌ No hay ASINs disponibles después del ranking", "WARNING", keyword=keyword)
-            self.keyword_manager.mark_as_searched(keyword_data, asins_found=len(asins), successful_publications=0)
+            self._mark_searched(keyword_data, asins_found=len(asins), queue_mode=queue_mode)
             if SEARCH_NOTIFIER_AVAILABLE and search_notifier_configured():
                 notify_search_error(keyword, "Sin ASINs después del ranking")
             return False
 
-        # 6. Guardar ASINs permitidos
-        asins_file = self.publish_config.get("asins_file", "asins.txt")
-        self.save_asins_to_file(final_asins, asins_file)
-
-        # 5. Ejecutar pipeline (si no es dry-run Y si está habilitado)
+        # 6. Entregar ASINs a publicación
         successful_publications = 0
         use_pipeline = self.publish_config.get("use_existing_pipeline", True)
 
-        if dry_run:
+        if queue_mode:
+            # Los workers publican mientras el próximo ciclo busca; el resultado
+            # se suma a la keyword en collect_publication_feedback()
+            self.enqueue_for_publication(final_asins, keyword)
+        elif dry_run:
+            self.save_asins_to_file(final_asins, self.publish_config.get("asins_file", "asins.txt"))
             self.log("🧪 DRY-RUN: Saltando ejecución del pipeline")
             successful_publications = len(final_asins)  # Simulación
         elif not use_pipeline:
+            self.save_asins_to_file(final_asins, self.publish_config.get("asins_file", "asins.txt"))
             self.log("⏭️  Pipeline deshabilitado - ASINs guardados en asins.txt")
             self.log(f"   pipeline.py se encargará de publicarlos")
             # Leer conteo real del log de main2.py (si existe)
             successful_publications = self.count_publications_from_log()
         else:
+            self.save_asins_to_file(final_asins, self.publish_config.get("asins_file", "asins.txt"))
             successful_publications = self.run_publication_pipeline()
 
         self.total_asins_published += successful_publications
 
         # 6. Actualizar keyword con resultados
-        self.keyword_manager.mark_as_searched(
+        self._mark_searched(
             keyword_data,
             asins_found=len(asins),
-            successful_publications=successful_publications
+            successful_publications=successful_publications,
+            queue_mode=queue_mode,
+            enqueued=queue_mode
         )
 
         # 7. Guardar métricas
@@ -1087,7 +1129,10 @@ class AutonomousSystem:
         self.log(f"   ASINs seleccionados:  {len(final_asins)} (top por BSR)")
         self.log(f"   Quality Score:        {quality_analysis.get('avg_score', 0):.1f}/100 ({quality_analysis.get('quality_tier', 'N/A')})")
         self.log(f"   Publicaciones esp.:   ~{expected_publications} (main2 rechaza ~27%)")
-        self.log(f"   Publicaciones reales: {successful_publications}")
+        if queue_mode:
+            self.log(f"   Publicaciones reales: en cola (se reportan al terminar)")
+        else:
+            self.log(f"   Publicaciones reales: {successful_publications}")
         self.log("═"*60)
 
         return True
@@ -1134,6 +1179,12 @@ class AutonomousSystem:
                 self.log(f"\n⏱️ Esperando {cycle_delay_minutes} minutos antes del siguiente ciclo...")
                 time.sleep(cycle_delay_minutes * 60)
 
+        # Detener workers propios (lo pendiente sigue en la cola para el próximo arranque)
+        if self.worker_processes:
+            self.log("⏳ Esperando que los workers terminen el ASIN actual...")
+            self.stop_publish_workers()
+            self.collect_publication_feedback()
+
         # Sistema detenido
         self.log("\n═══════════════════════════════════════════════════════════")
         self.log("🛑 SISTEMA AUTÓNOMO DETENIDO")
@@ -8,6 +8,11 @@ Filtrado inteligente de productos por:
 - Categorías restringidas (Ropa, Alimentos, Medicamentos)
 - Keywords prohibidas (supplements, vitamins, etc.)
 
+Todas las listas se compilan UNA vez al crear el filtro (índice de frases por
+lista): los trigramas del título y
+la categoría se calculan una vez por producto y cada lista solo verifica las
+frases candidatas, en vez de un `in` por cada entrada.
+
 Uso:
     from scripts.autonomous.brand_filter import ProductFilter
 
@@ -24,10 +29,60 @@ import sys
 import json
 import re
 from pathlib import Path
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 
 # Añadir src al path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.utils.phrase_matcher import PhraseMatcher, text_grams
+from src.filters.brand_matcher import get_brand_matcher
+
+# EXCEPCIÓN: Ropa de cama/Home NO es ropa con talles
+# Productos de Home/Bedding tienen medidas estándar en la caja (no talles)
+HOME_BEDDING_KEYWORDS = [
+    # Bedding
+    "sheet", "bedding", "comforter", "duvet", "pillowcase", "pillow case",
+    "blanket", "quilt", "mattress pad", "mattress topper", "bed sheet",
+    "fitted sheet", "flat sheet", "bedspread", "coverlet", "bed skirt",
+    "valance", "bed set", "bedding set", "throw blanket",
+    # Towels
+    "towel", "bath towel", "hand towel", "kitchen towel", "beach towel",
+    "washcloth", "bath mat", "bath rug",
+    # Window treatments
+    "curtain", "drape", "window panel", "valance", "window treatment",
+    "shower curtain", "curtain panel",
+    # Table linens
+    "tablecloth", "table cloth", "napkin", "table runner", "placemat",
+    "place mat", "table linen",
+    # Rugs & Mats
+    "rug", "area rug", "runner rug", "doormat", "door mat", "floor mat",
+    # Pillows (decorative)
+    "throw pillow", "decorative pillow", "pillow cover", "cushion cover"
+]
+
+
+class _PhraseList:
+    """Lista de frases compilada: "primera de la lista contenida en alguno de los textos" """
+
+    def __init__(self, phrases: List[str]):
+        # lower → texto original (para que la razón de rechazo sea la misma que antes)
+        originals = {}
+        for phrase in phrases:
+            if isinstance(phrase, str) and phrase:
+                originals.setdefault(phrase.lower(), phrase)
+        self.originals = list(originals.values())
+        self.matcher = PhraseMatcher(list(originals.keys()))
+
+    def first(self, *texts: Tuple[str, set]) -> Optional[str]:
+        """texts: pares (texto, text_grams(texto))"""
+        best = None
+        for text, grams in texts:
+            idx = self.matcher.first(text, grams)
+            if idx is not None and (best is None or idx < best):
+                best = idx
+        return self.originals[best] if best is not None else None
+
 
 class ProductFilter:
     """
@@ -57,6 +112,16 @@ class ProductFilter:
         # Compilar regex patterns
         self.compiled_patterns = [re.compile(pattern) for pattern in self.brand_patterns]
 
+        # Compilar listas de frases (una pasada por lista)
+        self.brand_matcher = get_brand_matcher(self.config_file, "blacklisted_brands")
+        self._prohibited_categories = _PhraseList(self.prohibited_categories)
+        self._restricted_categories = _PhraseList(self.restricted_categories)
+        self._prohibited_keywords = _PhraseList(self.prohibited_keywords)
+        self._restricted_keywords = _PhraseList(self.restricted_keywords)
+        self._irrelevant_types = _PhraseList(self.irrelevant_types)
+        self._irrelevant_keywords = _PhraseList(self.irrelevant_keywords)
+        self._home_bedding = _PhraseList(HOME_BEDDING_KEYWORDS)
+
         # Stats
         self.total_checked = 0
         self.total_rejected = 0
@@ -117,7 +182,7 @@ class ProductFilter:
             return False, f"Datos insuficientes (título: {bool(title)}, marca: {bool(brand)})"
 
         # 2. Verificar marca exacta
-        if brand in [b.lower() for b in self.blacklisted_brands]:
+        if brand and self.brand_matcher.is_exact(brand):
             self.total_rejected += 1
             self.rejection_reasons["brand"] += 1
             return False, f"Marca prohibida: {brand}"
@@ -131,74 +196,56 @@ class ProductFilter:
                 matched_brand = pattern.pattern.replace("(?i)", "").replace("\\s+", " ")
                 return False, f"Marca prohibida detectada: {matched_brand}"
 
+        # Trigramas calculados una vez y compartidos por todas las listas
+        title_t = (title, text_grams(title))
+        category_t = (category, text_grams(category))
+
         # 4. Verificar categorías prohibidas (HARD BLOCK)
-        for prohibited_cat in self.prohibited_categories:
-            if prohibited_cat.lower() in category or prohibited_cat.lower() in title:
-                self.total_rejected += 1
-                self.rejection_reasons["category"] += 1
-                return False, f"Categoría prohibida: {prohibited_cat}"
-
-        # 5. EXCEPCIÓN: Ropa de cama/Home NO es ropa con talles
-        # Productos de Home/Bedding tienen medidas estándar en la caja (no talles)
-        home_bedding_keywords = [
-            # Bedding
-            "sheet", "bedding", "comforter", "duvet", "pillowcase", "pillow case",
-            "blanket", "quilt", "mattress pad", "mattress topper", "bed sheet",
-            "fitted sheet", "flat sheet", "bedspread", "coverlet", "bed skirt",
-            "valance", "bed set", "bedding set", "throw blanket",
-            # Towels
-            "towel", "bath towel", "hand towel", "kitchen towel", "beach towel",
-            "washcloth", "bath mat", "bath rug",
-            # Window treatments
-            "curtain", "drape", "window panel", "valance", "window treatment",
-            "shower curtain", "curtain panel",
-            # Table linens
-            "tablecloth", "table cloth", "napkin", "table runner", "placemat",
-            "place mat", "table linen",
-            # Rugs & Mats
-            "rug", "area rug", "runner rug", "doormat", "door mat", "floor mat",
-            # Pillows (decorative)
-            "throw pillow", "decorative pillow", "pillow cover", "cushion cover"
-        ]
-
-        is_home_bedding = any(keyword in title for keyword in home_bedding_keywords)
+        prohibited_cat = self._prohibited_categories.first(category_t, title_t)
+        if prohibited_cat:
+            self.total_rejected += 1
+            self.rejection_reasons["category"] += 1
+            return False, f"Categoría prohibida: {prohibited_cat}"
+
+        # 5. EXCEPCIÓN: Ropa de cama/Home NO es ropa con talles (ver HOME_BEDDING_KEYWORDS)
+        is_home_bedding = self._home_bedding.first(title_t) is not None
 
         # 6. Verificar categorías restringidas (ropa, calzado) - EXCEPTO Home/Bedding
         if not is_home_bedding:
-            for restricted_cat in self.restricted_categories:
-                if restricted_cat.lower() in category or restricted_cat.lower() in title:
-                    self.total_rejected += 1
-                    self.rejection_reasons["category"] += 1
-                    return False, f"Categoría restringida: {restricted_cat}"
+            restricted_cat = self._restricted_categories.first(category_t, title_t)
+            if restricted_cat:
+                self.total_rejected += 1
+                self.rejection_reasons["category"] += 1
+                return False, f"Categoría restringida: {restricted_cat}"
 
         # 7. Verificar keywords prohibidas (supplements, vitamins, food, etc.)
-        for keyword in self.prohibited_keywords:
-            if keyword.lower() in title or keyword.lower() in category:
-                self.total_rejected += 1
-                self.rejection_reasons["keyword"] += 1
-                return False, f"Keyword prohibida: {keyword}"
+        keyword = self._prohibited_keywords.first(title_t, category_t)
+        if keyword:
+            self.total_rejected += 1
+            self.rejection_reasons["keyword"] += 1
+            return False, f"Keyword prohibida: {keyword}"
 
         # 8. Verificar keywords restringidas (ropa) - EXCEPTO Home/Bedding
         if not is_home_bedding:
-            for keyword in self.restricted_keywords:
-                if keyword.lower() in title:
-                    self.total_rejected += 1
-                    self.rejection_reasons["keyword"] += 1
-                    return False, f"Keyword restringida: {keyword}"
+            keyword = self._restricted_keywords.first(title_t)
+            if keyword:
+                self.total_rejected += 1
+                self.rejection_reasons["keyword"] += 1
+                return False, f"Keyword restringida: {keyword}"
 
         # 9. Verificar tipos de producto irrelevantes (DVDs, libros, etc.)
-        for irrelevant_type in self.irrelevant_types:
-            if irrelevant_type.lower() in category or irrelevant_type.lower() in title:
-                self.total_rejected += 1
-                self.rejection_reasons["category"] += 1
-                return False, f"Tipo de producto irrelevante: {irrelevant_type}"
+        irrelevant_type = self._irrelevant_types.first(category_t, title_t)
+        if irrelevant_type:
+            self.total_rejected += 1
+            self.rejection_reasons["category"] += 1
+            return False, f"Tipo de producto irrelevante: {irrelevant_type}"
 
         # 10. Verificar keywords irrelevantes (dvd, book, etc.)
-        for keyword in self.irrelevant_keywords:
-            if keyword.lower() in title:
-                self.total_rejected += 1
-                self.rejection_reasons["keyword"] += 1
-                return False, f"Keyword irrelevante: {keyword}"
+        keyword = self._irrelevant_keywords.first(title_t)
+        if keyword:
+            self.total_rejected += 1
+            self.rejection_reasons["keyword"] += 1
+            return False, f"Keyword irrelevante: {keyword}"
 
         # Producto permitido
         return True, "OK"
@@ -214,9 +261,11 @@ class ProductFilter:
             Tuple[bool, str]: (permitido, razón)
         """
         try:
-            from integrations.amazon_api import get_product_data_from_asin
+            from integrations.amazon_api import get_products_batch
 
-            product_data = get_product_data_from_asin(asin)
+            # Solo summaries (marca/título/tipo); si ya se consultó sale de la caché de catálogo
+            asin = asin.strip().upper()
+            product_data = get_products_batch([asin], include_data="summaries").get(asin)
 
             if not product_data:
                 return False, "No se pudo obtener información del producto"
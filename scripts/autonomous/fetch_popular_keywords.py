@@ -13,6 +13,10 @@ import requests
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Agregar project root al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from scripts.autonomous.keyword_manager import KeywordManager
+
 load_dotenv()
 
 DATAFORSEO_BULK_VOLUME_URL = "https://api.dataforseo.com/v3/dataforseo_labs/amazon/bulk_search_volume/live"
@@ -302,9 +306,14 @@ def fetch_and_save_popular_keywords(seed_keywords: list = None, use_discovery: b
     return True
 
 
+def _keyword_manager() -> KeywordManager:
+    """El progreso vive en la DB del KeywordManager (el JSON es solo la lista de keywords)"""
+    return KeywordManager(str(MASTER_KEYWORDS_FILE))
+
+
 def update_keyword_progress(keyword: str, asins_published: int):
     """
-    Actualiza el progreso de una keyword en master_keywords.json.
+    Actualiza el progreso de una keyword (DB del KeywordManager).
 
     Args:
         keyword: Keyword procesada
@@ -315,34 +324,13 @@ def update_keyword_progress(keyword: str, asins_published: int):
         print(f"⚠️  Archivo {MASTER_KEYWORDS_FILE} no existe")
         return False
 
-    with open(MASTER_KEYWORDS_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    # Buscar keyword y actualizar
-    for kw in data["keywords"]:
-        if kw["keyword"] == keyword:
-            kw["processed"] = True
-            kw["asins_published"] = asins_published
-
-            from datetime import datetime
-            kw["last_processed"] = datetime.now().isoformat()
-
-            # Actualizar totales
-            data["total_publications_current"] = sum(k["asins_published"] for k in data["keywords"])
-            data["last_updated"] = datetime.now().isoformat()
-
-            break
-
-    # Guardar cambios
-    with open(MASTER_KEYWORDS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
+    _keyword_manager().mark_processed(keyword, asins_published)
     return True
 
 
 def get_next_keyword():
     """
-    Obtiene la siguiente keyword NO procesada de master_keywords.json.
+    Obtiene la siguiente keyword NO procesada (orden de master_keywords.json).
 
     Returns:
         dict: Datos de la keyword o None si no hay más
@@ -352,15 +340,7 @@ def get_next_keyword():
         print(f"⚠️  Archivo {MASTER_KEYWORDS_FILE} no existe")
         return None
 
-    with open(MASTER_KEYWORDS_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    # Buscar primera keyword no procesada
-    for kw in data["keywords"]:
-        if not kw.get("processed", False):
-            return kw
-
-    return None
+    return _keyword_manager().get_next_keyword(strategy="by_search_volume")
 
 
 def get_progress_stats():
@@ -374,22 +354,7 @@ def get_progress_stats():
     if not MASTER_KEYWORDS_FILE.exists():
         return None
 
-    with open(MASTER_KEYWORDS_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    total_keywords = len(data["keywords"])
-    processed_keywords = sum(1 for k in data["keywords"] if k.get("processed", False))
-    total_publications = data.get("total_publications_current", 0)
-    target_publications = data.get("total_publications_target", 10000)
-
-    return {
-        "total_keywords": total_keywords,
-        "processed_keywords": processed_keywords,
-        "pending_keywords": total_keywords - processed_keywords,
-        "total_publications": total_publications,
-        "target_publications": target_publications,
-        "progress_percentage": (total_publications / target_publications * 100) if target_publications > 0 else 0
-    }
+    return _keyword_manager().get_progress_stats()
 
 
 # ============================================================
@@ -11,6 +11,16 @@ Estrategias:
 3. Actualización de métricas (ASINs encontrados, tasa de éxito)
 4. Enable/disable de keywords dinámicamente
 
+Almacenamiento:
+✅ SQLite (WAL) en storage/<archivo>.db → índices por prioridad, last_searched,
+   success_rate y orden de search volume: elegir keyword = O(log n)
+✅ Updates atómicos por fila (no reescribe el JSON de 1.5 MB por keyword)
+✅ Seguro con varios procesos de búsqueda en paralelo
+✅ El JSON se importa una sola vez y se re-sincroniza si cambia: es la fuente de la
+   lista (keywords borradas del JSON se borran de la DB, enabled/priority se respetan)
+   sin pisar el progreso ya registrado; --add escribe la keyword también en el JSON
+✅ --export vuelca el estado de vuelta al JSON para herramientas que lo lean
+
 Uso:
     from scripts.autonomous.keyword_manager import KeywordManager
 
@@ -21,22 +31,40 @@ Uso:
 """
 
 import os
+import sys
 import json
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+try:
+    from src.utils.kv_store import get_connection, Transaction
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.kv_store import get_connection, Transaction
+
+# Columnas con tipo propio; cualquier otro campo del JSON va a `extra`
+_COLUMNS = [
+    "keyword", "position", "search_volume", "category", "priority", "max_asins_per_search",
+    "enabled", "processed", "asins_published", "total_asins_found", "success_rate",
+    "last_searched", "last_processed",
+]
+_BOOL_COLUMNS = ("enabled", "processed")
+_SELECT = f"SELECT {', '.join(_COLUMNS)}, extra FROM keywords"
+
 
 class KeywordManager:
     """
     Gestor de keywords para búsqueda automática en Amazon
     """
 
-    def __init__(self, config_file: str = "config/master_keywords.json"):
+    def __init__(self, config_file: str = "config/master_keywords.json", db_path: str = None):
         """
         Inicializa el gestor de keywords
 
         Args:
-            config_file: Ruta al archivo JSON de keywords
+            config_file: Ruta al archivo JSON de keywords (fuente de la importación)
+            db_path: DB SQLite (default: $KEYWORDS_DB o storage/<config_file>.db)
         """
         self.config_file = Path(config_file)
 
@@ -47,38 +75,176 @@ class KeywordManager:
                 print(f"⚠️  {self.config_file} no existe, usando {fallback_file}")
                 self.config_file = fallback_file
 
-        self.config = self._load_config()
+        self.db_path = db_path or os.getenv("KEYWORDS_DB") or f"storage/{self.config_file.stem}.db"
+        self._init_schema()
+        self._sync_from_json()
 
-        self.keywords = self.config.get("keywords", [])
+        self.config = self._load_meta()
         self.strategy = self.config.get("strategy", "by_search_volume")
 
         # Detectar si es master_keywords.json (tiene search_volume)
-        self.is_master_keywords = any("search_volume" in k for k in self.keywords[:5] if isinstance(k, dict))
+        self.is_master_keywords = self._conn.execute(
+            "SELECT 1 FROM keywords WHERE search_volume IS NOT NULL LIMIT 1"
+        ).fetchone() is not None
 
-        # Estado del gestor
+        # Estado del gestor (cursores de los round-robin)
         self.current_index = 0
         self.current_priority = self._get_max_priority()
-
-    def _load_config(self) -> dict:
-        """Carga la configuración de keywords"""
+        self._cursor_position = -1
+
+    # ---------- Almacenamiento ----------
+    @property
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _init_schema(self):
+        conn = self._conn
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS keywords (
+                keyword TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                search_volume INTEGER,
+                category TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                max_asins_per_search INTEGER,
+                enabled INTEGER NOT NULL DEFAULT 1,
+                processed INTEGER NOT NULL DEFAULT 0,
+                asins_published INTEGER NOT NULL DEFAULT 0,
+                total_asins_found INTEGER NOT NULL DEFAULT 0,
+                success_rate REAL NOT NULL DEFAULT 0,
+                last_searched TEXT,
+                last_processed TEXT,
+                extra TEXT
+            )
+        """)
+        # Un índice por estrategia: cada get_next_keyword es un index seek + LIMIT 1
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_kw_volume ON keywords(enabled, processed, position)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_kw_priority ON keywords(enabled, priority, position)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_kw_last_searched ON keywords(enabled, last_searched)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_kw_success ON keywords(enabled, success_rate)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_kw_position ON keywords(enabled, position)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+
+    def _sync_from_json(self):
+        """
+        Importa el JSON en una sola transacción. Si el JSON cambió desde la última
+        importación (ej: fetch_popular_keywords agregó keywords, clean_blacklisted_keywords
+        quitó marcas), agrega las nuevas, borra las que ya no están y actualiza los datos
+        estáticos (+ enabled / priority si el JSON los trae) sin pisar el progreso de la DB.
+        """
         if not self.config_file.exists():
-            raise FileNotFoundError(f"No se encontró {self.config_file}")
+            if self._count() == 0:
+                raise FileNotFoundError(f"No se encontró {self.config_file}")
+            return
+
+        mtime = str(self.config_file.stat().st_mtime)
+        row = self._conn.execute("SELECT value FROM keyword_meta WHERE key = 'source_mtime'").fetchone()
+        if row and row[0] == mtime:
+            return
 
         with open(self.config_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            data = json.load(f)
 
-    def _save_config(self):
-        """Guarda la configuración actualizada"""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(self.config, f, indent=2, ensure_ascii=False)
+        rows = []
+        for position, k in enumerate(data.get("keywords", [])):
+            if isinstance(k, str):
+                k = {"keyword": k}
+            if not isinstance(k, dict) or not k.get("keyword"):
+                continue
+            # enabled / priority del JSON solo pisan la DB si el JSON los trae
+            enabled = (1 if k["enabled"] else 0) if "enabled" in k else None
+            rows.append(self._dict_to_row(k, position) + (enabled, k.get("priority")))
+
+        meta = {key: value for key, value in data.items() if key != "keywords"}
+        placeholders = ", ".join("?" for _ in range(len(_COLUMNS) + 1))
+
+        with Transaction(self._conn) as conn:
+            first_import = conn.execute("SELECT COUNT(*) FROM keywords").fetchone()[0] == 0
+            conn.executemany(
+                f"INSERT INTO keywords ({', '.join(_COLUMNS)}, extra) VALUES ({placeholders}) "
+                "ON CONFLICT(keyword) DO UPDATE SET position = excluded.position, "
+                "search_volume = excluded.search_volume, category = excluded.category, "
+                "max_asins_per_search = excluded.max_asins_per_search, extra = excluded.extra, "
+                "enabled = COALESCE(?, enabled), priority = COALESCE(?, priority)",
+                rows
+            )
+            # Keywords que ya no están en el JSON (ej: marcas blacklisteadas) → fuera de la DB
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS _json_keywords (keyword TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM _json_keywords")
+            conn.executemany("INSERT OR IGNORE INTO _json_keywords (keyword) VALUES (?)",
+                             [(row[0],) for row in rows])
+            removed = conn.execute(
+                "DELETE FROM keywords WHERE keyword NOT IN (SELECT keyword FROM _json_keywords)"
+            ).rowcount
+            conn.executemany(
+                "INSERT OR REPLACE INTO keyword_meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False)) for key, value in meta.items()]
+            )
+            conn.execute("INSERT OR REPLACE INTO keyword_meta (key, value) VALUES ('source_mtime', ?)", (mtime,))
+
+        if first_import:
+            print(f"📥 {len(rows)} keywords importadas de {self.config_file} → {self.db_path}")
+        elif removed:
+            print(f"🗑️  {removed} keywords eliminadas (ya no están en {self.config_file})")
+
+    def _load_meta(self) -> dict:
+        """Campos de configuración del JSON (strategy, targets, etc.)"""
+        meta = {}
+        for key, value in self._conn.execute("SELECT key, value FROM keyword_meta WHERE key != 'source_mtime'"):
+            try:
+                meta[key] = json.loads(value)
+            except (TypeError, ValueError):
+                meta[key] = value
+        return meta
+
+    @staticmethod
+    def _dict_to_row(k: dict, position: int) -> tuple:
+        extra = {key: value for key, value in k.items() if key not in _COLUMNS}
+        return (
+            k["keyword"], position, k.get("search_volume"), k.get("category"),
+            k.get("priority", 0) or 0, k.get("max_asins_per_search"),
+            1 if k.get("enabled", True) else 0, 1 if k.get("processed", False) else 0,
+            k.get("asins_published", 0) or 0, k.get("total_asins_found", 0) or 0,
+            k.get("success_rate", 0) or 0, k.get("last_searched"), k.get("last_processed"),
+            json.dumps(extra, ensure_ascii=False) if extra else None,
+        )
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        data = dict(zip(_COLUMNS, row[:-1]))
+        for col in _BOOL_COLUMNS:
+            data[col] = bool(data[col])
+        del data["position"]
+        if row[-1]:
+            data.update(json.loads(row[-1]))
+        return data
+
+    def _fetch_one(self, where: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(f"{_SELECT} {where} LIMIT 1", params).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def _count(self, where: str = "", params: tuple = ()) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM keywords {where}", params).fetchone()[0]
+
+    @property
+    def keywords(self) -> List[Dict[str, Any]]:
+        """Todas las keywords en orden original (O(n): solo para listados)"""
+        return [self._row_to_dict(row) for row in self._conn.execute(f"{_SELECT} ORDER BY position")]
+
+    def get_keyword(self, keyword: str) -> Optional[Dict[str, Any]]:
+        return self._fetch_one("WHERE keyword = ?", (keyword,))
 
     def _get_max_priority(self) -> int:
         """Obtiene la prioridad máxima de keywords habilitadas"""
-        enabled_keywords = [k for k in self.keywords if k.get("enabled", True)]
-        if not enabled_keywords:
-            return 0
-        return max(k.get("priority", 0) for k in enabled_keywords)
+        row = self._conn.execute("SELECT MAX(priority) FROM keywords WHERE enabled = 1").fetchone()
+        return row[0] if row and row[0] is not None else 0
 
+    # ---------- Selección ----------
     def get_next_keyword(self, strategy: str = None) -> Optional[Dict[str, Any]]:
         """
         Obtiene la siguiente keyword según la estrategia configurada
@@ -107,112 +273,69 @@ class KeywordManager:
     def _get_next_by_search_volume(self) -> Optional[Dict[str, Any]]:
         """
         Estrategia: Por search volume (de mayor a menor)
-        Retorna la primera keyword NO procesada de la lista ordenada
+        Retorna la primera keyword NO procesada en el orden de master_keywords.json
         """
-        # Las keywords ya vienen ordenadas por search_volume en master_keywords.json
-        # Solo retornamos la primera que NO esté procesada
-
-        for keyword_data in self.keywords:
-            # Verificar si está habilitada (si tiene ese campo)
-            if not keyword_data.get("enabled", True):
-                continue
-
-            # Verificar si ya fue procesada
-            if not keyword_data.get("processed", False):
-                return keyword_data
-
-        # No hay más keywords sin procesar
-        return None
+        return self._fetch_one("WHERE enabled = 1 AND processed = 0 ORDER BY position")
 
     def _get_next_by_priority(self) -> Optional[Dict[str, Any]]:
         """
         Estrategia: Round-robin por prioridad
         Primero todas las de prioridad 10, luego 9, etc.
         """
-        # Filtrar keywords habilitadas
-        enabled = [k for k in self.keywords if k.get("enabled", True)]
-
-        if not enabled:
+        max_priority = self._get_max_priority()
+        if self._count("WHERE enabled = 1") == 0:
             return None
 
-        # Agrupar por prioridad
-        by_priority = {}
-        for k in enabled:
-            priority = k.get("priority", 0)
-            if priority not in by_priority:
-                by_priority[priority] = []
-            by_priority[priority].append(k)
-
-        # Ordenar prioridades descendente
-        priorities = sorted(by_priority.keys(), reverse=True)
-
-        # Buscar la siguiente keyword de la prioridad actual
-        if self.current_priority not in priorities:
-            self.current_priority = priorities[0]
-
-        keywords_at_priority = by_priority[self.current_priority]
-
-        # Ciclar entre keywords de esta prioridad
-        if self.current_index >= len(keywords_at_priority):
-            self.current_index = 0
-            # Bajar a siguiente prioridad
-            current_idx = priorities.index(self.current_priority)
-            if current_idx + 1 < len(priorities):
-                self.current_priority = priorities[current_idx + 1]
-            else:
-                # Volver a empezar desde la prioridad más alta
-                self.current_priority = priorities[0]
-            keywords_at_priority = by_priority[self.current_priority]
-
-        keyword_data = keywords_at_priority[self.current_index]
-        self.current_index += 1
-
+        # La prioridad actual pudo quedar sin keywords habilitadas
+        if self._count("WHERE enabled = 1 AND priority = ?", (self.current_priority,)) == 0:
+            self.current_priority = max_priority
+            self._cursor_position = -1
+
+        keyword_data = self._fetch_one(
+            "WHERE enabled = 1 AND priority = ? AND position > ? ORDER BY position",
+            (self.current_priority, self._cursor_position)
+        )
+        if keyword_data is None:
+            # Bajar a siguiente prioridad (o volver a empezar desde la más alta)
+            row = self._conn.execute(
+                "SELECT MAX(priority) FROM keywords WHERE enabled = 1 AND priority < ?",
+                (self.current_priority,)
+            ).fetchone()
+            self.current_priority = row[0] if row[0] is not None else max_priority
+            keyword_data = self._fetch_one(
+                "WHERE enabled = 1 AND priority = ? ORDER BY position", (self.current_priority,)
+            )
+
+        self._cursor_position = self._position_of(keyword_data["keyword"])
         return keyword_data
 
     def _get_least_recently_searched(self) -> Optional[Dict[str, Any]]:
-        """Estrategia: Menos recientemente buscada"""
-        enabled = [k for k in self.keywords if k.get("enabled", True)]
-
-        if not enabled:
-            return None
-
-        # Ordenar por last_searched (None primero)
-        def sort_key(k):
-            last = k.get("last_searched")
-            if last is None:
-                return datetime.min
-            return datetime.fromisoformat(last)
-
-        sorted_keywords = sorted(enabled, key=sort_key)
-        return sorted_keywords[0]
+        """Estrategia: Menos recientemente buscada (nunca buscadas primero)"""
+        return self._fetch_one("WHERE enabled = 1 ORDER BY last_searched")
 
     def _get_best_success_rate(self) -> Optional[Dict[str, Any]]:
         """Estrategia: Mejor tasa de éxito"""
-        enabled = [k for k in self.keywords if k.get("enabled", True)]
-
-        if not enabled:
-            return None
-
-        # Ordenar por success_rate descendente
-        sorted_keywords = sorted(enabled, key=lambda k: k.get("success_rate", 0), reverse=True)
-        return sorted_keywords[0]
+        return self._fetch_one("WHERE enabled = 1 ORDER BY success_rate DESC")
 
     def _get_next_round_robin(self) -> Optional[Dict[str, Any]]:
         """Estrategia: Round-robin simple"""
-        enabled = [k for k in self.keywords if k.get("enabled", True)]
-
-        if not enabled:
+        keyword_data = self._fetch_one("WHERE enabled = 1 AND position > ? ORDER BY position",
+                                       (self._cursor_position,))
+        if keyword_data is None:
+            keyword_data = self._fetch_one("WHERE enabled = 1 ORDER BY position")
+        if keyword_data is None:
             return None
 
-        if self.current_index >= len(enabled):
-            self.current_index = 0
-
-        keyword_data = enabled[self.current_index]
-        self.current_index += 1
-
+        self._cursor_position = self._position_of(keyword_data["keyword"])
         return keyword_data
 
-    def mark_as_searched(self, keyword_data: dict, asins_found: int = 0, successful_publications: int = 0):
+    def _position_of(self, keyword: str) -> int:
+        row = self._conn.execute("SELECT position FROM keywords WHERE keyword = ?", (keyword,)).fetchone()
+        return row[0] if row else -1
+
+    # ---------- Actualizaciones (una fila, atómicas) ----------
+    def mark_as_searched(self, keyword_data: dict, asins_found: int = 0, successful_publications: int = 0,
+                         update_success_rate: bool = True):
         """
         Marca una keyword como buscada y actualiza métricas
 
@@ -220,42 +343,67 @@ class KeywordManager:
             keyword_data: Datos de la keyword
             asins_found: Cantidad de ASINs encontrados
             successful_publications: Cantidad de publicaciones exitosas
+            update_success_rate: False en modo cola (lo actualiza record_publications)
+        """
+        now = datetime.now().isoformat()
+        # Estimar success_rate basado en esta búsqueda; promedio móvil simple
+        current_success_rate = (successful_publications / asins_found) if asins_found > 0 else 0
+
+        # Si es master_keywords.json, además marcar como procesada y sumar publicaciones
+        master = 1 if self.is_master_keywords else 0
+        self._conn.execute(
+            """
+            UPDATE keywords SET
+                last_searched = ?,
+                total_asins_found = total_asins_found + ?,
+                processed = CASE WHEN ? THEN 1 ELSE processed END,
+                asins_published = asins_published + CASE WHEN ? THEN ? ELSE 0 END,
+                last_processed = CASE WHEN ? THEN ? ELSE last_processed END,
+                success_rate = CASE WHEN NOT ? THEN success_rate
+                                    WHEN total_asins_found + ? > 0
+                                    THEN ROUND((success_rate + ?) / 2, 2) ELSE 0 END
+            WHERE keyword = ?
+            """,
+            (now, asins_found, master, master, successful_publications, master, now,
+             1 if update_success_rate else 0, asins_found, current_success_rate, keyword_data.get("keyword"))
+        )
+
+    def record_publications(self, keyword: str, successful_publications: int, asins_attempted: int = 0):
         """
-        keyword_str = keyword_data.get("keyword")
-
-        # Buscar la keyword en la lista
-        for k in self.keywords:
-            if k.get("keyword") == keyword_str:
-                k["last_searched"] = datetime.now().isoformat()
-                k["total_asins_found"] = k.get("total_asins_found", 0) + asins_found
-
-                # Si es master_keywords.json, marcar como procesada y actualizar publicaciones
-                if self.is_master_keywords:
-                    k["processed"] = True
-                    k["asins_published"] = k.get("asins_published", 0) + successful_publications
-                    k["last_processed"] = datetime.now().isoformat()
-
-                    # Actualizar totales en el config principal
-                    self.config["total_publications_current"] = sum(
-                        kw.get("asins_published", 0) for kw in self.keywords
-                    )
-                    self.config["last_updated"] = datetime.now().isoformat()
-
-                # Calcular success_rate (para keywords.json o master_keywords.json)
-                total_asins = k.get("total_asins_found", 0)
-                if total_asins > 0:
-                    # Estimar success_rate basado en esta búsqueda
-                    current_success_rate = (successful_publications / asins_found) if asins_found > 0 else 0
-                    # Promedio móvil simple
-                    old_rate = k.get("success_rate", 0)
-                    k["success_rate"] = round((old_rate + current_success_rate) / 2, 2)
-                else:
-                    k["success_rate"] = 0
-
-                break
-
-        # Guardar cambios
-        self._save_config()
+        Suma publicaciones que terminaron después de mark_as_searched
+        (modo cola: los workers publican en paralelo a la búsqueda)
+
+        Args:
+            keyword: Keyword que originó los ASINs
+            successful_publications: Publicaciones exitosas del lote
+            asins_attempted: ASINs del lote que llegaron a procesarse
+        """
+        if asins_attempted > 0:
+            current_success_rate = successful_publications / asins_attempted
+            self._conn.execute(
+                "UPDATE keywords SET asins_published = asins_published + ?, "
+                "success_rate = ROUND((success_rate + ?) / 2, 2) WHERE keyword = ?",
+                (successful_publications, current_success_rate, keyword)
+            )
+        else:
+            self._conn.execute(
+                "UPDATE keywords SET asins_published = asins_published + ? WHERE keyword = ?",
+                (successful_publications, keyword)
+            )
+
+    def mark_processed(self, keyword: str, asins_published: int):
+        """
+        Marca una keyword como procesada con su total de publicaciones
+        (flujo manual de fetch_popular_keywords)
+
+        Args:
+            keyword: Keyword procesada
+            asins_published: Cantidad de ASINs publicados
+        """
+        self._conn.execute(
+            "UPDATE keywords SET processed = 1, asins_published = ?, last_processed = ? WHERE keyword = ?",
+            (asins_published, datetime.now().isoformat(), keyword)
+        )
 
     def disable_keyword(self, keyword: str):
         """
@@ -264,12 +412,7 @@ class KeywordManager:
         Args:
             keyword: Keyword a deshabilitar
         """
-        for k in self.keywords:
-            if k.get("keyword") == keyword:
-                k["enabled"] = False
-                break
-
-        self._save_config()
+        self._conn.execute("UPDATE keywords SET enabled = 0 WHERE keyword = ?", (keyword,))
 
     def enable_keyword(self, keyword: str):
         """
@@ -278,16 +421,12 @@ class KeywordManager:
         Args:
             keyword: Keyword a habilitar
         """
-        for k in self.keywords:
-            if k.get("keyword") == keyword:
-                k["enabled"] = True
-                break
-
-        self._save_config()
+        self._conn.execute("UPDATE keywords SET enabled = 1 WHERE keyword = ?", (keyword,))
 
     def add_keyword(self, keyword: str, category: str, priority: int = 5, max_asins: int = 50):
         """
-        Agrega una nueva keyword
+        Agrega una nueva keyword (en la DB y en el JSON: el JSON es la fuente de la lista,
+        si solo estuviera en la DB la borraría el próximo _sync_from_json)
 
         Args:
             keyword: Keyword a agregar
@@ -306,9 +445,58 @@ class KeywordManager:
             "success_rate": 0
         }
 
-        self.keywords.append(new_keyword)
-        self._save_config()
+        with Transaction(self._conn) as conn:
+            position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM keywords").fetchone()[0]
+            conn.execute(
+                f"INSERT OR IGNORE INTO keywords ({', '.join(_COLUMNS)}, extra) "
+                f"VALUES ({', '.join('?' for _ in range(len(_COLUMNS) + 1))})",
+                self._dict_to_row(new_keyword, position)
+            )
+
+        self._append_to_json(new_keyword)
 
+    def _append_to_json(self, keyword_data: dict):
+        """Agrega la keyword al JSON fuente (si no está) sin re-importarlo en el próximo arranque"""
+        if not self.config_file.exists():
+            return
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        keywords = data.setdefault("keywords", [])
+        if any((k if isinstance(k, str) else k.get("keyword")) == keyword_data["keyword"]
+               for k in keywords if isinstance(k, (str, dict))):
+            return
+        keywords.append(keyword_data)
+
+        tmp = self.config_file.with_suffix(self.config_file.suffix + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.config_file)
+        self._conn.execute("INSERT OR REPLACE INTO keyword_meta (key, value) VALUES ('source_mtime', ?)",
+                           (str(self.config_file.stat().st_mtime),))
+
+    def export_json(self, path: str = None) -> Path:
+        """
+        Vuelca el estado actual al JSON (mismo formato que master_keywords.json)
+        para herramientas que todavía leen el archivo.
+        """
+        path = Path(path) if path else self.config_file
+        data = dict(self.config)
+        data["keywords"] = self.keywords
+        if self.is_master_keywords:
+            data["total_publications_current"] = sum(k.get("asins_published", 0) for k in data["keywords"])
+        data["last_updated"] = datetime.now().isoformat()
+
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+
+        # El export no es un cambio externo: no re-importar en el próximo arranque
+        self._conn.execute("INSERT OR REPLACE INTO keyword_meta (key, value) VALUES ('source_mtime', ?)",
+                           (str(path.stat().st_mtime),))
+        return path
+
+    # ---------- Estadísticas ----------
     def get_stats(self) -> dict:
         """
         Obtiene estadísticas generales de keywords
@@ -316,21 +504,41 @@ class KeywordManager:
         Returns:
             dict: Estadísticas
         """
-        enabled = [k for k in self.keywords if k.get("enabled", True)]
-        disabled = [k for k in self.keywords if not k.get("enabled", True)]
-
-        total_asins = sum(k.get("total_asins_found", 0) for k in self.keywords)
-        avg_success_rate = sum(k.get("success_rate", 0) for k in enabled) / len(enabled) if enabled else 0
+        total, enabled, total_asins, avg_success_rate = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(enabled), 0), COALESCE(SUM(total_asins_found), 0), "
+            "COALESCE(AVG(CASE WHEN enabled = 1 THEN success_rate END), 0) FROM keywords"
+        ).fetchone()
 
         return {
-            "total_keywords": len(self.keywords),
-            "enabled_keywords": len(enabled),
-            "disabled_keywords": len(disabled),
+            "total_keywords": total,
+            "enabled_keywords": enabled,
+            "disabled_keywords": total - enabled,
             "total_asins_found": total_asins,
             "avg_success_rate": round(avg_success_rate, 2),
             "strategy": self.strategy
         }
 
+    def get_progress_stats(self) -> dict:
+        """
+        Progreso de master_keywords (procesadas y publicaciones vs. objetivo)
+
+        Returns:
+            dict: Estadísticas de progreso
+        """
+        total, processed, publications = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(processed), 0), COALESCE(SUM(asins_published), 0) FROM keywords"
+        ).fetchone()
+        target = self.config.get("total_publications_target", 10000)
+
+        return {
+            "total_keywords": total,
+            "processed_keywords": processed,
+            "pending_keywords": total - processed,
+            "total_publications": publications,
+            "target_publications": target,
+            "progress_percentage": (publications / target * 100) if target > 0 else 0
+        }
+
     def print_stats(self):
         """Imprime estadísticas de keywords"""
         stats = self.get_stats()
@@ -347,8 +555,10 @@ class KeywordManager:
         print("="*60)
 
         # Top 5 keywords por éxito
-        enabled = [k for k in self.keywords if k.get("enabled", True)]
-        top_keywords = sorted(enabled, key=lambda k: k.get("success_rate", 0), reverse=True)[:5]
+        top_keywords = [
+            self._row_to_dict(row)
+            for row in self._conn.execute(f"{_SELECT} WHERE enabled = 1 ORDER BY success_rate DESC LIMIT 5")
+        ]
 
         if top_keywords:
             print("\n🏆 Top 5 Keywords (por tasa de éxito):")
@@ -372,6 +582,8 @@ if __name__ == "__main__":
     parser.add_argument("--add", nargs=4, metavar=("KEYWORD", "CATEGORY", "PRIORITY", "MAX_ASINS"), help="Agregar keyword")
     parser.add_argument("--enable", metavar="KEYWORD", help="Habilitar keyword")
     parser.add_argument("--disable", metavar="KEYWORD", help="Deshabilitar keyword")
+    parser.add_argument("--export", nargs="?", const="", metavar="JSON",
+                        help="Volcar el estado de la DB al JSON (default: el archivo de origen)")
 
     args = parser.parse_args()
 
@@ -409,5 +621,9 @@ if __name__ == "__main__":
         km.disable_keyword(args.disable)
         print(f"❌ Keyword '{args.disable}' deshabilitada")
 
+    elif args.export is not None:
+        path = km.export_json(args.export or None)
+        print(f"💾 Keywords exportadas a {path}")
+
     else:
         parser.print_help()
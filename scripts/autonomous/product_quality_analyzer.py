@@ -30,13 +30,20 @@ Uso:
 import os
 import sys
 import json
-import statistics
 from pathlib import Path
 from typing import Dict, Any, List, Tuple, Optional
 
+import numpy as np
+
 # Añadir src al path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
 
+try:
+    from src.utils.quality_scoring import QualityScorer, extract_quality_metrics, metrics_to_columns
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+    from src.utils.quality_scoring import QualityScorer, extract_quality_metrics, metrics_to_columns
+
 class ProductQualityAnalyzer:
     """
     Analizador de calidad de productos basado en métricas de Amazon
@@ -84,6 +91,10 @@ class ProductQualityAnalyzer:
             "price": 0.15       # 15% del score
         })
 
+        # Motor vectorizado con las mismas curvas (batch de productos = arrays)
+        tiers = [(name, spec.get("min_score", 0)) for name, spec in self.config.get("quality_tiers", {}).items()]
+        self.scorer = QualityScorer(self.thresholds, self.weights, tiers or None)
+
     def _load_config(self) -> dict:
         """Carga configuración de thresholds"""
         if not self.config_file.exists():
@@ -102,17 +113,7 @@ class ProductQualityAnalyzer:
         Returns:
             float: Score 0-100
         """
-        if rating is None or rating <= 0:
-            return 0
-
-        if rating >= self.thresholds["excellent_rating"]:
-            return 100
-        elif rating >= self.thresholds["good_rating"]:
-            return 80
-        elif rating >= self.thresholds["min_rating"]:
-            return 50
-        else:
-            return 20
+        return float(self.scorer.score_rating([rating])[0])
 
     def score_reviews(self, review_count: int) -> float:
         """
@@ -124,17 +125,7 @@ class ProductQualityAnalyzer:
         Returns:
             float: Score 0-100
         """
-        if review_count is None or review_count <= 0:
-            return 0
-
-        if review_count >= self.thresholds["high_reviews"]:
-            return 100
-        elif review_count >= self.thresholds["medium_reviews"]:
-            return 70
-        elif review_count >= self.thresholds["min_reviews"]:
-            return 40
-        else:
-            return 20
+        return float(self.scorer.score_reviews([review_count])[0])
 
     def score_bsr(self, bsr: int) -> float:
         """
@@ -147,17 +138,7 @@ class ProductQualityAnalyzer:
         Returns:
             float: Score 0-100
         """
-        if bsr is None or bsr <= 0:
-            return 50  # Neutral si no hay BSR
-
-        if bsr <= self.thresholds["top_bsr"]:
-            return 100
-        elif bsr <= self.thresholds["good_bsr"]:
-            return 80
-        elif bsr <= self.thresholds["medium_bsr"]:
-            return 60
-        else:
-            return 30
+        return float(self.scorer.score_bsr([bsr])[0])
 
     def score_price(self, price: float) -> float:
         """
@@ -170,19 +151,7 @@ class ProductQualityAnalyzer:
         Returns:
             float: Score 0-100
         """
-        if price is None or price <= 0:
-            return 0
-
-        # Fuera de rango mínimo/máximo
-        if price < self.thresholds["min_price"] or price > self.thresholds["max_price"]:
-            return 20
-
-        # Rango óptimo
-        if self.thresholds["optimal_min_price"] <= price <= self.thresholds["optimal_max_price"]:
-            return 100
-
-        # Dentro del rango pero no óptimo
-        return 60
+        return float(self.scorer.score_price([price])[0])
 
     def calculate_product_score(self, product_data: dict) -> Dict[str, Any]:
         """
@@ -197,83 +166,37 @@ class ProductQualityAnalyzer:
         Returns:
             dict: Score detallado
         """
-        # Extraer métricas - Soporta tanto formato directo como Amazon SP-API
-        rating = 0
-        review_count = 0
-        bsr = 0
-        price = 0
-
-        # Intentar extraer de formato Amazon SP-API (salesRanks, attributes)
-        if "salesRanks" in product_data and product_data.get("salesRanks"):
-            sales_ranks = product_data["salesRanks"]
-            if isinstance(sales_ranks, list) and sales_ranks:
-                sales_ranks = sales_ranks[0]
-
-            # BSR viene de classificationRanks
-            if "classificationRanks" in sales_ranks:
-                classification_ranks = sales_ranks["classificationRanks"]
-                if classification_ranks:
-                    bsr = classification_ranks[0].get("rank", 0)
-
-        # Precio de attributes
-        if "attributes" in product_data:
-            attrs = product_data["attributes"]
-            if "list_price" in attrs and attrs["list_price"]:
-                price_data = attrs["list_price"][0] if isinstance(attrs["list_price"], list) else attrs["list_price"]
-                price = price_data.get("value", 0)
-
-        # Formato directo (legacy)
-        if not rating:
-            rating = product_data.get("rating", 0)
-        if not review_count:
-            review_count = product_data.get("reviews_count", 0)
-        if not bsr:
-            bsr = product_data.get("sales_rank", 0)
-            if not bsr and "sales_rankings" in product_data:
-                rankings = product_data.get("sales_rankings", [])
-                if rankings:
-                    bsr = rankings[0].get("rank", 0)
-        if not price:
-            price = product_data.get("price", 0)
-            if not price and "amount" in product_data:
-                price = product_data.get("amount", 0)
-
-        # Calcular scores individuales
-        rating_score = self.score_rating(rating)
-        reviews_score = self.score_reviews(review_count)
-        bsr_score = self.score_bsr(bsr)
-        price_score = self.score_price(price)
-
-        # MODO SIMPLIFICADO: Si no hay rating/reviews, usar solo BSR + precio
-        has_rating_data = rating > 0 or review_count > 0
-
-        if not has_rating_data:
-            # Solo BSR (70%) + Precio (30%)
-            total_score = (bsr_score * 0.70) + (price_score * 0.30)
-        else:
-            # Score completo con todos los factores
-            total_score = (
-                rating_score * self.weights["rating"] +
-                reviews_score * self.weights["reviews"] +
-                bsr_score * self.weights["bsr"] +
-                price_score * self.weights["price"]
-            )
+        return self.calculate_product_scores([product_data])[0]
 
-        return {
-            "total_score": round(total_score, 2),
-            "rating_score": rating_score,
-            "reviews_score": reviews_score,
-            "bsr_score": bsr_score,
-            "price_score": price_score,
-            "metrics": {
-                "rating": rating,
-                "review_count": review_count,
-                "bsr": bsr,
-                "price": price
-            },
-            "quality_tier": self._get_quality_tier(total_score),
-            "simplified_mode": not has_rating_data
-        }
+    def calculate_product_scores(self, products: List[dict]) -> List[Dict[str, Any]]:
+        """
+        calculate_product_score para un batch: extrae métricas y puntúa todo en arrays.
+
+        Args:
+            products: Lista de productos (formato SP-API o directo)
+
+        Returns:
+            list: Un dict de score por producto (mismo formato que calculate_product_score)
+        """
+        metrics = [extract_quality_metrics(p) for p in products]
+        if not metrics:
+            return []
+        columns = metrics_to_columns(metrics)
+        result = self.scorer.score(columns["rating"], columns["reviews"], columns["bsr"], columns["price"])
+
+        return [
+            {
+                "total_score": float(result["total_score"][i]),
+                "rating_score": float(result["rating_score"][i]),
+                "reviews_score": float(result["reviews_score"][i]),
+                "bsr_score": float(result["bsr_score"][i]),
+                "price_score": float(result["price_score"][i]),
+                "metrics": metrics[i],
+                "quality_tier": str(result["quality_tier"][i]),
+                "simplified_mode": bool(result["simplified_mode"][i])
+            }
+            for i in range(len(metrics))
+        ]
 
     def _get_quality_tier(self, score: float) -> str:
         """
@@ -285,16 +208,7 @@ class ProductQualityAnalyzer:
         Returns:
             str: Tier (EXCELLENT, GOOD, REGULAR, LOW, VERY_LOW)
         """
-        if score >= 90:
-            return "EXCELLENT"
-        elif score >= 70:
-            return "GOOD"
-        elif score >= 50:
-            return "REGULAR"
-        elif score >= 30:
-            return "LOW"
-        else:
-            return "VERY_LOW"
+        return str(self.scorer.tiers([score])[0])
 
     def analyze_keyword_quality(self, asins_data: List[dict], sample_size: int = 20) -> Dict[str, Any]:
         """
@@ -318,26 +232,20 @@ class ProductQualityAnalyzer:
         # Limitar a sample_size
         sample = asins_data[:min(sample_size, len(asins_data))]
 
-        # Calcular scores
-        scores = []
-        quality_tiers = []
-
-        for product in sample:
-            result = self.calculate_product_score(product)
-            scores.append(result["total_score"])
-            quality_tiers.append(result["quality_tier"])
+        # Calcular scores (todo el batch en arrays)
+        columns = metrics_to_columns([extract_quality_metrics(p) for p in sample])
+        result = self.scorer.score(columns["rating"], columns["reviews"], columns["bsr"], columns["price"])
+        scores = result["total_score"]
+        quality_tiers = result["quality_tier"]
 
         # Estadísticas
-        avg_score = statistics.mean(scores) if scores else 0
-        median_score = statistics.median(scores) if scores else 0
+        avg_score = float(np.mean(scores))
+        median_score = float(np.median(scores))
 
         # Contar por tier
         tier_counts = {
-            "EXCELLENT": quality_tiers.count("EXCELLENT"),
-            "GOOD": quality_tiers.count("GOOD"),
-            "REGULAR": quality_tiers.count("REGULAR"),
-            "LOW": quality_tiers.count("LOW"),
-            "VERY_LOW": quality_tiers.count("VERY_LOW")
+            tier: int(np.count_nonzero(quality_tiers == tier))
+            for tier in ("EXCELLENT", "GOOD", "REGULAR", "LOW", "VERY_LOW")
         }
 
         # Tier dominante
@@ -468,16 +376,21 @@ class ProductQualityAnalyzer:
         Returns:
             list: Lista ordenada por score descendente
         """
-        scored_products = []
+        if not asins_data:
+            return []
+
+        columns = metrics_to_columns([extract_quality_metrics(p) for p in asins_data])
+        result = self.scorer.score(columns["rating"], columns["reviews"], columns["bsr"], columns["price"])
+        scores = result["total_score"]
+        tiers = result["quality_tier"]
 
-        for product in asins_data:
-            score_result = self.calculate_product_score(product)
-            product["_quality_score"] = score_result["total_score"]
-            product["_quality_tier"] = score_result["quality_tier"]
-            scored_products.append(product)
+        for i, product in enumerate(asins_data):
+            product["_quality_score"] = float(scores[i])
+            product["_quality_tier"] = str(tiers[i])
 
-        # Ordenar por score descendente
-        return sorted(scored_products, key=lambda x: x.get("_quality_score", 0), reverse=True)
+        # Ordenar por score descendente (estable: empates conservan el orden de entrada)
+        order = np.argsort(-scores, kind="stable")
+        return [asins_data[i] for i in order]
 
     def print_analysis(self, analysis: dict, keyword: str = None):
         """
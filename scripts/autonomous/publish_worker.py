@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+publish_worker.py
+═══════════════════════════════════════════════════════════════════════════════
+WORKER DE PUBLICACIÓN DE LARGA VIDA
+═══════════════════════════════════════════════════════════════════════════════
+
+Consume ASINs de la cola durable (storage/job_queue.db, cola "publish") que
+llena el sistema autónomo a medida que los ASINs pasan los filtros, y los
+publica con el pipeline de 02_publish.py.
+
+Características:
+✅ El pipeline (imports, clientes, modelos) se carga UNA sola vez
+✅ Búsqueda y publicación se solapan (no hay handoff por asins.txt + subprocess)
+✅ Lease + heartbeat: si el worker muere, otro retoma el ASIN
+✅ Resultado por ASIN en la cola (item_id, fase y error) → feedback al buscador
+✅ Se pueden correr N workers en paralelo
+
+Uso:
+    python scripts/autonomous/publish_worker.py [--once] [--poll 10] [--dry-run]
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import os
+import sys
+import time
+import signal
+import importlib.util
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+os.chdir(project_root)
+
+from src.utils.job_queue import JobQueue, default_worker_id
+
+PUBLISH_QUEUE = "publish"
+STOP_FILE = Path("storage/STOP_AUTONOMOUS")
+
+
+def load_publish_module():
+    """Importa 02_publish.py (el nombre empieza con dígito → importlib)"""
+    spec = importlib.util.spec_from_file_location("publish_pipeline", project_root / "02_publish.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class PublishWorker:
+    """Loop claim → publicar → complete/fail sobre la cola de publicación"""
+
+    def __init__(self, poll_seconds: int = 10, dry_run: bool = False):
+        self.queue = JobQueue(PUBLISH_QUEUE)
+        self.worker_id = default_worker_id()
+        self.poll_seconds = poll_seconds
+        self.stopping = False
+
+        self.publish = load_publish_module()
+        self.publish.Config.DRY_RUN = dry_run
+        self.publish.Config.setup_directories()
+        self.pipeline = self.publish.Pipeline(self.publish.Config)
+        self.processed = 0
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+    def _handle_stop(self, *_):
+        print(f"\n🛑 [{self.worker_id}] Deteniendo al terminar el ASIN actual...")
+        self.stopping = True
+
+    def _is_duplicate(self, asin: str) -> bool:
+        from src.pipeline.duplicate_checker import get_published_index
+        return get_published_index().is_published(asin)
+
+    def process_job(self, job: dict):
+        with self.queue.keep_alive(job["id"], self.worker_id):
+            self._process_job(job)
+
+    def _process_job(self, job: dict):
+        asin = job["job_key"]
+        try:
+            if self._is_duplicate(asin):
+                # fail (no complete) → "done" del lote == publicaciones reales
+                self.queue.fail(job["id"], "duplicate", retry=False,
+                                result={"success": False, "skipped": "duplicate"}, worker=self.worker_id)
+                print(f"⏭️  {asin} ya publicado - skip")
+                return
+
+            stats = self.queue.stats()
+            total = self.processed + stats["pending"] + stats["running"]
+            result = self.pipeline.process_asin(asin, self.processed + 1, total)
+            self.processed += 1
+            self._notify(asin, result, total)
+
+            summary = {k: result.get(k) for k in ("success", "item_id", "phase", "error", "error_code",
+                                                   "countries_ok", "partial_success")}
+            if result.get("success"):
+                self.queue.complete(job["id"], summary, worker=self.worker_id)
+            else:
+                # Los fallos del pipeline ya agotaron sus propios reintentos → no re-encolar
+                self.queue.fail(job["id"], str(result.get("error") or result.get("phase")), retry=False,
+                                result=summary, worker=self.worker_id)
+        except Exception as e:
+            # Error inesperado (no del pipeline): se reintenta con otro claim
+            self.queue.fail(job["id"], f"{type(e).__name__}: {e}", retry=True, worker=self.worker_id)
+            print(f"❌ Error crítico en {asin}: {str(e)[:60]}")
+
+    def _notify(self, asin: str, result: dict, total: int):
+        """Mismas notificaciones de Telegram que Pipeline.run"""
+        tg = getattr(self.publish, "tg_notifier", None)
+        if not tg or not tg.is_configured():
+            return
+        if result.get("success"):
+            if result.get("partial_success"):
+                tg.notify_partial_success(
+                    asin, result.get("item_id", "N/A"), result.get("countries_ok", []),
+                    result.get("countries_failed", []), result.get("title"), self.processed, total,
+                    result.get("max_retries_reached", False), result.get("error")
+                )
+            else:
+                tg.notify_publish_success(
+                    asin, result.get("item_id", "N/A"), result.get("countries_ok", []),
+                    result.get("countries_failed", []), result.get("title"), self.processed, total
+                )
+        elif result.get("phase") == "publish":
+            tg.notify_publish_error(asin, result.get("error", "Unknown error"), self.processed, total,
+                                    result.get("title"))
+
+    def run(self, once: bool = False):
+        print(f"👷 Worker {self.worker_id} escuchando cola '{PUBLISH_QUEUE}'")
+        while not self.stopping:
+            if STOP_FILE.exists():
+                print("🛑 Emergency stop detectado")
+                break
+            self.queue.register_worker(self.worker_id)
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                if once:
+                    break
+                time.sleep(self.poll_seconds)
+                continue
+            self.process_job(job)
+            if not self.publish.Config.DRY_RUN:
+                time.sleep(self.publish.Config.PUBLISH_DELAY)
+
+        print(f"👋 Worker {self.worker_id} detenido ({self.processed} ASINs procesados)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Worker de publicación (cola durable)")
+    parser.add_argument("--once", action="store_true", help="Salir cuando la cola quede vacía")
+    parser.add_argument("--poll", type=int, default=10, help="Segundos entre consultas con cola vacía")
+    parser.add_argument("--dry-run", action="store_true", help="Simular publicaciones sin enviar a ML")
+    args = parser.parse_args()
+
+    PublishWorker(poll_seconds=args.poll, dry_run=args.dry_run).run(once=args.once)
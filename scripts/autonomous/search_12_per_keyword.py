@@ -6,25 +6,29 @@ search_12_per_keyword.py
 BÚSQUEDA INTELIGENTE: TOP N ASINs POR KEYWORD (IA OPTIMIZADA AL FINAL)
 ═══════════════════════════════════════════════════════════════════════════════
 
-Sistema de búsqueda con validación IA SOLO al final, evaluando 1x1 hasta obtener
+Sistema de búsqueda con validación IA SOLO al final, evaluando en ventanas hasta obtener
 los N ASINs solicitados (98%+ ahorro tokens).
 
 CARACTERÍSTICAS:
 - ✅ Filtra 1000 ASINs sin IA (solo blacklist básica)
 - ✅ Ordena por BSR (mejor ranking primero)
-- ✅ Validación IA 1x1 hasta obtener N aprobados (early stopping)
+- ✅ Validación IA por ventanas hasta obtener N aprobados (early stopping)
+- ✅ Análisis de seguridad IA en batch + veredictos cacheados por ASIN (no se re-clasifica)
 - ✅ Triple filtrado: Básico + Prime + BSR + IA final
 - ✅ 98%+ reducción tokens IA vs sistema anterior
+- ✅ Búsqueda paralela con cola de keywords (--queue): cada keyword se busca UNA vez,
+     con lease + heartbeat (si un proceso muere, otro retoma la keyword)
+- ✅ Presupuesto de requests SP-API compartido entre procesos (token bucket global)
 
 FLUJO POR KEYWORD (OPTIMIZADO):
 1. Buscar 100 páginas en Amazon (~1000 ASINs)
 2. Filtrar por blacklist básica (SIN IA - batch API)
 3. Filtrar por Prime + Fast Fulfillment
 4. Ordenar TODOS los ASINs por BSR (mejor→peor)
-5. VALIDACIÓN FINAL IA (1x1, early stopping):
+5. VALIDACIÓN FINAL IA (por ventanas, early stopping):
    - Evalúa candidatos en orden BSR (mejor primero)
    - BrandIntelligenceFilter: detecta marcas prohibidas + categorías con IA
-   - AIProductSafetyFilter: análisis profundo GPT-4o-mini
+   - AIProductSafetyFilter: análisis profundo GPT-4o-mini (1 request por ventana)
    - Detiene cuando obtiene N aprobados (ej: 8)
 6. Guardar en asins.txt
 
@@ -48,6 +52,7 @@ USO:
     python scripts/autonomous/search_12_per_keyword.py
     python scripts/autonomous/search_12_per_keyword.py --keywords-file ~/Desktop/mis-keywords.txt
     python scripts/autonomous/search_12_per_keyword.py --asins-per-keyword 12
+    python scripts/autonomous/search_12_per_keyword.py --queue search --keywords-file kw.txt  (N procesos)
 ═══════════════════════════════════════════════════════════════════════════════
 """
 
@@ -55,6 +60,7 @@ import os
 import sys
 import json
 import time
+import random
 from pathlib import Path
 from datetime import datetime
 from typing import List, Tuple
@@ -67,11 +73,21 @@ sys.path.insert(0, str(project_root / 'scripts'))
 from autonomous.brand_filter import ProductFilter
 from tools.search_asins_by_keyword import search_products_by_keyword
 from integrations.amazon_pricing import get_prime_offers_batch_optimized
-from integrations.amazon_api import get_products_batch, get_product_bsr_only
+from integrations.amazon_api import get_products_batch, split_cached_asins, extract_bsr, get_spapi_client
 
 # Import NEW AI Safety Filter (reemplaza ProductFilter para mayor protección)
-from src.filters.ai_product_safety_filter import AIProductSafetyFilter
+from src.filters.ai_product_safety_filter import AIProductSafetyFilter, SEMANTIC_BATCH_SIZE
 from src.filters.brand_intelligence_filter import BrandIntelligenceFilter
+from src.utils.job_queue import JobQueue, default_worker_id
+from src.utils.request_budget import RequestBudget
+from src.utils.seen_asins import get_seen_index
+
+# Ritmo GLOBAL de requests SP-API (suma de todos los procesos de búsqueda)
+SEARCH_REQUESTS_PER_SECOND = float(os.getenv("SEARCH_REQUESTS_PER_SECOND", "1.0"))
+SEARCH_REQUEST_BURST = int(os.getenv("SEARCH_REQUEST_BURST", "5"))
+
+# Validación final: candidatos evaluados por ventana (1 request SP-API + 1 request IA de seguridad)
+AI_VALIDATION_WINDOW = min(SEMANTIC_BATCH_SIZE, 20)  # getCatalogItems acepta hasta 20 ASINs
 
 
 class SimpleKeywordSearch:
@@ -80,7 +96,8 @@ class SimpleKeywordSearch:
     Con evaluación IA de marcas y filtrado de productos prohibidos
     """
 
-    def __init__(self, keywords_file: str = None, output_file: str = None, asins_per_keyword: int = 8, process_id: int = 0):
+    def __init__(self, keywords_file: str = None, output_file: str = None, asins_per_keyword: int = 8, process_id: int = 0,
+                 queue_name: str = None):
         """
         Inicializa el buscador
 
@@ -88,8 +105,10 @@ class SimpleKeywordSearch:
             keywords_file: Path al archivo de keywords (default: ~/Desktop/asins-1000.txt)
             output_file: Path al archivo de salida (default: asins.txt)
             asins_per_keyword: Número de ASINs por keyword (default: 8)
-            process_id: ID del proceso (0-3) para evitar colisiones en parallel search
+            process_id: ID del proceso (solo para logs; el ritmo lo coordina el presupuesto compartido)
+            queue_name: Cola de keywords compartida (None = procesar el archivo completo)
         """
+        self.keywords_file_given = keywords_file is not None
         # Archivo de keywords
         if keywords_file:
             self.keywords_file = Path(keywords_file).expanduser()
@@ -107,7 +126,15 @@ class SimpleKeywordSearch:
 
         # Configuración
         self.asins_per_keyword = asins_per_keyword
-        self.process_id = process_id  # Para delays escalonados en parallel search
+        self.process_id = process_id
+
+        # Coordinación entre procesos: cola de keywords con lease + presupuesto de requests
+        self.queue = JobQueue(queue_name) if queue_name else None
+        self.worker_id = default_worker_id()
+        self.budget = RequestBudget("sp_api_search", rate=SEARCH_REQUESTS_PER_SECOND, burst=SEARCH_REQUEST_BURST)
+
+        # ASINs ya publicados / en cola / rechazados: se descartan antes de cualquier request
+        self.seen_index = get_seen_index(asins_file=str(self.output_file))
 
         # Componentes
         # NUEVO SISTEMA SIMPLIFICADO (Nov 2024):
@@ -133,6 +160,9 @@ class SimpleKeywordSearch:
         self.log("🔍 BÚSQUEDA OPTIMIZADA: IA SOLO AL FINAL (98%+ AHORRO TOKENS)")
         self.log("═══════════════════════════════════════════════════════════")
         self.log(f"📄 Keywords file: {self.keywords_file}")
+        if self.queue:
+            self.log(f"📋 Cola de keywords: '{queue_name}' (worker {self.worker_id})")
+        self.log(f"🚦 Presupuesto SP-API global: {SEARCH_REQUESTS_PER_SECOND} req/s (ráfaga {SEARCH_REQUEST_BURST})")
         self.log(f"💾 Output file: {self.output_file}")
         self.log(f"📊 Target: Top {self.asins_per_keyword} ASINs por keyword")
         self.log(f"📄 Páginas búsqueda: {self.search_pages} páginas (~{self.search_pages * 10} ASINs)")
@@ -142,7 +172,7 @@ class SimpleKeywordSearch:
         self.log(f"   2️⃣  Filtro básico: Blacklist sin IA (batch API)")
         self.log(f"   3️⃣  Filtro Prime: Solo Prime + Fast Fulfillment")
         self.log(f"   4️⃣  Ranking BSR: Ordenar por ventas (mejor→peor)")
-        self.log(f"   5️⃣  VALIDACIÓN IA 1x1: Evaluar hasta obtener {self.asins_per_keyword} aprobados ✨")
+        self.log(f"   5️⃣  VALIDACIÓN IA por ventanas: Evaluar hasta obtener {self.asins_per_keyword} aprobados ✨")
         self.log(f"")
         self.log(f"💰 OPTIMIZACIÓN IA (EARLY STOPPING):")
         self.log(f"   • Sistema anterior: ~400 ASINs con IA = ~320k tokens")
@@ -150,9 +180,9 @@ class SimpleKeywordSearch:
         self.log(f"   • Ahorro: 98%+ reducción tokens IA 🎉")
         self.log(f"")
         self.log(f"🤖 VALIDACIÓN IA FINAL (early stopping agresivo):")
-        self.log(f"   • Evalúa ASINs 1x1 en orden BSR (mejor primero)")
+        self.log(f"   • Evalúa ASINs en ventanas de hasta {AI_VALIDATION_WINDOW} en orden BSR (mejor primero)")
         self.log(f"   • BrandIntelligenceFilter: Marcas prohibidas + categorías")
-        self.log(f"   • AIProductSafetyFilter: Análisis profundo GPT-4o-mini")
+        self.log(f"   • AIProductSafetyFilter: Análisis profundo GPT-4o-mini (1 request por ventana + cache)")
         self.log(f"   • Detiene INMEDIATAMENTE al obtener {self.asins_per_keyword} aprobados")
         self.log("═══════════════════════════════════════════════════════════")
 
@@ -183,7 +213,6 @@ class SimpleKeywordSearch:
 
         # Detectar si es JSON por la extensión
         if self.keywords_file.suffix.lower() == '.json':
-            import json
             try:
                 with open(self.keywords_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
@@ -232,11 +261,6 @@ class SimpleKeywordSearch:
         Returns:
             Tuple[list, list]: (asins_permitidos, asins_rechazados)
         """
-        # Delay escalonado por proceso para evitar colisiones en batch API
-        if self.process_id > 0:
-            process_delay = self.process_id * 15  # 0s, 15s, 30s (3 procesos)
-            time.sleep(process_delay)
-
         allowed = []
         rejected = []
 
@@ -249,17 +273,12 @@ class SimpleKeywordSearch:
 
             self.log(f"   Batch {batch_num}/{total_batches}: Verificando {len(batch)} ASINs...", keyword=keyword)
 
-            # Delay aleatorio pequeño para desincronizar procesos
-            if self.process_id > 0:
-                import random
-                stagger_delay = random.randint(5, 15)  # 5-15s aleatorio
-                time.sleep(stagger_delay)
-
             # Retry logic con backoff exponencial
             max_retries = 5
             for attempt in range(max_retries):
                 try:
-                    # Obtener datos de 20 ASINs en 1 sola llamada
+                    # Obtener datos de 20 ASINs en 1 sola llamada (token del presupuesto global)
+                    self.budget.acquire()
                     products_data = get_products_batch(batch, include_data="summaries")
 
                     # Filtrar cada producto
@@ -271,7 +290,7 @@ class SimpleKeywordSearch:
                             continue
 
                         # Verificación con AIProductSafetyFilter (usa WHITELIST + keywords, sin IA)
-                        # Nota: El filtro AI profundo se ejecuta UNO POR UNO en evaluación final
+                        # Nota: El filtro AI profundo se ejecuta por ventanas en la evaluación final
                         is_safe, reason_unsafe, confidence = self.safety_filter.is_safe_to_publish(
                             asin, product_data, use_ai=False  # Solo keywords + whitelist, sin IA
                         )
@@ -289,19 +308,11 @@ class SimpleKeywordSearch:
                 except Exception as e:
                     # Si es rate limit, reintentar después de esperar
                     if "429" in str(e) and attempt < max_retries - 1:
-                        # Backoff exponencial suave + jitter POR PROCESO (rangos diferentes)
-                        import random
-                        base_wait = int(10 * (1.5 ** attempt))  # 10s, 15s, 22s, 33s, 50s
-
-                        # Jitter basado en process_id para GARANTIZAR que NO se pisen
-                        jitter_min = self.process_id * 20      # P0:0, P1:20, P2:40
-                        jitter_max = (self.process_id + 1) * 20  # P0:20, P1:40, P2:60
-                        jitter = random.randint(jitter_min, jitter_max)
+                        # Backoff exponencial suave: pausa GLOBAL (todos los procesos esperan)
+                        wait_time = int(10 * (1.5 ** attempt)) + random.randint(0, 5)  # 10s, 15s, 22s, 33s, 50s
 
-                        wait_time = base_wait + jitter
-
-                        self.log(f"   ⏱️ Rate limit (429) en batch {batch_num}, esperando {wait_time}s antes de reintentar (intento {attempt + 1}/{max_retries})...", "WARNING", keyword=keyword)
-                        time.sleep(wait_time)
+                        self.log(f"   ⏱️ Rate limit (429) en batch {batch_num}, pausando presupuesto global {wait_time}s (intento {attempt + 1}/{max_retries})...", "WARNING", keyword=keyword)
+                        self.budget.penalize(wait_time)
                         continue
                     else:
                         # Error final después de max retries: SALTAR batch y continuar
@@ -315,10 +326,6 @@ class SimpleKeywordSearch:
                             rejected.append({"asin": asin, "reason": f"Batch fallido: {str(e)[:50]}"})
                         break  # Salir del retry loop y CONTINUAR con siguiente batch
 
-            # Delay entre batches (aumentado para procesos paralelos)
-            if i + batch_size < len(asins):
-                time.sleep(5)
-
         return allowed, rejected
 
     def filter_prime_asins(self, asins: List[str], keyword: str) -> List[str]:
@@ -337,14 +344,11 @@ class SimpleKeywordSearch:
 
         self.log(f"⭐ Filtrando {len(asins)} ASINs por Prime + Fast Fulfillment...", keyword=keyword)
 
-        # Delay aleatorio pequeño para desincronizar procesos
-        if self.process_id > 0:
-            import random
-            process_delay = random.randint(5, 20)  # 5-20s aleatorio
-            time.sleep(process_delay)
-
-        # Obtener ofertas Prime en batch
-        prime_offers = get_prime_offers_batch_optimized(asins, batch_size=20, show_progress=True)
+        # Obtener ofertas Prime en batch (un token del presupuesto por request de 20 ASINs)
+        prime_offers = {}
+        for i in range(0, len(asins), 20):
+            self.budget.acquire()
+            prime_offers.update(get_prime_offers_batch_optimized(asins[i:i + 20], batch_size=20, show_progress=False))
 
         # Filtrar solo ASINs con oferta Prime válida
         prime_asins = [
@@ -371,33 +375,25 @@ class SimpleKeywordSearch:
             list: Top 12 ASINs ordenados por BSR (menor = más vendido)
         """
         self.log(f"📊 Obteniendo BSR de {len(asins)} ASINs para ordenar por ventas...", keyword=keyword)
-        self.log(f"   Esto tomará ~{len(asins) * 2 // 60} minutos (2s por ASIN)", keyword=keyword)
 
-        # Delay escalonado por proceso para evitar colisiones en BSR requests
-        if self.process_id > 0:
-            process_delay = self.process_id * 15  # 0s, 15s, 30s (3 procesos)
-            time.sleep(process_delay)
+        # Lo cacheado (dentro del TTL) no gasta presupuesto; el resto va de a 20 por request
+        products_data, misses = split_cached_asins(asins, include_data="salesRanks")
+        if products_data:
+            self.log(f"   ♻️ {len(products_data)} ASINs desde caché de catálogo", keyword=keyword)
 
-        asins_with_bsr = []
-
-        # Procesar cada ASIN
-        for i, asin in enumerate(asins, 1):
+        for i in range(0, len(misses), 20):
+            batch = misses[i:i + 20]
             try:
-                self.log(f"   [{i}/{len(asins)}] Obteniendo BSR de {asin}...", keyword=keyword)
-
-                bsr = get_product_bsr_only(asin)
-
-                if bsr:
-                    asins_with_bsr.append({"asin": asin, "bsr": bsr})
-                    self.log(f"      ✅ BSR: {bsr:,}", keyword=keyword)
-                else:
-                    self.log(f"      ⚠️ Sin BSR", keyword=keyword)
-
-                # Delay entre requests (aumentado para procesos paralelos)
-                time.sleep(4)
-
+                self.budget.acquire()
+                products_data.update(get_products_batch(batch, include_data="salesRanks"))
             except Exception as e:
-                self.log(f"   ⚠️ Error obteniendo BSR de {asin}: {e}", "WARNING", keyword=keyword)
+                self.log(f"   ⚠️ Error obteniendo BSR de {len(batch)} ASINs: {e}", "WARNING", keyword=keyword)
+
+        asins_with_bsr = []
+        for asin in asins:
+            bsr = extract_bsr(products_data.get(asin))
+            if bsr:
+                asins_with_bsr.append({"asin": asin, "bsr": bsr})
 
         if not asins_with_bsr:
             self.log(f"❌ No se pudo obtener BSR de ningún ASIN", "ERROR", keyword=keyword)
@@ -480,7 +476,6 @@ Responde en JSON:
             result_text = response.choices[0].message.content.strip()
 
             # Parsear respuesta JSON
-            import json
             import re
             json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
             if json_match:
@@ -499,12 +494,16 @@ Responde en JSON:
         keyword: str
     ) -> Tuple[List[str], dict]:
         """
-        VALIDACIÓN FINAL CON IA: Evalúa ASINs UNO POR UNO hasta obtener los N solicitados
+        VALIDACIÓN FINAL CON IA: Evalúa ASINs en ventanas hasta obtener los N solicitados
 
         Este es el paso FINAL equivalente al filtro de Wikipedia anterior.
         Va evaluando candidatos en orden BSR (mejor→peor) hasta obtener
         los N ASINs aprobados (configurado en self.asins_per_keyword).
 
+        Cada ventana (~2x los aprobados que faltan, máx AI_VALIDATION_WINDOW) trae
+        los datos en 1 request SP-API y pasa el análisis de seguridad en 1 request
+        IA (los ASINs ya analizados en otras keywords salen del cache).
+
         EARLY STOPPING: Detiene evaluación cuando obtiene suficientes aprobados.
 
         FILTRO DE MARCA: Si la keyword es una marca conocida (ej: "lego"),
@@ -519,7 +518,7 @@ Responde en JSON:
                 - Lista de hasta asins_per_keyword ASINs finales aprobados
                 - Estadísticas del filtrado
         """
-        self.log(f"[5/5] 🤖 VALIDACIÓN FINAL IA: Evaluando 1x1 hasta obtener {self.asins_per_keyword} aprobados...", keyword=keyword)
+        self.log(f"[5/5] 🤖 VALIDACIÓN FINAL IA: Evaluando en ventanas hasta obtener {self.asins_per_keyword} aprobados...", keyword=keyword)
 
         final_asins = []
         rejected = []
@@ -531,114 +530,129 @@ Responde en JSON:
             "approved": 0
         }
 
-        # Evaluar cada candidato final con IA
-        for i, asin in enumerate(candidate_asins, 1):
+        safety_stats_before = self.safety_filter.get_stats()
+        total = len(candidate_asins)
+        position = 0
+
+        # Evaluar candidatos en ventanas (orden BSR)
+        while position < total:
             # Detener si ya tenemos suficientes aprobados
-            if len(final_asins) >= self.asins_per_keyword:
+            needed = self.asins_per_keyword - len(final_asins)
+            if needed <= 0:
                 self.log(f"   ✅ Objetivo alcanzado: {self.asins_per_keyword} ASINs aprobados por IA", keyword=keyword)
-                self.log(f"   ⏭️  Deteniendo validación (evaluados {i-1}/{len(candidate_asins)})", keyword=keyword)
+                self.log(f"   ⏭️  Deteniendo validación (evaluados {position}/{total})", keyword=keyword)
                 break
 
-            stats["total_evaluated"] += 1
+            # ~2x lo que falta (parte se rechaza), acotado al batch de la IA
+            window = candidate_asins[position:position + min(AI_VALIDATION_WINDOW, max(2, needed * 2))]
+            window_start = position
+            position += len(window)
+
+            # Obtener datos completos de la ventana (1 request)
+            window_data = self._fetch_products_data(window, keyword)
+
+            # Filtros por ASIN (datos, relevancia, marca) → sobrevivientes al análisis de seguridad
+            survivors = []
+            for offset, asin in enumerate(window):
+                i = window_start + offset + 1
+                stats["total_evaluated"] += 1
+                product_data = window_data.get(asin, {})
+
+                if not product_data:
+                    self.log(f"   ⚠️ [{i}/{total}] {asin}: Sin datos - RECHAZADO", keyword=keyword)
+                    stats["rejected_data"] += 1
+                    rejected.append({"asin": asin, "reason": "sin_datos"})
+                    continue
 
-            # Obtener datos completos del ASIN
-            product_data = {}
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    batch_data = get_products_batch([asin])
-                    product_data = batch_data.get(asin, {})
-                    time.sleep(2)
-                    break
-                except Exception as e:
-                    if "429" in str(e) and attempt < max_retries - 1:
-                        import random
-                        wait_time = int(10 * (1.5 ** attempt)) + random.randint(5, 15)
-                        self.log(f"   ⏱️ Rate limit en {asin}, esperando {wait_time}s...", keyword=keyword)
-                        time.sleep(wait_time)
+                # Extraer título y marca
+                title = ""
+                brand = ""
+                if "summaries" in product_data and product_data["summaries"]:
+                    summary = product_data["summaries"][0]
+                    title = summary.get("itemName", "")
+                    brand = summary.get("brand", "")
+
+                if not title:
+                    self.log(f"   ⚠️ [{i}/{total}] {asin}: Sin título - RECHAZADO", keyword=keyword)
+                    stats["rejected_data"] += 1
+                    rejected.append({"asin": asin, "reason": "sin_titulo"})
+                    continue
+
+                # FILTRO IA 0: Verificar RELEVANCIA a la keyword
+                is_relevant = self._check_relevance_with_ai(title, keyword, brand)
+                if not is_relevant:
+                    self.log(f"   ❌ [{i}/{total}] {asin}: Rechazado IA - No relevante a '{keyword}'", keyword=keyword)
+                    stats["rejected_brand_ai"] += 1
+                    rejected.append({
+                        "asin": asin,
+                        "reason": "not_relevant",
+                        "details": f"Producto no relevante a keyword '{keyword}'"
+                    })
+                    continue
+
+                # FILTRO IA 1: BrandIntelligenceFilter (detecta marcas prohibidas + categorías con IA)
+                if brand:
+                    is_safe, reason, filter_details = self.brand_filter.is_brand_safe(title, brand)
+                    if not is_safe:
+                        self.log(f"   ❌ [{i}/{total}] {asin}: Rechazado IA - {reason}", keyword=keyword)
+                        stats["rejected_brand_ai"] += 1
+                        rejected.append({
+                            "asin": asin,
+                            "reason": "brand_intelligence_ai",
+                            "details": f"{brand}: {reason}"
+                        })
                         continue
                     else:
-                        self.log(f"   ⚠️ Error obteniendo {asin}: {e} - SALTANDO", "WARNING", keyword=keyword)
-                        break
+                        self.log(f"   ✔️  [{i}/{total}] {asin}: '{brand}' SAFE IA - {reason}", keyword=keyword)
+                else:
+                    is_safe, reason, filter_details = self.brand_filter.is_brand_safe(title, "")
+                    if not is_safe:
+                        self.log(f"   ❌ [{i}/{total}] {asin}: Rechazado IA - {reason}", keyword=keyword)
+                        stats["rejected_brand_ai"] += 1
+                        rejected.append({
+                            "asin": asin,
+                            "reason": "prohibited_category_ai",
+                            "details": reason
+                        })
+                        continue
+                    self.log(f"   ✔️  [{i}/{total}] {asin}: Sin marca, título seguro IA", keyword=keyword)
 
-            if not product_data:
-                self.log(f"   ⚠️ [{i}/{len(candidate_asins)}] {asin}: Sin datos - RECHAZADO", keyword=keyword)
-                stats["rejected_data"] += 1
-                rejected.append({"asin": asin, "reason": "sin_datos"})
-                continue
+                survivors.append((i, asin, product_data))
 
-            # Extraer título y marca
-            title = ""
-            brand = ""
-            if "summaries" in product_data and product_data["summaries"]:
-                summary = product_data["summaries"][0]
-                title = summary.get("itemName", "")
-                brand = summary.get("brand", "")
-
-            if not title:
-                self.log(f"   ⚠️ [{i}/{len(candidate_asins)}] {asin}: Sin título - RECHAZADO", keyword=keyword)
-                stats["rejected_data"] += 1
-                rejected.append({"asin": asin, "reason": "sin_titulo"})
+            if not survivors:
                 continue
 
-            # FILTRO IA 0: Verificar RELEVANCIA a la keyword
-            is_relevant = self._check_relevance_with_ai(title, keyword, brand)
-            if not is_relevant:
-                self.log(f"   ❌ [{i}/{len(candidate_asins)}] {asin}: Rechazado IA - No relevante a '{keyword}'", keyword=keyword)
-                stats["rejected_brand_ai"] += 1
-                rejected.append({
-                    "asin": asin,
-                    "reason": "not_relevant",
-                    "details": f"Producto no relevante a keyword '{keyword}'"
-                })
-                continue
+            # FILTRO IA 2: AIProductSafetyFilter (análisis profundo con GPT-4o-mini, toda la ventana junta)
+            safety_results = self.safety_filter.is_safe_to_publish_batch(
+                [(asin, product_data) for _, asin, product_data in survivors], use_ai=True
+            )
+
+            for i, asin, _ in survivors:
+                is_safe, safety_reason, confidence = safety_results[asin]
 
-            # FILTRO IA 1: BrandIntelligenceFilter (detecta marcas prohibidas + categorías con IA)
-            if brand:
-                is_safe, reason, filter_details = self.brand_filter.is_brand_safe(title, brand)
                 if not is_safe:
-                    self.log(f"   ❌ [{i}/{len(candidate_asins)}] {asin}: Rechazado IA - {reason}", keyword=keyword)
-                    stats["rejected_brand_ai"] += 1
+                    self.log(f"   ❌ [{i}/{total}] {asin}: Rechazado Safety IA - {safety_reason[:80]}", keyword=keyword)
+                    stats["rejected_safety_ai"] += 1
                     rejected.append({
                         "asin": asin,
-                        "reason": "brand_intelligence_ai",
-                        "details": f"{brand}: {reason}"
+                        # confidence 0 = fail-safe (IA falló / sin veredicto): no es un rechazo del producto
+                        "reason": "safety_ai" if confidence > 0 else "ia_sin_veredicto",
+                        "details": safety_reason
                     })
                     continue
-                else:
-                    self.log(f"   ✔️  [{i}/{len(candidate_asins)}] {asin}: '{brand}' SAFE IA - {reason}", keyword=keyword)
-            else:
-                is_safe, reason, filter_details = self.brand_filter.is_brand_safe(title, "")
-                if not is_safe:
-                    self.log(f"   ❌ [{i}/{len(candidate_asins)}] {asin}: Rechazado IA - {reason}", keyword=keyword)
-                    stats["rejected_brand_ai"] += 1
-                    rejected.append({
-                        "asin": asin,
-                        "reason": "prohibited_category_ai",
-                        "details": reason
-                    })
-                    continue
-                self.log(f"   ✔️  [{i}/{len(candidate_asins)}] {asin}: Sin marca, título seguro IA", keyword=keyword)
 
-            # FILTRO IA 2: AIProductSafetyFilter (análisis profundo con GPT-4o-mini)
-            is_safe, safety_reason, confidence = self.safety_filter.is_safe_to_publish(
-                asin, product_data, use_ai=True
-            )
+                # Aprobados de más en la última ventana: no se usan
+                if len(final_asins) >= self.asins_per_keyword:
+                    break
 
-            if not is_safe:
-                self.log(f"   ❌ [{i}/{len(candidate_asins)}] {asin}: Rechazado Safety IA - {safety_reason[:80]}", keyword=keyword)
-                stats["rejected_safety_ai"] += 1
-                rejected.append({
-                    "asin": asin,
-                    "reason": "safety_ai",
-                    "details": safety_reason
-                })
-                continue
+                # PRODUCTO APROBADO POR IA
+                final_asins.append(asin)
+                stats["approved"] += 1
+                self.log(f"   ✅ [{i}/{total}] {asin}: APROBADO IA ({len(final_asins)}/{self.asins_per_keyword})", keyword=keyword)
 
-            # PRODUCTO APROBADO POR IA
-            final_asins.append(asin)
-            stats["approved"] += 1
-            self.log(f"   ✅ [{i}/{len(candidate_asins)}] {asin}: APROBADO IA ({len(final_asins)}/{self.asins_per_keyword})", keyword=keyword)
+        safety_stats = self.safety_filter.get_stats()
+        stats["safety_ai_requests"] = safety_stats["ai_requests"] - safety_stats_before["ai_requests"]
+        stats["safety_ai_cache_hits"] = safety_stats["ai_cache_hits"] - safety_stats_before["ai_cache_hits"]
 
         # Resumen de validación IA
         self.log(f"\n   📊 RESUMEN VALIDACIÓN FINAL IA:", keyword=keyword)
@@ -648,19 +662,38 @@ Responde en JSON:
         self.log(f"      ❌ Safety IA:     {stats['rejected_safety_ai']}", keyword=keyword)
         self.log(f"      ❌ Sin datos:     {stats['rejected_data']}", keyword=keyword)
         self.log(f"   💰 Tokens IA: ~{stats['total_evaluated'] * 800} tokens (solo {stats['total_evaluated']} ASINs evaluados)", keyword=keyword)
+        self.log(f"   🤖 Requests IA seguridad: {stats['safety_ai_requests']} (cache: {stats['safety_ai_cache_hits']} ASINs)", keyword=keyword)
 
+        self.seen_index.record_rejected(rejected)
         return final_asins, stats
 
+    def _fetch_products_data(self, asins: List[str], keyword: str) -> dict:
+        """Datos completos de hasta 20 ASINs en 1 request (con reintentos ante 429)"""
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                self.budget.acquire()
+                return get_products_batch(asins)
+            except Exception as e:
+                if "429" in str(e) and attempt < max_retries - 1:
+                    wait_time = int(10 * (1.5 ** attempt)) + random.randint(5, 15)
+                    self.log(f"   ⏱️ Rate limit en ventana {asins[0]}…, pausando presupuesto global {wait_time}s...", keyword=keyword)
+                    self.budget.penalize(wait_time)
+                    continue
+                self.log(f"   ⚠️ Error obteniendo {len(asins)} ASINs: {e} - SALTANDO", "WARNING", keyword=keyword)
+                break
+        return {}
+
     def search_asins_for_keyword(self, keyword: str) -> List[str]:
         """
         Busca ASINs para una keyword y retorna top N por BSR + Validación IA final
 
-        NUEVO Proceso OPTIMIZADO (IA solo al final, evaluación 1x1):
-        1. Busca ~1000 ASINs en Amazon
+        NUEVO Proceso OPTIMIZADO (IA solo al final, evaluación por ventanas):
+        1. Busca ~1000 ASINs en Amazon (y descarta los ya vistos, sin requests)
         2. Filtra por marcas/categorías prohibidas (básico, sin IA)
         3. Filtra por Prime/Fast Fulfillment
         4. Ordena TODOS los ASINs por BSR (mejor→peor)
-        5. VALIDACIÓN FINAL IA: Evalúa 1x1 hasta obtener N aprobados (early stopping)
+        5. VALIDACIÓN FINAL IA: Evalúa por ventanas hasta obtener N aprobados (early stopping)
 
         Args:
             keyword: Keyword a buscar
@@ -686,10 +719,19 @@ Responde en JSON:
                 self.log(f"⚠️ No se encontraron ASINs", keyword=keyword)
                 return []
 
+            # 1.5. Descartar ASINs ya publicados/en cola/rechazados (índice local, sin requests)
+            new_asins, seen = self.seen_index.filter_new(all_asins)
+            if seen:
+                self.log(f"⏭️  {len(seen)} ASINs ya vistos (publicados/en cola/rechazados) - sin consultar Amazon", keyword=keyword)
+            if not new_asins:
+                self.log(f"⚠️ Todos los ASINs ya fueron vistos", keyword=keyword)
+                return []
+
             # 2. Filtrar por marcas + categorías prohibidas (SIN IA - solo blacklist básica)
             self.log(f"[2/5] Filtrando por marcas + categorías prohibidas (BATCH API - SIN IA)...", keyword=keyword)
-            allowed_asins, rejected = self.filter_asins_by_brand_batch(all_asins, keyword)
-            self.log(f"✅ Filtro básico: {len(allowed_asins)}/{len(all_asins)} ASINs permitidos", keyword=keyword)
+            allowed_asins, rejected = self.filter_asins_by_brand_batch(new_asins, keyword)
+            self.seen_index.record_rejected(rejected)
+            self.log(f"✅ Filtro básico: {len(allowed_asins)}/{len(new_asins)} ASINs permitidos", keyword=keyword)
 
             if not allowed_asins:
                 self.log(f"⚠️ Todos rechazados por filtros básicos", keyword=keyword)
@@ -715,7 +757,7 @@ Responde en JSON:
 
             self.log(f"✅ {len(ranked_asins)} candidatos ordenados por BSR", keyword=keyword)
 
-            # 5. VALIDACIÓN FINAL IA: Evaluar 1x1 hasta obtener N aprobados
+            # 5. VALIDACIÓN FINAL IA: Evaluar por ventanas hasta obtener N aprobados
             final_asins, ai_stats = self.final_ai_validation(ranked_asins, keyword)
 
             if not final_asins:
@@ -726,6 +768,7 @@ Responde en JSON:
             self.log(f"\n✅ FINAL: {len(final_asins)} ASINs seleccionados", keyword=keyword)
             self.log(f"   📊 Pipeline completo:", keyword=keyword)
             self.log(f"      {len(all_asins)} encontrados Amazon", keyword=keyword)
+            self.log(f"      → {len(new_asins)} nuevos (no vistos antes)", keyword=keyword)
             self.log(f"      → {len(allowed_asins)} filtro básico (sin IA)", keyword=keyword)
             self.log(f"      → {len(prime_asins)} Prime OK", keyword=keyword)
             self.log(f"      → {len(ranked_asins)} ordenados BSR", keyword=keyword)
@@ -752,11 +795,14 @@ Responde en JSON:
         with open(self.output_file, mode, encoding='utf-8') as f:
             for asin in asins:
                 f.write(f"{asin}\n")
+        self.seen_index.mark_queued(asins)
 
         self.log(f"💾 {len(asins)} ASINs guardados en {self.output_file}")
 
     def run(self):
         """Ejecuta la búsqueda para todas las keywords"""
+        if self.queue:
+            return self.run_queue()
 
         # Limpiar archivo de salida
         if self.output_file.exists():
@@ -810,6 +856,83 @@ Responde en JSON:
         self.log(f"   Promedio por keyword: {self.total_asins_found / max(self.total_keywords_processed, 1):.1f} ASINs")
         self.log(f"   Tiempo total:         {elapsed:.1f} minutos ({elapsed/60:.1f} horas)")
         self.log(f"   Output:               {self.output_file}")
+        self.log_spapi_usage()
+        self.log(f"{'='*60}")
+
+    def log_spapi_usage(self):
+        """Uso de cuota SP-API por operación de este proceso"""
+        for operation, usage in get_spapi_client().utilization().items():
+            self.log(f"   Cuota {operation}: {usage['requests']} requests | "
+                     f"{usage['utilization_pct']}% de {usage['rate_limit']} req/s | "
+                     f"{usage['throttled']} x 429 | espera {usage['wait_seconds']}s")
+
+    def run_queue(self, poll_seconds: int = 30):
+        """
+        Modo cola: N procesos reclaman keywords de la misma cola hasta vaciarla.
+        Cada keyword la busca un solo proceso; si ese proceso muere, su lease vence
+        y otro la retoma. El proceso sale cuando no quedan keywords pendientes ni en curso.
+        """
+        if self.output_file.exists():
+            self.output_file.unlink()
+            self.log(f"🗑️  Limpiado {self.output_file}")
+
+        # Encolar es idempotente: varios procesos pueden pasar el mismo archivo
+        if self.keywords_file_given:
+            keywords = self.load_keywords()
+            added = self.queue.enqueue_many(keywords)
+            self.log(f"📥 {added} keywords nuevas en la cola ({len(keywords) - added} ya estaban)")
+
+        stats = self.queue.stats()
+        self.log(f"\n🚀 Worker {self.worker_id}: {stats['pending']} keywords pendientes en cola '{self.queue.name}'")
+
+        while True:
+            self.queue.register_worker(self.worker_id)
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                stats = self.queue.stats()
+                if stats["running"] == 0:
+                    break
+                # Otros procesos tienen keywords en curso: esperar por si alguno muere y su lease vence
+                time.sleep(poll_seconds)
+                continue
+
+            keyword = job["job_key"]
+            self.log(f"\n{'#'*60}")
+            self.log(f"Keyword '{keyword}' (intento {job['attempts']}) | cola: {self.queue.stats()['pending']} pendientes")
+            self.log(f"{'#'*60}")
+
+            with self.queue.keep_alive(job["id"], self.worker_id) as lease:
+                try:
+                    asins = self.search_asins_for_keyword(keyword)
+                except Exception as e:
+                    self.queue.fail(job["id"], f"{type(e).__name__}: {e}", retry=True, worker=self.worker_id)
+                    continue
+
+            if lease.lost:
+                self.log(f"⚠️ Lease de '{keyword}' perdido (otro proceso la retomó) - descartando resultado", "WARNING")
+                continue
+
+            if asins:
+                self.total_keywords_processed += 1
+                self.total_asins_found += len(asins)
+                self.save_asins(asins, mode='a')
+            else:
+                self.log(f"⚠️ No se encontraron ASINs para '{keyword}'")
+            self.queue.complete(job["id"], {"asins": asins}, worker=self.worker_id)
+
+        elapsed = (datetime.now() - self.start_time).total_seconds() / 60
+        budget = self.budget.stats()
+
+        self.log(f"\n{'='*60}")
+        self.log("✅ COLA DE KEYWORDS VACÍA")
+        self.log(f"{'='*60}")
+        self.log(f"📊 RESUMEN (worker {self.worker_id}):")
+        self.log(f"   Keywords procesadas:  {self.total_keywords_processed}")
+        self.log(f"   ASINs encontrados:    {self.total_asins_found}")
+        self.log(f"   Tiempo total:         {elapsed:.1f} minutos")
+        self.log(f"   Requests SP-API (todos los procesos): {budget['granted']}")
+        self.log(f"   Output:               {self.output_file}")
+        self.log_spapi_usage()
         self.log(f"{'='*60}")
 
 
@@ -840,6 +963,11 @@ if __name__ == "__main__":
         type=int,
         help='ID del proceso (para parallel search)'
     )
+    parser.add_argument(
+        '--queue',
+        type=str,
+        help='Cola de keywords compartida entre procesos (ej: search)'
+    )
 
     args = parser.parse_args()
 
@@ -848,7 +976,8 @@ if __name__ == "__main__":
             keywords_file=args.keywords_file,
             output_file=args.output_file,
             asins_per_keyword=args.asins_per_keyword,
-            process_id=args.process_id if args.process_id is not None else 0
+            process_id=args.process_id if args.process_id is not None else 0,
+            queue_name=args.queue
         )
         searcher.run()
 
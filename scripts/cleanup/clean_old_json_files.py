@@ -24,7 +24,18 @@ def get_asins_from_db():
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
 
-        cursor.execute("SELECT asin FROM listings WHERE mini_ml_data IS NOT NULL")
+        # mini_ml_data puede estar inline (BDs viejas) o comprimido en listing_payloads
+        has_payloads = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'listing_payloads'"
+        ).fetchone()
+        if has_payloads:
+            cursor.execute("""
+                SELECT l.asin FROM listings l
+                LEFT JOIN listing_payloads p ON p.listing_id = l.id
+                WHERE l.mini_ml_data IS NOT NULL OR p.mini_ml_data IS NOT NULL
+            """)
+        else:
+            cursor.execute("SELECT asin FROM listings WHERE mini_ml_data IS NOT NULL")
         asins = [row[0] for row in cursor.fetchall()]
 
         conn.close()
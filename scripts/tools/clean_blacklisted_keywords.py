@@ -21,6 +21,9 @@ from pathlib import Path
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+from scripts.autonomous.keyword_manager import KeywordManager
+
 MASTER_KW_FILE = PROJECT_ROOT / "config" / "master_keywords.json"
 BLACKLIST_FILE = PROJECT_ROOT / "config" / "brand_blacklist.json"
 
@@ -108,6 +111,9 @@ def clean_keywords():
 
     # 6. Reporte
     print(f"\n✅ Archivo limpio guardado: {MASTER_KW_FILE.name}")
+
+    # Sincronizar ya la DB del KeywordManager (borra las keywords removidas del JSON)
+    KeywordManager(str(MASTER_KW_FILE))
     print(f"\n📊 RESULTADOS:")
     print(f"   • Keywords originales:   {original_count:,}")
     print(f"   • Keywords removidas:    {len(removed_keywords):,}")
@@ -4,9 +4,15 @@ Script para exportar todos los items de la base de datos SQLite a un archivo de
 Formato similar al export de MercadoLibre para facilitar comparaciones.
 """
 
+import sys
 import sqlite3
 import json
 from datetime import datetime
+from pathlib import Path
+
+# Agregar project root al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.utils.listing_payloads import attach_payloads
 
 DB_PATH = 'storage/listings_database.db'
 
@@ -29,6 +35,8 @@ def get_all_items_from_db():
     rows = cursor.fetchall()
 
     items = [dict(row) for row in rows]
+    # Columnas pesadas (comprimidas en listing_payloads), en batch
+    attach_payloads(conn, items, ("images_urls", "attributes", "main_features", "description"))
 
     conn.close()
 
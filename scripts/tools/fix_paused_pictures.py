@@ -14,6 +14,13 @@ Flujo:
 5. Re-subir imagen mejorada
 6. Reactivar publicación
 7. Notificar por Telegram
+
+Ciclo completo (run_fix_cycle) en pipeline de 3 etapas:
+- I/O (hilos): detalles del item + descarga (image store compartido)
+- CPU (procesos): rembg con una sesión ONNX precargada por worker, usa todos los cores
+  (cada sesión con REMBG_THREADS hilos; procesos = cores // REMBG_THREADS, sin sobresuscribir)
+- I/O (hilos): subidas concurrentes + actualización de fotos + reactivación
+Los items avanzan de etapa apenas terminan la anterior (no se espera al lote completo).
 """
 
 import os
@@ -21,12 +28,18 @@ import sys
 import json
 import requests
 import io
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
-from rembg import remove
+from requests.adapters import HTTPAdapter
+from rembg import remove, new_session
 from PIL import Image
 
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.utils.image_store import get_image_store
+
 # Cargar variables de entorno
 load_dotenv(override=True)
 
@@ -35,6 +48,17 @@ ML_API = "https://api.mercadolibre.com"
 ML_TOKEN = os.getenv("ML_ACCESS_TOKEN")
 USER_ID = os.getenv("ML_USER_ID", "2629793984")
 
+# Concurrencia del ciclo completo
+IO_WORKERS = int(os.getenv("FIX_PICTURES_IO_WORKERS", "8"))
+# Hilos ONNX por sesión rembg: con N procesos, onnxruntime usa por defecto N hilos cada uno (N×N)
+REMBG_THREADS = max(1, int(os.getenv("REMBG_THREADS", "1")))
+CPU_WORKERS = int(os.getenv("FIX_PICTURES_CPU_WORKERS", str(max(1, (os.cpu_count() or 2) // REMBG_THREADS))))
+REMBG_MODEL = os.getenv("REMBG_MODEL", "u2net")
+
+# Sesión HTTP con pool de conexiones (keep-alive) para la API de ML
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=IO_WORKERS, pool_maxsize=IO_WORKERS))
+
 # Directorio temporal para imágenes
 TEMP_DIR = Path("storage/temp_images")
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
@@ -85,7 +109,7 @@ def get_paused_items_with_picture_issues():
             "limit": 50
         }
 
-        r = requests.get(url, headers=headers, params=params, timeout=30)
+        r = _http.get(url, headers=headers, params=params, timeout=30)
         r.raise_for_status()
         results = r.json().get("results", [])
 
@@ -103,7 +127,7 @@ def get_paused_items_with_picture_issues():
             "limit": 50
         }
 
-        r = requests.get(url, headers=headers, params=params, timeout=30)
+        r = _http.get(url, headers=headers, params=params, timeout=30)
         r.raise_for_status()
         results = r.json().get("results", [])
 
@@ -125,7 +149,7 @@ def get_item_details(item_id):
 
     try:
         url = f"{ML_API}/items/{item_id}"
-        r = requests.get(url, headers=headers, timeout=30)
+        r = _http.get(url, headers=headers, timeout=30)
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -148,7 +172,7 @@ def check_picture_quality(picture_id):
         url = f"{ML_API}/quality/picture"
         params = {"picture_id": picture_id}
 
-        r = requests.get(url, headers=headers, params=params, timeout=30)
+        r = _http.get(url, headers=headers, params=params, timeout=30)
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -163,14 +187,65 @@ def download_image(image_url):
     Returns:
         PIL.Image o None si falla
     """
+    # Image store compartido: una descarga por URL (pool HTTP + cache en disco)
+    meta = get_image_store().get(image_url)
+    img = get_image_store().open_image(image_url) if meta and meta["ok"] else None
+    if img is None:
+        status = meta["status"] if meta else None
+        log(f"❌ Error descargando imagen {image_url}: status {status}")
+        return None
+    log(f"✅ Imagen descargada: {image_url[:50]}...")
+    return img
+
+
+# Sesión rembg (modelo ONNX) cargada una sola vez por proceso
+_rembg_session = None
+
+
+def _get_rembg_session():
+    global _rembg_session
+    if _rembg_session is None:
+        _rembg_session = new_session(REMBG_MODEL)
+    return _rembg_session
+
+
+def _init_rembg_worker():
+    """Initializer del process pool: deja la sesión ONNX caliente en cada worker"""
+    # rembg arma las SessionOptions (intra/inter_op_num_threads) desde OMP_NUM_THREADS
+    os.environ["OMP_NUM_THREADS"] = str(REMBG_THREADS)
+    _get_rembg_session()
+
+
+def _remove_background(image):
+    """rembg + fondo blanco (requerido por ML). Recibe y devuelve PIL.Image."""
+    # Convertir PIL Image a bytes
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='PNG')
+
+    # Remover fondo con rembg (sesión reutilizada)
+    output = remove(img_byte_arr.getvalue(), session=_get_rembg_session())
+
+    # Convertir de bytes a PIL Image
+    processed_img = Image.open(io.BytesIO(output))
+
+    # Agregar fondo blanco (requerido por ML)
+    white_bg = Image.new("RGB", processed_img.size, (255, 255, 255))
+    white_bg.paste(processed_img, mask=processed_img.split()[3] if processed_img.mode == 'RGBA' else None)
+    return white_bg
+
+
+def process_image_bytes(image_bytes):
+    """
+    Etapa CPU del pipeline (corre en el process pool).
+    Bytes de la imagen original → bytes JPEG procesados (o None si falla).
+    """
     try:
-        r = requests.get(image_url, timeout=30)
-        r.raise_for_status()
-        img = Image.open(io.BytesIO(r.content))
-        log(f"✅ Imagen descargada: {image_url[:50]}...")
-        return img
+        processed = _remove_background(Image.open(io.BytesIO(image_bytes)))
+        out = io.BytesIO()
+        processed.save(out, format='JPEG', quality=95)
+        return out.getvalue()
     except Exception as e:
-        log(f"❌ Error descargando imagen {image_url}: {e}")
+        log(f"❌ Error procesando imagen con IA: {e}")
         return None
 
 
@@ -186,22 +261,7 @@ def process_image_with_ai(image):
     """
     try:
         log("🤖 Procesando imagen con IA (rembg)...")
-
-        # Convertir PIL Image a bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr = img_byte_arr.getvalue()
-
-        # Remover fondo con rembg
-        output = remove(img_byte_arr)
-
-        # Convertir de bytes a PIL Image
-        processed_img = Image.open(io.BytesIO(output))
-
-        # Agregar fondo blanco (requerido por ML)
-        white_bg = Image.new("RGB", processed_img.size, (255, 255, 255))
-        white_bg.paste(processed_img, mask=processed_img.split()[3] if processed_img.mode == 'RGBA' else None)
-
+        white_bg = _remove_background(image)
         log("✅ Imagen procesada exitosamente")
         return white_bg
 
@@ -219,21 +279,24 @@ def upload_image_to_ml(image, item_id):
     Returns:
         picture_id de la imagen subida o None si falla
     """
+    # Convertir imagen a bytes
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format='JPEG', quality=95)
+    return upload_image_bytes_to_ml(img_byte_arr.getvalue(), item_id)
+
+
+def upload_image_bytes_to_ml(jpeg_bytes, item_id):
+    """Sube bytes JPEG ya procesados (lo usa la etapa de subidas del pipeline)"""
     headers = {"Authorization": f"Bearer {ML_TOKEN}"}
 
     try:
-        log("📤 Subiendo imagen mejorada a MercadoLibre...")
-
-        # Convertir imagen a bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='JPEG', quality=95)
-        img_byte_arr.seek(0)
+        log(f"📤 Subiendo imagen mejorada a MercadoLibre ({item_id})...")
 
         # Subir
         url = f"{ML_API}/pictures/items/upload"
-        files = {'file': ('image.jpg', img_byte_arr, 'image/jpeg')}
+        files = {'file': ('image.jpg', io.BytesIO(jpeg_bytes), 'image/jpeg')}
 
-        r = requests.post(url, headers=headers, files=files, timeout=60)
+        r = _http.post(url, headers=headers, files=files, timeout=60)
         r.raise_for_status()
 
         result = r.json()
@@ -251,7 +314,7 @@ def upload_image_to_ml(image, item_id):
         return None
 
 
-def update_item_pictures(item_id, new_picture_id, keep_old_pictures=True):
+def update_item_pictures(item_id, new_picture_id, keep_old_pictures=True, current_pictures=None):
     """
     Actualiza las imágenes de un item.
 
@@ -259,6 +322,7 @@ def update_item_pictures(item_id, new_picture_id, keep_old_pictures=True):
         item_id: ID del item
         new_picture_id: ID de la nueva imagen
         keep_old_pictures: Si True, mantiene las imágenes antiguas
+        current_pictures: Fotos actuales si ya se tienen (evita otro GET del item)
 
     Returns:
         True si exitoso, False si falla
@@ -267,11 +331,11 @@ def update_item_pictures(item_id, new_picture_id, keep_old_pictures=True):
 
     try:
         # Obtener imágenes actuales
-        item = get_item_details(item_id)
-        if not item:
-            return False
-
-        current_pictures = item.get('pictures', [])
+        if current_pictures is None:
+            item = get_item_details(item_id)
+            if not item:
+                return False
+            current_pictures = item.get('pictures', [])
 
         # Construir lista de imágenes
         if keep_old_pictures:
@@ -288,7 +352,7 @@ def update_item_pictures(item_id, new_picture_id, keep_old_pictures=True):
         url = f"{ML_API}/items/{item_id}"
         data = {"pictures": new_pictures}
 
-        r = requests.put(url, headers=headers, json=data, timeout=30)
+        r = _http.put(url, headers=headers, json=data, timeout=30)
         r.raise_for_status()
 
         log(f"✅ Imágenes actualizadas en item {item_id}")
@@ -312,7 +376,7 @@ def reactivate_item(item_id):
         url = f"{ML_API}/items/{item_id}"
         data = {"status": "active"}
 
-        r = requests.put(url, headers=headers, json=data, timeout=30)
+        r = _http.put(url, headers=headers, json=data, timeout=30)
         r.raise_for_status()
 
         log(f"✅ Item {item_id} reactivado exitosamente")
@@ -323,12 +387,12 @@ def reactivate_item(item_id):
         return False
 
 
-def fix_item_pictures(item_id):
+def prepare_item(item_id):
     """
-    Flujo completo de corrección de fotos para un item.
+    Etapa I/O de entrada: detalles del item, diagnóstico de calidad y descarga de la foto.
 
     Returns:
-        True si se corrigió exitosamente, False si no
+        dict con {item_id, title, status, pictures, image_bytes} o None si no hay nada que corregir
     """
     log(f"\n{'='*70}")
     log(f"🔧 PROCESANDO ITEM: {item_id}")
@@ -338,7 +402,7 @@ def fix_item_pictures(item_id):
     item = get_item_details(item_id)
     if not item:
         log(f"❌ No se pudo obtener detalles del item {item_id}")
-        return False
+        return None
 
     title = item.get('title', 'Sin título')[:50]
     status = item.get('status', 'unknown')
@@ -350,7 +414,7 @@ def fix_item_pictures(item_id):
 
     if not pictures:
         log(f"⚠️ Item sin fotos - nada que corregir")
-        return False
+        return None
 
     # 2. Obtener primera imagen (usualmente la problemática)
     first_picture = pictures[0]
@@ -359,7 +423,7 @@ def fix_item_pictures(item_id):
 
     if not picture_url:
         log(f"❌ No se pudo obtener URL de la imagen")
-        return False
+        return None
 
     log(f"🖼️  Picture ID: {picture_id}")
 
@@ -368,44 +432,63 @@ def fix_item_pictures(item_id):
     if quality_info:
         log(f"📊 Info de calidad: {json.dumps(quality_info, indent=2)}")
 
-    # 4. Descargar imagen
-    original_image = download_image(picture_url)
-    if not original_image:
+    # 4. Descargar imagen (image store compartido)
+    image_bytes = get_image_store().get_bytes(picture_url)
+    if not image_bytes:
         log(f"❌ No se pudo descargar la imagen")
-        return False
+        return None
+    log(f"✅ Imagen descargada: {picture_url[:50]}...")
 
-    # 5. Procesar con IA
-    processed_image = process_image_with_ai(original_image)
-    if not processed_image:
-        log(f"❌ No se pudo procesar la imagen con IA")
+    return {
+        "item_id": item_id,
+        "title": title,
+        "status": status,
+        "pictures": pictures,
+        "image_bytes": image_bytes,
+    }
+
+
+def finish_item(job, processed_bytes):
+    """
+    Etapa I/O de salida: subir la foto procesada, actualizar el item, reactivar y notificar.
+
+    Returns:
+        True si se corrigió exitosamente, False si no
+    """
+    item_id = job["item_id"]
+    status = job["status"]
+
+    if not processed_bytes:
+        log(f"❌ No se pudo procesar la imagen con IA ({item_id})")
         return False
 
     # 6. Subir imagen mejorada
-    new_picture_id = upload_image_to_ml(processed_image, item_id)
+    new_picture_id = upload_image_bytes_to_ml(processed_bytes, item_id)
     if not new_picture_id:
-        log(f"❌ No se pudo subir la imagen mejorada")
+        log(f"❌ No se pudo subir la imagen mejorada ({item_id})")
         return False
 
-    # 7. Actualizar item con nueva imagen
-    if not update_item_pictures(item_id, new_picture_id, keep_old_pictures=True):
-        log(f"❌ No se pudo actualizar las imágenes del item")
+    # 7. Actualizar item con nueva imagen (fotos actuales ya leídas en la etapa 1)
+    if not update_item_pictures(item_id, new_picture_id, keep_old_pictures=True,
+                                current_pictures=job["pictures"]):
+        log(f"❌ No se pudo actualizar las imágenes del item {item_id}")
         return False
 
     # 8. Reactivar si está pausado
     if status == "paused":
         if not reactivate_item(item_id):
-            log(f"⚠️ No se pudo reactivar el item automáticamente")
+            log(f"⚠️ No se pudo reactivar el item {item_id} automáticamente")
             log(f"💡 Intenta reactivarlo manualmente desde ML")
 
     # 9. Notificar éxito
-    log(f"✅ ¡CORRECCIÓN EXITOSA!")
+    log(f"✅ ¡CORRECCIÓN EXITOSA! ({item_id})")
 
     if telegram_configured():
         message = f"""
 ✅ <b>Foto Corregida Automáticamente</b>
 
 🆔 Item: <code>{item_id}</code>
-📦 {title}
+📦 {job["title"]}
 🖼️ Foto procesada con IA y re-subida
 {'✅ Reactivado' if status == 'paused' else '✅ Actualizado'}
 
@@ -416,6 +499,72 @@ def fix_item_pictures(item_id):
     return True
 
 
+def fix_item_pictures(item_id):
+    """
+    Flujo completo de corrección de fotos para un item (secuencial, en este proceso).
+
+    Returns:
+        True si se corrigió exitosamente, False si no
+    """
+    job = prepare_item(item_id)
+    if not job:
+        return False
+
+    # 5. Procesar con IA
+    log("🤖 Procesando imagen con IA (rembg)...")
+    processed = process_image_bytes(job["image_bytes"])
+    if processed:
+        log("✅ Imagen procesada exitosamente")
+    return finish_item(job, processed)
+
+
+def fix_items_pipeline(item_ids, io_workers=IO_WORKERS, cpu_workers=CPU_WORKERS):
+    """
+    Corrige muchos items en paralelo: descargas y subidas en hilos,
+    rembg en un process pool (una sesión ONNX caliente por worker).
+
+    Returns:
+        (success_count, failed_count)
+    """
+    success_count = failed_count = 0
+    log(f"⚙️  Pipeline: {io_workers} hilos I/O, {cpu_workers} procesos rembg")
+
+    with ThreadPoolExecutor(max_workers=io_workers) as io_pool, \
+            ProcessPoolExecutor(max_workers=cpu_workers, initializer=_init_rembg_worker,
+                                # spawn: onnxruntime no es fork-safe y el padre ya tiene hilos de I/O
+                                mp_context=multiprocessing.get_context("spawn")) as cpu_pool:
+
+        # stage: "prepare" → "process" → "finish"
+        pending = {io_pool.submit(prepare_item, item_id): ("prepare", item_id, None) for item_id in item_ids}
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage, item_id, job = pending.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    log(f"❌ Error inesperado procesando {item_id} ({stage}): {e}")
+                    failed_count += 1
+                    continue
+
+                if stage == "prepare":
+                    if not result:
+                        failed_count += 1
+                        continue
+                    image_bytes = result.pop("image_bytes")
+                    pending[cpu_pool.submit(process_image_bytes, image_bytes)] = ("process", item_id, result)
+                elif stage == "process":
+                    pending[io_pool.submit(finish_item, job, result)] = ("finish", item_id, job)
+                else:
+                    if result:
+                        success_count += 1
+                    else:
+                        failed_count += 1
+
+    return success_count, failed_count
+
+
 def run_fix_cycle():
     """Ejecuta un ciclo completo de corrección"""
     log("\n" + "="*70)
@@ -431,19 +580,8 @@ def run_fix_cycle():
 
     log(f"📋 Total items a procesar: {len(paused_items)}")
 
-    # 2. Procesar cada item
-    success_count = 0
-    failed_count = 0
-
-    for item_id in paused_items:
-        try:
-            if fix_item_pictures(item_id):
-                success_count += 1
-            else:
-                failed_count += 1
-        except Exception as e:
-            log(f"❌ Error inesperado procesando {item_id}: {e}")
-            failed_count += 1
+    # 2. Procesar items en pipeline (I/O concurrente + rembg en todos los cores)
+    success_count, failed_count = fix_items_pipeline(paused_items)
 
     # 3. Resumen
     log("\n" + "="*70)
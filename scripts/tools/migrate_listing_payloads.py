@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MIGRACIÓN: columnas pesadas de listings → listing_payloads (zlib)
+=================================================================
+
+Mueve mini_ml_data, attributes, main_features, description e images_urls a la
+tabla listing_payloads (comprimidas), crea los índices de listings (asin, date_updated)
+y hace VACUUM para recuperar el espacio liberado.
+
+Es idempotente: lo que ya está en listing_payloads no se vuelve a tocar.
+Al final compara el tamaño de la BD y el tiempo de un scan completo de listings.
+
+Uso:
+    python3 scripts/tools/migrate_listing_payloads.py
+    python3 scripts/tools/migrate_listing_payloads.py --db storage/listings_database.db --no-vacuum
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+
+# Agregar project root al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.utils.listing_payloads import LISTINGS_DB_PATH, ensure_listing_payloads
+
+# Query típica del sync / reportes (no toca columnas pesadas)
+SCAN_QUERY = "SELECT id, asin, item_id, price_usd, site_items, date_updated FROM listings"
+
+
+def _mb(path: str) -> float:
+    return os.path.getsize(path) / 1024 / 1024
+
+
+def _scan_seconds(conn: sqlite3.Connection) -> float:
+    start = time.perf_counter()
+    conn.execute(SCAN_QUERY).fetchall()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mueve las columnas pesadas de listings a listing_payloads")
+    parser.add_argument("--db", default=LISTINGS_DB_PATH, help=f"BD de listings (default: {LISTINGS_DB_PATH})")
+    parser.add_argument("--no-vacuum", action="store_true", help="No compactar el archivo al terminar")
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ No se encontró la base de datos: {args.db}")
+        return 1
+
+    size_before = _mb(args.db)
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        scan_before = _scan_seconds(conn)
+        print(f"🗜️  Migrando columnas pesadas en {args.db} ({size_before:.1f} MB)...")
+        moved = ensure_listing_payloads(conn)
+        print(f"   ✅ {moved} listings movidos a listing_payloads")
+
+        if not args.no_vacuum:
+            print("   🧹 VACUUM...")
+            conn.execute("VACUUM")
+
+        payloads = conn.execute("SELECT COUNT(*) FROM listing_payloads").fetchone()[0]
+        scan_after = _scan_seconds(conn)
+    finally:
+        conn.close()
+
+    print(f"   📦 listing_payloads: {payloads} listings")
+    print(f"   💾 Tamaño: {size_before:.1f} MB → {_mb(args.db):.1f} MB")
+    print(f"   ⏱️  Scan de listings: {scan_before * 1000:.0f} ms → {scan_after * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MIGRACIÓN: listings.site_items (JSON) → tabla normalizada site_items
+====================================================================
+
+Crea la tabla site_items (global_item_id, site_id, local_item_id, logistic_type,
+status, seller_id, error_code) con sus índices y los triggers que la mantienen
+sincronizada con listings.site_items, y la carga desde el JSON existente.
+
+Es idempotente: se puede correr las veces que haga falta (regenera la tabla).
+Al final compara contra un parseo directo del JSON.
+
+Uso:
+    python3 scripts/tools/migrate_site_items_table.py
+    python3 scripts/tools/migrate_site_items_table.py --db storage/listings_database.db
+"""
+
+import sys
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+
+# Agregar project root al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.utils.site_items_store import LISTINGS_DB_PATH, ensure_site_items_table, rebuild_site_items
+
+
+def count_json_site_items(conn: sqlite3.Connection) -> tuple:
+    """(entradas de site_items en el JSON, listings con JSON corrupto)"""
+    total = 0
+    invalid = 0
+    for (site_items_json,) in conn.execute("SELECT site_items FROM listings WHERE site_items IS NOT NULL"):
+        try:
+            site_items = json.loads(site_items_json)
+        except (TypeError, ValueError):
+            invalid += 1
+            continue
+        if isinstance(site_items, list):
+            total += sum(1 for s in site_items if isinstance(s, dict))
+        elif isinstance(site_items, dict):
+            total += sum(1 for s in site_items.values() if isinstance(s, dict))
+    return total, invalid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra listings.site_items a la tabla site_items")
+    parser.add_argument("--db", default=LISTINGS_DB_PATH, help=f"BD de listings (default: {LISTINGS_DB_PATH})")
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"❌ No se encontró la base de datos: {args.db}")
+        return 1
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        print(f"🗂️  Migrando site_items en {args.db}...")
+        if not ensure_site_items_table(conn):
+            rebuild_site_items(conn)
+
+        rows = conn.execute("SELECT COUNT(*) FROM site_items").fetchone()[0]
+        listings = conn.execute("SELECT COUNT(DISTINCT listing_id) FROM site_items").fetchone()[0]
+        expected, invalid = count_json_site_items(conn)
+
+        print(f"   ✅ {rows} registros ({listings} listings)")
+        if invalid:
+            print(f"   ⚠️  {invalid} listings con site_items JSON corrupto (sin registros)")
+        if rows != expected:
+            print(f"   ❌ El JSON tiene {expected} entradas y la tabla {rows}")
+            return 1
+        print(f"   ✅ Coincide con el JSON ({expected} entradas)")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,6 +30,10 @@ from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Agregar project root al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.utils.site_items_store import find_missing_sites, load_site_items
+
 # Cargar .env
 load_dotenv(override=True)
 
@@ -71,48 +75,19 @@ def get_items_missing_marketplaces(limit=None):
     log("\n📋 Analizando items en base de datos...", Colors.CYAN)
 
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    query = "SELECT item_id, site_items FROM listings WHERE item_id IS NOT NULL"
-    if limit:
-        query += f" LIMIT {limit}"
-
-    cursor.execute(query)
-
-    items_to_publish = []
-
-    for row in cursor.fetchall():
-        item_id = row[0]
-        site_items_str = row[1]
-
-        # Si no hay site_items, necesita publicarse en todos
-        if not site_items_str:
-            items_to_publish.append((item_id, ALL_MARKETPLACES, []))
-            continue
-
-        try:
-            site_items = json.loads(site_items_str)
-
-            # Extraer marketplaces donde YA está publicado (sin errores)
-            published_sites = {
-                item.get('site_id')
-                for item in site_items
-                if 'site_id' in item and 'error' not in item and item.get('item_id')
-            }
-
-            # Calcular marketplaces faltantes
-            missing = ALL_MARKETPLACES - published_sites
-
-            if missing:
-                items_to_publish.append((item_id, missing, site_items))
 
-        except Exception as e:
-            log(f"⚠️  Error parseando site_items de {item_id}: {e}", Colors.YELLOW)
-            continue
+    # Query indexada sobre site_items: países con item local y sin error
+    missing_by_item = find_missing_sites(conn, ALL_MARKETPLACES, limit=limit)
+    site_items_by_item = load_site_items(conn, [item_id for item_id, _ in missing_by_item])
+    items_to_publish = [
+        (item_id, missing, site_items_by_item.get(item_id, []))
+        for item_id, missing in missing_by_item
+    ]
+    total = conn.execute("SELECT COUNT(*) FROM listings WHERE item_id IS NOT NULL").fetchone()[0]
 
     conn.close()
 
-    log(f"✅ Items analizados: {cursor.rowcount if cursor.rowcount > 0 else 'N/A'}", Colors.GREEN)
+    log(f"✅ Items analizados: {total}", Colors.GREEN)
     log(f"✅ Items que necesitan publicación: {len(items_to_publish)}", Colors.GREEN)
 
     return items_to_publish
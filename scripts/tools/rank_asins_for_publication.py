@@ -13,8 +13,15 @@ Calcula un score para cada ASIN basado en múltiples factores:
 - Competencia ML: 15%
 - Categoría: 5%
 
+Ranking incremental: features y scores de cada ASIN quedan persistidos
+(storage/asin_rankings.db). En cada corrida solo se piden a Amazon los ASINs
+nuevos o con features más viejas que ASIN_RANKING_TTL_HOURS; si cambian las
+curvas de puntos se re-scorea desde las features guardadas (sin requests).
+El top N sale de un heap sobre los scores guardados.
+
 Uso como script:
     python3 scripts/tools/rank_asins_for_publication.py --limit 1000
+    python3 scripts/tools/rank_asins_for_publication.py --limit 1000 --refresh   # re-pedir todo
 
 Uso como módulo:
     from scripts.tools.rank_asins_for_publication import rank_and_select_top_asins
@@ -24,6 +31,9 @@ Uso como módulo:
 import json
 import sys
 import os
+import time
+import heapq
+import hashlib
 from pathlib import Path
 from typing import Dict, List, Optional
 import sqlite3
@@ -32,7 +42,96 @@ import sqlite3
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+import numpy as np
+
 from src.integrations.amazon_api import get_amazon_data_batch
+from src.utils.kv_store import get_connection, Transaction
+from src.utils.quality_scoring import as_array, step_down, step_up
+
+ASIN_RANKING_DB = os.getenv("ASIN_RANKING_DB", "storage/asin_rankings.db")
+ASIN_RANKING_TTL_HOURS = float(os.getenv("ASIN_RANKING_TTL_HOURS", "24"))
+AMAZON_BATCH_SIZE = 20  # ASINs por request de Catalog API
+
+
+# Curvas de puntos (máximo por factor: BSR 35, reviews 15+10, precio 20, competencia 15, categoría 5)
+BSR_THRESHOLDS, BSR_POINTS = [100, 1000, 10000, 50000, 100000], [35, 30, 25, 20, 15, 10]
+NO_BSR_POINTS = 5  # Sin BSR = peor score
+REVIEW_COUNT_THRESHOLDS, REVIEW_COUNT_POINTS = [10, 50, 100, 500, 1000], [2, 5, 8, 10, 12, 15]
+RATING_THRESHOLDS, RATING_POINTS = [3.0, 3.5, 4.0, 4.5], [1, 3, 5, 8, 10]
+NO_REVIEW_DATA_POINTS = 12  # Sin review_count ni rating (Catalog API): neutral, no el mínimo
+COMPETITION_POINTS = 10  # Score neutral por defecto (después se puede integrar con ML API)
+POPULAR_CATEGORIES = [
+    'electronics', 'home', 'kitchen', 'sports', 'outdoor',
+    'tools', 'automotive', 'pet', 'baby', 'health', 'beauty'
+]
+# Cambia solo si cambian las curvas → los scores guardados con otra versión se recalculan
+SCORING_VERSION = hashlib.sha1(json.dumps([
+    BSR_THRESHOLDS, BSR_POINTS, NO_BSR_POINTS, REVIEW_COUNT_THRESHOLDS, REVIEW_COUNT_POINTS,
+    RATING_THRESHOLDS, RATING_POINTS, NO_REVIEW_DATA_POINTS, COMPETITION_POINTS, POPULAR_CATEGORIES
+]).encode()).hexdigest()[:12]
+
+
+def calculate_asin_scores(asins_data: List[dict]) -> List[dict]:
+    """
+    calculate_asin_score para un batch completo, con arrays (motor de quality_scoring).
+
+    Args:
+        asins_data: Lista de dicts con datos de cada ASIN desde Amazon
+
+    Returns:
+        List[dict]: Un {'score', 'breakdown'} por ASIN, en el mismo orden
+    """
+    if not asins_data:
+        return []
+
+    bsr = as_array([d.get('sales_rank', 999999) for d in asins_data])
+    review_count = as_array([d.get('review_count', 0) for d in asins_data])
+    rating = as_array([d.get('rating', 0) for d in asins_data])
+    price = as_array([d.get('price', 0) for d in asins_data])
+
+    # 1. BSR Score (35 puntos) - Mientras más bajo, mejor
+    bsr_score = np.where(bsr > 0, step_down(bsr, BSR_THRESHOLDS, BSR_POINTS), NO_BSR_POINTS)
+
+    # 2. Reviews Score (25 puntos): cantidad (15 pts) + rating (10 pts)
+    #    Sin ninguno de los dos datos (no es lo mismo que 0 reviews) → puntaje neutral
+    has_review_data = np.array([d.get('review_count') is not None or d.get('rating') is not None
+                                for d in asins_data])
+    review_score = np.where(has_review_data,
+                            step_up(review_count, REVIEW_COUNT_THRESHOLDS, REVIEW_COUNT_POINTS) +
+                            step_up(rating, RATING_THRESHOLDS, RATING_POINTS),
+                            NO_REVIEW_DATA_POINTS)
+
+    # 3. Price Score (20 puntos) - Precio ideal: $20-$70
+    #    subiendo hasta $70 (10 → 15 → 20) y bajando después ($100 → 15, $150 → 10, más → 5)
+    price_score = np.where(price <= 70,
+                           step_up(price, [10, 15, 20], [5, 10, 15, 20]),
+                           step_down(price, [100, 150], [15, 10, 5]))
+    price_score = np.where(price > 0, price_score, 0)  # Sin precio
+
+    # 4. Competition Score (15 puntos)
+    competition_score = np.full(len(asins_data), COMPETITION_POINTS, dtype=np.float64)
+
+    # 5. Category Score (5 puntos) - Categorías populares
+    category_score = np.array([
+        5 if any(cat in (d.get('category') or '').lower() for cat in POPULAR_CATEGORIES) else 3
+        for d in asins_data
+    ], dtype=np.float64)
+
+    total_score = bsr_score + review_score + price_score + competition_score + category_score
+
+    return [
+        {
+            'score': float(total_score[i]),
+            'breakdown': {
+                'bsr_score': float(bsr_score[i]),
+                'review_score': float(review_score[i]),
+                'price_score': float(price_score[i]),
+                'competition_score': float(competition_score[i]),
+                'category_score': float(category_score[i])
+            }
+        }
+        for i in range(len(asins_data))
+    ]
 
 
 def calculate_asin_score(asin_data: dict) -> dict:
@@ -54,118 +153,161 @@ def calculate_asin_score(asin_data: dict) -> dict:
             }
         }
     """
+    return calculate_asin_scores([asin_data])[0]
 
-    score_breakdown = {}
-    total_score = 0
-
-    # 1. BSR Score (35 puntos) - Mientras más bajo, mejor
-    bsr = asin_data.get('sales_rank', 999999)
-    if bsr and bsr > 0:
-        # Normalizar BSR (log scale)
-        # BSR 1-100: 35 pts
-        # BSR 100-1000: 30 pts
-        # BSR 1000-10000: 25 pts
-        # BSR 10000-50000: 20 pts
-        # BSR 50000+: 10 pts
-        if bsr <= 100:
-            bsr_score = 35
-        elif bsr <= 1000:
-            bsr_score = 30
-        elif bsr <= 10000:
-            bsr_score = 25
-        elif bsr <= 50000:
-            bsr_score = 20
-        elif bsr <= 100000:
-            bsr_score = 15
-        else:
-            bsr_score = 10
-    else:
-        bsr_score = 5  # Sin BSR = peor score
-
-    score_breakdown['bsr_score'] = bsr_score
-    total_score += bsr_score
-
-    # 2. Reviews Score (25 puntos)
-    review_count = asin_data.get('review_count', 0)
-    rating = asin_data.get('rating', 0)
-
-    # Sub-score por cantidad de reviews (15 pts)
-    if review_count >= 1000:
-        review_count_score = 15
-    elif review_count >= 500:
-        review_count_score = 12
-    elif review_count >= 100:
-        review_count_score = 10
-    elif review_count >= 50:
-        review_count_score = 8
-    elif review_count >= 10:
-        review_count_score = 5
-    else:
-        review_count_score = 2
-
-    # Sub-score por rating (10 pts)
-    if rating >= 4.5:
-        rating_score = 10
-    elif rating >= 4.0:
-        rating_score = 8
-    elif rating >= 3.5:
-        rating_score = 5
-    elif rating >= 3.0:
-        rating_score = 3
-    else:
-        rating_score = 1
-
-    review_score = review_count_score + rating_score
-    score_breakdown['review_score'] = review_score
-    total_score += review_score
 
-    # 3. Price Score (20 puntos) - Precio ideal: $20-$70
-    price = asin_data.get('price', 0)
-
-    if 20 <= price <= 70:
-        price_score = 20  # Rango ideal
-    elif 15 <= price < 20 or 70 < price <= 100:
-        price_score = 15  # Aceptable
-    elif 10 <= price < 15 or 100 < price <= 150:
-        price_score = 10  # Marginal
-    elif price > 0:
-        price_score = 5   # Muy bajo o muy alto
-    else:
-        price_score = 0   # Sin precio
-
-    score_breakdown['price_score'] = price_score
-    total_score += price_score
-
-    # 4. Competition Score (15 puntos) - Basado en saturación de categoría
-    # Por ahora asignamos score base, después puedes integrarlo con ML API
-    competition_score = 10  # Score neutral por defecto
-    score_breakdown['competition_score'] = competition_score
-    total_score += competition_score
-
-    # 5. Category Score (5 puntos) - Categorías populares
-    category = asin_data.get('category', '').lower()
-    popular_categories = [
-        'electronics', 'home', 'kitchen', 'sports', 'outdoor',
-        'tools', 'automotive', 'pet', 'baby', 'health', 'beauty'
-    ]
+class AsinScoreStore:
+    """
+    Features + score persistidos por ASIN (SQLite WAL):
 
-    category_score = 5 if any(cat in category for cat in popular_categories) else 3
-    score_breakdown['category_score'] = category_score
-    total_score += category_score
+        asin_rankings (asin, features JSON o NULL = sin datos en Amazon, features_at,
+                       score, breakdown JSON, scoring_version, scored_at)
+    """
 
+    def __init__(self, db_path: str = None, ttl_hours: float = ASIN_RANKING_TTL_HOURS):
+        self.db_path = db_path or ASIN_RANKING_DB
+        self.max_age = ttl_hours * 3600
+        self._init_schema()
+
+    @property
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _init_schema(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS asin_rankings (
+                asin TEXT PRIMARY KEY,
+                features TEXT,
+                features_at REAL NOT NULL,
+                score REAL,
+                breakdown TEXT,
+                scoring_version TEXT,
+                scored_at REAL
+            )
+        """)
+
+    def oldest(self, max_age: float = None) -> float:
+        """features_at mínimo para considerar vigentes las features (TTL 0 = nada vigente)"""
+        max_age = self.max_age if max_age is None else max_age
+        return time.time() - max_age if max_age > 0 else float("inf")
+
+    def load(self, asins: List[str]) -> Dict[str, dict]:
+        """{asin: {features, features_at, score, breakdown, scoring_version}} de los ASINs guardados"""
+        rows = {}
+        conn = self._conn
+        for i in range(0, len(asins), 500):
+            chunk = asins[i:i + 500]
+            query = ("SELECT asin, features, features_at, score, breakdown, scoring_version "
+                     "FROM asin_rankings WHERE asin IN (%s)" % ",".join("?" * len(chunk)))
+            for asin, features, features_at, score, breakdown, version in conn.execute(query, chunk):
+                rows[asin] = {
+                    "features": json.loads(features) if features else None,
+                    "features_at": features_at,
+                    "score": score,
+                    "breakdown": json.loads(breakdown) if breakdown else None,
+                    "scoring_version": version,
+                }
+        return rows
+
+    def save(self, entries: Dict[str, dict], features_at: float = None):
+        """
+        Guarda features + score. `entries`: {asin: {features, score, breakdown}}.
+        Sin `features_at` solo se actualiza el score (re-scoring desde features guardadas).
+        """
+        now = time.time()
+        with Transaction(self._conn) as conn:
+            if features_at is None:
+                conn.executemany("""
+                    UPDATE asin_rankings SET score = ?, breakdown = ?, scoring_version = ?, scored_at = ?
+                    WHERE asin = ?
+                """, [
+                    (e["score"], json.dumps(e["breakdown"]), SCORING_VERSION, now, asin)
+                    for asin, e in entries.items()
+                ])
+                return
+            conn.executemany("""
+                INSERT INTO asin_rankings (asin, features, features_at, score, breakdown, scoring_version, scored_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(asin) DO UPDATE SET
+                    features = excluded.features, features_at = excluded.features_at,
+                    score = excluded.score, breakdown = excluded.breakdown,
+                    scoring_version = excluded.scoring_version, scored_at = excluded.scored_at
+            """, [
+                (asin,
+                 json.dumps(e["features"], ensure_ascii=False) if e["features"] is not None else None,
+                 features_at,
+                 e["score"],
+                 json.dumps(e["breakdown"]) if e["breakdown"] is not None else None,
+                 SCORING_VERSION,
+                 now)
+                for asin, e in entries.items()
+            ])
+
+
+def _score_entries(asins_data: Dict[str, dict]) -> Dict[str, dict]:
+    """{asin: features} → {asin: {features, score, breakdown}} (scoring en batch)"""
+    asins = list(asins_data)
+    results = calculate_asin_scores([asins_data[a] for a in asins])
     return {
-        'score': total_score,
-        'breakdown': score_breakdown
+        asin: {"features": asins_data[asin], "score": r["score"], "breakdown": r["breakdown"]}
+        for asin, r in zip(asins, results)
     }
 
 
-def rank_asins_from_file(asins_file: Path, limit: int = 1000) -> List[Dict]:
+def refresh_asin_features(asins: List[str], store: AsinScoreStore) -> Dict[str, dict]:
+    """
+    Pide a Amazon (batches de 20) las features de `asins`, las scorea y las guarda.
+    ASINs sin datos quedan guardados como tales (no se vuelven a pedir hasta que venza el TTL).
+    Los de un batch que falló (429, red, 5xx: "retryable") no se guardan: conservan lo
+    que tenían y se vuelven a pedir en la próxima corrida.
+
+    Returns:
+        Dict[str, dict]: {asin: {features, score, breakdown}} de lo que se guardó
+    """
+    saved = {}
+    for i in range(0, len(asins), AMAZON_BATCH_SIZE):
+        batch = asins[i:i + AMAZON_BATCH_SIZE]
+        print(f"\n[{i+1}-{min(i+AMAZON_BATCH_SIZE, len(asins))}/{len(asins)}] Obteniendo datos de Amazon...")
+
+        batch_data = get_amazon_data_batch(batch)
+        retryable = [asin for asin in batch if batch_data.get(asin, {}).get('retryable')]
+        if retryable:
+            print(f"   ❌ {len(retryable)} ASINs sin respuesta de Amazon (se reintentan en la próxima corrida)")
+
+        valid = {}
+        entries = {}
+        for asin in batch:
+            asin_data = batch_data.get(asin, {})
+            if asin_data.get('retryable'):
+                continue
+            if not asin_data or 'error' in asin_data:
+                print(f"   ⚠️  {asin}: Sin datos")
+                entries[asin] = {"features": None, "score": None, "breakdown": None}
+            else:
+                valid[asin] = asin_data
+
+        entries.update(_score_entries(valid))
+        if entries:
+            store.save(entries, features_at=time.time())
+        saved.update(entries)
+        print(f"   ✅ {len(valid)} scoreados, {len(entries) - len(valid)} sin datos")
+
+    return saved
+
+
+def rank_asins_from_file(asins_file: Path, limit: int = 1000, max_age_hours: float = None,
+                         store: AsinScoreStore = None) -> List[Dict]:
     """
     Rankea ASINs desde un archivo y retorna los top N.
 
+    Solo se piden a Amazon los ASINs nuevos o con features vencidas; el resto
+    usa el score guardado (re-scoreado si cambiaron las curvas).
+
     Args:
         asins_file: Path al archivo con ASINs (uno por línea)
         limit: Cantidad de ASINs a retornar
+        max_age_hours: TTL de las features (default: ASIN_RANKING_TTL_HOURS; 0 = re-pedir todo)
+        store: AsinScoreStore a usar (default: storage/asin_rankings.db)
 
     Returns:
         List[Dict]: Lista de ASINs rankeados con sus scores
@@ -177,67 +319,66 @@ def rank_asins_from_file(asins_file: Path, limit: int = 1000) -> List[Dict]:
         return []
 
     with open(asins_file, 'r') as f:
-        asins = [
+        asins = list(dict.fromkeys(
             line.strip().upper()
             for line in f
             if line.strip() and not line.startswith("#")
-        ]
+        ))
+
+    store = store or AsinScoreStore()
+    max_age = None if max_age_hours is None else max_age_hours * 3600
 
     print(f"\n📊 Evaluando {len(asins)} ASINs...")
     print("="*60)
 
-    # Obtener datos de Amazon en batch (20 ASINs por request)
-    batch_size = 20
-    all_ranked_asins = []
-
-    for i in range(0, len(asins), batch_size):
-        batch = asins[i:i+batch_size]
-        print(f"\n[{i+1}-{min(i+batch_size, len(asins))}/{len(asins)}] Obteniendo datos de Amazon...")
-
-        # Obtener datos del batch
-        batch_data = get_amazon_data_batch(batch)
+    # 1. Scores guardados; pedir a Amazon solo nuevos / vencidos
+    rows = store.load(asins)
+    oldest = store.oldest(max_age)
+    stale = [asin for asin in asins if asin not in rows or rows[asin]["features_at"] < oldest]
+    print(f"  ♻️  Con features vigentes: {len(asins) - len(stale)}")
+    print(f"  🆕 Nuevos o vencidos: {len(stale)}")
 
-        # Calcular score para cada ASIN
-        for asin in batch:
-            asin_data = batch_data.get(asin, {})
-
-            if not asin_data or 'error' in asin_data:
-                print(f"   ⚠️  {asin}: Sin datos")
-                continue
-
-            # Calcular score
-            score_result = calculate_asin_score(asin_data)
-
-            # Agregar a lista
-            ranked_asin = {
-                'asin': asin,
-                'score': score_result['score'],
-                'breakdown': score_result['breakdown'],
-                'title': asin_data.get('title', 'N/A')[:60],
-                'price': asin_data.get('price', 0),
-                'bsr': asin_data.get('sales_rank', 999999),
-                'reviews': asin_data.get('review_count', 0),
-                'rating': asin_data.get('rating', 0)
-            }
+    if stale:
+        rows.update(refresh_asin_features(stale, store))
 
-            all_ranked_asins.append(ranked_asin)
-
-            print(f"   ✅ {asin}: Score {score_result['score']:.1f}/100")
-
-    # Ordenar por score (mayor a menor)
-    all_ranked_asins.sort(key=lambda x: x['score'], reverse=True)
-
-    # Retornar top N
-    top_asins = all_ranked_asins[:limit]
+    # 2. Re-scorear (sin requests) lo guardado con otra versión de las curvas
+    outdated = {
+        asin: row["features"] for asin, row in rows.items()
+        if row["features"] is not None and row.get("scoring_version", SCORING_VERSION) != SCORING_VERSION
+    }
+    if outdated:
+        print(f"  🔁 Re-scoreando {len(outdated)} ASINs (curvas actualizadas)")
+        rescored = _score_entries(outdated)
+        store.save(rescored)
+        rows.update(rescored)
+
+    # 3. Top N con heap (empates: orden del archivo, igual que un sort estable)
+    scored = [asin for asin in asins if asin in rows and rows[asin]["score"] is not None]
+    top = heapq.nlargest(limit, scored, key=lambda asin: rows[asin]["score"])
+
+    top_asins = []
+    for asin in top:
+        asin_data = rows[asin]["features"]
+        top_asins.append({
+            'asin': asin,
+            'score': rows[asin]['score'],
+            'breakdown': rows[asin]['breakdown'],
+            'title': (asin_data.get('title') or 'N/A')[:60],
+            'price': asin_data.get('price', 0),
+            'bsr': asin_data.get('sales_rank', 999999),
+            'reviews': asin_data.get('review_count', 0),
+            'rating': asin_data.get('rating', 0)
+        })
 
     print(f"\n{'='*60}")
     print(f"📊 RANKING COMPLETADO")
     print(f"{'='*60}")
-    print(f"  Total evaluados: {len(all_ranked_asins)}")
+    print(f"  Total evaluados: {len(scored)}")
     print(f"  Top seleccionados: {len(top_asins)}")
-    print(f"  Score promedio top {limit}: {sum(a['score'] for a in top_asins)/len(top_asins):.1f}")
-    print(f"  Score más alto: {top_asins[0]['score']:.1f}")
-    print(f"  Score más bajo (top {limit}): {top_asins[-1]['score']:.1f}")
+    if top_asins:
+        print(f"  Score promedio top {limit}: {sum(a['score'] for a in top_asins)/len(top_asins):.1f}")
+        print(f"  Score más alto: {top_asins[0]['score']:.1f}")
+        print(f"  Score más bajo (top {limit}): {top_asins[-1]['score']:.1f}")
     print(f"{'='*60}\n")
 
     return top_asins
@@ -246,7 +387,8 @@ def rank_asins_from_file(asins_file: Path, limit: int = 1000) -> List[Dict]:
 def rank_and_select_top_asins(
     input_file: str,
     limit: int = 1000,
-    verbose: bool = True
+    verbose: bool = True,
+    max_age_hours: float = None
 ) -> List[str]:
     """
     FUNCIÓN PRINCIPAL DEL MÓDULO
@@ -257,6 +399,7 @@ def rank_and_select_top_asins(
         input_file: Path al archivo con ASINs (uno por línea)
         limit: Cantidad de ASINs a retornar
         verbose: Si es True, imprime progreso
+        max_age_hours: TTL de las features guardadas (default: ASIN_RANKING_TTL_HOURS)
 
     Returns:
         List[str]: Lista de ASINs rankeados (solo los códigos, sin metadata)
@@ -270,7 +413,7 @@ def rank_and_select_top_asins(
     """
 
     # Rankear con metadata completa
-    ranked_asins = rank_asins_from_file(Path(input_file), limit=limit)
+    ranked_asins = rank_asins_from_file(Path(input_file), limit=limit, max_age_hours=max_age_hours)
 
     # Extraer solo los ASINs (sin metadata)
     asin_list = [asin_data['asin'] for asin_data in ranked_asins]
@@ -357,6 +500,17 @@ def main():
         default='asins_top1000.txt',
         help='Archivo de salida TXT con solo ASINs (default: asins_top1000.txt)'
     )
+    parser.add_argument(
+        '--max-age-hours',
+        type=float,
+        default=None,
+        help=f'TTL de las features guardadas (default: {ASIN_RANKING_TTL_HOURS:g}h)'
+    )
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help='Re-pedir a Amazon las features de todos los ASINs (ignora el TTL)'
+    )
 
     args = parser.parse_args()
 
@@ -378,7 +532,8 @@ def main():
     print("="*60)
 
     # Rankear ASINs
-    ranked_asins = rank_asins_from_file(input_file, limit=args.limit)
+    max_age_hours = 0 if args.refresh else args.max_age_hours
+    ranked_asins = rank_asins_from_file(input_file, limit=args.limit, max_age_hours=max_age_hours)
 
     if not ranked_asins:
         print("❌ No se pudieron rankear ASINs")
@@ -7,6 +7,11 @@ Script simple para leer datos de la BD de listings
 import sqlite3
 import json
 import sys
+from pathlib import Path
+
+# Agregar project root al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.utils.listing_payloads import attach_payloads
 
 DB_PATH = "storage/listings_database.db"
 
@@ -22,6 +27,8 @@ def get_listing_by_asin(asin):
     if row:
         # Convertir a dict
         listing = dict(row)
+        # Columnas pesadas (comprimidas en listing_payloads)
+        attach_payloads(conn, [listing], ("images_urls", "attributes", "main_features", "description"))
 
         # Parsear los campos JSON
         if listing.get('images_urls'):
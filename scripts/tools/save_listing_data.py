@@ -6,22 +6,63 @@ Usado por main2 para almacenar item_ids después de publicar
 """
 
 import os
+import re
+import sys
 import sqlite3
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Agregar project root al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.utils.site_items_store import ensure_site_items_table
+from src.utils.listing_payloads import ensure_listing_payloads, store_payload
+
 # Cargar variables de entorno
 load_dotenv(override=True)
 
 DB_PATH = "storage/listings_database.db"
+GTIN_LENGTHS = (8, 12, 13, 14)  # GTIN-8 / UPC-A / EAN-13 / GTIN-14
+
+# DBs ya inicializadas en este proceso (init_database se llama en cada chequeo)
+_initialized_dbs = set()
 
 def is_save_to_db_enabled():
     """Lee la variable SAVE_TO_DB del .env cada vez que se llama"""
     return os.getenv("SAVE_TO_DB", "true").lower() == "true"
 
+def normalize_gtin(gtin) -> str:
+    """
+    GTIN/UPC/EAN → 14 dígitos con ceros a la izquierda (UPC-A 012345678905 y
+    EAN-13 0012345678905 son el mismo producto). Si vienen varios separados
+    por coma se usa el primero válido. '' si no hay un GTIN válido.
+    """
+    if not gtin:
+        return ""
+    for token in re.split(r"[,;|/]", str(gtin)):
+        digits = re.sub(r"\D", "", token)
+        if len(digits) in GTIN_LENGTHS:
+            return digits.zfill(14)
+    return ""
+
+
+def backfill_gtin_normalized(conn: sqlite3.Connection) -> int:
+    """
+    Completa gtin_normalized de las filas escritas por otros scripts (rebuild, sync)
+    o cuyo gtin cambió (el trigger lo vuelve a NULL). Usa el índice → barato si no hay nada.
+    """
+    rows = conn.execute("SELECT id, gtin FROM listings WHERE gtin_normalized IS NULL").fetchall()
+    if rows:
+        conn.executemany("UPDATE listings SET gtin_normalized = ? WHERE id = ?",
+                         [(normalize_gtin(gtin), row_id) for row_id, gtin in rows])
+        conn.commit()
+    return len(rows)
+
+
 def init_database():
-    """Inicializa la base de datos si no existe"""
+    """Inicializa la base de datos si no existe (una vez por proceso)"""
+    if DB_PATH in _initialized_dbs:
+        return
     Path("storage").mkdir(parents=True, exist_ok=True)
 
     conn = sqlite3.connect(DB_PATH)
@@ -90,16 +131,35 @@ def init_database():
         'es_catalogo': 'INTEGER DEFAULT 0',
         'ultima_actualizacion_precio': 'TIMESTAMP',
         'amazon_url': 'TEXT',
-        'gtin': 'TEXT'
+        'gtin': 'TEXT',
+        'gtin_normalized': 'TEXT'
     }
 
     for col_name, col_type in new_columns.items():
         if col_name not in existing_columns:
             cursor.execute(f"ALTER TABLE listings ADD COLUMN {col_name} {col_type}")
 
+    # Índices para la detección de duplicados (mismos nombres que rebuild_db_v2)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_asin ON listings(asin)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_gtin_normalized ON listings(gtin_normalized)")
+    # Si otro script cambia el gtin, la normalización se recalcula en el próximo backfill
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_listings_gtin_changed
+        AFTER UPDATE OF gtin ON listings
+        WHEN NEW.gtin IS NOT OLD.gtin AND NEW.gtin_normalized IS OLD.gtin_normalized
+        BEGIN
+            UPDATE listings SET gtin_normalized = NULL WHERE id = NEW.id;
+        END
+    """)
 
     conn.commit()
+    backfill_gtin_normalized(conn)
+    # Tabla normalizada de site_items (la mantienen triggers; migra el JSON la primera vez)
+    ensure_site_items_table(conn)
+    # Columnas pesadas comprimidas en listing_payloads (+ índices asin / date_updated)
+    ensure_listing_payloads(conn)
     conn.close()
+    _initialized_dbs.add(DB_PATH)
 
 
 def save_listing(item_id, mini_ml, marketplaces=None, site_items=None):
@@ -120,6 +180,9 @@ def save_listing(item_id, mini_ml, marketplaces=None, site_items=None):
     if marketplaces is None:
         marketplaces = ["MLM", "MLB", "MLC", "MCO", "MLA"]
 
+    # Columnas nuevas (gtin_normalized) + triggers de site_items (una vez por proceso)
+    init_database()
+
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
@@ -134,6 +197,7 @@ def save_listing(item_id, mini_ml, marketplaces=None, site_items=None):
     # Construir URL de Amazon
     amazon_url = f"https://www.amazon.com/dp/{asin}" if asin else None
     gtin = mini_ml.get("gtin", "")
+    gtin_normalized = normalize_gtin(gtin)
 
     # Precio
     price_info = mini_ml.get("price", {})
@@ -177,38 +241,42 @@ def save_listing(item_id, mini_ml, marketplaces=None, site_items=None):
                 width_cm = ?,
                 height_cm = ?,
                 weight_kg = ?,
-                images_urls = ?,
-                attributes = ?,
-                main_features = ?,
                 marketplaces = ?,
                 site_items = ?,
                 date_updated = ?,
-                mini_ml_data = ?,
                 amazon_url = ?,
-                gtin = ?
+                gtin = ?,
+                gtin_normalized = ?
             WHERE asin = ?
         """, (
             item_id, title, brand, model, category_id, category_name,
             price_usd, length_cm, width_cm, height_cm, weight_kg,
-            images_urls, attributes, main_features, marketplaces_str,
-            site_items_str, now, mini_ml_data, amazon_url, gtin, asin
+            marketplaces_str, site_items_str, now, amazon_url, gtin, gtin_normalized, asin
         ))
+        listing_id = existing[0]
     else:
         # Insertar nuevo registro
         cursor.execute("""
             INSERT INTO listings (
                 item_id, asin, title, brand, model, category_id, category_name,
                 price_usd, length_cm, width_cm, height_cm, weight_kg,
-                images_urls, attributes, main_features, marketplaces,
-                site_items, date_published, date_updated, mini_ml_data,
-                amazon_url, gtin
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                marketplaces, site_items, date_published, date_updated,
+                amazon_url, gtin, gtin_normalized
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             item_id, asin, title, brand, model, category_id, category_name,
             price_usd, length_cm, width_cm, height_cm, weight_kg,
-            images_urls, attributes, main_features, marketplaces_str,
-            site_items_str, now, now, mini_ml_data, amazon_url, gtin
+            marketplaces_str, site_items_str, now, now, amazon_url, gtin, gtin_normalized
         ))
+        listing_id = cursor.lastrowid
+
+    # Columnas pesadas → listing_payloads (zlib), en la misma transacción
+    store_payload(conn, listing_id, {
+        "images_urls": images_urls,
+        "attributes": attributes,
+        "main_features": main_features,
+        "mini_ml_data": mini_ml_data,
+    })
 
     conn.commit()
     conn.close()
@@ -259,7 +327,7 @@ def check_asin_exists(asin: str) -> dict:
 
 def check_gtin_exists(gtin: str) -> dict:
     """
-    Verifica si un GTIN ya fue publicado en la BD
+    Verifica si un GTIN ya fue publicado en la BD (UPC/EAN/GTIN-14 equivalentes cuentan igual)
 
     Returns:
         dict: {
@@ -270,29 +338,10 @@ def check_gtin_exists(gtin: str) -> dict:
             'date_published': str o None
         }
     """
-    init_database()
-
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT asin, item_id, title, date_published
-        FROM listings
-        WHERE gtin = ?
-        LIMIT 1
-    """, (gtin,))
-
-    result = cursor.fetchone()
-    conn.close()
+    found = find_published_gtins([gtin])
 
-    if result:
-        return {
-            'exists': True,
-            'asin': result[0],
-            'item_id': result[1],
-            'title': result[2],
-            'date_published': result[3]
-        }
+    if found:
+        return {'exists': True, **next(iter(found.values()))}
     else:
         return {
             'exists': False,
@@ -301,3 +350,72 @@ def check_gtin_exists(gtin: str) -> dict:
             'title': None,
             'date_published': None
         }
+
+
+def _lookup_in_batch(conn: sqlite3.Connection, column: str, values: list, select: str) -> dict:
+    """
+    Join de una tabla temporal con `values` contra listings.<column> (indexado).
+    Primera fila por valor (como el LIMIT 1 de los chequeos individuales).
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_values (value TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM lookup_values")
+    conn.executemany("INSERT OR IGNORE INTO lookup_values (value) VALUES (?)", [(v,) for v in values])
+    rows = conn.execute(f"""
+        SELECT l.{column}, {select}
+        FROM lookup_values v
+        JOIN listings l ON l.{column} = v.value
+        ORDER BY l.id
+    """).fetchall()
+    found = {}
+    for row in rows:
+        found.setdefault(row[0], row[1:])
+    return found
+
+
+def find_published_asins(asins: list) -> dict:
+    """
+    check_asin_exists para muchos ASINs en una sola query.
+
+    Returns:
+        dict: {asin: {'item_id', 'title', 'date_published'}} solo de los publicados
+    """
+    init_database()
+    if not asins:
+        return {}
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        found = _lookup_in_batch(conn, "asin", list(asins), "l.item_id, l.title, l.date_published")
+    finally:
+        conn.close()
+
+    return {
+        asin: {'item_id': item_id, 'title': title, 'date_published': date_published}
+        for asin, (item_id, title, date_published) in found.items()
+    }
+
+
+def find_published_gtins(gtins: list) -> dict:
+    """
+    check_gtin_exists para muchos GTINs en una sola query (comparando GTINs normalizados).
+
+    Returns:
+        dict: {gtin_normalizado: {'asin', 'item_id', 'title', 'date_published'}} solo de los publicados
+    """
+    init_database()
+    normalized = [g for g in (normalize_gtin(gtin) for gtin in gtins) if g]
+    if not normalized:
+        return {}
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        backfill_gtin_normalized(conn)
+        found = _lookup_in_batch(conn, "gtin_normalized", normalized,
+                                 "l.asin, l.item_id, l.title, l.date_published")
+    finally:
+        conn.close()
+
+    return {
+        gtin: {'asin': asin, 'item_id': item_id, 'title': title, 'date_published': date_published}
+        for gtin, (asin, item_id, title, date_published) in found.items()
+    }
@@ -10,14 +10,13 @@ import os
 import sys
 import json
 import requests
-import time
 from pathlib import Path
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Agregar src al path para imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
-from integrations.amazon_api import get_amazon_access_token
+from integrations.amazon_api import get_spapi_client
 
 load_dotenv()
 
@@ -45,22 +44,12 @@ def search_products_by_keyword(keyword: str, max_pages: int = 10, log_callback=N
     log(f"\n🔍 Buscando productos para keyword: '{keyword}'")
     log(f"📊 Máximo de páginas: {max_pages} (~{max_pages * 10} ASINs potenciales)\n")
 
-    token = get_amazon_access_token()
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "x-amz-access-token": token,
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-
+    client = get_spapi_client()
     all_asins = []
     next_token = None
     page = 1
 
     while page <= max_pages:
-        url = f"{SPAPI_BASE}/catalog/2022-04-01/items"
-
         params = {
             "marketplaceIds": MARKETPLACE_ID,
             "keywords": keyword,
@@ -73,7 +62,8 @@ def search_products_by_keyword(keyword: str, max_pages: int = 10, log_callback=N
 
         try:
             log(f"   📥 Descargando página {page}/{max_pages}...")
-            r = requests.get(url, headers=headers, params=params, timeout=30)
+            # El cliente espera turno en la cuota de searchCatalogItems (compartida entre procesos)
+            r = client.request("searchCatalogItems", "GET", "/catalog/2022-04-01/items", params=params)
             r.raise_for_status()
             data = r.json()
 
@@ -95,18 +85,14 @@ def search_products_by_keyword(keyword: str, max_pages: int = 10, log_callback=N
 
             page += 1
 
-            # Rate limiting: Amazon permite ~2 requests/segundo para este endpoint
-            # Aumentado a 2s para evitar conflictos con otros procesos que usan la misma API
-            time.sleep(2.0)
-
         except requests.exceptions.HTTPError as e:
             if r.status_code == 403:
-                log(f"   ❌ Error 403: Sin permisos para el endpoint de búsqueda")
+                log("   ❌ Error 403: Sin permisos para el endpoint de búsqueda")
                 log("      Verificá que tu cuenta tenga acceso a Catalog Items API 2022-04-01")
                 break
             elif r.status_code == 429:
-                log(f"   ⏱️ Rate limit alcanzado, esperando 2 segundos...")
-                time.sleep(2)
+                # El cliente ya pausó la cuota para todos los procesos: reintentar cuando haya turno
+                log("   ⏱️ Rate limit alcanzado, esperando turno de cuota...")
                 continue
             else:
                 log(f"   ❌ Error HTTP {r.status_code}: {r.text}")
@@ -121,30 +107,23 @@ def search_products_by_keyword(keyword: str, max_pages: int = 10, log_callback=N
 # 📊 Obtener BSR (Best Sellers Rank) de un ASIN
 # -------------------------------------------------------------
 
-def get_bsr_for_asin(asin: str, token: str):
+def get_bsr_for_asin(asin: str, token: str = None):
     """
     Obtiene el BSR (Best Sellers Rank) de un ASIN usando SP-API.
+    (`token` se ignora: el cliente SP-API maneja token y cuota)
 
     Returns:
         dict: {"asin": str, "bsr": int or None, "category": str or None}
     """
 
-    url = f"{SPAPI_BASE}/catalog/2022-04-01/items/{asin}"
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "x-amz-access-token": token,
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-
     params = {
         "marketplaceIds": MARKETPLACE_ID,
         "includedData": "salesRanks"
     }
 
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=15)
+        r = get_spapi_client().request("getCatalogItem", "GET", f"/catalog/2022-04-01/items/{asin}",
+                                       params=params, timeout=15)
         r.raise_for_status()
         data = r.json()
 
@@ -196,11 +175,11 @@ def get_bsr_for_asins(asins: list, max_workers: int = 5):
     print(f"\n📊 Obteniendo BSR para {len(asins)} ASINs...")
     print(f"⚙️  Usando {max_workers} threads paralelos\n")
 
-    token = get_amazon_access_token()
     results = []
 
+    # Cada thread espera turno en la cuota de getCatalogItem (sin pausas fijas)
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(get_bsr_for_asin, asin, token): asin for asin in asins}
+        futures = {executor.submit(get_bsr_for_asin, asin): asin for asin in asins}
 
         completed = 0
         for future in as_completed(futures):
@@ -217,9 +196,6 @@ def get_bsr_for_asins(asins: list, max_workers: int = 5):
                 print(f"❌ [{completed}/{len(asins)}] {asin} - Error: {e}")
                 results.append({"asin": asin, "bsr": None, "category": None, "error": str(e)})
 
-            # Rate limiting: pequeña pausa entre requests
-            time.sleep(0.2)
-
     return results
 
 # -------------------------------------------------------------
@@ -47,6 +47,7 @@ load_dotenv(override=False)
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from src.integrations.amazon_glow_api_v2_advanced import check_availability_v2_advanced
 from src.integrations.mainglobal import refresh_ml_token
+from src.utils.site_items_store import load_site_items
 
 # Importar notificaciones Telegram (bot separado para sync)
 try:
@@ -136,7 +137,7 @@ def is_wrong_account_item(site_items_json):
     Verifica si un item pertenece a una cuenta diferente a la actual (ONEWORLD).
 
     Args:
-        site_items_json: String JSON con site_items de la DB (array de objetos)
+        site_items_json: site_items del listing (lista de la tabla site_items o String JSON)
 
     Returns:
         bool: True si el item pertenece EXCLUSIVAMENTE a cuenta ONEWORLD (no NEXO)
@@ -145,7 +146,7 @@ def is_wrong_account_item(site_items_json):
         return False
 
     try:
-        site_items = json.loads(site_items_json)
+        site_items = json.loads(site_items_json) if isinstance(site_items_json, str) else site_items_json
 
         # Si no hay datos, no es error de cuenta diferente
         if not site_items:
@@ -608,6 +609,7 @@ def get_all_published_listings():
     """
     Obtiene todos los listings publicados desde la base de datos.
     Retorna lista de dicts con: item_id, asin, price_usd, amazon_price_last, site_items
+    (site_items ya como lista, desde la tabla normalizada: sin json.loads por listing)
 
     Si TEST_MODE=true en .env, solo retorna 25 items incluyendo el item de prueba.
     """
@@ -636,7 +638,7 @@ def get_all_published_listings():
         # Primero obtener los items de prueba
         placeholders = ','.join('?' * len(test_item_ids))
         cursor.execute(f"""
-            SELECT item_id, asin, price_usd, amazon_price_last, title, site_items
+            SELECT item_id, asin, price_usd, amazon_price_last, title
             FROM listings
             WHERE item_id IN ({placeholders})
         """, test_item_ids)
@@ -648,7 +650,7 @@ def get_all_published_listings():
         remaining = 25 - loaded_test_items
         if remaining > 0:
             cursor.execute(f"""
-                SELECT item_id, asin, price_usd, amazon_price_last, title, site_items
+                SELECT item_id, asin, price_usd, amazon_price_last, title
                 FROM listings
                 WHERE item_id IS NOT NULL AND item_id NOT IN ({placeholders})
                 ORDER BY date_updated DESC
@@ -662,7 +664,7 @@ def get_all_published_listings():
     else:
         print("   → Ejecutando query SQL...", flush=True)
         cursor.execute("""
-            SELECT item_id, asin, price_usd, amazon_price_last, title, site_items
+            SELECT item_id, asin, price_usd, amazon_price_last, title
             FROM listings
             WHERE item_id IS NOT NULL
             ORDER BY date_updated DESC
@@ -671,6 +673,11 @@ def get_all_published_listings():
         print("   → Convirtiendo resultados...", flush=True)
         listings = [dict(row) for row in cursor.fetchall()]
 
+    # Países de cada listing: una sola query a site_items
+    site_items_by_item = load_site_items(conn, [l["item_id"] for l in listings] if test_mode else None)
+    for listing in listings:
+        listing["site_items"] = site_items_by_item.get(listing["item_id"], [])
+
     conn.close()
     print(f"   → Listo! {len(listings)} listings cargados", flush=True)
     return listings
@@ -35,6 +35,8 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from src.utils.site_items_store import resolve_local_item
+from src.utils.listing_payloads import BULKY_COLUMNS, ensure_listing_payloads
 
 load_dotenv(override=True)
 
@@ -248,80 +250,58 @@ def find_global_item_id(ml_item_id):
         str: Item ID global o el mismo ID si no se encuentra
     """
     try:
-        # Recargar token FRESCO
-        load_dotenv(override=True)
-        ml_token = os.getenv("ML_ACCESS_TOKEN")
-
-        # Consultar ML API para obtener info del item
-        url = f"https://api.mercadolibre.com/items/{ml_item_id}"
-        headers = {"Authorization": f"Bearer {ml_token}"}
-        response = requests.get(url, headers=headers, timeout=10)
-
-        if response.status_code != 200:
-            return ml_item_id
-
-        item_data = response.json()
-        catalog_product_id = item_data.get("catalog_product_id")
-
-        if not catalog_product_id:
-            return ml_item_id
-
-        # Buscar todos los items con ese catalog_product_id en nuestra DB
+        # Item local → listing global: query indexada sobre site_items (sin API ni json.loads)
         conn = sqlite3.connect(LISTINGS_DB_PATH, timeout=10)
-        cursor = conn.cursor()
+        try:
+            match = resolve_local_item(conn, ml_item_id)
+        finally:
+            conn.close()
 
-        # Buscar en site_items JSON para encontrar match
-        cursor.execute("SELECT item_id, site_items FROM listings")
-        rows = cursor.fetchall()
-        conn.close()
+        if not match:
+            return ml_item_id
 
-        # Intentar encontrar un item que exista en nuestra DB
-        for row in rows:
-            item_id = row[0]
-            site_items_json = row[1]
+        item_id = match["global_item_id"]
+        # Encontramos el item global que contiene esta variante
+        print(f"{Colors.GREEN}   ✅ Encontrado item global: {item_id} (variante: {ml_item_id}){Colors.NC}")
 
-            if site_items_json:
-                try:
-                    site_items = json.loads(site_items_json)
-                    # Verificar si alguno de los site_items coincide con el ml_item_id buscado
-                    for site_item in site_items:
-                        if site_item.get("item_id") == ml_item_id:
-                            # Encontramos el item global que contiene esta variante
-                            print(f"{Colors.GREEN}   ✅ Encontrado item global: {item_id} (variante: {ml_item_id}){Colors.NC}")
-
-                            # Guardar variante en DB clonando el item global
-                            try:
-                                conn_save = sqlite3.connect(LISTINGS_DB_PATH, timeout=10)
-                                cursor_save = conn_save.cursor()
-
-                                # Copiar todos los datos del item global
-                                cursor_save.execute("""
-                                    INSERT OR IGNORE INTO listings
-                                    (item_id, asin, title, description, brand, model, category_id, category_name,
-                                     price_usd, length_cm, width_cm, height_cm, weight_kg, images_urls, attributes,
-                                     main_features, marketplaces, site_items, date_published, date_updated,
-                                     amazon_price_last, costo_amazon)
-                                    SELECT ?, asin, title, description, brand, model, category_id, category_name,
-                                           price_usd, length_cm, width_cm, height_cm, weight_kg, images_urls, attributes,
-                                           main_features, marketplaces, site_items, datetime('now'), datetime('now'),
-                                           amazon_price_last, costo_amazon
-                                    FROM listings WHERE item_id = ?
-                                """, (ml_item_id, item_id))
-
-                                conn_save.commit()
-                                conn_save.close()
-
-                                if cursor_save.rowcount > 0:
-                                    print(f"{Colors.GREEN}   💾 Variante {ml_item_id} guardada en DB{Colors.NC}")
-                            except Exception as e:
-                                print(f"{Colors.YELLOW}   ⚠️ Error guardando variante en DB: {e}{Colors.NC}")
-
-                            return item_id
-                except:
-                    pass
-
-        # Si no encontramos nada, devolver el original
-        return ml_item_id
+        # Guardar variante en DB clonando el item global
+        try:
+            conn_save = sqlite3.connect(LISTINGS_DB_PATH, timeout=10)
+            cursor_save = conn_save.cursor()
+
+            # Copiar todos los datos del item global
+            cursor_save.execute("""
+                INSERT OR IGNORE INTO listings
+                (item_id, asin, title, description, brand, model, category_id, category_name,
+                 price_usd, length_cm, width_cm, height_cm, weight_kg, images_urls, attributes,
+                 main_features, marketplaces, site_items, date_published, date_updated,
+                 amazon_price_last, costo_amazon)
+                SELECT ?, asin, title, description, brand, model, category_id, category_name,
+                       price_usd, length_cm, width_cm, height_cm, weight_kg, images_urls, attributes,
+                       main_features, marketplaces, site_items, datetime('now'), datetime('now'),
+                       amazon_price_last, costo_amazon
+                FROM listings WHERE item_id = ?
+            """, (ml_item_id, item_id))
+
+            if cursor_save.rowcount > 0:
+                # Las columnas pesadas viven en listing_payloads: copiarlas también
+                ensure_listing_payloads(conn_save)
+                payload_cols = ", ".join(BULKY_COLUMNS)
+                conn_save.execute(f"""
+                    INSERT OR IGNORE INTO listing_payloads (listing_id, {payload_cols})
+                    SELECT ?, {payload_cols} FROM listing_payloads
+                    WHERE listing_id = (SELECT id FROM listings WHERE item_id = ? ORDER BY id LIMIT 1)
+                """, (cursor_save.lastrowid, item_id))
+
+            conn_save.commit()
+            conn_save.close()
+
+            if cursor_save.rowcount > 0:
+                print(f"{Colors.GREEN}   💾 Variante {ml_item_id} guardada en DB{Colors.NC}")
+        except Exception as e:
+            print(f"{Colors.YELLOW}   ⚠️ Error guardando variante en DB: {e}{Colors.NC}")
+
+        return item_id
 
     except Exception as e:
         print(f"{Colors.YELLOW}   ⚠️ Error buscando item global: {e}{Colors.NC}")
@@ -43,6 +43,7 @@ from dotenv import load_dotenv
 # Add project root to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from src.integrations.amazon_availability_scraper import validate_fast_fulfillment_scraper
+from src.utils.listing_payloads import load_payloads
 
 # Cargar .env
 load_dotenv(override=True)
@@ -166,21 +167,26 @@ def get_listings_to_update(asin_filter=None):
 
     if asin_filter:
         cursor.execute("""
-            SELECT asin, item_id, mini_ml_data, price_usd, site_items
+            SELECT id, asin, item_id, price_usd, site_items
             FROM listings
             WHERE asin = ? AND item_id IS NOT NULL
         """, (asin_filter,))
     else:
         cursor.execute("""
-            SELECT asin, item_id, mini_ml_data, price_usd, site_items
+            SELECT id, asin, item_id, price_usd, site_items
             FROM listings
             WHERE item_id IS NOT NULL
         """)
 
-    listings = cursor.fetchall()
+    rows = cursor.fetchall()
+    # mini_ml_data vive comprimido en listing_payloads: se carga en batch solo esa columna
+    payloads = load_payloads(conn, [row[0] for row in rows], ("mini_ml_data",))
     conn.close()
 
-    return listings
+    return [
+        (asin, item_id, payloads.get(listing_id, {}).get("mini_ml_data"), price_usd, site_items)
+        for listing_id, asin, item_id, price_usd, site_items in rows
+    ]
 
 def main():
     parser = argparse.ArgumentParser(description="Actualizar precios masivamente")
@@ -7,7 +7,9 @@ Sistema de filtrado con IA que NO deja pasar NI UN SOLO producto prohibido.
 
 Filtrado en 3 capas:
 1. Keyword matching (rápido) - Detecta términos prohibidos exactos
+   (todas las keywords compiladas UNA vez en un solo matcher por palabra completa)
 2. AI Semantic Analysis (GPT-4) - Detecta variaciones, sinónimos, nombres creativos
+   (en batch: varios productos por request; veredictos cacheados por ASIN + hash del texto)
 3. Brand Protection (GPT-4) - Detecta marcas protegidas/conocidas
 
 IMPORTANTE: Si hay CUALQUIER duda, el producto se RECHAZA.
@@ -17,14 +19,65 @@ import os
 import sys
 import json
 import re
+import time
+import hashlib
 from pathlib import Path
 from typing import Dict, Any, Tuple, List
 from dotenv import load_dotenv
 
+try:
+    from src.utils.phrase_matcher import PhraseMatcher
+    from src.utils.kv_store import KVStore
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.phrase_matcher import PhraseMatcher
+    from src.utils.kv_store import KVStore
+
 # Cargar API key
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Análisis semántico en batch + cache de veredictos
+SEMANTIC_BATCH_SIZE = int(os.getenv("SAFETY_AI_BATCH_SIZE", "10"))
+SEMANTIC_CACHE_TTL_DAYS = float(os.getenv("SAFETY_AI_CACHE_TTL_DAYS", "14"))
+SEMANTIC_PROMPT_VERSION = "v2"  # Cambiar si cambia el prompt → invalida el cache
+
+# Política que recibe la IA (igual para 1 o N productos)
+SEMANTIC_POLICY = """CATEGORÍAS COMPLETAMENTE PROHIBIDAS (NO se pueden publicar bajo NINGUNA circunstancia):
+1. Armas de fuego, rifles, pistolas, airsoft, paintball, BB guns, ballestas
+2. Armas blancas TÁCTICAS/CAZA: cuchillos tácticos, navajas, espadas, katanas, machetes, dagas
+3. Armas de defensa: tasers, gas pimienta, paralizadores, esposas, nudillos
+4. Explosivos, municiones, balas, pólvora, detonadores, granadas
+5. Vapes, cigarrillos electrónicos, e-liquids, tabaco, nicotina
+6. Drogas, marihuana, CBD, THC, cannabis, narcóticos
+7. Productos falsificados, réplicas, clones, piratería
+8. Documentos falsos, pasaportes, IDs, sellos oficiales
+9. Medicamentos, jeringas, agujas, equipos médicos
+10. Químicos peligrosos, ácidos, cianuro, peróxidos
+11. Material radiactivo, uranio, plutonio
+12. Pesticidas, insecticidas, plantas vivas no certificadas
+13. Alimentos, bebidas, alcohol, suplementos, vitaminas
+14. Cosméticos, perfumes, aerosoles
+15. Combustibles, gases, cilindros, gasolina
+16. Baterías de litio de alta capacidad (>100Wh)
+17. Equipos de espionaje, cámaras ocultas, vigilancia
+18. Productos expirados, vencidos, sin certificación
+19. Productos reacondicionados de electrónica
+20. Drones de alto rendimiento
+
+PRODUCTOS LEGÍTIMOS QUE SÍ SE PERMITEN (NO rechazar):
+✅ Cuchillos de COCINA (kitchen knife, chef knife, bread knife, steak knife) - PERMITIDOS
+✅ Linternas tácticas (tactical flashlight, LED flashlight) sin armas - PERMITIDAS
+✅ Binoculares para observación de aves/naturaleza (NO de caza) - PERMITIDOS
+✅ Accesorios genéricos (cables, fundas, soportes) - PERMITIDOS
+
+NOTA CRÍTICA: La palabra "tactical" o "cuchillo" SOLA no significa prohibido.
+Analiza el CONTEXTO completo:
+- "Kitchen Knife Set" = PERMITIDO (cocina)
+- "Tactical Hunting Knife" = PROHIBIDO (caza)
+- "LED Tactical Flashlight" = PERMITIDO (solo linterna)
+- "Tactical Vest Gun Holster" = PROHIBIDO (equipo militar)"""
+
 class AIProductSafetyFilter:
     """
     Filtro de seguridad con IA para productos Amazon → MercadoLibre
@@ -59,6 +112,15 @@ class AIProductSafetyFilter:
                 if len(keyword_lower) >= 3:
                     self.prohibited_keywords.add(keyword_lower)
 
+        # Compilar UNA vez (orden alfabético → razones de rechazo deterministas)
+        # - keywords: palabra completa, equivale a r'\b' + re.escape(keyword) + r'\b'
+        # - whitelist: substring, equivale a `safe_term in texto`
+        self.keyword_matcher = PhraseMatcher(sorted(self.prohibited_keywords), word_boundary=True)
+        self.safe_matcher = PhraseMatcher(sorted(self.safe_exceptions))
+
+        # Veredictos de la IA: clave ASIN + hash del texto analizado (expiran a los N días)
+        self.semantic_cache = KVStore("ai_safety_semantic")
+
         # Stats
         self.total_checked = 0
         self.total_rejected = 0
@@ -68,6 +130,8 @@ class AIProductSafetyFilter:
             "protected_brand": 0,
             "missing_data": 0
         }
+        self.ai_requests = 0
+        self.ai_cache_hits = 0
 
     def _load_config(self) -> dict:
         """Carga la configuración de items prohibidos"""
@@ -94,51 +158,81 @@ class AIProductSafetyFilter:
             - razón_rechazo: Descripción detallada de por qué se rechazó
             - confidence_score: 0.0-1.0, qué tan confiado está el filtro
         """
-        self.total_checked += 1
+        return self.is_safe_to_publish_batch([(asin, product_data)], use_ai=use_ai)[asin]
 
-        # Extraer información del producto
-        product_text = self._extract_product_text(product_data)
+    def is_safe_to_publish_batch(self, products: List[Tuple[str, dict]],
+                                 use_ai: bool = True) -> Dict[str, Tuple[bool, str, float]]:
+        """
+        Versión batch de is_safe_to_publish: misma decisión por producto, pero el
+        análisis semántico de todos los productos sale en pocos requests (y los
+        ya analizados salen del cache).
+
+        Args:
+            products: Lista de (asin, product_data)
+            use_ai: Si usar IA para análisis semántico
+
+        Returns:
+            Dict[asin, (es_seguro, razón_rechazo, confidence_score)]
+        """
+        results = {}
+        texts = []
+        for asin, product_data in products:
+            self.total_checked += 1
 
-        if not product_text["title"] and not product_text["description"]:
-            self.total_rejected += 1
-            self.rejection_reasons["missing_data"] += 1
-            return False, "Producto sin título ni descripción - RECHAZADO por seguridad", 0.0
+            # Extraer información del producto
+            product_text = self._extract_product_text(product_data)
+
+            if not product_text["title"] and not product_text["description"]:
+                self.total_rejected += 1
+                self.rejection_reasons["missing_data"] += 1
+                results[asin] = (False, "Producto sin título ni descripción - RECHAZADO por seguridad", 0.0)
+                continue
+            texts.append((asin, product_text))
 
         # =====================================================================
         # MODO 1: Solo IA (use_ai=True) - Análisis semántico profundo
         # =====================================================================
         if use_ai and OPENAI_API_KEY:
             # CAPA 1 (IA): AI Semantic Analysis (detecta variaciones y sinónimos)
-            ai_result = self._check_ai_semantic(asin, product_text)
-            if not ai_result[0]:
-                self.total_rejected += 1
-                self.rejection_reasons["ai_semantic"] += 1
-                return ai_result
+            ai_results = self.check_ai_semantic_batch(texts)
 
-            # CAPA 2 (IA): Brand Protection (detecta marcas conocidas/protegidas)
-            if product_text["brand"]:
-                brand_result = self._check_protected_brand(product_text["brand"])
-                if not brand_result[0]:
+            for asin, product_text in texts:
+                ai_result = ai_results[asin]
+                if not ai_result[0]:
                     self.total_rejected += 1
-                    self.rejection_reasons["protected_brand"] += 1
-                    return brand_result
-
-            # Producto aprobado por IA ✅
-            return True, "Producto seguro - APROBADO por IA", 1.0
+                    self.rejection_reasons["ai_semantic"] += 1
+                    results[asin] = ai_result
+                    continue
+
+                # CAPA 2 (IA): Brand Protection (detecta marcas conocidas/protegidas)
+                if product_text["brand"]:
+                    brand_result = self._check_protected_brand(product_text["brand"])
+                    if not brand_result[0]:
+                        self.total_rejected += 1
+                        self.rejection_reasons["protected_brand"] += 1
+                        results[asin] = brand_result
+                        continue
+
+                # Producto aprobado por IA ✅
+                results[asin] = (True, "Producto seguro - APROBADO por IA", 1.0)
 
         # =====================================================================
         # MODO 2: Solo Keywords (use_ai=False) - Filtro rápido básico
         # =====================================================================
         else:
-            # CAPA 1 (Keywords): Keyword Matching (rápido)
-            keyword_result = self._check_prohibited_keywords(product_text)
-            if not keyword_result[0]:
-                self.total_rejected += 1
-                self.rejection_reasons["keyword_match"] += 1
-                return keyword_result
+            for asin, product_text in texts:
+                # CAPA 1 (Keywords): Keyword Matching (rápido)
+                keyword_result = self._check_prohibited_keywords(product_text)
+                if not keyword_result[0]:
+                    self.total_rejected += 1
+                    self.rejection_reasons["keyword_match"] += 1
+                    results[asin] = keyword_result
+                    continue
 
-            # Producto aprobado por keywords ✅
-            return True, "Producto seguro - APROBADO por keywords", 1.0
+                # Producto aprobado por keywords ✅
+                results[asin] = (True, "Producto seguro - APROBADO por keywords", 1.0)
+
+        return results
 
     def _extract_product_text(self, product_data: dict) -> dict:
         """
@@ -234,22 +328,23 @@ class AIProductSafetyFilter:
 
         # WHITELIST: Verificar si el producto está en excepciones seguras PRIMERO
         full_text_lower = full_text.lower()
-        for safe_term in self.safe_exceptions:
-            if safe_term in full_text_lower:
-                return True, f"OK - Producto legítimo (whitelist: '{safe_term}')", 1.0
-
-        # Buscar cada keyword prohibida en AMBOS textos (original + normalizado)
-        found_keywords = []
-        for keyword in self.prohibited_keywords:
-            # Buscar keyword como palabra completa (word boundary)
-            pattern = r'\b' + re.escape(keyword) + r'\b'
-
-            # Buscar en texto original
-            if re.search(pattern, full_text, re.IGNORECASE):
-                found_keywords.append(keyword)
+        safe_idx = self.safe_matcher.first(full_text_lower)
+        if safe_idx is not None:
+            safe_term = self.safe_matcher.phrases[safe_idx]
+            return True, f"OK - Producto legítimo (whitelist: '{safe_term}')", 1.0
+
+        # Buscar TODAS las keywords prohibidas en una pasada por texto (original + normalizado)
+        matcher = self.keyword_matcher
+        hits = matcher.indices(full_text_lower)
+        variation_hits = set()
+        if full_text_normalized != full_text:
             # También buscar en texto normalizado (detecta "c1g" -> "cig")
-            elif re.search(pattern, full_text_normalized, re.IGNORECASE):
-                found_keywords.append(keyword + " (variación detectada)")
+            variation_hits = matcher.indices(full_text_normalized.lower()) - hits
+
+        found_keywords = [
+            matcher.phrases[idx] if idx in hits else matcher.phrases[idx] + " (variación detectada)"
+            for idx in sorted(hits | variation_hits)
+        ]
 
         if found_keywords:
             # EXCEPCIONES IMPORTANTES para productos legítimos
@@ -313,75 +408,122 @@ class AIProductSafetyFilter:
         Returns:
             Tuple[bool, str, float]: (es_seguro, razón, confidence)
         """
-        try:
-            from openai import OpenAI
-            client = OpenAI(api_key=OPENAI_API_KEY, timeout=60.0)
+        return self.check_ai_semantic_batch([(asin, product_text)])[asin]
 
-            # Construir prompt con TODAS las categorías prohibidas
-            prohibited_categories = list(self.prohibited_config.keys())
+    def check_ai_semantic_batch(self, items: List[Tuple[str, dict]]) -> Dict[str, Tuple[bool, str, float]]:
+        """
+        CAPA 2 (batch): análisis semántico de varios productos.
 
-            prompt = f"""Eres un experto en políticas de MercadoLibre y detección de productos prohibidos.
+        - Veredictos cacheados por ASIN + hash del texto (título, descripción, marca,
+          categoría): el mismo ASIN encontrado con otra keyword no se re-clasifica
+        - Los pendientes se envían de a SEMANTIC_BATCH_SIZE en UN prompt estructurado
+        - Productos sin veredicto en la respuesta del chunk → se reintentan de a uno
+        - Fail-safe: si la IA falla o no devuelve un producto → RECHAZADO (y no se cachea)
 
-Analiza el siguiente producto de Amazon y determina si es SEGURO publicar en MercadoLibre.
+        Args:
+            items: Lista de (asin, product_text) (product_text de _extract_product_text)
 
-PRODUCTO:
-- ASIN: {asin}
+        Returns:
+            Dict[asin, (es_seguro, razón, confidence)]
+        """
+        results = {}
+        keys = {asin: self._semantic_cache_key(asin, product_text) for asin, product_text in items}
+        cached = self.semantic_cache.get_many(keys.values(), max_age=SEMANTIC_CACHE_TTL_DAYS * 86400)
+
+        pending = []
+        for asin, product_text in items:
+            verdict = cached.get(keys[asin])
+            if verdict is not None:
+                self.ai_cache_hits += 1
+                results[asin] = (verdict["is_safe"], verdict["reason"], verdict["confidence"])
+            else:
+                pending.append((asin, product_text))
+        # Un mismo ASIN repetido en el batch se analiza una sola vez
+        pending = list({asin: (asin, text) for asin, text in pending}.values())
+
+        for i in range(0, len(pending), SEMANTIC_BATCH_SIZE):
+            chunk = pending[i:i + SEMANTIC_BATCH_SIZE]
+            verdicts, error = self._classify_chunk(chunk)
+            errors = {asin: error for asin, _ in chunk} if error else {}
+
+            if not error and len(chunk) > 1:
+                # Sin veredicto (ASIN omitido o mal copiado) → reintentar ese producto solo
+                for asin, product_text in chunk:
+                    if asin not in verdicts:
+                        single, single_error = self._classify_chunk([(asin, product_text)])
+                        verdicts.update(single)
+                        if single_error:
+                            errors[asin] = single_error
+
+            to_cache = {}
+            for asin, _ in chunk:
+                if asin in errors:
+                    # Si la IA falla, RECHAZAR por seguridad (fail-safe)
+                    results[asin] = (False, f"IA falló - RECHAZADO por seguridad: {errors[asin][:100]}", 0.0)
+                elif asin not in verdicts:
+                    results[asin] = (False, "IA no devolvió veredicto - RECHAZADO por seguridad", 0.0)
+                else:
+                    results[asin] = verdicts[asin]
+                    is_safe, reason, confidence = verdicts[asin]
+                    to_cache[keys[asin]] = {"is_safe": is_safe, "reason": reason, "confidence": confidence}
+            self.semantic_cache.put_many(to_cache)
+
+        return results
+
+    def _semantic_cache_key(self, asin: str, product_text: dict) -> str:
+        """ASIN + hash de exactamente lo que ve la IA (si el listing cambia, se re-analiza)"""
+        payload = "|".join([
+            SEMANTIC_PROMPT_VERSION,
+            product_text["title"],
+            product_text["description"][:500],
+            str(product_text["brand"]),
+            product_text["category"],
+        ])
+        return f"{asin}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}"
+
+    def _build_semantic_prompt(self, chunk: List[Tuple[str, dict]]) -> str:
+        """Prompt estructurado con N productos numerados (un resultado por ASIN)"""
+        products_block = "\n\n".join(
+            f"""[{n}] ASIN: {asin}
 - Título: {product_text['title']}
 - Descripción: {product_text['description'][:500]}
 - Marca: {product_text['brand']}
-- Categoría: {product_text['category']}
+- Categoría: {product_text['category']}"""
+            for n, (asin, product_text) in enumerate(chunk, 1)
+        )
 
-CATEGORÍAS COMPLETAMENTE PROHIBIDAS (NO se pueden publicar bajo NINGUNA circunstancia):
-1. Armas de fuego, rifles, pistolas, airsoft, paintball, BB guns, ballestas
-2. Armas blancas TÁCTICAS/CAZA: cuchillos tácticos, navajas, espadas, katanas, machetes, dagas
-3. Armas de defensa: tasers, gas pimienta, paralizadores, esposas, nudillos
-4. Explosivos, municiones, balas, pólvora, detonadores, granadas
-5. Vapes, cigarrillos electrónicos, e-liquids, tabaco, nicotina
-6. Drogas, marihuana, CBD, THC, cannabis, narcóticos
-7. Productos falsificados, réplicas, clones, piratería
-8. Documentos falsos, pasaportes, IDs, sellos oficiales
-9. Medicamentos, jeringas, agujas, equipos médicos
-10. Químicos peligrosos, ácidos, cianuro, peróxidos
-11. Material radiactivo, uranio, plutonio
-12. Pesticidas, insecticidas, plantas vivas no certificadas
-13. Alimentos, bebidas, alcohol, suplementos, vitaminas
-14. Cosméticos, perfumes, aerosoles
-15. Combustibles, gases, cilindros, gasolina
-16. Baterías de litio de alta capacidad (>100Wh)
-17. Equipos de espionaje, cámaras ocultas, vigilancia
-18. Productos expirados, vencidos, sin certificación
-19. Productos reacondicionados de electrónica
-20. Drones de alto rendimiento
+        return f"""Eres un experto en políticas de MercadoLibre y detección de productos prohibidos.
 
-PRODUCTOS LEGÍTIMOS QUE SÍ SE PERMITEN (NO rechazar):
-✅ Cuchillos de COCINA (kitchen knife, chef knife, bread knife, steak knife) - PERMITIDOS
-✅ Linternas tácticas (tactical flashlight, LED flashlight) sin armas - PERMITIDAS
-✅ Binoculares para observación de aves/naturaleza (NO de caza) - PERMITIDOS
-✅ Accesorios genéricos (cables, fundas, soportes) - PERMITIDOS
+Analiza CADA UNO de los siguientes {len(chunk)} productos de Amazon y determina si es SEGURO publicarlo en MercadoLibre.
+Evalúa cada producto de forma INDEPENDIENTE (un producto no influye en el veredicto de otro).
 
-NOTA CRÍTICA: La palabra "tactical" o "cuchillo" SOLA no significa prohibido.
-Analiza el CONTEXTO completo:
-- "Kitchen Knife Set" = PERMITIDO (cocina)
-- "Tactical Hunting Knife" = PROHIBIDO (caza)
-- "LED Tactical Flashlight" = PERMITIDO (solo linterna)
-- "Tactical Vest Gun Holster" = PROHIBIDO (equipo militar)
+PRODUCTOS:
+{products_block}
+
+{SEMANTIC_POLICY}
 
 TAREA:
-Analiza SEMÁNTICAMENTE el producto. Detecta:
+Analiza SEMÁNTICAMENTE cada producto. Detecta:
 - Nombres creativos o variaciones de productos prohibidos
 - Sinónimos o términos alternativos
 - Cualquier señal de que el producto podría estar en categorías prohibidas
 
-RESPONDE EN FORMATO JSON ESTRICTO:
+RESPONDE EN FORMATO JSON ESTRICTO (un elemento por producto, en el mismo orden):
 {{
-  "is_safe": true/false,
-  "reason": "Explicación detallada de por qué es seguro o prohibido",
-  "confidence": 0.0-1.0,
-  "detected_issues": ["lista de problemas detectados"],
-  "category_match": "categoría prohibida que coincide, o null"
+  "results": [
+    {{
+      "asin": "ASIN del producto",
+      "is_safe": true/false,
+      "reason": "Explicación detallada de por qué es seguro o prohibido",
+      "confidence": 0.0-1.0,
+      "detected_issues": ["lista de problemas detectados"],
+      "category_match": "categoría prohibida que coincide, o null"
+    }}
+  ]
 }}
 
 IMPORTANTE:
+- Incluye TODOS los productos en "results", cada uno con su ASIN
 - Analiza el CONTEXTO COMPLETO, no solo palabras individuales
 - Detecta intentos de evadir filtros (ej: "vvape", "g u n", "k n i f e", etc.)
 - NO rechaces productos legítimos solo por tener palabras como "tactical" o "knife"
@@ -391,35 +533,55 @@ IMPORTANTE:
 
 Retorna SOLO el JSON, sin texto adicional."""
 
+    def _classify_chunk(self, chunk: List[Tuple[str, dict]]) -> Tuple[Dict[str, Tuple[bool, str, float]], str]:
+        """Un request a la IA para todo el chunk. Retorna (veredictos por ASIN, error o "")"""
+        try:
+            from openai import OpenAI
+            client = OpenAI(api_key=OPENAI_API_KEY, timeout=60.0 + 10.0 * len(chunk))
+
+            self.ai_requests += 1
             response = client.chat.completions.create(
                 model="gpt-4o-mini",  # Mini es suficiente para clasificación binaria (75% más barato)
                 temperature=0.1,  # Muy bajo para ser consistente
-                messages=[{"role": "user", "content": prompt}],
+                messages=[{"role": "user", "content": self._build_semantic_prompt(chunk)}],
                 response_format={"type": "json_object"}
             )
 
             result_text = response.choices[0].message.content.strip()
-            result = json.loads(result_text)
-
-            is_safe = result.get("is_safe", False)
-            reason = result.get("reason", "IA no pudo determinar")
-            confidence = result.get("confidence", 0.5)
-            detected_issues = result.get("detected_issues", [])
-            category_match = result.get("category_match")
-
-            if not is_safe:
-                issues_str = ", ".join(detected_issues[:3]) if detected_issues else "Ver razón"
-                full_reason = f"IA DETECTÓ RIESGO - {reason} | Issues: {issues_str}"
-                if category_match:
-                    full_reason += f" | Categoría: {category_match}"
-                return False, full_reason, confidence
-
-            return True, f"IA APROBÓ - {reason}", confidence
+            items = json.loads(result_text).get("results", [])
+            if not isinstance(items, list):
+                items = []
+
+            chunk_asins = {asin for asin, _ in chunk}
+            verdicts = {}
+            for result in items:
+                # ASIN ausente o mal copiado = sin veredicto (nunca asignar por posición:
+                # podría quedar el veredicto de un producto en otro)
+                if isinstance(result, dict) and result.get("asin") in chunk_asins:
+                    verdicts.setdefault(result["asin"], self._format_semantic_verdict(result))
+            return verdicts, ""
 
         except Exception as e:
-            print(f"⚠️ Error en análisis IA para {asin}: {e}")
-            # Si la IA falla, RECHAZAR por seguridad (fail-safe)
-            return False, f"IA falló - RECHAZADO por seguridad: {str(e)[:100]}", 0.0
+            asins = ", ".join(asin for asin, _ in chunk)
+            print(f"⚠️ Error en análisis IA para {asins}: {e}")
+            return {}, str(e) or type(e).__name__
+
+    def _format_semantic_verdict(self, result: dict) -> Tuple[bool, str, float]:
+        """JSON de la IA → (es_seguro, razón, confidence)"""
+        is_safe = result.get("is_safe", False)
+        reason = result.get("reason", "IA no pudo determinar")
+        confidence = result.get("confidence", 0.5)
+        detected_issues = result.get("detected_issues", [])
+        category_match = result.get("category_match")
+
+        if not is_safe:
+            issues_str = ", ".join(detected_issues[:3]) if detected_issues else "Ver razón"
+            full_reason = f"IA DETECTÓ RIESGO - {reason} | Issues: {issues_str}"
+            if category_match:
+                full_reason += f" | Categoría: {category_match}"
+            return False, full_reason, confidence
+
+        return True, f"IA APROBÓ - {reason}", confidence
 
     def _check_protected_brand(self, brand: str) -> Tuple[bool, str, float]:
         """
@@ -454,7 +616,9 @@ Retorna SOLO el JSON, sin texto adicional."""
             "total_rejected": self.total_rejected,
             "total_approved": self.total_checked - self.total_rejected,
             "rejection_rate": self.total_rejected / self.total_checked if self.total_checked > 0 else 0,
-            "rejection_reasons": self.rejection_reasons
+            "rejection_reasons": self.rejection_reasons,
+            "ai_requests": self.ai_requests,
+            "ai_cache_hits": self.ai_cache_hits
         }
 
 
@@ -488,11 +652,119 @@ def is_product_safe(asin: str, product_data: dict, use_ai: bool = True) -> Tuple
     return filter_obj.is_safe_to_publish(asin, product_data, use_ai=use_ai)
 
 
+# ============================================================================
+# BENCHMARK (capa de keywords: matcher compilado vs loop de regex anterior)
+# ============================================================================
+
+def benchmark_keyword_scan(json_dir: str = "asins_json", rounds: int = 20) -> dict:
+    """
+    Mide items/seg de _check_prohibited_keywords contra el loop anterior
+    (un re.search por keyword, dos veces por producto) y verifica que las
+    decisiones (seguro / confidence) sean idénticas.
+    """
+    filter_obj = AIProductSafetyFilter()
+
+    def legacy_check(product_text: dict) -> Tuple[bool, float]:
+        full_text = product_text["full_text"]
+        full_text_normalized = product_text.get("full_text_normalized", full_text)
+        full_text_lower = full_text.lower()
+        for safe_term in filter_obj.safe_exceptions:
+            if safe_term in full_text_lower:
+                return True, 1.0
+        found_keywords = []
+        for keyword in filter_obj.prohibited_keywords:
+            pattern = r'\b' + re.escape(keyword) + r'\b'
+            if re.search(pattern, full_text, re.IGNORECASE):
+                found_keywords.append(keyword)
+            elif re.search(pattern, full_text_normalized, re.IGNORECASE):
+                found_keywords.append(keyword + " (variación detectada)")
+        if found_keywords:
+            if "knife" in found_keywords or "knives" in found_keywords:
+                kitchen_indicators = ["kitchen", "chef", "cooking", "culinary", "steak knife",
+                                     "bread knife", "paring knife", "cocina", "cocinero"]
+                if any(indicator in full_text for indicator in kitchen_indicators):
+                    found_keywords = [k for k in found_keywords if k not in ["knife", "knives"]]
+                    if not found_keywords:
+                        return True, 0.9
+            if "binoculars" in found_keywords:
+                nature_indicators = ["bird watching", "birdwatching", "bird", "nature", "wildlife",
+                                    "observación de aves", "aves", "naturaleza"]
+                hunting_indicators = ["hunting", "hunt", "tactical", "caza", "cacería"]
+                if any(i in full_text for i in nature_indicators) and not any(i in full_text for i in hunting_indicators):
+                    found_keywords = [k for k in found_keywords if k != "binoculars"]
+                    if not found_keywords:
+                        return True, 0.9
+            if "tactical" in found_keywords:
+                tactical_ok_products = ["flashlight", "linterna", "light", "torch"]
+                weapon_indicators = ["knife", "gun", "vest", "gear", "equipment", "weapon"]
+                if any(p in full_text for p in tactical_ok_products) and not any(w in full_text for w in weapon_indicators):
+                    found_keywords = [k for k in found_keywords if k != "tactical"]
+                    if not found_keywords:
+                        return True, 0.9
+            if found_keywords:
+                return False, 1.0
+        return True, 0.8
+
+    # Corpus: JSONs reales de Amazon + casos sintéticos que ejercitan las excepciones
+    products = []
+    for path in sorted(Path(json_dir).glob("*.json")):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                products.append(json.load(f))
+        except Exception:
+            continue
+    products += [
+        {"title": "Tactical Airsoft Gun BB Pistol", "description": "Airsoft pistol for tactical games"},
+        {"title": "Chef Kitchen Knife Set 8 Pieces", "description": "Stainless steel cooking knives"},
+        {"title": "Tactical LED Flashlight 1200 Lumens", "description": "Rechargeable torch"},
+        {"title": "Binoculars 10x42 for Bird Watching", "description": "Wildlife and nature"},
+        {"title": "Hunting Binoculars Tactical", "description": "Long range"},
+        {"title": "Disposable V4pe Pen 5000 puffs", "description": "C1g alternative"},
+        {"title": "USB Cable Type-C Fast Charging", "description": "Durable USB-C cable"},
+    ]
+    texts = [filter_obj._extract_product_text(p) for p in products]
+
+    mismatches = 0
+    for text in texts:
+        new_safe, _, new_conf = filter_obj._check_prohibited_keywords(text)
+        if (new_safe, new_conf) != legacy_check(text):
+            mismatches += 1
+
+    def items_per_second(fn) -> float:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in texts:
+                fn(text)
+        return len(texts) * rounds / (time.perf_counter() - start)
+
+    before = items_per_second(legacy_check)
+    after = items_per_second(filter_obj._check_prohibited_keywords)
+
+    print(f"📦 Productos: {len(texts)} x {rounds} rondas | keywords: {len(filter_obj.prohibited_keywords)}")
+    print(f"   Antes (regex por keyword): {before:,.0f} items/seg")
+    print(f"   Ahora (matcher compilado): {after:,.0f} items/seg  ({after / before:.1f}x)")
+    print(f"   Decisiones distintas: {mismatches}")
+
+    return {"items": len(texts), "before": before, "after": after, "mismatches": mismatches}
+
+
 # ============================================================================
 # TEST
 # ============================================================================
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="AI Product Safety Filter")
+    parser.add_argument("--benchmark", action="store_true", help="Comparar capa de keywords vs loop anterior")
+    parser.add_argument("--json-dir", default="asins_json", help="Carpeta con JSONs de Amazon para el benchmark")
+    parser.add_argument("--rounds", type=int, default=20, help="Rondas del benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_keyword_scan(args.json_dir, args.rounds)
+        sys.exit(0)
+
     # Test del filtro
     filter_obj = AIProductSafetyFilter()
 
@@ -3,12 +3,20 @@
 # brand_filter.py
 # ✅ Sistema de filtrado de marcas prohibidas
 # ✅ Previene publicar productos de marcas con restricciones
+# ✅ Lista compilada una vez (BrandMatcher) con hot-reload por mtime
 # ============================================================
 
+import sys
 import json
 import re
 from pathlib import Path
 
+try:
+    from src.filters.brand_matcher import get_brand_matcher
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.filters.brand_matcher import get_brand_matcher
+
 CONFIG_FILE = Path(__file__).parent.parent.parent / "config" / "blocked_brands.json"
 
 
@@ -52,35 +60,40 @@ def is_brand_blocked(brand: str, verbose: bool = False) -> dict:
     if not brand:
         return {'is_blocked': False, 'brand': None, 'matched_brand': None}
 
-    brand_clean = brand.lower().strip()
-    blocked_brands = load_blocked_brands()
+    # Match exacto o contenido en cualquier dirección
+    # Ejemplo: "Nike Pro" contiene "Nike"
+    blocked = get_brand_matcher(CONFIG_FILE, 'blocked_brands').match(brand)
+    return _blocked_result(brand, blocked, verbose)
 
-    # Verificar match exacto
-    for blocked in blocked_brands:
-        if blocked == brand_clean:
-            if verbose:
-                print(f"🚫 Marca prohibida detectada: {brand}")
 
-            return {
-                'is_blocked': True,
-                'brand': brand,
-                'matched_brand': blocked.title()
-            }
+def are_brands_blocked(brands: list, verbose: bool = False) -> list:
+    """
+    Versión batch de is_brand_blocked (misma respuesta por marca, una sola
+    verificación de recarga del archivo para todo el lote).
+    """
+    matches = get_brand_matcher(CONFIG_FILE, 'blocked_brands').match_many(brands)
+    return [
+        _blocked_result(brand, blocked, verbose) if brand else {'is_blocked': False, 'brand': None, 'matched_brand': None}
+        for brand, blocked in zip(brands, matches)
+    ]
 
-        # Verificar si la marca bloqueada está contenida en el nombre
-        # Ejemplo: "Nike Pro" contiene "Nike"
-        if blocked in brand_clean or brand_clean in blocked:
-            if verbose:
-                print(f"🚫 Marca prohibida detectada: {brand} (match: {blocked.title()})")
 
-            return {
-                'is_blocked': True,
-                'brand': brand,
-                'matched_brand': blocked.title()
-            }
+def _blocked_result(brand: str, blocked: str, verbose: bool) -> dict:
+    if blocked is None:
+        # No es marca prohibida
+        return {'is_blocked': False, 'brand': brand, 'matched_brand': None}
+
+    if verbose:
+        if blocked == brand.lower().strip():
+            print(f"🚫 Marca prohibida detectada: {brand}")
+        else:
+            print(f"🚫 Marca prohibida detectada: {brand} (match: {blocked.title()})")
 
-    # No es marca prohibida
-    return {'is_blocked': False, 'brand': brand, 'matched_brand': None}
+    return {
+        'is_blocked': True,
+        'brand': brand,
+        'matched_brand': blocked.title()
+    }
 
 
 def check_product_brand(product_data: dict, verbose: bool = False) -> dict:
@@ -13,15 +13,22 @@ NO usa:
 - GPT-4 para análisis de marcas
 
 SOLO filtra: Las 19 marcas de config/prohibited_items_comprehensive.json
+(compiladas una vez en un BrandMatcher compartido, con hot-reload del JSON)
 
 Author: Sistema Autónomo
 Date: 2025-12-03
 """
 
-import json
+import sys
 from pathlib import Path
 from typing import Tuple, Optional
 
+try:
+    from src.filters.brand_matcher import get_brand_matcher
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.filters.brand_matcher import get_brand_matcher
+
 
 class BrandIntelligenceFilter:
     """
@@ -41,30 +48,23 @@ class BrandIntelligenceFilter:
         self.blacklist_file = Path(blacklist_file)
 
         # Cargar solo las 19 marcas prohibidas
-        self.prohibited_brands = self._load_prohibited_brands()
+        self.matcher = self._load_prohibited_brands()
 
         # Stats
         self.total_checked = 0
         self.total_rejected = 0
         self.total_approved = 0
 
-    def _load_prohibited_brands(self) -> list:
-        """Carga SOLO las 19 marcas prohibidas"""
-        if not self.blacklist_file.exists():
-            print(f"⚠️ No se encontró {self.blacklist_file}")
-            return []
-
-        with open(self.blacklist_file, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-
-        # Extraer SOLO protected_brands_luxury
-        brands = []
-        if "protected_brands_luxury" in config:
-            brands = [brand.lower() for brand in config["protected_brands_luxury"]]
-
-        print(f"✅ Cargadas {len(brands)} marcas prohibidas")
+    def _load_prohibited_brands(self):
+        """Carga SOLO las 19 marcas prohibidas (protected_brands_luxury)"""
+        matcher = get_brand_matcher(self.blacklist_file, "protected_brands_luxury")
+        if matcher.brands:
+            print(f"✅ Cargadas {len(matcher.brands)} marcas prohibidas")
+        return matcher
 
-        return brands
+    @property
+    def prohibited_brands(self) -> list:
+        return self.matcher.brands
 
     def is_brand_safe(
         self,
@@ -91,25 +91,15 @@ class BrandIntelligenceFilter:
         title_lower = title.lower()
         brand_lower = brand.lower() if brand else ""
 
-        # Verificar contra las 19 marcas prohibidas
-        for prohibited_brand in self.prohibited_brands:
-            # Verificar en título
-            if prohibited_brand in title_lower:
-                self.total_rejected += 1
-                return False, f"Marca prohibida: {prohibited_brand}", {
-                    "category": "protected_brands_luxury",
-                    "matched_brand": prohibited_brand,
-                    "method": "title_match"
-                }
-
-            # Verificar en campo brand (si existe)
-            if brand_lower and prohibited_brand in brand_lower:
-                self.total_rejected += 1
-                return False, f"Marca prohibida: {prohibited_brand}", {
-                    "category": "protected_brands_luxury",
-                    "matched_brand": prohibited_brand,
-                    "method": "brand_field_match"
-                }
+        # Verificar contra las 19 marcas prohibidas (título y campo brand en una pasada)
+        prohibited_brand, where = self.matcher.find_in_text(title_lower, brand_lower)
+        if prohibited_brand:
+            self.total_rejected += 1
+            return False, f"Marca prohibida: {prohibited_brand}", {
+                "category": "protected_brands_luxury",
+                "matched_brand": prohibited_brand,
+                "method": "title_match" if where == 0 else "brand_field_match"
+            }
 
         # Producto aprobado (no está en las 19 marcas prohibidas)
         self.total_approved += 1
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# brand_matcher.py
+# ✅ Motor único de matching de marcas para todos los filtros
+#    (brand_filter.is_brand_blocked, BrandIntelligenceFilter, ProductFilter)
+# ✅ La lista se carga y compila UNA vez (índice de frases, ver phrase_matcher)
+# ✅ Hot-reload: si cambia el mtime del JSON se recompila sola
+# ✅ match_many(brands): miles de marcas en microsegundos por item
+# ✅ Misma semántica que los loops anteriores: gana la PRIMERA marca de la lista
+# ============================================================
+
+import os
+import sys
+import json
+import time
+import threading
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from src.utils.phrase_matcher import PhraseMatcher
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.phrase_matcher import PhraseMatcher
+
+RELOAD_CHECK_SECONDS = 2.0  # Cada cuánto mirar el mtime del archivo como máximo
+_SEPARATOR = "\x00"
+
+
+def normalize_brand(brand: str) -> str:
+    return brand.lower().strip() if brand else ""
+
+
+class _CompiledBrands:
+    """Estructuras inmutables de una versión de la lista (se reemplazan enteras al recargar)"""
+
+    def __init__(self, raw_brands: List[str]):
+        self.brands = brands = list(dict.fromkeys(b for b in map(normalize_brand, raw_brands) if b))
+        self.exact: Dict[str, int] = {b: i for i, b in enumerate(brands)}
+        self.phrase_matcher = PhraseMatcher(brands)
+        # Para "marca consultada contenida en una bloqueada": una sola búsqueda C (str.find)
+        # sobre todas las marcas concatenadas en orden → el primer hit es la de menor índice
+        self.joined = _SEPARATOR.join(brands)
+        self.offsets = []
+        offset = 0
+        for b in brands:
+            self.offsets.append(offset)
+            offset += len(b) + 1
+        self.cache: Dict[str, Optional[int]] = {}
+
+    def match_index(self, brand_clean: str) -> Optional[int]:
+        cached = self.cache.get(brand_clean, -1)
+        if cached != -1:
+            return cached
+
+        candidates = []
+        exact = self.exact.get(brand_clean)
+        if exact is not None:
+            candidates.append(exact)
+        # Marca bloqueada contenida en la consultada ("nike pro" contiene "nike")
+        forward = self.phrase_matcher.first(brand_clean)
+        if forward is not None:
+            candidates.append(forward)
+        # Marca consultada contenida en una bloqueada
+        if _SEPARATOR not in brand_clean:
+            pos = self.joined.find(brand_clean)
+            if pos != -1:
+                candidates.append(bisect_right(self.offsets, pos) - 1)
+
+        result = min(candidates) if candidates else None
+        if len(self.cache) < 100_000:
+            self.cache[brand_clean] = result
+        return result
+
+
+class BrandMatcher:
+    """
+    Lista de marcas de un JSON (clave `list_key`), normalizada y compilada.
+
+    - `match(brand)`: marca bloqueada si es igual, la contiene o está contenida en ella
+    - `match_many(brands)`: lo mismo en batch
+    - `find_in_text(text)`: primera marca de la lista presente en un texto (título, etc.)
+    """
+
+    def __init__(self, path, list_key: str):
+        self.path = Path(path)
+        self.list_key = list_key
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._compiled = _CompiledBrands([])
+        self._reload_if_changed(force=True)
+
+    @property
+    def brands(self) -> List[str]:
+        return self._compiled.brands
+
+    # ---------- Carga / compilación ----------
+    def _load(self) -> List[str]:
+        if not self.path.exists():
+            print(f"⚠️  Archivo de marcas no encontrado: {self.path}")
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            return [b for b in config.get(self.list_key, []) if isinstance(b, str)]
+        except Exception as e:
+            print(f"❌ Error cargando marcas de {self.path}: {e}")
+            return []
+
+    def _reload_if_changed(self, force: bool = False):
+        now = time.time()
+        if not force and now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if force or mtime != self._mtime:
+            with self._lock:
+                self._mtime = mtime
+                self._compiled = _CompiledBrands(self._load())
+
+    # ---------- Matching ----------
+    def match(self, brand: str) -> Optional[str]:
+        """Marca bloqueada (normalizada) que matchea, o None"""
+        if not brand:
+            return None
+        self._reload_if_changed()
+        compiled = self._compiled
+        idx = compiled.match_index(normalize_brand(brand))
+        return compiled.brands[idx] if idx is not None else None
+
+    def match_many(self, brands: Iterable[str]) -> List[Optional[str]]:
+        """match() para cada marca (un solo chequeo de recarga por batch)"""
+        self._reload_if_changed()
+        compiled = self._compiled
+        out = []
+        for brand in brands:
+            if not brand:
+                out.append(None)
+                continue
+            idx = compiled.match_index(normalize_brand(brand))
+            out.append(compiled.brands[idx] if idx is not None else None)
+        return out
+
+    def is_exact(self, brand: str) -> bool:
+        self._reload_if_changed()
+        return normalize_brand(brand) in self._compiled.exact
+
+    def find_in_text(self, *texts: str) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Primera marca de la lista (en orden) contenida en alguno de los textos.
+        Retorna (marca, índice_del_texto_donde_apareció) o (None, None).
+        Los textos deben venir en minúsculas.
+        """
+        self._reload_if_changed()
+        compiled = self._compiled
+        best = None
+        for t_idx, text in enumerate(texts):
+            if not text:
+                continue
+            idx = compiled.phrase_matcher.first(text)
+            if idx is not None and (best is None or idx < best[0]):
+                best = (idx, t_idx)
+        if best is None:
+            return None, None
+        return compiled.brands[best[0]], best[1]
+
+
+_matchers: Dict[Tuple[str, str], BrandMatcher] = {}
+_matchers_lock = threading.Lock()
+
+
+def get_brand_matcher(path, list_key: str) -> BrandMatcher:
+    """Un matcher compartido por (archivo, clave) dentro del proceso"""
+    # Lookup rápido por la ruta tal cual llega (resolve() toca el filesystem)
+    matcher = _matchers.get((str(path), list_key))
+    if matcher is not None:
+        return matcher
+    key = (str(Path(path).resolve()), list_key)
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is None:
+            matcher = _matchers[key] = BrandMatcher(path, list_key)
+        _matchers[(str(path), list_key)] = matcher
+    return matcher
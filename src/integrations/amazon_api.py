@@ -2,6 +2,10 @@
 # amazon_api.py
 # ✅ Conexión directa a Amazon SP-API para obtener datos de un ASIN
 # ✅ Sistema de caché inteligente para tokens (auto-renovación)
+# ✅ Requests vía cliente SP-API compartido (cuota por operación entre procesos)
+# ✅ Caché TTL de catálogo (summaries/salesRanks/attributes) compartido entre procesos:
+#    un ASIN repetido no vuelve a costar un request dentro del TTL
+# ✅ relationships de SP-API alimentan el grafo de variantes (variant_graph)
 # ============================================================
 
 import os
@@ -14,89 +18,125 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-SPAPI_BASE = "https://sellingpartnerapi-na.amazon.com"
-MARKETPLACE_ID = "ATVPDKIKX0DER"  # US marketplace
-TOKEN_CACHE_FILE = Path("cache/amazon_token.json")
-TOKEN_LIFETIME = 3300  # 55 minutos (Amazon tokens duran 1 hora)
-
-# -------------------------------------------------------------
-# 🔑 Función para obtener access_token con caché inteligente
-# -------------------------------------------------------------
+# Token LWA, cuotas por operación y pool HTTP viven en spapi_client
+# (get_amazon_access_token se re-exporta para los imports existentes)
+try:
+    from src.integrations.spapi_client import (
+        SPAPI_BASE, MARKETPLACE_ID, TOKEN_CACHE_FILE, TOKEN_LIFETIME,
+        get_amazon_access_token, get_spapi_client,
+    )
+    from src.utils.kv_store import KVStore
+    from src.utils.variant_graph import get_variant_graph
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.integrations.spapi_client import (
+        SPAPI_BASE, MARKETPLACE_ID, TOKEN_CACHE_FILE, TOKEN_LIFETIME,
+        get_amazon_access_token, get_spapi_client,
+    )
+    from src.utils.kv_store import KVStore
+    from src.utils.variant_graph import get_variant_graph
+
+# Caché de catálogo: ASIN → {"item": datos | None, "fetched": {data_set: timestamp}}
+# Cada data set (summaries, salesRanks, ...) vence por separado; item None = ASIN inexistente
+CATALOG_CACHE_TTL_HOURS = float(os.getenv("CATALOG_CACHE_TTL_HOURS", "24"))  # 0 = sin caché
+CATALOG_BATCH_SIZE = 20  # Máximo de identifiers por searchCatalogItems
+CATALOG_MAX_ATTEMPTS = 3  # Intentos por batch ante 429 / 5xx / error de red
+CATALOG_ANALYSIS_DATA = "summaries,salesRanks,attributes,productTypes"  # Marca + ranking + calidad
+FULL_ITEM_DATA = "attributes,images,productTypes,salesRanks,summaries,relationships"
+
+_catalog_cache = None
+
+
+def _get_catalog_cache() -> KVStore:
+    global _catalog_cache
+    if _catalog_cache is None:
+        _catalog_cache = KVStore("sp_api_catalog")
+    return _catalog_cache
+
+
+def _data_sets(include_data: str) -> list:
+    return [s.strip() for s in include_data.split(",") if s.strip()]
+
+
+def _lookup_catalog_cache(asins: list, data_sets: list):
+    """
+    Separa ASINs en vigentes en caché y faltantes.
 
-def get_amazon_access_token():
+    Returns:
+        (hits, misses, entries): hits = {asin: item | None}, entries = lo leído (para merge)
     """
-    Obtiene un access token de Amazon usando LWA (Login with Amazon).
-    Sistema de caché inteligente:
-    - Si existe un token válido en caché (< 55 min), lo usa
-    - Si no existe o expiró, genera uno nuevo automáticamente
-    - Completamente automático, sin intervención manual
+    if CATALOG_CACHE_TTL_HOURS <= 0:
+        return {}, list(asins), {}
+    entries = _get_catalog_cache().get_many(asins)
+    oldest = time.time() - CATALOG_CACHE_TTL_HOURS * 3600
+    hits, misses = {}, []
+    for asin in asins:
+        entry = entries.get(asin)
+        fetched = entry.get("fetched", {}) if entry else {}
+        if entry and entry.get("item") is None:
+            # Inexistente: vale para cualquier data set
+            fresh = max(fetched.values(), default=0) >= oldest
+        else:
+            fresh = bool(entry) and all(fetched.get(s, 0) >= oldest for s in data_sets)
+        if fresh:
+            hits[asin] = entry.get("item")
+        else:
+            misses.append(asin)
+    return hits, misses, entries
+
+
+def _record_relationships(asin: str, item: dict):
+    """relationships (VARIATION) de SP-API → grafo de variantes compartido con búsqueda y sync"""
+    graph = get_variant_graph()
+    is_variation = False
+    for group in item.get("relationships") or []:
+        for rel in group.get("relationships", []):
+            if rel.get("type") != "VARIATION":
+                continue
+            is_variation = True
+            children = rel.get("childAsins") or []
+            if children:
+                graph.record_family(asin, {c: None for c in children}, source="sp_api")
+            for parent in rel.get("parentAsins") or []:
+                graph.link_child(parent, asin)
+    if not is_variation:
+        graph.record_family(asin, {}, source="sp_api")  # Producto sin variantes
+
+
+def _store_catalog_items(asins: list, items: dict, data_sets: list, previous: dict = None) -> dict:
     """
+    Guarda la respuesta en caché. Los data sets pedidos se reemplazan; los otros
+    data sets aún vigentes del ASIN se conservan (ej: summaries y salesRanks pedidos por separado).
 
-    # 1. Verificar si hay token cacheado válido
-    if TOKEN_CACHE_FILE.exists():
-        try:
-            with open(TOKEN_CACHE_FILE, 'r') as f:
-                cached = json.load(f)
-
-            token_age = time.time() - cached.get('timestamp', 0)
-
-            if token_age < TOKEN_LIFETIME:
-                # Token todavía válido
-                quiet_mode = os.getenv('PIPELINE_QUIET_MODE') == '1'
-                if not quiet_mode:
-                    mins_left = int((TOKEN_LIFETIME - token_age) / 60)
-                    print(f"♻️ Usando token cacheado de Amazon (válido por {mins_left} min más)")
-                return cached['access_token']
-        except (json.JSONDecodeError, KeyError):
-            pass  # Cache corrupto, generar nuevo token
-
-    # 2. Generar nuevo token
-    client_id = os.getenv("LWA_CLIENT_ID") or os.getenv("AMZ_CLIENT_ID")
-    client_secret = os.getenv("LWA_CLIENT_SECRET") or os.getenv("AMZ_CLIENT_SECRET")
-    refresh_token = os.getenv("REFRESH_TOKEN") or os.getenv("AMZ_REFRESH_TOKEN")
-
-    if not all([client_id, client_secret, refresh_token]):
-        raise RuntimeError(
-            "❌ Faltan credenciales de Amazon SP-API en .env:\n"
-            "   - LWA_CLIENT_ID (o AMZ_CLIENT_ID)\n"
-            "   - LWA_CLIENT_SECRET (o AMZ_CLIENT_SECRET)\n"
-            "   - REFRESH_TOKEN (o AMZ_REFRESH_TOKEN)"
-        )
-
-    url = "https://api.amazon.com/auth/o2/token"
-    data = {
-        "grant_type": "refresh_token",
-        "refresh_token": refresh_token,
-        "client_id": client_id,
-        "client_secret": client_secret,
-    }
-
-    try:
-        quiet_mode = os.getenv('PIPELINE_QUIET_MODE') == '1'
-        if not quiet_mode:
-            print(f"🔐 Generando nuevo access token de Amazon...")
-
-        r = requests.post(url, data=data, timeout=15)
-        r.raise_for_status()
-        token_data = r.json()
-        access_token = token_data["access_token"]
-
-        # 3. Guardar en caché
-        TOKEN_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
-        cache_data = {
-            'access_token': access_token,
-            'timestamp': time.time()
-        }
-        with open(TOKEN_CACHE_FILE, 'w') as f:
-            json.dump(cache_data, f)
-
-        if not quiet_mode:
-            print(f"✅ Token generado y cacheado (válido por 55 min)")
-
-        return access_token
-
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"❌ Error obteniendo access token de Amazon: {e}")
+    Returns:
+        dict: {asin: item combinado} de los ASINs encontrados
+    """
+    if "relationships" in data_sets:
+        for asin in asins:
+            if items.get(asin):
+                _record_relationships(asin, items[asin])
+
+    if CATALOG_CACHE_TTL_HOURS <= 0:
+        return {asin: items[asin] for asin in asins if items.get(asin)}
+    previous = previous or {}
+    now = time.time()
+    oldest = now - CATALOG_CACHE_TTL_HOURS * 3600
+    updates = {}
+    for asin in asins:
+        new_item = items.get(asin)
+        if new_item is None:
+            updates[asin] = {"item": None, "fetched": {s: now for s in data_sets}}
+            continue
+        prev = previous.get(asin) or {}
+        fetched = {s: t for s, t in prev.get("fetched", {}).items() if t >= oldest and s not in data_sets}
+        prev_item = prev.get("item") or {}
+        merged = {k: v for k, v in prev_item.items() if k in fetched}
+        merged.update(new_item)
+        fetched.update({s: now for s in data_sets})
+        updates[asin] = {"item": merged, "fetched": fetched}
+    if updates:
+        _get_catalog_cache().put_many(updates)
+    return {asin: entry["item"] for asin, entry in updates.items() if entry["item"]}
 
 # -------------------------------------------------------------
 # 🧠 Obtener información de un ASIN
@@ -119,29 +159,16 @@ def get_product_data_from_asin(asin: str, save_path: str = None):
     if not asin or len(asin) != 10:
         raise ValueError(f"❌ ASIN inválido: '{asin}' (debe tener 10 caracteres)")
 
-    if not quiet_mode:
-        print(f"🔐 Obteniendo access token de Amazon...")
-
-    token = get_amazon_access_token()
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "x-amz-access-token": token,
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
-
-    url = f"{SPAPI_BASE}/catalog/2022-04-01/items/{asin}"
     params = {
         "marketplaceIds": MARKETPLACE_ID,
-        "includedData": "attributes,images,productTypes,salesRanks,summaries,relationships"
+        "includedData": FULL_ITEM_DATA
     }
 
     if not quiet_mode:
         print(f"📥 Descargando datos del ASIN {asin}...")
 
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=30)
+        r = get_spapi_client().request("getCatalogItem", "GET", f"/catalog/2022-04-01/items/{asin}", params=params)
         r.raise_for_status()
         data = r.json()
     except requests.exceptions.HTTPError as e:
@@ -157,6 +184,9 @@ def get_product_data_from_asin(asin: str, save_path: str = None):
     if "asin" not in data:
         data["asin"] = asin
 
+    # Alimenta la caché de catálogo: ranking/marca/BSR de este ASIN ya no piden nada
+    _store_catalog_items([asin], {asin: data}, _data_sets(FULL_ITEM_DATA))
+
     if save_path is None:
         save_path = Path("asins_json") / f"{asin}.json"
     else:
@@ -175,9 +205,22 @@ def get_product_data_from_asin(asin: str, save_path: str = None):
     return data
 
 
+def extract_bsr(product_data: dict):
+    """BSR principal (classificationRanks[0]) de un item de catálogo, o None"""
+    for rank_data in (product_data or {}).get('salesRanks', []):
+        classification_ranks = rank_data.get('classificationRanks', [])
+        if classification_ranks:
+            # Tomar el primer ranking (usualmente es el más importante)
+            bsr = classification_ranks[0].get('rank')
+            if bsr:
+                return int(bsr)
+    return None
+
+
 def get_product_bsr_only(asin: str):
     """
     Obtiene únicamente el BSR (Best Seller Rank) de un ASIN.
+    Sale de la caché de catálogo si el ASIN ya se consultó dentro del TTL.
 
     Args:
         asin: El ASIN del producto
@@ -186,45 +229,67 @@ def get_product_bsr_only(asin: str):
         int: El BSR del producto, o None si no tiene
     """
     try:
-        # Usar PIPELINE_QUIET_MODE para no mostrar output
-        os.environ['PIPELINE_QUIET_MODE'] = '1'
-
-        data = get_product_data_from_asin(asin, save_path=None)
-
-        # Restaurar modo normal
-        os.environ.pop('PIPELINE_QUIET_MODE', None)
-
-        # Extraer BSR de salesRanks
-        sales_ranks = data.get('salesRanks', [])
+        asin = asin.strip().upper()
+        return extract_bsr(get_products_batch([asin], include_data="salesRanks").get(asin))
+    except Exception:
+        return None
 
-        if not sales_ranks:
-            return None
 
-        # Buscar el ranking principal (classificationRanks[0])
-        for rank_data in sales_ranks:
-            classification_ranks = rank_data.get('classificationRanks', [])
-            if classification_ranks:
-                # Tomar el primer ranking (usualmente es el más importante)
-                bsr = classification_ranks[0].get('rank')
-                if bsr:
-                    return int(bsr)
+def _fetch_catalog_batch(asins: list, include_data: str) -> dict:
+    """
+    Un request searchCatalogItems (hasta 20 ASINs) → {asin: item}.
+    429 / 5xx / error de red se reintentan (hasta CATALOG_MAX_ATTEMPTS); ante un 429 el
+    cliente ya pausó la cuota para todos los procesos, así que el reintento espera esa pausa.
+    Si se agotan los intentos → RuntimeError.
+    """
+    params = {
+        "marketplaceIds": MARKETPLACE_ID,
+        "identifiers": ",".join(asins),
+        "identifiersType": "ASIN",
+        "includedData": include_data
+    }
 
-        return None
+    last_error = None
+    for attempt in range(1, CATALOG_MAX_ATTEMPTS + 1):
+        try:
+            r = get_spapi_client().request("searchCatalogItems", "GET", "/catalog/2022-04-01/items", params=params)
+        except requests.exceptions.RequestException as e:
+            last_error = e
+        else:
+            if r.status_code != 429 and r.status_code < 500:
+                try:
+                    r.raise_for_status()
+                    data = r.json()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    raise RuntimeError(f"❌ Error obteniendo batch de ASINs: {e}")
+                break
+            last_error = f"HTTP {r.status_code}"
+            if r.status_code == 429:
+                continue  # La penalización del cliente marca la espera
+        if attempt < CATALOG_MAX_ATTEMPTS:
+            time.sleep(2 * attempt)
+    else:
+        raise RuntimeError(f"❌ Error obteniendo batch de ASINs ({CATALOG_MAX_ATTEMPTS} intentos): {last_error}")
 
-    except Exception as e:
-        # Restaurar modo normal en caso de error
-        os.environ.pop('PIPELINE_QUIET_MODE', None)
-        return None
+    # Parsear respuesta - formato: {"items": [{asin: ..., summaries: ...}, ...]}
+    result = {}
+    for item in data.get("items", []):
+        asin = item.get("asin")
+        if asin:
+            result[asin] = item
+    return result
 
 
-def get_products_batch(asins: list, include_data: str = "summaries") -> dict:
+def get_products_batch(asins: list, include_data: str = "summaries", use_cache: bool = True) -> dict:
     """
     Obtiene datos de múltiples ASINs en una sola llamada (hasta 20 ASINs).
-    Usa el endpoint searchCatalogItems con identifiers.
+    Usa el endpoint searchCatalogItems con identifiers; solo pide los ASINs
+    que no están vigentes en la caché de catálogo.
 
     Args:
         asins: Lista de ASINs a consultar (máximo 20)
         include_data: Datos a incluir (default: "summaries" para marca/título)
+        use_cache: False para forzar el request (igual actualiza la caché)
 
     Returns:
         dict: {asin: product_data} - Mapeo de ASIN a datos del producto
@@ -232,45 +297,108 @@ def get_products_batch(asins: list, include_data: str = "summaries") -> dict:
     if not asins:
         return {}
 
-    if len(asins) > 20:
-        raise ValueError(f"Máximo 20 ASINs por batch (recibido: {len(asins)})")
+    if len(asins) > CATALOG_BATCH_SIZE:
+        raise ValueError(f"Máximo {CATALOG_BATCH_SIZE} ASINs por batch (recibido: {len(asins)})")
 
     # Limpiar ASINs
-    asins = [asin.strip().upper() for asin in asins]
+    asins = list(dict.fromkeys(asin.strip().upper() for asin in asins))
+    data_sets = _data_sets(include_data)
 
-    token = get_amazon_access_token()
+    if use_cache:
+        hits, misses, entries = _lookup_catalog_cache(asins, data_sets)
+    else:
+        hits, misses, entries = {}, asins, {}
 
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "x-amz-access-token": token,
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-    }
+    result = {asin: item for asin, item in hits.items() if item}
+    if misses:
+        fetched = _fetch_catalog_batch(misses, include_data)
+        # Los ASINs que Amazon no devolvió también se cachean (como inexistentes)
+        result.update(_store_catalog_items(misses, fetched, data_sets, entries))
 
-    url = f"{SPAPI_BASE}/catalog/2022-04-01/items"
-    params = {
-        "marketplaceIds": MARKETPLACE_ID,
-        "identifiers": ",".join(asins),
-        "identifiersType": "ASIN",
-        "includedData": include_data
-    }
+    return result
 
-    try:
-        r = requests.get(url, headers=headers, params=params, timeout=30)
-        r.raise_for_status()
-        data = r.json()
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"❌ Error obteniendo batch de ASINs: {e}")
 
-    # Parsear respuesta - formato: {"items": [{asin: ..., summaries: ...}, ...]}
-    items = data.get("items", [])
+def split_cached_asins(asins: list, include_data: str = "summaries"):
+    """
+    Sin tocar la API: (items vigentes en caché, ASINs que requieren request).
+    Para llamadores que administran su propio presupuesto de requests.
+    """
+    asins = list(dict.fromkeys(a.strip().upper() for a in asins if a and a.strip()))
+    hits, misses, _ = _lookup_catalog_cache(asins, _data_sets(include_data))
+    return {asin: item for asin, item in hits.items() if item}, misses
 
-    result = {}
-    for item in items:
-        asin = item.get("asin")
-        if asin:
-            result[asin] = item
 
+def get_catalog_items(asins: list, include_data: str = "summaries", failed: set = None) -> dict:
+    """
+    Como get_products_batch pero para cualquier cantidad de ASINs:
+    primero la caché, y los faltantes en requests de 20.
+    Un batch que falla (después de sus reintentos) se omite: sus ASINs quedan fuera
+    del resultado y, si se pasa `failed`, se agregan ahí (≠ "no existe en Amazon").
+
+    Returns:
+        dict: {asin: product_data}
+    """
+    asins = list(dict.fromkeys(a.strip().upper() for a in asins if a and a.strip()))
+    if not asins:
+        return {}
+
+    data_sets = _data_sets(include_data)
+    hits, misses, entries = _lookup_catalog_cache(asins, data_sets)
+    result = {asin: item for asin, item in hits.items() if item}
+
+    for i in range(0, len(misses), CATALOG_BATCH_SIZE):
+        batch = misses[i:i + CATALOG_BATCH_SIZE]
+        try:
+            fetched = _fetch_catalog_batch(batch, include_data)
+        except RuntimeError as e:
+            print(f"⚠️ {e}")
+            if failed is not None:
+                failed.update(batch)
+            continue
+        result.update(_store_catalog_items(batch, fetched, data_sets, entries))
+
+    return result
+
+
+def get_amazon_data_batch(asins: list) -> dict:
+    """
+    Datos planos para ranking de ASINs (título, precio, BSR, categoría), vía caché de catálogo.
+    El Catalog API no trae reviews/rating: las claves review_count/rating NO se incluyen
+    (dato desconocido, no 0).
+
+    Returns:
+        dict: {asin: {title, brand, price, sales_rank, category}}
+              o {asin: {"error": ...}} si Amazon no lo devolvió
+              o {asin: {"error": ..., "retryable": True}} si su batch falló (429, red, 5xx)
+    """
+    failed = set()
+    items = get_catalog_items(asins, include_data=CATALOG_ANALYSIS_DATA, failed=failed)
+    result = {}
+    for asin in asins:
+        asin = asin.strip().upper()
+        item = items.get(asin)
+        if asin in failed:
+            result[asin] = {"error": "Batch fallido (throttling/red)", "retryable": True}
+            continue
+        if not item:
+            result[asin] = {"error": "ASIN no encontrado en catálogo"}
+            continue
+
+        summary = (item.get("summaries") or [{}])[0]
+        price = 0
+        list_price = item.get("attributes", {}).get("list_price")
+        if list_price:
+            price_data = list_price[0] if isinstance(list_price, list) else list_price
+            price = price_data.get("value", 0) or 0
+        product_types = item.get("productTypes") or [{}]
+
+        result[asin] = {
+            "title": summary.get("itemName", ""),
+            "brand": summary.get("brand", ""),
+            "price": float(price),
+            "sales_rank": extract_bsr(item) or 0,
+            "category": product_types[0].get("productType") or summary.get("productType", ""),
+        }
     return result
 
 
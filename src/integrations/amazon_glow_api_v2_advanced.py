@@ -24,6 +24,14 @@ from datetime import datetime
 from typing import Optional, Dict, List
 from bs4 import BeautifulSoup
 
+try:
+    from src.utils.variant_graph import get_variant_graph, parse_twister_html
+except ModuleNotFoundError:
+    import sys
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.variant_graph import get_variant_graph, parse_twister_html
+
 # Intentar imports con fallback
 try:
     from curl_cffi import requests as curl_requests
@@ -292,6 +300,8 @@ def detect_and_resolve_variants(html_content: str, original_asin: str) -> Option
         - asin: El ASIN de la variante
         - dimensions: Dict con dimensiones (ej: {"size_name": "7", "color_name": "Black"})
         - variant_info: Lista con valores de la variante
+        Si original_asin es el padre (no una variante), el hijo comprable que conoce el grafo:
+        - asin: ASIN del hijo, parent_asin: original_asin, is_parent: True
         O None si no tiene variantes o no se pudo extraer
     """
 
@@ -306,26 +316,37 @@ def detect_and_resolve_variants(html_content: str, original_asin: str) -> Option
     if not has_variant_selector:
         return None  # No tiene variantes
 
-    # EXTRACCIÓN 1: Buscar dimensionValuesDisplayData (mapeo ASIN -> valores)
-    dim_data_match = re.search(
-        r'"dimensionValuesDisplayData"\s*:\s*(\{[^}]+\})',
-        html_content
-    )
+    # EXTRACCIÓN 1: Mapa ASIN -> valores del twister (se guarda en el grafo de variantes compartido)
+    graph = get_variant_graph()
+    parent_asin, variant_map = parse_twister_html(html_content)
+    if variant_map:
+        graph.record_page(original_asin, parent_asin, variant_map, source="glow_sync")
+    else:
+        # Página sin mapa legible: usar la familia ya conocida (búsqueda / publicación / SP-API)
+        family = graph.family(original_asin)
+        variant_map = family["children"] if family else {}
 
-    if not dim_data_match:
+    if not variant_map:
         return None  # No se pudo extraer mapa de variantes
 
     try:
-        import json
-        variant_map = json.loads(dim_data_match.group(1))
-
         # VERIFICACIÓN: ¿Nuestro ASIN está en el mapa?
         if original_asin not in variant_map:
             print(f"   ⚠️  ASIN padre detectado (no es variante específica)")
             print(f"      Variantes disponibles: {list(variant_map.keys())[:3]}")
-            return None
+            buyable_child = graph.resolve_buyable_child(original_asin)
+            if not buyable_child:
+                return None
+            print(f"      Variante comprable conocida: {buyable_child}")
+            return {
+                'asin': buyable_child,
+                'parent_asin': original_asin,
+                'is_parent': True,
+                'variant_info': variant_map.get(buyable_child) or [],
+                'dimensions': {}
+            }
 
-        variant_info = variant_map[original_asin]
+        variant_info = variant_map[original_asin] or []
 
         # EXTRACCIÓN 2: Buscar dimensionToAsinMap (mapeo valores -> ASIN)
         # Esto nos da los nombres de las dimensiones (size_name, color_name, etc)
@@ -834,7 +855,8 @@ def check_availability_v2_advanced(asin: str, zipcode: str = None) -> Dict:
         zipcode: Zipcode del comprador (default: BUYER_ZIPCODE de .env)
 
     Returns:
-        Dict con resultado de validación
+        Dict con resultado de validación (+ buyable_child si el ASIN es un padre de
+        variantes y el grafo conoce un hijo comprable)
     """
 
     if not zipcode:
@@ -1116,6 +1138,9 @@ def check_availability_v2_advanced(asin: str, zipcode: str = None) -> Dict:
                 if result["days_until_delivery"] and result["days_until_delivery"] <= max_days:
                     result["is_fast_delivery"] = True
 
+                # Si es una variante conocida, queda como comprable en el grafo
+                get_variant_graph().mark_buyable(asin, True)
+
                 # Éxito - salir del loop de retry
                 return result
 
@@ -1125,6 +1150,12 @@ def check_availability_v2_advanced(asin: str, zipcode: str = None) -> Dict:
 
                 variant_data = detect_and_resolve_variants(html, asin)
 
+                if variant_data and variant_data.get("is_parent"):
+                    # El precio/delivery de otra variante no sirve para este ASIN: se informa el
+                    # hijo comprable para que el caller decida (re-publicar / re-mapear)
+                    result["buyable_child"] = variant_data["asin"]
+                    return result
+
                 if variant_data:
                     # ESTRATEGIA: Agregar parámetros th=1&psc=1 para forzar selección de variante
                     print(f"   🔄 Consultando variante con parámetros de selección...")
@@ -5,13 +5,26 @@ Busca keywords en Amazon y extrae ASINs de los resultados
 """
 import os
 import re
+import sys
 import requests
 import random
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+from pathlib import Path
 from typing import List, Dict, Optional
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+try:
+    from src.utils.request_budget import RequestBudget
+    from src.utils.variant_graph import get_variant_graph, parse_twister_html
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.request_budget import RequestBudget
+    from src.utils.variant_graph import get_variant_graph, parse_twister_html
+
 load_dotenv(override=True)
 
 # Lista de User-Agents para rotar
@@ -72,175 +85,222 @@ def extract_price_from_product(product) -> Optional[float]:
     return None
 
 
-def get_product_variants(asin: str, session: requests.Session, zipcode: str = None,
-                        min_price: float = 28.0, max_price: float = 450.0,
-                        max_delivery_days: int = 4) -> List[str]:
-    """
-    Obtiene las variantes de un producto y retorna los ASINs que cumplen con los criterios.
+# -------------------------------------------------------------
+# 🧬 Variantes: crawl concurrente acotado + mapa padre→variantes cacheado
+# -------------------------------------------------------------
 
-    Args:
-        asin: ASIN del producto padre
-        session: Sesión de requests configurada
-        zipcode: Zipcode para verificar envío
-        min_price: Precio mínimo permitido
-        max_price: Precio máximo permitido
-        max_delivery_days: Máximo días de envío
+GLOW_VARIANT_WORKERS = int(os.getenv("GLOW_VARIANT_WORKERS", "4"))  # Páginas /dp/ en vuelo a la vez
+GLOW_PAGE_RATE = float(os.getenv("GLOW_PAGE_RATE", "2.0"))  # Páginas /dp/ por segundo (global, todos los procesos)
 
-    Returns:
-        Lista de ASINs de variantes que cumplen criterios (puede estar vacía)
-    """
-    valid_variants = []
+_A_PRICE_RE = re.compile(r'class="a-price[^"]*"[^>]*>\s*<span class="a-offscreen">\s*\$?\s*([\d,]+(?:\.\d{1,2})?)')
+_PRICEBLOCK_RE = re.compile(r'id="priceblock_(?:ourprice|dealprice|saleprice)"[^>]*>\s*\$?\s*([\d,]+(?:\.\d{1,2})?)')
+_ANY_PRICE_RE = re.compile(r'\$(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)')
+_FAST_DELIVERY_RE = re.compile(
+    r'FREE\s+delivery|Get\s+it\s+by|Get\s+it\s+(?:today|tomorrow)|Arrives\s+(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun)',
+    re.IGNORECASE
+)
 
-    try:
-        # Visitar página del producto
-        product_url = f"https://www.amazon.com/dp/{asin}"
-        response = session.get(product_url, timeout=15)
 
-        if response.status_code != 200:
-            return valid_variants
-
-        html = response.text
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Buscar variantes en el HTML
-        # Método 1: Buscar en twister-main (selector de variantes)
-        variant_asins = set()
-
-        # Buscar en data attributes de las opciones de variantes
-        variant_selects = soup.find_all('select', {'id': re.compile(r'native_dropdown_selected_')})
-        for select in variant_selects:
-            options = select.find_all('option', {'value': True})
-            for option in options:
-                value = option.get('value', '')
-                # El value puede contener el ASIN
-                if len(value) == 10 and value.isalnum():
-                    variant_asins.add(value)
-
-        # Método 2: Buscar en links de variantes
-        variant_links = soup.find_all('a', {'href': re.compile(r'/dp/[A-Z0-9]{10}')})
-        for link in variant_links:
-            href = link.get('href', '')
-            match = re.search(r'/dp/([A-Z0-9]{10})', href)
-            if match:
-                variant_asins.add(match.group(1))
+def parse_twister_variants(html: str) -> Dict[str, object]:
+    """
+    Variantes del twister de una página /dp/ leyendo su JSON embebido.
 
-        # Método 3: Buscar en JSON embebido (twisterData)
-        scripts = soup.find_all('script', {'type': 'text/javascript'})
-        for script in scripts:
-            script_text = script.string if script.string else ''
-            # Buscar patrones de ASIN en el script
-            asin_matches = re.findall(r'"asin"\s*:\s*"([A-Z0-9]{10})"', script_text)
-            for asin_match in asin_matches:
-                variant_asins.add(asin_match)
+    Returns:
+        {asin_variante: valores_de_dimensión} (vacío si el producto no tiene variantes)
+    """
+    return parse_twister_html(html)[1]
 
-        # Remover el ASIN original
-        variant_asins.discard(asin)
 
-        # Si no encontramos variantes, retornar vacío
-        if not variant_asins:
-            return valid_variants
+def extract_page_price(html: str) -> Optional[float]:
+    """Precio de una página /dp/: a-price/a-offscreen, priceblock legacy, o primer $XX razonable"""
+    for regex in (_A_PRICE_RE, _PRICEBLOCK_RE):
+        match = regex.search(html)
+        if match:
+            try:
+                return float(match.group(1).replace(',', ''))
+            except ValueError:
+                pass
 
-        # Verificar cada variante (precio y envío)
-        for variant_asin in variant_asins:
-            variant_url = f"https://www.amazon.com/dp/{variant_asin}"
+    for pm in _ANY_PRICE_RE.findall(html):
+        try:
+            potential_price = float(pm.replace(',', ''))
+        except ValueError:
+            continue
+        if 1 <= potential_price <= 10000:  # Rango razonable (no código postal, etc)
+            return potential_price
+    return None
 
-            try:
-                variant_response = session.get(variant_url, timeout=10)
-                if variant_response.status_code != 200:
-                    continue
 
-                variant_html = variant_response.text
-                variant_soup = BeautifulSoup(variant_html, 'html.parser')
-
-                # Verificar precio - múltiples métodos
-                price = None
-
-                # Método 1: a-price con a-offscreen (más común actualmente)
-                price_span = variant_soup.find('span', class_='a-price')
-                if price_span:
-                    offscreen = price_span.find('span', class_='a-offscreen')
-                    if offscreen:
-                        price_text = offscreen.get_text(strip=True).replace('$', '').replace(',', '')
-                        match = re.search(r'(\d+(?:\.\d{1,2})?)', price_text)
-                        if match:
-                            try:
-                                price = float(match.group(1))
-                            except ValueError:
-                                pass
-
-                # Método 2: priceblock IDs (legacy)
-                if not price:
-                    for price_id in ['priceblock_ourprice', 'priceblock_dealprice', 'priceblock_saleprice']:
-                        price_elem = variant_soup.find('span', {'id': price_id})
-                        if price_elem:
-                            price_text = price_elem.get_text(strip=True).replace('$', '').replace(',', '')
-                            match = re.search(r'(\d+(?:\.\d{1,2})?)', price_text)
-                            if match:
-                                try:
-                                    price = float(match.group(1))
-                                    break
-                                except ValueError:
-                                    continue
-
-                # Método 3: Buscar en cualquier span con patrón $XX.XX
-                if not price:
-                    all_text = variant_html
-                    # Buscar patrones como $99.99 o $99
-                    price_matches = re.findall(r'\$(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)', all_text)
-                    if price_matches:
-                        # Tomar el primer precio que parezca razonable (no código postal, etc)
-                        for pm in price_matches:
-                            try:
-                                potential_price = float(pm.replace(',', ''))
-                                if 1 <= potential_price <= 10000:  # Rango razonable
-                                    price = potential_price
-                                    break
-                            except:
-                                continue
-
-                # Si no encontramos precio o está fuera de rango, skip
-                if price is None:
-                    continue
-                if min_price is not None and price < min_price:
-                    continue
-                if max_price is not None and price > max_price:
-                    continue
+class VariantCrawler:
+    """
+    Expande productos a sus variantes válidas (precio + envío rápido) en paralelo.
+
+    - Hasta GLOW_VARIANT_WORKERS páginas en vuelo; ritmo global GLOW_PAGE_RATE (token bucket
+      compartido entre procesos) → el tiempo total depende del presupuesto, no de las variantes
+    - Las variantes salen del JSON del twister (regex + json, sin BeautifulSoup)
+    - Familias de variantes en el grafo compartido (variant_graph, TTL VARIANT_GRAPH_TTL_HOURS):
+      un ASIN cuya familia ya se conoce (por búsqueda, sync o SP-API) no vuelve a pedir su página
+    - `expand(asin)` retorna un Future con la lista de variantes válidas
+    """
 
-                # Verificar envío
-                has_fast_delivery = False
-                delivery_patterns = [
-                    r'FREE\s+delivery',
-                    r'Get\s+it\s+by',
-                    r'Get\s+it\s+(today|tomorrow)',
-                    r'Arrives\s+(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun)',
-                ]
+    def __init__(self, session: requests.Session, min_price: float = 28.0, max_price: float = 450.0,
+                 seen_index=None, proxies: dict = None, max_workers: int = GLOW_VARIANT_WORKERS):
+        self.session = session
+        self.min_price = min_price
+        self.max_price = max_price
+        self.seen_index = seen_index
+        self.proxies = proxies
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.budget = RequestBudget("amazon_product_pages", rate=GLOW_PAGE_RATE, burst=max_workers)
+        self.graph = get_variant_graph()
+        self._stopped = False
+        self.stats = {"pages": 0, "map_cache_hits": 0, "variants_checked": 0}
+        self._stats_lock = threading.Lock()
+
+        # Pool HTTP del tamaño de la concurrencia (keep-alive entre workers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount("https://", adapter)
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _get(self, url: str, timeout: float) -> Optional[str]:
+        if self._stopped:
+            return None
+        self.budget.acquire()
+        if self._stopped:
+            return None
+        self._count("pages")
+        response = self.session.get(url, timeout=timeout, proxies=self.proxies)
+        if response.status_code == 503:
+            # Amazon frena el scraping con 503: pausa a todos los procesos
+            self.budget.penalize(10)
+        if response.status_code != 200:
+            return None
+        return response.text
+
+    def variant_asins(self, asin: str) -> List[str]:
+        """Variantes de la familia del ASIN (grafo o 1 página /dp/), sin el propio ASIN"""
+        family = self.graph.family(asin)
+        if family is not None:
+            self._count("map_cache_hits")
+            variants = list(family["children"])
+        else:
+            html = self._get(f"https://www.amazon.com/dp/{asin}", timeout=15)
+            if html is None:
+                return []
+            parent_asin, children = parse_twister_html(html)
+            self.graph.record_page(asin, parent_asin, children, source="glow_search")
+            variants = sorted(children)
+        return [v for v in variants if v != asin]
+
+    def check_variant(self, asin: str) -> bool:
+        """True si la variante cumple precio y muestra envío rápido"""
+        try:
+            html = self._get(f"https://www.amazon.com/dp/{asin}", timeout=10)
+        except requests.RequestException:
+            return False
+        if html is None:
+            return False
+        self._count("variants_checked")
+
+        price = extract_page_price(html)
+        has_fast_delivery = bool(_FAST_DELIVERY_RE.search(html))
+        self.graph.mark_buyable(asin, price is not None and has_fast_delivery)
+
+        if price is None:
+            return False
+        if self.min_price is not None and price < self.min_price:
+            return False
+        if self.max_price is not None and price > self.max_price:
+            return False
+        return has_fast_delivery
+
+    def _candidates(self, asin: str) -> List[str]:
+        try:
+            variants = self.variant_asins(asin)
+        except requests.RequestException:
+            return []
+        # Las variantes ya vistas no se visitan (evita 1 GET por cada una)
+        if self.seen_index is not None:
+            variants = [v for v in variants if v not in self.seen_index]
+        return variants
+
+    def expand(self, asin: str) -> Future:
+        """
+        Future → lista de variantes válidas del ASIN (en orden estable).
+        Las páginas de las variantes se piden en paralelo, sin bloquear workers.
+        """
+        out = Future()
+
+        def on_candidates(f):
+            candidates = [] if f.exception() else f.result()
+            if not candidates or self._stopped:
+                out.set_result([])
+                return
+            checks = [self.executor.submit(self.check_variant, v) for v in candidates]
+            remaining = [len(checks)]
+            lock = threading.Lock()
+
+            def on_check(_):
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0]:
+                        return
+                out.set_result([v for v, c in zip(candidates, checks) if not c.exception() and c.result()])
+
+            for c in checks:
+                c.add_done_callback(on_check)
 
-                for pattern in delivery_patterns:
-                    if re.search(pattern, variant_html, re.IGNORECASE):
-                        has_fast_delivery = True
-                        break
+        try:
+            self.executor.submit(self._candidates, asin).add_done_callback(on_candidates)
+        except RuntimeError:
+            out.set_result([])  # Crawler ya cerrado
+        return out
 
-                # Si cumple criterios, agregar
-                if has_fast_delivery:
-                    valid_variants.append(variant_asin)
+    def close(self):
+        """Corta lo pendiente (las páginas en vuelo terminan) y libera los workers"""
+        self._stopped = True
+        self.executor.shutdown(wait=True)
 
-                # Pequeño delay entre variantes
-                time.sleep(0.5)
 
-            except Exception:
-                # Si falla una variante, continuar con las demás
-                continue
+def get_product_variants(asin: str, session: requests.Session, zipcode: str = None,
+                        min_price: float = 28.0, max_price: float = 450.0,
+                        max_delivery_days: int = 4, seen_index=None,
+                        crawler: VariantCrawler = None) -> List[str]:
+    """
+    Obtiene las variantes de un producto y retorna los ASINs que cumplen con los criterios.
 
-        return valid_variants
+    Args:
+        asin: ASIN del producto padre
+        session: Sesión de requests configurada
+        zipcode: Zipcode para verificar envío
+        min_price: Precio mínimo permitido
+        max_price: Precio máximo permitido
+        max_delivery_days: Máximo días de envío
+        seen_index: Índice de ASINs ya vistos (las variantes vistas no se visitan)
+        crawler: VariantCrawler a reusar (si no, se crea uno para esta llamada)
 
+    Returns:
+        Lista de ASINs de variantes que cumplen criterios (puede estar vacía)
+    """
+    own_crawler = crawler is None
+    if own_crawler:
+        crawler = VariantCrawler(session, min_price=min_price, max_price=max_price, seen_index=seen_index)
+    try:
+        return crawler.expand(asin).result()
     except Exception:
-        return valid_variants
+        return []
+    finally:
+        if own_crawler:
+            crawler.close()
 
 
 def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = None,
                           filter_fast_delivery: bool = True, use_blacklist: bool = True,
                           max_delivery_days: int = 4, min_price: float = 28.0, max_price: float = 450.0,
-                          check_variants: bool = True) -> Dict:
+                          check_variants: bool = True, skip_seen: bool = True) -> Dict:
     """
     Busca una keyword en Amazon y extrae los ASINs de los resultados.
 
@@ -254,6 +314,8 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
         min_price: Precio mínimo permitido en USD (default: 28.0, None = sin límite mínimo)
         max_price: Precio máximo permitido en USD (default: 450.0, None = sin límite)
         check_variants: Si True, analiza variantes de cada producto encontrado (default: True)
+        skip_seen: Si True, descarta ASINs ya publicados/en cola/rechazados antes de
+            cualquier filtro o request de variantes (default: True)
 
     Returns:
         Dict con:
@@ -264,6 +326,7 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
             "total_checked": int,  # Total de productos revisados
             "filtered_by_blacklist": int,  # Productos filtrados por blacklist
             "filtered_by_price": int,  # Productos filtrados por precio (min/max)
+            "filtered_as_seen": int,  # Productos ya vistos (publicados/en cola/rechazados)
             "variants_found": int,  # Total de variantes encontradas
             "error": str or None
         }
@@ -278,6 +341,7 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
         "total_checked": 0,
         "filtered_by_blacklist": 0,
         "filtered_by_price": 0,
+        "filtered_as_seen": 0,
         "variants_found": 0,
         "using_prime": False,
         "error": None
@@ -293,6 +357,19 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
     else:
         product_filter = None
 
+    # Índice global de ASINs ya vistos (consulta en memoria, sin requests)
+    seen_index = None
+    if skip_seen:
+        try:
+            from src.utils.seen_asins import get_seen_index
+        except ModuleNotFoundError:
+            import sys
+            from pathlib import Path
+            sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+            from src.utils.seen_asins import get_seen_index
+        seen_index = get_seen_index()
+        seen_index.refresh()
+
     session = requests.Session()
     user_agent = get_random_user_agent()
 
@@ -320,6 +397,12 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
             'https': proxy_url,
         }
 
+    # Expansión de variantes concurrente sobre la misma sesión (cookies + zipcode de Glow)
+    crawler = None
+    if check_variants:
+        crawler = VariantCrawler(session, min_price=min_price, max_price=max_price,
+                                 seen_index=seen_index, proxies=proxies)
+
     try:
         # Paso 1: GET homepage para obtener cookies iniciales
         homepage_url = "https://www.amazon.com"
@@ -354,10 +437,21 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
 
         # Paso 3: Realizar búsqueda con paginación (hasta 5 páginas)
         search_url = "https://www.amazon.com/s"
-        asins_found = []
+        parents = []  # ASINs de la búsqueda que pasaron los filtros (en orden)
+        expansions = {}  # parent → Future con sus variantes válidas
         products_checked = 0
         MAX_PAGES = 5
 
+        def add_parent(parent_asin: str):
+            parents.append(parent_asin)
+            if crawler is not None:
+                # Las variantes se resuelven en segundo plano mientras seguimos paginando
+                expansions[parent_asin] = crawler.expand(parent_asin)
+
+        def count_found() -> int:
+            # Variantes solo de las expansiones ya terminadas (no bloquea)
+            return len(parents) + sum(len(f.result()) for f in expansions.values() if f.done())
+
         for page in range(1, MAX_PAGES + 1):
             params = {
                 'k': keyword,
@@ -388,6 +482,11 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
                 if not asin or len(asin) != 10:
                     continue
 
+                # ASIN ya publicado/en cola/rechazado: no gastar filtros ni requests
+                if seen_index is not None and asin in seen_index:
+                    result["filtered_as_seen"] += 1
+                    continue
+
                 # SKIP SPONSORED: Ignorar productos patrocinados
                 product_html = str(product)
                 if re.search(r'Sponsored', product_html, re.IGNORECASE):
@@ -449,26 +548,9 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
 
                 # Si no queremos filtrar, agregar directamente
                 if not filter_fast_delivery:
-                    if asin not in asins_found:
-                        asins_found.append(asin)
-
-                        # Revisar variantes si está habilitado
-                        if check_variants:
-                            variants = get_product_variants(
-                                asin=asin,
-                                session=session,
-                                zipcode=zipcode,
-                                min_price=min_price,
-                                max_price=max_price,
-                                max_delivery_days=max_delivery_days
-                            )
-                            for variant_asin in variants:
-                                # Verificar que no sea el mismo ASIN y que no esté ya en la lista
-                                if variant_asin != asin and variant_asin not in asins_found:
-                                    asins_found.append(variant_asin)
-                                    result["variants_found"] += 1
-
-                        if len(asins_found) >= max_results:
+                    if asin not in parents:
+                        add_parent(asin)
+                        if count_found() >= max_results:
                             break
                     continue
 
@@ -495,36 +577,37 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
                         break
 
                 # Solo agregar si tiene envío rápido
-                if has_fast_delivery and asin not in asins_found:
-                    asins_found.append(asin)
-
-                    # Revisar variantes si está habilitado
-                    if check_variants:
-                        variants = get_product_variants(
-                            asin=asin,
-                            session=session,
-                            zipcode=zipcode,
-                            min_price=min_price,
-                            max_price=max_price,
-                            max_delivery_days=max_delivery_days
-                        )
-                        for variant_asin in variants:
-                            # Verificar que no sea el mismo ASIN y que no esté ya en la lista
-                            if variant_asin != asin and variant_asin not in asins_found:
-                                asins_found.append(variant_asin)
-                                result["variants_found"] += 1
-
-                    if len(asins_found) >= max_results:
+                if has_fast_delivery and asin not in parents:
+                    add_parent(asin)
+                    if count_found() >= max_results:
                         break
 
             # Si ya tenemos suficientes ASINs, salir del loop de páginas
-            if len(asins_found) >= max_results:
+            # (antes de pedir otra página se esperan las variantes en curso)
+            if len(parents) < max_results:
+                futures_wait(list(expansions.values()))
+            if count_found() >= max_results:
                 break
 
             # Delay entre páginas para evitar rate limiting
             if page < MAX_PAGES:
                 time.sleep(1.5)
 
+        # Armar resultado en orden: padre → sus variantes, hasta completar max_results
+        asins_found = []
+        for parent in parents:
+            if len(asins_found) >= max_results:
+                break
+            if parent not in asins_found:
+                asins_found.append(parent)
+            future = expansions.get(parent)
+            variants = future.result() if future is not None else []
+            for variant_asin in variants:
+                # Verificar que no sea el mismo ASIN y que no esté ya en la lista
+                if variant_asin != parent and variant_asin not in asins_found:
+                    asins_found.append(variant_asin)
+                    result["variants_found"] += 1
+
         result["asins"] = asins_found
         result["total_found"] = len(asins_found)
         result["total_checked"] = products_checked
@@ -540,6 +623,9 @@ def search_amazon_keyword(keyword: str, max_results: int = 10, zipcode: str = No
     except Exception as e:
         result["error"] = f"Unexpected error: {str(e)}"
         return result
+    finally:
+        if crawler is not None:
+            crawler.close()
 
 
 def search_multiple_keywords(keywords: List[str], max_results_per_keyword: int = 10,
@@ -7,14 +7,19 @@ Obtiene precios y ofertas Prime de productos en Amazon
 import os
 import requests
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timezone
 from typing import Optional, Dict, List
-from .amazon_api import get_amazon_access_token
+from .amazon_api import get_spapi_client
 
 # Configuración
 SPAPI_BASE = "https://sellingpartnerapi-na.amazon.com"
 MARKETPLACE_ID = "ATVPDKIKX0DER"  # US
 
+# Batches de getItemOffersBatch en vuelo a la vez (la cuota la impone el cliente SP-API)
+PRICING_MAX_IN_FLIGHT = int(os.getenv("PRICING_MAX_IN_FLIGHT", "4"))
+
 # Configuración de filtros de fast fulfillment
 MAX_WAREHOUSE_HOURS = 24  # Máximo 24 horas para salir del almacén (Prime 1-day)
 MAX_BACKORDER_DAYS = 0    # Máximo días de espera si tiene fecha futura
@@ -177,22 +182,9 @@ def get_prime_offer(asin: str, retry_count: int = 3) -> Optional[Dict]:
         None si no hay oferta Prime disponible
     """
 
-    url = f"{SPAPI_BASE}/products/pricing/v0/items/{asin}/offers"
-
     for attempt in range(retry_count):
         try:
-            # 1. Obtener token
-            token = get_amazon_access_token()
-
-            # 2. Headers
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "x-amz-access-token": token,
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
-
-            # 3. Params
+            # 1. Params
             params = {
                 "MarketplaceId": MARKETPLACE_ID,
                 "ItemCondition": "New",  # Solo productos nuevos
@@ -204,15 +196,15 @@ def get_prime_offer(asin: str, retry_count: int = 3) -> Optional[Dict]:
             if buyer_zipcode:
                 params["deliveryPostalCode"] = buyer_zipcode
 
-            # 4. Request
-            response = requests.get(url, headers=headers, params=params, timeout=15)
+            # 2. Request (el cliente espera turno en la cuota de getItemOffers)
+            response = get_spapi_client().request(
+                "getItemOffers", "GET", f"/products/pricing/v0/items/{asin}/offers", params=params, timeout=15
+            )
 
-            # 5. Manejar errores
+            # 3. Manejar errores
             if response.status_code == 429:
-                # Rate limit - esperar y reintentar
-                wait_time = 2 ** attempt  # Backoff exponencial: 1s, 2s, 4s
-                print(f"⏱️  Rate limit alcanzado, esperando {wait_time}s...")
-                time.sleep(wait_time)
+                # Rate limit - el cliente ya pausó la cuota global; reintentar cuando haya turno
+                print(f"⏱️  Rate limit alcanzado para {asin}, reintentando...")
                 continue
 
             if response.status_code == 403:
@@ -224,7 +216,7 @@ def get_prime_offer(asin: str, retry_count: int = 3) -> Optional[Dict]:
                 print(f"⚠️  Error {response.status_code} para {asin}: {response.text[:200]}")
                 return None
 
-            # 6. Parsear respuesta
+            # 4. Parsear respuesta
             data = response.json()
 
             if 'payload' not in data:
@@ -237,7 +229,7 @@ def get_prime_offer(asin: str, retry_count: int = 3) -> Optional[Dict]:
                 # No hay ofertas disponibles
                 return None
 
-            # 7. Recolectar TODAS las ofertas Prime + FBA válidas y elegir la más barata
+            # 5. Recolectar TODAS las ofertas Prime + FBA válidas y elegir la más barata
             valid_offers = []
 
             for offer in payload['Offers']:
@@ -343,12 +335,97 @@ def get_prime_offers_batch(asins: list, delay: float = 1.5) -> Dict[str, Optiona
     return results
 
 
+def _build_item_offers_body(asins: List[str]) -> dict:
+    """Body del endpoint batch getItemOffersBatch (1 sub-request por ASIN)"""
+    requests_array = []
+    buyer_zipcode = os.getenv("BUYER_ZIPCODE")
+
+    for asin in asins:
+        request_params = {
+            "uri": f"/products/pricing/v0/items/{asin}/offers",
+            "method": "GET",
+            "MarketplaceId": MARKETPLACE_ID,
+            "ItemCondition": "New",
+            "CustomerType": "Consumer"  # Consumer (Prime personal) vs Business (Business Prime)
+        }
+
+        # Agregar zipcode si está configurado (para obtener disponibilidad precisa)
+        if buyer_zipcode:
+            request_params["deliveryPostalCode"] = buyer_zipcode
+
+        requests_array.append(request_params)
+
+    return {"requests": requests_array}
+
+
+def _parse_prime_offer(asin: str, payload: dict) -> Optional[Dict]:
+    """La oferta Prime + FBA (fast fulfillment) más barata de un payload de itemOffers, o None"""
+    offers = payload.get("Offers", [])
+    if not offers:
+        return None
+
+    # Recolectar TODAS las ofertas Prime + FBA válidas y elegir la más barata
+    valid_offers = []
+
+    for offer in offers:
+        is_fba = offer.get("IsFulfilledByAmazon", False)
+        prime_info = offer.get("PrimeInformation", {})
+        is_prime = prime_info.get("IsPrime", False)
+
+        if is_fba and is_prime:
+            listing_price = offer.get("ListingPrice", {})
+            price = listing_price.get("Amount")
+            currency = listing_price.get("CurrencyCode", "USD")
+
+            if price and price > 0:
+                # Validar fast fulfillment
+                is_valid, reason = validate_fast_fulfillment(offer, asin)
+                if not is_valid:
+                    # No rechazar, solo skip esta oferta y continuar
+                    continue
+
+                # Obtener datos de ShippingTime y ShipsFrom para logging
+                shipping_time = offer.get("ShippingTime", {})
+                ships_from = offer.get("ShipsFrom", {})
+
+                # Oferta válida - agregarla
+                valid_offers.append({
+                    "price": float(price),
+                    "currency": currency,
+                    "is_prime": True,
+                    "is_fba": True,
+                    "in_stock": True,
+                    "is_buybox_winner": offer.get("IsBuyBoxWinner", False),
+                    "fulfillment_validation": reason,
+                    "availability_type": shipping_time.get("availabilityType"),
+                    "maximum_hours": shipping_time.get("maximumHours"),
+                    "available_date": shipping_time.get("availableDate"),
+                    "ships_from_state": ships_from.get("State"),
+                    "ships_from_country": ships_from.get("Country")
+                })
+
+    # Elegir la MÁS BARATA de las ofertas válidas
+    if valid_offers:
+        return min(valid_offers, key=lambda x: x['price'])
+    return None
+
+
+def _post_item_offers_batch(asins: List[str]) -> requests.Response:
+    # El token de cuota ya lo tomó el scheduler (acquire=False)
+    return get_spapi_client().request(
+        "getItemOffersBatch", "POST", "/batches/products/pricing/v0/itemOffers",
+        json_body=_build_item_offers_body(asins), timeout=30, acquire=False
+    )
+
+
 def get_prime_offers_batch_optimized(asins: List[str], batch_size: int = 20, show_progress: bool = True) -> Dict[str, Optional[Dict]]:
     """
     Obtiene ofertas Prime para múltiples ASINs usando el endpoint BATCH de Amazon SP-API.
 
     OPTIMIZACIÓN: Procesa hasta 20 ASINs por request (vs 1 ASIN individual).
-    Resultado: 4x más rápido que get_prime_offers_batch().
+    Los batches se despachan al ritmo de la cuota de getItemOffersBatch (token bucket del
+    cliente SP-API, compartido entre procesos), con varios en vuelo a la vez; la cuota se
+    ajusta con el header x-amzn-RateLimit-Limit y solo se reintentan los ASINs que fallaron (429/5xx).
 
     Args:
         asins: Lista de ASINs
@@ -382,74 +459,76 @@ def get_prime_offers_batch_optimized(asins: List[str], batch_size: int = 20, sho
 
     results = {}
     total_batches = (len(asins) + batch_size - 1) // batch_size
+    max_retries = 3
 
-    if show_progress:
-        print(f"📊 Obteniendo precios Prime de {len(asins)} ASINs usando BATCH (batches de {batch_size})", flush=True)
-
-    # Procesar en batches
-    for batch_num in range(total_batches):
-        start_idx = batch_num * batch_size
-        end_idx = min(start_idx + batch_size, len(asins))
-        batch_asins = asins[start_idx:end_idx]
+    budget = get_spapi_client().budget("getItemOffersBatch")
 
+    if show_progress:
+        print(f"📊 Obteniendo precios Prime de {len(asins)} ASINs usando BATCH (batches de {batch_size}, "
+              f"cuota {budget.rate} req/s, hasta {PRICING_MAX_IN_FLIGHT} en vuelo)", flush=True)
+
+    attempts = {asin: 0 for asin in asins}
+    pending = deque(asins[i:i + batch_size] for i in range(0, len(asins), batch_size))
+    retry_asins: List[str] = []
+    in_flight = {}
+    sent = 0
+
+    def retry_or_fail(failed: List[str], reason: str):
+        """Re-encola los ASINs que fallaron (se reagrupan en batches nuevos) o los da por perdidos"""
+        gave_up = 0
+        for asin in failed:
+            attempts[asin] += 1
+            if attempts[asin] < max_retries:
+                retry_asins.append(asin)
+            else:
+                results[asin] = None
+                gave_up += 1
         if show_progress:
-            print(f"   Batch {batch_num + 1}/{total_batches}: Procesando {len(batch_asins)} ASINs...", flush=True)
-
-        # Preparar batch request
-        url = f"{SPAPI_BASE}/batches/products/pricing/v0/itemOffers"
-        token = get_amazon_access_token()
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "x-amz-access-token": token,
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-
-        # Crear array de requests
-        requests_array = []
-        buyer_zipcode = os.getenv("BUYER_ZIPCODE")
-
-        for asin in batch_asins:
-            request_params = {
-                "uri": f"/products/pricing/v0/items/{asin}/offers",
-                "method": "GET",
-                "MarketplaceId": MARKETPLACE_ID,
-                "ItemCondition": "New",
-                "CustomerType": "Consumer"  # Consumer (Prime personal) vs Business (Business Prime)
-            }
-
-            # Agregar zipcode si está configurado (para obtener disponibilidad precisa)
-            if buyer_zipcode:
-                request_params["deliveryPostalCode"] = buyer_zipcode
-
-            requests_array.append(request_params)
-
-        body = {"requests": requests_array}
-
-        # Hacer batch request con retry en caso de rate limit
-        max_retries = 3
-        retry_delay = 15  # Esperar 15s antes de reintentar
-
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(url, headers=headers, json=body, timeout=30)
+            print(f"   ⏱️ {reason}: {len(failed) - gave_up} ASINs a reintentar"
+                  + (f", {gave_up} agotaron {max_retries} intentos" if gave_up else ""), flush=True)
+
+    with ThreadPoolExecutor(max_workers=PRICING_MAX_IN_FLIGHT) as executor:
+        while pending or retry_asins or in_flight:
+            # Reintentos: solo los ASINs fallidos, reagrupados (1 request por hasta 20)
+            if not pending and retry_asins:
+                pending.extend(retry_asins[i:i + batch_size] for i in range(0, len(retry_asins), batch_size))
+                retry_asins = []
+
+            # Despachar mientras haya cuota (sin bloquear si ya hay requests en vuelo)
+            while pending and len(in_flight) < PRICING_MAX_IN_FLIGHT:
+                if not budget.acquire(timeout=None if not in_flight else 0):
+                    break
+                batch_asins = pending.popleft()
+                sent += 1
+                if show_progress:
+                    label = f"{sent}/{total_batches}" if sent <= total_batches else f"reintento {sent - total_batches}"
+                    print(f"   Batch {label}: Procesando {len(batch_asins)} ASINs...", flush=True)
+                in_flight[executor.submit(_post_item_offers_batch, batch_asins)] = batch_asins
+
+            if not in_flight:
+                continue
+            # Con batches pendientes, volver a pedir cuota cuando se repone un token
+            poll = min(1.0, 1.0 / budget.rate) if pending else 1.0
+            done, _ = wait(in_flight, timeout=poll, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                batch_asins = in_flight.pop(future)
+                try:
+                    response = future.result()
+                except requests.exceptions.Timeout:
+                    retry_or_fail(batch_asins, "Timeout en batch")
+                    continue
+                except Exception as e:
+                    retry_or_fail(batch_asins, f"Error en batch ({str(e)[:60]})")
+                    continue
 
-                # Si es rate limit, esperar y reintentar
+                # Rate limit del batch entero (el cliente ya pausó la cuota global): reintentar el batch
                 if response.status_code == 429:
-                    if attempt < max_retries - 1:
-                        wait_time = retry_delay * (attempt + 1)  # 15s, 30s, 45s
-                        print(f"   ⏱️ Rate limit (429) en batch {batch_num + 1}, esperando {wait_time}s antes de reintentar...", flush=True)
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        print(f"   ❌ Rate limit persistente después de {max_retries} intentos", flush=True)
-                        for asin in batch_asins:
-                            results[asin] = None
-                        break
+                    retry_or_fail(batch_asins, "Rate limit (429) en batch")
+                    continue
 
                 if response.status_code != 200:
-                    print(f"   ❌ Error batch {batch_num + 1}: Status {response.status_code}", flush=True)
+                    print(f"   ❌ Error batch: Status {response.status_code}", flush=True)
                     try:
                         error_msg = response.json()
                         print(f"      Error: {error_msg}", flush=True)
@@ -458,112 +537,44 @@ def get_prime_offers_batch_optimized(asins: List[str], batch_size: int = 20, sho
                     # Marcar todos los ASINs del batch como None
                     for asin in batch_asins:
                         results[asin] = None
-                    break
+                    continue
 
                 # ✅ Request exitoso
-                data = response.json()
+                try:
+                    data = response.json()
+                except ValueError:
+                    retry_or_fail(batch_asins, "Respuesta inválida en batch")
+                    continue
 
                 if "responses" not in data:
-                    print(f"   ⚠️ Respuesta sin 'responses' en batch {batch_num + 1}", flush=True)
+                    print(f"   ⚠️ Respuesta sin 'responses' en batch", flush=True)
                     for asin in batch_asins:
                         results[asin] = None
-                    break
+                    continue
 
-                # Procesar cada respuesta
+                # Procesar cada respuesta (429/5xx individuales → solo esos ASINs se reintentan)
+                failed = []
                 for i, resp in enumerate(data["responses"]):
                     asin = batch_asins[i]
 
-                    # Verificar status
                     status = resp.get("status", {}).get("statusCode")
-                    if status != 200:
-                        results[asin] = None
+                    if status == 429 or (status or 0) >= 500:
+                        failed.append(asin)
                         continue
-
-                    # Parsear body
-                    body_data = resp.get("body", {})
-                    payload = body_data.get("payload", {})
-                    offers = payload.get("Offers", [])
-
-                    if not offers:
+                    if status != 200:
                         results[asin] = None
                         continue
 
-                    # Recolectar TODAS las ofertas Prime + FBA válidas y elegir la más barata
-                    valid_offers = []
-
-                    for offer in offers:
-                        is_fba = offer.get("IsFulfilledByAmazon", False)
-                        prime_info = offer.get("PrimeInformation", {})
-                        is_prime = prime_info.get("IsPrime", False)
-
-                        if is_fba and is_prime:
-                            listing_price = offer.get("ListingPrice", {})
-                            price = listing_price.get("Amount")
-                            currency = listing_price.get("CurrencyCode", "USD")
-
-                            if price and price > 0:
-                                # Validar fast fulfillment
-                                is_valid, reason = validate_fast_fulfillment(offer, asin)
-                                if not is_valid:
-                                    # No rechazar, solo skip esta oferta y continuar
-                                    continue
-
-                                # Obtener datos de ShippingTime y ShipsFrom para logging
-                                shipping_time = offer.get("ShippingTime", {})
-                                ships_from = offer.get("ShipsFrom", {})
-
-                                # Oferta válida - agregarla
-                                valid_offers.append({
-                                    "price": float(price),
-                                    "currency": currency,
-                                    "is_prime": True,
-                                    "is_fba": True,
-                                    "in_stock": True,
-                                    "is_buybox_winner": offer.get("IsBuyBoxWinner", False),
-                                    "fulfillment_validation": reason,
-                                    "availability_type": shipping_time.get("availabilityType"),
-                                    "maximum_hours": shipping_time.get("maximumHours"),
-                                    "available_date": shipping_time.get("availableDate"),
-                                    "ships_from_state": ships_from.get("State"),
-                                    "ships_from_country": ships_from.get("Country")
-                                })
-
-                    # Elegir la MÁS BARATA de las ofertas válidas
-                    if valid_offers:
-                        results[asin] = min(valid_offers, key=lambda x: x['price'])
-                    else:
-                        results[asin] = None
-
-                # Salir del retry loop si todo fue exitoso
-                break
-
-            except requests.exceptions.Timeout:
-                print(f"   ⏱️ Timeout en batch {batch_num + 1}, intento {attempt + 1}/{max_retries}", flush=True)
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    for asin in batch_asins:
-                        results[asin] = None
-
-            except Exception as e:
-                print(f"   ❌ Error en batch {batch_num + 1}: {e}", flush=True)
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    for asin in batch_asins:
-                        results[asin] = None
+                    payload = resp.get("body", {}).get("payload", {})
+                    results[asin] = _parse_prime_offer(asin, payload)
 
-        # Rate limit: Amazon recomienda 0.1 req/s = 10s entre batches
-        # Aumentamos a 15s para tener margen y evitar 429
-        if batch_num < total_batches - 1:
-            time.sleep(15)  # 15s entre batches para evitar rate limits
+                if failed:
+                    retry_or_fail(failed, "ASINs con 429/5xx dentro del batch")
 
     # Resumen
     if show_progress:
         prime_count = sum(1 for v in results.values() if v is not None)
-        print(f"   ✅ {prime_count}/{len(asins)} ASINs con Prime", flush=True)
+        print(f"   ✅ {prime_count}/{len(asins)} ASINs con Prime ({sent} requests)", flush=True)
 
     return results
 
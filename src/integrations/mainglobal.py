@@ -17,6 +17,12 @@ from dotenv import load_dotenv
 import os, sys, json, glob, time, requests, re
 from typing import Tuple, Dict, Any, List
 
+try:
+    from src.utils.publish_fix_engine import get_fix_engine
+except ModuleNotFoundError:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from utils.publish_fix_engine import get_fix_engine
+
 # ============ Inicialización ============
 if sys.prefix == sys.base_prefix:
     vpy = os.path.join(os.path.dirname(__file__), "venv", "bin", "python")
@@ -680,49 +686,6 @@ def compute_net_proceeds_from_amazon(amazon_json) -> Tuple[float, float, float]:
     return base, mk, net
 
 # ============ Dimensiones del paquete ============
-def extract_dimensions(amazon_json):
-    """Lee directamente las medidas del paquete desde item_package_dimensions."""
-    try:
-        pkg = amazon_json.get("attributes", {})
-        dims = pkg.get("item_package_dimensions", [{}])[0]
-        weight = pkg.get("item_package_weight", [{}])[0]
-        L = dims.get("length", {}).get("value")
-        W = dims.get("width", {}).get("value")
-        H = dims.get("height", {}).get("value")
-        KG = weight.get("value")
-        if all([L, W, H, KG]):
-            qprint(f"📦 Dimensiones del paquete directas: {round(L,2)}×{round(W,2)}×{round(H,2)} cm – {round(KG,3)} kg")
-            return round(L, 2), round(W, 2), round(H, 2), round(KG, 3)
-    except Exception as e:
-        print(f"⚠️ Error leyendo item_package_dimensions: {e}")
-
-    # Fallback: búsqueda recursiva
-    values = {}
-    def walk(o, p=""):
-        if isinstance(o, dict):
-            for k, v in o.items():
-                walk(v, f"{p}.{k}" if p else k)
-        elif isinstance(o, list):
-            for i, v in enumerate(o):
-                walk(v, f"{p}[{i}]")
-        else:
-            k = p.lower()
-            if any(x in k for x in ["length", "width", "height", "depth", "weight"]):
-                try:
-                    num = float(re.findall(r"[-+]?\d*\.\d+|\d+", str(o))[0])
-                    values[k] = num
-                except:
-                    pass
-    walk(amazon_json)
-    l = next((v for k, v in values.items() if "length" in k), None)
-    w = next((v for k, v in values.items() if "width" in k), None)
-    h = next((v for k, v in values.items() if "height" in k), None)
-    kg = next((v for k, v in values.items() if "weight" in k), None)
-    if all([l, w, h, kg]):
-        print(f"📏 Dimensiones detectadas por búsqueda: {l}×{w}×{h} cm – {kg} kg")
-        return round(l, 2), round(w, 2), round(h, 2), round(kg, 3)
-    return None, None, None, None
-
 def get_package_dimensions_ai(amazon_json):
     """Usa GPT-4o para detectar medidas del paquete si no existen."""
     if not OPENAI_API_KEY:
@@ -1710,6 +1673,8 @@ Devuelve SOLO un array JSON con los atributos rellenados.
     max_retries = 2
     item_id = None  # Inicializar antes del loop
     res = None  # Inicializar antes del loop
+    fix_engine = get_fix_engine()
+    applied_fixes = []  # Fixes aplicados antes del intento actual (para memoria de fixes)
     for retry_attempt in range(max_retries):
         try:
             res = http_post(f"{API}/global/items", body)
@@ -1821,6 +1786,11 @@ Devuelve SOLO un array JSON con los atributos rellenados.
         except RuntimeError as e:
             error_text = str(e)
 
+            # Los fixes del intento anterior no alcanzaron (si su error se repite) → registrarlo en memoria
+            if applied_fixes:
+                fix_engine.record_outcome(cid, applied_fixes, success=False, error_text=error_text)
+                applied_fixes = []
+
             # Si es el último intento, re-raise el error
             if retry_attempt >= max_retries - 1:
                 raise
@@ -1832,16 +1802,27 @@ Devuelve SOLO un array JSON con los atributos rellenados.
                 # No hay campos faltantes detectables, re-raise error
                 raise
 
-            # Intentar extraer campos faltantes con IA
-            qprint(f"🤖 Reintento {retry_attempt + 1}/{max_retries}: Extrayendo campos faltantes con IA...")
+            # 1) Fixes deterministas/aprendidos (equivalencias y valores que ya funcionaron) → sin IA
+            extracted_values, pending_ids, applied_fixes = fix_engine.resolve_missing_attributes(
+                cid, missing_field_ids, amazon_json
+            )
+            if extracted_values:
+                qprint(f"♻️ {len(extracted_values)} campos resueltos desde memoria de fixes (sin IA)")
 
-            # Crear lista de "campos requeridos" ficticios para ai_extract_missing_fields
-            fake_required_fields = [
-                {"id": field_id, "name": field_id.replace("_", " ").title(), "value_type": "string"}
-                for field_id in missing_field_ids
-            ]
+            # 2) IA solo para los campos nunca vistos
+            if pending_ids:
+                qprint(f"🤖 Reintento {retry_attempt + 1}/{max_retries}: Extrayendo campos faltantes con IA...")
 
-            extracted_values = ai_extract_missing_fields(asin, amazon_json, fake_required_fields)
+                # Crear lista de "campos requeridos" ficticios para ai_extract_missing_fields
+                fake_required_fields = [
+                    {"id": field_id, "name": field_id.replace("_", " ").title(), "value_type": "string"}
+                    for field_id in pending_ids
+                ]
+
+                ai_values = ai_extract_missing_fields(asin, amazon_json, fake_required_fields)
+                ai_values = {k: v for k, v in (ai_values or {}).items() if k in pending_ids and v}
+                applied_fixes += fix_engine.learn_from_ai(cid, ai_values, amazon_json)
+                extracted_values.update(ai_values)
 
             if not extracted_values:
                 print("⚠️ IA no pudo extraer los campos faltantes")
@@ -1860,6 +1841,10 @@ Devuelve SOLO un array JSON con los atributos rellenados.
             qprint("🔄 Reintentando publicación con campos agregados...")
             continue  # Volver al inicio del loop para reintentar
 
+    # El intento con fixes llegó a publicarse → los fixes funcionaron
+    if applied_fixes and item_id:
+        fix_engine.record_outcome(cid, applied_fixes, success=True)
+
     # Guardar en la base de datos para sincronización
     disable_db_save = os.getenv("DISABLE_DB_SAVE", "false").lower() == "true"
 
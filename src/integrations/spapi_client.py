@@ -0,0 +1,280 @@
+# ============================================================
+# spapi_client.py
+# ✅ Cliente SP-API compartido: sesión HTTP con pool de conexiones (keep-alive)
+# ✅ Cuota POR OPERACIÓN respetada entre TODOS los procesos (token bucket en SQLite)
+# ✅ Ritmo ajustado con x-amzn-RateLimit-Limit; un 429 pausa esa operación en todos los procesos
+# ✅ Uso de cuota por operación (requests, 429, espera) → utilization()
+# ✅ Token LWA: caché en memoria + archivo; una sola renovación entre procesos (flock)
+# ============================================================
+
+import os
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: sin lock entre procesos (cada uno renueva por su cuenta)
+
+try:
+    from src.utils.request_budget import RequestBudget
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.request_budget import RequestBudget
+
+load_dotenv()
+
+SPAPI_BASE = "https://sellingpartnerapi-na.amazon.com"
+MARKETPLACE_ID = "ATVPDKIKX0DER"  # US marketplace
+TOKEN_CACHE_FILE = Path("cache/amazon_token.json")
+TOKEN_LIFETIME = 3300  # 55 minutos (Amazon tokens duran 1 hora)
+
+# Cuotas documentadas por operación: (requests/segundo, ráfaga).
+# Se ajustan solas con el header x-amzn-RateLimit-Limit de cada respuesta.
+SPAPI_QUOTAS = {
+    "searchCatalogItems": (2.0, 2),
+    "getCatalogItem": (2.0, 2),
+    "getItemOffers": (0.5, 1),
+    "getItemOffersBatch": (float(os.getenv("SPAPI_ITEM_OFFERS_BATCH_RATE", "0.1")),
+                           int(os.getenv("SPAPI_ITEM_OFFERS_BATCH_BURST", "1"))),
+}
+DEFAULT_QUOTA = (1.0, 1)
+SPAPI_POOL_SIZE = int(os.getenv("SPAPI_POOL_SIZE", "10"))
+THROTTLE_PENALTY_SECONDS = 10  # Pausa global de la operación ante un 429
+
+# -------------------------------------------------------------
+# 🔑 Access token (LWA) con caché en memoria + archivo
+# -------------------------------------------------------------
+
+_token = {"access_token": None, "timestamp": 0.0}
+_token_lock = threading.Lock()
+
+
+def _read_token_file() -> Optional[dict]:
+    try:
+        with open(TOKEN_CACHE_FILE, 'r') as f:
+            cached = json.load(f)
+        if time.time() - cached.get('timestamp', 0) < TOKEN_LIFETIME and cached.get('access_token'):
+            return cached
+    except (OSError, json.JSONDecodeError):
+        pass  # Sin caché o corrupto → generar nuevo token
+    return None
+
+
+def _request_new_token() -> dict:
+    client_id = os.getenv("LWA_CLIENT_ID") or os.getenv("AMZ_CLIENT_ID")
+    client_secret = os.getenv("LWA_CLIENT_SECRET") or os.getenv("AMZ_CLIENT_SECRET")
+    refresh_token = os.getenv("REFRESH_TOKEN") or os.getenv("AMZ_REFRESH_TOKEN")
+
+    if not all([client_id, client_secret, refresh_token]):
+        raise RuntimeError(
+            "❌ Faltan credenciales de Amazon SP-API en .env:\n"
+            "   - LWA_CLIENT_ID (o AMZ_CLIENT_ID)\n"
+            "   - LWA_CLIENT_SECRET (o AMZ_CLIENT_SECRET)\n"
+            "   - REFRESH_TOKEN (o AMZ_REFRESH_TOKEN)"
+        )
+
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+        "client_id": client_id,
+        "client_secret": client_secret,
+    }
+
+    quiet_mode = os.getenv('PIPELINE_QUIET_MODE') == '1'
+    try:
+        if not quiet_mode:
+            print("🔐 Generando nuevo access token de Amazon...")
+
+        r = requests.post("https://api.amazon.com/auth/o2/token", data=data, timeout=15)
+        r.raise_for_status()
+        cached = {'access_token': r.json()["access_token"], 'timestamp': time.time()}
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"❌ Error obteniendo access token de Amazon: {e}")
+
+    # Escritura atómica: otros procesos nunca leen un JSON a medias
+    TOKEN_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = TOKEN_CACHE_FILE.with_suffix(f".tmp{os.getpid()}")
+    with open(tmp, 'w') as f:
+        json.dump(cached, f)
+    os.replace(tmp, TOKEN_CACHE_FILE)
+
+    if not quiet_mode:
+        print("✅ Token generado y cacheado (válido por 55 min)")
+    return cached
+
+
+def get_amazon_access_token():
+    """
+    Obtiene un access token de Amazon usando LWA (Login with Amazon).
+    Sistema de caché inteligente:
+    - Token en memoria del proceso (sin tocar disco en cada request)
+    - Si no, token cacheado en archivo (< 55 min), compartido entre procesos
+    - Si expiró, UN solo proceso lo renueva (lock); el resto reusa el nuevo
+    """
+    if time.time() - _token["timestamp"] < TOKEN_LIFETIME and _token["access_token"]:
+        return _token["access_token"]
+
+    with _token_lock:
+        if time.time() - _token["timestamp"] < TOKEN_LIFETIME and _token["access_token"]:
+            return _token["access_token"]
+
+        cached = _read_token_file()
+        if cached is None:
+            TOKEN_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(TOKEN_CACHE_FILE.with_suffix(".lock"), 'w') as lock:
+                if fcntl:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    # Otro proceso pudo renovarlo mientras esperábamos el lock
+                    cached = _read_token_file() or _request_new_token()
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+        elif os.getenv('PIPELINE_QUIET_MODE') != '1':
+            mins_left = int((TOKEN_LIFETIME - (time.time() - cached['timestamp'])) / 60)
+            print(f"♻️ Usando token cacheado de Amazon (válido por {mins_left} min más)")
+
+        _token.update(cached)
+        return cached['access_token']
+
+
+# -------------------------------------------------------------
+# 🚦 Cliente con cuota por operación
+# -------------------------------------------------------------
+
+class SPAPIClient:
+    """
+    Todas las llamadas SP-API pasan por acá:
+
+        client = get_spapi_client()
+        r = client.request("getCatalogItem", "GET", f"/catalog/2022-04-01/items/{asin}", params=...)
+
+    - Espera turno en el token bucket de la operación (compartido entre procesos)
+    - Reusa conexiones (pool HTTP)
+    - Ajusta la cuota con x-amzn-RateLimit-Limit y penaliza ante 429
+    """
+
+    def __init__(self, pool_size: int = SPAPI_POOL_SIZE):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self._budgets: Dict[str, RequestBudget] = {}
+        self._stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def budget(self, operation: str) -> RequestBudget:
+        """Token bucket de la operación (mismo nombre en todos los procesos)"""
+        budget = self._budgets.get(operation)
+        if budget is None:
+            with self._lock:
+                budget = self._budgets.get(operation)
+                if budget is None:
+                    rate, burst = SPAPI_QUOTAS.get(operation, DEFAULT_QUOTA)
+                    budget = self._budgets[operation] = RequestBudget(f"sp_api_{operation}", rate=rate, burst=burst)
+                    self._stats[operation] = {"requests": 0, "throttled": 0, "errors": 0, "wait_seconds": 0.0}
+        return budget
+
+    def request(self, operation: str, method: str, path: str, params: dict = None, json_body: dict = None,
+                timeout: float = 30, acquire: bool = True) -> requests.Response:
+        """
+        Request SP-API con cuota. `acquire=False` si el llamador ya tomó el token
+        (ej: un scheduler que despacha varios batches en paralelo).
+        """
+        budget = self.budget(operation)
+        waited = 0.0
+        if acquire:
+            start = time.time()
+            budget.acquire()
+            waited = time.time() - start
+
+        token = get_amazon_access_token()
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "x-amz-access-token": token,
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        try:
+            response = self.session.request(method, f"{SPAPI_BASE}{path}", headers=headers, params=params,
+                                            json=json_body, timeout=timeout)
+        except requests.exceptions.RequestException:
+            self._record(operation, waited, error=True)
+            raise
+
+        self._observe(operation, budget, response)
+        self._record(operation, waited, throttled=response.status_code == 429)
+        return response
+
+    def _observe(self, operation: str, budget: RequestBudget, response: requests.Response):
+        """Cuota real de la cuenta (header, persistida para todos los procesos) y pausa global ante 429"""
+        try:
+            limit = float(response.headers.get("x-amzn-RateLimit-Limit", ""))
+        except (TypeError, ValueError):
+            limit = None
+        if limit and limit > 0 and abs(limit - budget.rate) > 1e-9:
+            if os.getenv('PIPELINE_QUIET_MODE') != '1':
+                print(f"🚦 Cuota SP-API {operation}: {budget.rate} → {limit} req/s")
+            budget.set_rate(limit)
+        if response.status_code == 429:
+            budget.penalize(THROTTLE_PENALTY_SECONDS)
+
+    def _record(self, operation: str, waited: float, throttled: bool = False, error: bool = False):
+        with self._lock:
+            stats = self._stats[operation]
+            stats["requests"] += 1
+            stats["wait_seconds"] += waited
+            stats["throttled"] += int(throttled)
+            stats["errors"] += int(error)
+
+    def utilization(self) -> Dict[str, dict]:
+        """
+        Uso de cuota por operación de ESTE proceso (requests/s vs cuota) + estado global del bucket.
+        """
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        out = {}
+        for operation, budget in list(self._budgets.items()):
+            stats = dict(self._stats[operation])
+            rate = stats["requests"] / elapsed
+            stats.update({
+                "rate_limit": budget.rate,
+                "observed_rate": round(rate, 3),
+                "utilization_pct": round(100 * rate / budget.rate, 1) if budget.rate else 0.0,
+                "wait_seconds": round(stats["wait_seconds"], 1),
+                "global": budget.stats(),
+            })
+            out[operation] = stats
+        return out
+
+    def print_utilization(self):
+        usage = self.utilization()
+        if not usage:
+            return
+        print("🚦 Uso de cuota SP-API (este proceso):")
+        for operation, stats in usage.items():
+            print(f"   {operation}: {stats['requests']} requests | {stats['observed_rate']}/{stats['rate_limit']} req/s "
+                  f"({stats['utilization_pct']}%) | 429: {stats['throttled']} | espera: {stats['wait_seconds']}s | "
+                  f"global: {stats['global']['granted']} otorgados")
+
+
+_client: Optional[SPAPIClient] = None
+_client_lock = threading.Lock()
+
+
+def get_spapi_client() -> SPAPIClient:
+    """Cliente único por proceso (comparte pool de conexiones y buckets)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SPAPIClient()
+    return _client
@@ -8,8 +8,15 @@ import requests
 from openai import OpenAI
 from typing import Dict, List, Optional
 import os
+import sys
 from dotenv import load_dotenv
 
+try:
+    from src.utils.image_store import get_image_store
+except ModuleNotFoundError:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from utils.image_store import get_image_store
+
 load_dotenv(override=True)
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -52,21 +59,23 @@ def validate_images_with_ai(images: List[Dict], product_title: str, category_nam
             "recommendations": ["Ensure all images have valid URLs"]
         }
 
-    # Verificar que la URL sea accesible
-    try:
-        resp = requests.head(image_url, timeout=5)
-        if resp.status_code != 200:
+    # Verificar que la URL sea accesible: si otro componente ya la descargó al image store
+    # no hay request; si no, un HEAD (la imagen la baja OpenAI, no hace falta el GET)
+    if get_image_store().peek(image_url) is None:
+        try:
+            resp = requests.head(image_url, timeout=5)
+            if resp.status_code != 200:
+                return {
+                    "valid": False,
+                    "issues": [f"Main image URL not accessible (status {resp.status_code})"],
+                    "recommendations": ["Use publicly accessible image URLs"]
+                }
+        except Exception as e:
             return {
                 "valid": False,
-                "issues": [f"Main image URL not accessible (status {resp.status_code})"],
-                "recommendations": ["Use publicly accessible image URLs"]
+                "issues": [f"Cannot access main image: {str(e)}"],
+                "recommendations": ["Verify image URL is publicly accessible"]
             }
-    except Exception as e:
-        return {
-            "valid": False,
-            "issues": [f"Cannot access main image: {str(e)}"],
-            "recommendations": ["Verify image URL is publicly accessible"]
-        }
 
     # Usar GPT-4o Vision para validar la imagen
     prompt = f"""You are an e-commerce image quality validator for MercadoLibre listings.
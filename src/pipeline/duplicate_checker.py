@@ -4,24 +4,132 @@
 # ✅ Sistema de detección de duplicados antes de procesar
 # ✅ Verifica por ASIN y por GTIN/UPC para evitar reprocesar
 # ✅ Filtra marcas prohibidas automáticamente
+# ✅ Batch: miles de ASINs/GTINs en una pasada (join indexado por asin y gtin_normalized)
+# ✅ Hot path del publish: búsquedas puntuales indexadas sobre una conexión por proceso
+#    (sin recargar la tabla de listings en cada commit)
 # ============================================================
 
+import os
 import sys
 import json
+import sqlite3
+import threading
 from pathlib import Path
 
 # Agregar scripts/tools al path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'scripts' / 'tools'))
-from save_listing_data import check_asin_exists, check_gtin_exists, init_database
+import save_listing_data
+from save_listing_data import find_published_asins, find_published_gtins, init_database, normalize_gtin
 
 # Agregar src al path para imports locales
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from filters.brand_filter import is_brand_blocked
 
 
+def _duplicate_result(reason: str = None, existing_asin: str = None, info: dict = None) -> dict:
+    info = info or {}
+    return {
+        'is_duplicate': reason is not None,
+        'reason': reason,
+        'existing_asin': existing_asin,
+        'existing_item_id': info.get('item_id'),
+        'existing_title': info.get('title'),
+        'date_published': info.get('date_published')
+    }
+
+
+def _print_duplicate(asin: str, gtin: str, result: dict):
+    title = (result['existing_title'] or '')[:60]
+    if result['reason'] == 'asin':
+        print(f"⚠️  ASIN {asin} ya publicado:")
+        print(f"   Item ID: {result['existing_item_id']}")
+        print(f"   Título: {title}...")
+        print(f"   Fecha: {result['date_published']}")
+    else:
+        print(f"⚠️  Producto con GTIN {gtin} ya publicado (ASIN diferente):")
+        print(f"   ASIN existente: {result['existing_asin']}")
+        print(f"   ASIN nuevo: {asin}")
+        print(f"   Item ID: {result['existing_item_id']}")
+        print(f"   Título: {title}...")
+        print(f"   → Es el mismo producto físico, ASIN diferente (variante/distribuidor)")
+
+
+class PublishedIndex:
+    """
+    Chequeo de ASIN/GTIN publicados para el hot path del publish:
+
+        index = get_published_index()
+        index.lookup("B0XXXXXXX", gtin="0123456789012")   # mismo dict que check_product_duplicate
+
+    No copia la tabla a memoria: cada lookup son una o dos búsquedas puntuales por
+    idx_asin / idx_gtin_normalized sobre una conexión propia (abierta una vez por proceso).
+    gtin_normalized se completa solo cuando la BD cambió (PRAGMA data_version: cambia
+    cuando cualquier otra conexión/proceso hace commit).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._version = None
+
+    def _refresh(self):
+        if self._conn is None or self._pid != os.getpid():
+            init_database()
+            self._conn = sqlite3.connect(save_listing_data.DB_PATH, check_same_thread=False)
+            self._pid = os.getpid()
+            self._version = None
+
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            # Filas de otros scripts (rebuild, sync) o con gtin cambiado: normalizar antes de buscar
+            save_listing_data.backfill_gtin_normalized(self._conn)
+            self._version = version
+
+    def _first(self, column: str, value: str):
+        return self._conn.execute(
+            f"SELECT asin, item_id, title, date_published FROM listings WHERE {column} = ? ORDER BY id LIMIT 1",
+            (value,)
+        ).fetchone()
+
+    def lookup(self, asin: str, gtin: str = None) -> dict:
+        asin = asin.strip().upper()
+        gtin_normalized = normalize_gtin(gtin) if gtin else None
+        with self._lock:
+            self._refresh()
+            row = self._first("asin", asin)
+            reason = 'asin' if row else None
+            if not row and gtin_normalized:
+                row = self._first("gtin_normalized", gtin_normalized)
+                reason = 'gtin' if row else None
+
+        if not row:
+            return _duplicate_result()
+        existing_asin, item_id, title, date_published = row
+        info = {'item_id': item_id, 'title': title, 'date_published': date_published}
+        return _duplicate_result(reason, existing_asin, info)
+
+    def is_published(self, asin: str) -> bool:
+        return self.lookup(asin)['is_duplicate']
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_published_index() -> PublishedIndex:
+    """Índice único por proceso"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PublishedIndex()
+    return _index
+
+
 def check_product_duplicate(asin: str, gtin: str = None, verbose: bool = True) -> dict:
     """
-    Verifica si un producto ya fue publicado, usando ASIN y GTIN.
+    Verifica si un producto ya fue publicado, usando ASIN y GTIN (búsquedas indexadas).
 
     Args:
         asin: ASIN del producto
@@ -38,58 +146,41 @@ def check_product_duplicate(asin: str, gtin: str = None, verbose: bool = True) -
             'date_published': str o None
         }
     """
+    result = get_published_index().lookup(asin, gtin)
+    if verbose and result['is_duplicate']:
+        _print_duplicate(asin.strip().upper(), gtin, result)
+    return result
 
-    # Inicializar BD si no existe
-    init_database()
 
-    # 1. Verificar por ASIN (mismo producto exacto)
-    asin_check = check_asin_exists(asin)
-    if asin_check['exists']:
-        if verbose:
-            print(f"⚠️  ASIN {asin} ya publicado:")
-            print(f"   Item ID: {asin_check['item_id']}")
-            print(f"   Título: {asin_check['title'][:60]}...")
-            print(f"   Fecha: {asin_check['date_published']}")
+def check_products_duplicates(asins: list, gtins: dict = None) -> dict:
+    """
+    check_product_duplicate para muchos productos en una pasada contra la BD:
+    una query por ASIN y otra por GTIN normalizado (joins indexados).
 
-        return {
-            'is_duplicate': True,
-            'reason': 'asin',
-            'existing_asin': asin,
-            'existing_item_id': asin_check['item_id'],
-            'existing_title': asin_check['title'],
-            'date_published': asin_check['date_published']
-        }
+    Args:
+        asins: Lista de ASINs
+        gtins: {asin: gtin} opcional (los ASINs sin GTIN solo se verifican por ASIN)
 
-    # 2. Verificar por GTIN (mismo producto físico, diferente ASIN)
-    if gtin:
-        gtin_check = check_gtin_exists(gtin)
-        if gtin_check['exists']:
-            if verbose:
-                print(f"⚠️  Producto con GTIN {gtin} ya publicado (ASIN diferente):")
-                print(f"   ASIN existente: {gtin_check['asin']}")
-                print(f"   ASIN nuevo: {asin}")
-                print(f"   Item ID: {gtin_check['item_id']}")
-                print(f"   Título: {gtin_check['title'][:60]}...")
-                print(f"   → Es el mismo producto físico, ASIN diferente (variante/distribuidor)")
-
-            return {
-                'is_duplicate': True,
-                'reason': 'gtin',
-                'existing_asin': gtin_check['asin'],
-                'existing_item_id': gtin_check['item_id'],
-                'existing_title': gtin_check['title'],
-                'date_published': gtin_check['date_published']
-            }
+    Returns:
+        dict: {asin: resultado de check_product_duplicate}
+    """
+    asins = [a.strip().upper() for a in asins if a and a.strip()]
+    gtins = {a.strip().upper(): g for a, g in (gtins or {}).items() if g}
 
-    # No es duplicado
-    return {
-        'is_duplicate': False,
-        'reason': None,
-        'existing_asin': None,
-        'existing_item_id': None,
-        'existing_title': None,
-        'date_published': None
-    }
+    published_asins = find_published_asins(asins)
+    published_gtins = find_published_gtins(list(gtins.values()))
+
+    results = {}
+    for asin in asins:
+        if asin in published_asins:
+            results[asin] = _duplicate_result('asin', asin, published_asins[asin])
+            continue
+        gtin_info = published_gtins.get(normalize_gtin(gtins.get(asin)))
+        if gtin_info:
+            results[asin] = _duplicate_result('gtin', gtin_info['asin'], gtin_info)
+        else:
+            results[asin] = _duplicate_result()
+    return results
 
 
 def check_brand_from_mini_ml(asin: str, verbose: bool = False) -> dict:
@@ -135,13 +226,14 @@ def check_brand_from_mini_ml(asin: str, verbose: bool = False) -> dict:
         return {'is_blocked': False, 'brand': None, 'matched_brand': None}
 
 
-def filter_asins_batch(asins: list, verbose: bool = True) -> dict:
+def filter_asins_batch(asins: list, verbose: bool = True, gtins: dict = None) -> dict:
     """
-    Filtra una lista de ASINs, separando nuevos de duplicados.
+    Filtra una lista de ASINs, separando nuevos de duplicados (una pasada contra la BD).
 
     Args:
         asins: Lista de ASINs a verificar
         verbose: Si es True, imprime resumen
+        gtins: {asin: gtin} opcional para detectar también el mismo producto con otro ASIN
 
     Returns:
         dict: {
@@ -156,8 +248,6 @@ def filter_asins_batch(asins: list, verbose: bool = True) -> dict:
         }
     """
 
-    init_database()
-
     new_asins = []
     duplicate_asins = []
     dup_by_asin = 0
@@ -166,19 +256,25 @@ def filter_asins_batch(asins: list, verbose: bool = True) -> dict:
     if verbose:
         print(f"\n🔍 Verificando {len(asins)} ASINs contra la base de datos...\n")
 
+    checks = check_products_duplicates(asins, gtins)
+
     for asin in asins:
         asin = asin.strip().upper()
         if not asin:
             continue
 
-        # Por ahora solo verificamos por ASIN (GTIN lo verificaremos durante el procesamiento)
-        check = check_asin_exists(asin)
+        check = checks[asin]
 
-        if check['exists']:
+        if check['reason'] == 'asin':
             duplicate_asins.append(asin)
             dup_by_asin += 1
             if verbose:
-                print(f"⏭️  {asin}: Ya publicado → {check['item_id']}")
+                print(f"⏭️  {asin}: Ya publicado → {check['existing_item_id']}")
+        elif check['reason'] == 'gtin':
+            duplicate_asins.append(asin)
+            dup_by_gtin += 1
+            if verbose:
+                print(f"⏭️  {asin}: Mismo GTIN que {check['existing_asin']} → {check['existing_item_id']}")
         else:
             new_asins.append(asin)
             if verbose:
@@ -198,6 +294,8 @@ def filter_asins_batch(asins: list, verbose: bool = True) -> dict:
         print(f"  Total ASINs: {stats['total']}")
         print(f"  ✅ Nuevos: {stats['new']}")
         print(f"  ⏭️  Duplicados (mismo ASIN): {stats['duplicate_by_asin']}")
+        if gtins:
+            print(f"  ⏭️  Duplicados (mismo GTIN): {stats['duplicate_by_gtin']}")
         print(f"="*60 + "\n")
 
     return {
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# equivalence_store.py
+# ✅ Store único de equivalencias Amazon → ML por categoría
+#    tabla: category_id → attribute_id → source_key (ordenadas)
+# ✅ LRU en memoria por proceso (categorías más usadas)
+# ✅ "Se aprende una vez, se comparte en todos lados":
+#    lo que la IA aprendió en un producto resuelve los `missing`
+#    de todos los productos siguientes de esa categoría,
+#    también en otros publicadores corriendo en paralelo
+# ✅ Migración one-shot de schemas/*_equiv.json
+# ============================================================
+
+import os
+import glob
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Iterable
+
+try:
+    from src.utils.kv_store import get_connection, KV_DB_PATH
+except ModuleNotFoundError:
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from utils.kv_store import get_connection, KV_DB_PATH
+
+LEGACY_SCHEMAS_DIR = "schemas"
+LRU_MAX_CATEGORIES = int(os.getenv("EQUIV_LRU_SIZE", "256"))
+_MIGRATION_NAME = "category_equivalences"
+
+
+class EquivalenceStore:
+    """Equivalencias aprendidas por categoría, persistidas en SQLite y cacheadas con LRU"""
+
+    def __init__(self, db_path: str = None, legacy_dir: str = LEGACY_SCHEMAS_DIR,
+                 max_categories: int = LRU_MAX_CATEGORIES):
+        self.db_path = db_path or KV_DB_PATH
+        self.legacy_dir = legacy_dir
+        self.max_categories = max_categories
+        self._lru: "OrderedDict[str, Dict[str, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._init_schema()
+        self._migrate_legacy()
+
+    @property
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _init_schema(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS category_equivalences (
+                category_id TEXT NOT NULL,
+                attribute_id TEXT NOT NULL,
+                source_key TEXT NOT NULL,
+                position INTEGER NOT NULL DEFAULT 0,
+                learned_at REAL NOT NULL,
+                PRIMARY KEY (category_id, attribute_id, source_key)
+            ) WITHOUT ROWID
+        """)
+
+    # ---------- Lectura ----------
+    def _load_rows(self, category_id: str, attribute_ids: Iterable[str] = None) -> Dict[str, List[str]]:
+        sql = "SELECT attribute_id, source_key FROM category_equivalences WHERE category_id = ?"
+        params = [category_id]
+        if attribute_ids is not None:
+            attribute_ids = list(attribute_ids)
+            if not attribute_ids:
+                return {}
+            sql += f" AND attribute_id IN ({','.join('?' * len(attribute_ids))})"
+            params += attribute_ids
+        sql += " ORDER BY attribute_id, position, learned_at"
+
+        out: Dict[str, List[str]] = {}
+        for aid, key in self._conn.execute(sql, params):
+            out.setdefault(aid, []).append(key)
+        return out
+
+    def get_category(self, category_id: str) -> Dict[str, List[str]]:
+        """Todas las equivalencias de la categoría (LRU → SQLite)"""
+        with self._lock:
+            cached = self._lru.get(category_id)
+            if cached is not None:
+                self._lru.move_to_end(category_id)
+                return cached
+
+        equivs = self._load_rows(category_id)
+        with self._lock:
+            self._lru[category_id] = equivs
+            self._lru.move_to_end(category_id)
+            while len(self._lru) > self.max_categories:
+                self._lru.popitem(last=False)
+        return equivs
+
+    def resolve(self, category_id: str, attribute_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Equivalencias conocidas para `attribute_ids`.
+        Lo que no está en el LRU se re-consulta en SQLite (pudo aprenderlo otro proceso).
+        """
+        equivs = self.get_category(category_id)
+        unknown = [a for a in attribute_ids if a not in equivs]
+        if unknown:
+            fresh = self._load_rows(category_id, unknown)
+            if fresh:
+                with self._lock:
+                    equivs.update(fresh)
+        return {a: equivs[a] for a in attribute_ids if a in equivs}
+
+    def unknown_attributes(self, category_id: str, attribute_ids: Iterable[str]) -> List[str]:
+        """Atributos sin ninguna equivalencia aprendida en la categoría (candidatos a preguntar a la IA)"""
+        attribute_ids = list(attribute_ids)
+        known = self.resolve(category_id, attribute_ids)
+        return [a for a in attribute_ids if a not in known]
+
+    # ---------- Escritura ----------
+    def learn(self, category_id: str, mapping: Dict[str, List[str]]) -> int:
+        """
+        Agrega equivalencias (merge, nunca reemplaza las existentes).
+        Retorna cantidad de source_keys nuevos.
+        """
+        rows = []
+        now = time.time()
+        for aid, keys in (mapping or {}).items():
+            if isinstance(keys, str):
+                keys = [keys]
+            if not isinstance(keys, list):
+                continue
+            for pos, key in enumerate(keys):
+                if isinstance(key, str) and key:
+                    rows.append((category_id, aid, key, pos, now))
+        if not rows:
+            return 0
+
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO category_equivalences "
+                "(category_id, attribute_id, source_key, position, learned_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        # Refrescar solo los atributos tocados en el LRU
+        fresh = self._load_rows(category_id, {r[1] for r in rows})
+        with self._lock:
+            if category_id in self._lru:
+                self._lru[category_id].update(fresh)
+        return added
+
+    # ---------- Migración ----------
+    def _migrate_legacy(self):
+        conn = self._conn
+        done = conn.execute(
+            "SELECT 1 FROM kv_migrations WHERE namespace = ?", (_MIGRATION_NAME,)
+        ).fetchone()
+        if done:
+            return
+
+        files = sorted(glob.glob(os.path.join(self.legacy_dir, "*_equiv.json")))
+        total = 0
+        for path in files:
+            category_id = os.path.basename(path)[:-len("_equiv.json")]
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"⚠️ No se pudo leer {path}: {e}")
+                continue
+            if isinstance(data, dict):
+                total += self.learn(category_id, data)
+
+        conn.execute(
+            "INSERT OR IGNORE INTO kv_migrations (namespace, source_path, migrated_at, rows) VALUES (?, ?, ?, ?)",
+            (_MIGRATION_NAME, self.legacy_dir, time.time(), total)
+        )
+        if total:
+            print(f"📦 Equivalencias migradas desde {self.legacy_dir}: {len(files)} categorías, {total} claves")
+
+
+_store = None
+
+
+def get_equivalence_store() -> EquivalenceStore:
+    """Singleton por proceso"""
+    global _store
+    if _store is None:
+        _store = EquivalenceStore()
+    return _store
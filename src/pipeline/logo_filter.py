@@ -7,47 +7,40 @@ Sistema de detección ultra estricto de logos de marca en imágenes usando GPT-4
 Solo elimina imágenes que contengan logos GRANDES y CLAROS en el producto principal.
 Ignora: texto de compatibilidad, logos en el fondo, formas de productos sin branding.
 
+Performance:
+- Cache de análisis por URL canónica y por hash perceptual (dHash) de la imagen
+  (descargada una sola vez por el image store compartido):
+  la misma foto reutilizada en variantes / re-listados se analiza una sola vez
+- Los misses se agrupan en lotes multi-imagen (un request de visión por lote)
+  y los lotes corren en un pool acotado → ~1 round trip por producto
+
 Author: Pipeline v2.0
 Date: 2025-01-03
 """
 
 import os
+import sys
 import json
 import re
-from typing import List, Dict, Optional
-from openai import OpenAI
-
-class LogoFilter:
-    """Filtro de logos en imágenes usando GPT-4 Vision"""
-
-    def __init__(self):
-        """Inicializa el cliente OpenAI"""
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY no configurada")
-
-        self.client = OpenAI(api_key=api_key)
-        self.model = "gpt-4o"  # GPT-4 Vision
-        self.confidence_threshold = 0.75
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple
 
-    def analyze_image(self, image_url: str) -> Dict:
-        """
-        Analiza una imagen para detectar logos de marca.
+from openai import OpenAI
 
-        Args:
-            image_url: URL de la imagen a analizar
+try:
+    from src.utils.kv_store import KVStore, get_connection, KV_DB_PATH
+    from src.utils.image_store import get_image_store, canonical_image_url
+except ModuleNotFoundError:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from utils.kv_store import KVStore, get_connection, KV_DB_PATH
+    from utils.image_store import get_image_store, canonical_image_url
 
-        Returns:
-            Dict con análisis: {
-                "has_logos": bool,
-                "should_remove": bool,
-                "logos_detected": list,
-                "reasoning": str,
-                "confidence": float
-            }
-        """
+LOGO_FILTER_WORKERS = int(os.getenv("LOGO_FILTER_WORKERS", "4"))
+LOGO_FILTER_BATCH = int(os.getenv("LOGO_FILTER_BATCH", "5"))  # imágenes por request de visión
+PHASH_MAX_DISTANCE = 3  # bits distintos para considerar dos imágenes "la misma"
 
-        prompt = """Analyze this product image for trademarked brand logos.
+LOGO_PROMPT = """Analyze this product image for trademarked brand logos.
 
 ⚠️ ULTRA STRICT RULES:
 
@@ -92,6 +85,141 @@ Respond in JSON:
 
 Only recommend "remove" if should_flag=true for ANY logo with confidence >= 0.75"""
 
+LOGO_BATCH_SUFFIX = """
+
+You will receive {n} images, each preceded by "Image <index>:". Analyze EACH image independently
+with the rules above and respond in JSON:
+{{
+  "images": [
+    {{"index": 0, "has_logos": ..., "logos_detected": [...], "overall_confidence": ..., "recommendation": ..., "reasoning": ...}}
+  ]
+}}
+Include one entry per image, in order."""
+
+
+def _build_analysis(analysis: Dict) -> Dict:
+    """Normaliza la respuesta del modelo al formato de analyze_image"""
+    logos = analysis.get('logos_detected', [])
+    flagged_logos = [l for l in logos if isinstance(l, dict) and l.get('should_flag', False)]
+    return {
+        "has_logos": analysis.get('has_logos', False),
+        "should_remove": analysis.get('recommendation') == 'remove',
+        "logos_detected": flagged_logos,
+        "reasoning": analysis.get('reasoning', ''),
+        "confidence": analysis.get('overall_confidence', 0),
+        "raw_response": analysis
+    }
+
+
+def _error_analysis(reasoning: str, error: str) -> Dict:
+    return {
+        "has_logos": False,
+        "should_remove": False,
+        "logos_detected": [],
+        "reasoning": reasoning,
+        "confidence": 0,
+        "error": error
+    }
+
+
+# ---------- Hash perceptual ----------
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Pool acotado compartido por todas las instancias (filter_product_images crea una por llamada)"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=LOGO_FILTER_WORKERS, thread_name_prefix="logo_filter")
+    return _executor
+
+
+class _PhashIndex:
+    """
+    Análisis de logos indexados por dHash en SQLite (compartido entre procesos).
+    Búsqueda aproximada por bandas: el hash de 64 bits se parte en 4 bandas de 16;
+    con distancia <= 3 al menos una banda coincide exacta (se consulta por índice).
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or KV_DB_PATH
+        conn = get_connection(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS logo_analysis_phash (
+                phash TEXT PRIMARY KEY,
+                b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER,
+                url TEXT,
+                analysis TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        for i in range(4):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_logo_phash_b{i} ON logo_analysis_phash(b{i})")
+
+    @staticmethod
+    def _bands(ph: int) -> List[int]:
+        return [(ph >> (16 * i)) & 0xFFFF for i in range(4)]
+
+    def lookup(self, ph: int) -> Optional[Dict]:
+        b = self._bands(ph)
+        rows = get_connection(self.db_path).execute(
+            "SELECT phash, analysis FROM logo_analysis_phash WHERE b0 = ? OR b1 = ? OR b2 = ? OR b3 = ?", b
+        ).fetchall()
+        best = None
+        for hex_hash, analysis in rows:
+            dist = _hamming(int(hex_hash, 16), ph)
+            if dist <= PHASH_MAX_DISTANCE and (best is None or dist < best[0]):
+                best = (dist, analysis)
+        return json.loads(best[1]) if best else None
+
+    def store(self, ph: int, url: str, analysis: Dict):
+        get_connection(self.db_path).execute(
+            "INSERT OR REPLACE INTO logo_analysis_phash (phash, b0, b1, b2, b3, url, analysis, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [f"{ph:016x}", *self._bands(ph), url, json.dumps(analysis, ensure_ascii=False), time.time()]
+        )
+
+
+class LogoFilter:
+    """Filtro de logos en imágenes usando GPT-4 Vision"""
+
+    def __init__(self):
+        """Inicializa el cliente OpenAI"""
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY no configurada")
+
+        self.client = OpenAI(api_key=api_key)
+        self.model = "gpt-4o"  # GPT-4 Vision
+        self.confidence_threshold = 0.75
+        self.batch_size = max(1, LOGO_FILTER_BATCH)
+
+        # Caches persistentes compartidos (storage/cache_store.db)
+        self.url_cache = KVStore("logo_analysis")
+        self.hash_cache = _PhashIndex()
+        self.official_cache = KVStore("logo_official_title")
+        self._executor = _get_executor()
+
+    def analyze_image(self, image_url: str) -> Dict:
+        """
+        Analiza una imagen para detectar logos de marca (sin cache).
+
+        Args:
+            image_url: URL de la imagen a analizar
+
+        Returns:
+            Dict con análisis: {
+                "has_logos": bool,
+                "should_remove": bool,
+                "logos_detected": list,
+                "reasoning": str,
+                "confidence": float
+            }
+        """
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
@@ -99,7 +227,7 @@ Only recommend "remove" if should_flag=true for ANY logo with confidence >= 0.75
                     {
                         "role": "user",
                         "content": [
-                            {"type": "text", "text": prompt},
+                            {"type": "text", "text": LOGO_PROMPT},
                             {
                                 "type": "image_url",
                                 "image_url": {"url": image_url, "detail": "high"}
@@ -116,39 +244,134 @@ Only recommend "remove" if should_flag=true for ANY logo with confidence >= 0.75
             # Extraer JSON de la respuesta
             json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
             if json_match:
-                analysis = json.loads(json_match.group(0))
-
-                # Procesar resultado
-                logos = analysis.get('logos_detected', [])
-                flagged_logos = [l for l in logos if l.get('should_flag', False)]
-
-                return {
-                    "has_logos": analysis.get('has_logos', False),
-                    "should_remove": analysis.get('recommendation') == 'remove',
-                    "logos_detected": flagged_logos,
-                    "reasoning": analysis.get('reasoning', ''),
-                    "confidence": analysis.get('overall_confidence', 0),
-                    "raw_response": analysis
-                }
+                return _build_analysis(json.loads(json_match.group(0)))
             else:
-                return {
-                    "has_logos": False,
-                    "should_remove": False,
-                    "logos_detected": [],
-                    "reasoning": "No se pudo parsear respuesta",
-                    "confidence": 0,
-                    "error": "No JSON in response"
-                }
+                return _error_analysis("No se pudo parsear respuesta", "No JSON in response")
 
         except Exception as e:
-            return {
-                "has_logos": False,
-                "should_remove": False,
-                "logos_detected": [],
-                "reasoning": f"Error: {str(e)[:100]}",
-                "confidence": 0,
-                "error": str(e)
-            }
+            return _error_analysis(f"Error: {str(e)[:100]}", str(e))
+
+    def analyze_images(self, image_urls: List[str]) -> List[Dict]:
+        """
+        Modo multi-imagen: analiza varias imágenes en UN solo request de visión.
+        Las imágenes que el modelo no devuelve se re-analizan de a una.
+
+        Returns:
+            Lista de análisis en el mismo orden que `image_urls`
+        """
+        if len(image_urls) == 1:
+            return [self.analyze_image(image_urls[0])]
+
+        content = [{"type": "text", "text": LOGO_PROMPT + LOGO_BATCH_SUFFIX.format(n=len(image_urls))}]
+        for i, url in enumerate(image_urls):
+            content.append({"type": "text", "text": f"Image {i}:"})
+            content.append({"type": "image_url", "image_url": {"url": url, "detail": "high"}})
+
+        results: List[Optional[Dict]] = [None] * len(image_urls)
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": content}],
+                max_tokens=min(600 * len(image_urls), 4000),
+                temperature=0.1
+            )
+            result_text = response.choices[0].message.content.strip()
+            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
+            if json_match:
+                data = json.loads(json_match.group(0))
+                for item in data.get("images", []):
+                    idx = item.get("index")
+                    if isinstance(idx, int) and 0 <= idx < len(results):
+                        results[idx] = _build_analysis(item)
+        except Exception as e:
+            print(f"[logo_filter] Error en análisis multi-imagen ({len(image_urls)}): {str(e)[:80]}")
+
+        # Fallback individual para las que faltaron en la respuesta
+        for i, r in enumerate(results):
+            if r is None:
+                results[i] = self.analyze_image(image_urls[i])
+        return results
+
+    # ---------- Cache ----------
+    def _cached_analyses(self, urls: List[str]) -> Tuple[Dict[str, Dict], Dict[str, Optional[int]]]:
+        """
+        Busca análisis previos por URL y, si no hay, por hash perceptual de la imagen descargada
+        (misma foto reutilizada en variantes / re-listados con otra URL).
+
+        Returns:
+            (hits {url: análisis}, hashes {url: dhash} de las que no tuvieron hit)
+        """
+        hits, hashes = {}, {}
+        pending = []
+        for url in urls:
+            cached = self.url_cache.get(url)
+            if cached and cached.get("analysis"):
+                hits[url] = cached["analysis"]
+            else:
+                pending.append(url)
+
+        if not pending:
+            return hits, {}
+
+        # Descargas en paralelo vía image store (una por URL, compartidas con otros consumidores)
+        for url, meta in get_image_store().iter_fetch(pending):
+            ph = meta["dhash"] if meta and meta["ok"] else None
+            hashes[url] = ph
+            if ph is None:
+                continue
+            analysis = self.hash_cache.lookup(ph)
+            if analysis is not None:
+                hits[url] = analysis
+                self.url_cache.put(url, {"phash": f"{ph:016x}", "analysis": analysis})
+                hashes.pop(url)
+        return hits, hashes
+
+    def _store_analysis(self, url: str, ph: Optional[int], analysis: Dict):
+        if analysis.get("error"):
+            return  # No cachear errores transitorios
+        stored = {k: v for k, v in analysis.items() if k != "raw_response"}
+        self.url_cache.put(url, {"phash": f"{ph:016x}" if ph is not None else None, "analysis": stored})
+        if ph is not None:
+            self.hash_cache.store(ph, url, stored)
+
+    def analyze_many(self, urls: List[str]) -> Dict[str, Dict]:
+        """
+        Análisis de varias URLs: cache (URL → hash perceptual) y los misses
+        en lotes multi-imagen ejecutados en paralelo (pool acotado).
+
+        Returns:
+            {url: análisis}
+        """
+        unique = list(dict.fromkeys(canonical_image_url(u) for u in urls if u))
+        results, hashes = self._cached_analyses(unique)
+
+        # Imágenes casi idénticas dentro del mismo producto → se analiza una sola
+        misses, same_as = [], {}
+        seen_hashes: Dict[int, str] = {}
+        for url in unique:
+            if url in results:
+                continue
+            ph = hashes.get(url)
+            twin = next((u for h, u in seen_hashes.items() if ph is not None and _hamming(h, ph) <= PHASH_MAX_DISTANCE), None)
+            if twin:
+                same_as[url] = twin
+                continue
+            if ph is not None:
+                seen_hashes[ph] = url
+            misses.append(url)
+
+        batches = [misses[i:i + self.batch_size] for i in range(0, len(misses), self.batch_size)]
+        futures = {self._executor.submit(self.analyze_images, batch): batch for batch in batches}
+        for fut in as_completed(futures):
+            batch = futures[fut]
+            for url, analysis in zip(batch, fut.result()):
+                results[url] = analysis
+                self._store_analysis(url, hashes.get(url), analysis)
+
+        for url, twin in same_as.items():
+            results[url] = results[twin]
+            self._store_analysis(url, hashes.get(url), results[twin])
+        return results
 
     def _is_official_product_ai(self, title: str) -> Dict:
         """
@@ -167,6 +390,10 @@ Only recommend "remove" if should_flag=true for ANY logo with confidence >= 0.75
         if not title:
             return {"is_official": False, "brand": None, "reasoning": "No title"}
 
+        cached = self.official_cache.get(title)
+        if cached is not None:
+            return cached
+
         prompt = f"""Analyze this product title and determine if it's an OFFICIAL product from the DEVICE'S brand, or a THIRD-PARTY accessory.
 
 Product title: "{title}"
@@ -239,11 +466,13 @@ Respond in JSON:
             json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
             if json_match:
                 analysis = json.loads(json_match.group(0))
-                return {
+                result = {
                     "is_official": analysis.get("is_official", False),
                     "brand": analysis.get("brand"),
                     "reasoning": analysis.get("reasoning", "")
                 }
+                self.official_cache.put(title, result)
+                return result
             else:
                 return {"is_official": False, "brand": None, "reasoning": "Parse error"}
 
@@ -299,8 +528,10 @@ Respond in JSON:
                 "analysis_details": []
             }
 
-        # Extraer marcas permitidas del título
-        allowed_brands = self._extract_allowed_brands(product_title)
+        # Marcas permitidas (IA de texto) en paralelo con el análisis de imágenes
+        brands_future = self._executor.submit(self._extract_allowed_brands, product_title)
+        analyses = self.analyze_many([img.get('url', '') for img in images])
+        allowed_brands = brands_future.result()
 
         filtered = []
         removed = []
@@ -313,8 +544,7 @@ Respond in JSON:
                 filtered.append(img)
                 continue
 
-            # Analizar imagen
-            analysis = self.analyze_image(url)
+            analysis = analyses[canonical_image_url(url)]
 
             # Filtrar logos: solo eliminar si NO están en la whitelist
             logos_detected = analysis['logos_detected']
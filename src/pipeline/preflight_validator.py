@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# preflight_validator.py
+# ✅ Validación offline de mini_ml / payload de item contra el
+#    schema de categoría cacheado (schemas/, data/schemas/, resources/schemas/)
+# ✅ Chequea: requeridos, value_type, allowed_units, listas cerradas,
+#    atributos read_only / fuera del schema y largo del título
+# ✅ Sin llamadas a la API de ML: schema compilado una vez por categoría,
+#    cada validación son lookups en dicts (microsegundos)
+# ✅ Autofix local de lo que se puede corregir sin IA
+#    (value_id, unidades, truncado de título, descarte de inválidos)
+# ============================================================
+
+import os
+import re
+import json
+import copy
+import threading
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA_DIRS = ["schemas", "data/schemas", "resources/schemas"]
+TITLE_MAX_CHARS = 60  # CBT: publish_item ya trunca a 60
+
+# Códigos de violación
+TITLE_EMPTY = "title_empty"
+TITLE_TOO_LONG = "title_too_long"
+MISSING_REQUIRED = "missing_required"
+UNKNOWN_ATTRIBUTE = "unknown_attribute"
+READ_ONLY = "read_only"
+INVALID_NUMBER = "invalid_number"
+MISSING_UNIT = "missing_unit"
+INVALID_UNIT = "invalid_unit"
+VALUE_NOT_IN_LIST = "value_not_in_list"
+INVALID_BOOLEAN = "invalid_boolean"
+INVALID_VALUE_ID = "invalid_value_id"
+
+# Acciones de corrección
+FIX_REPLACE = "replace"     # reemplazar value_name (unidad normalizada, valor del schema)
+FIX_DROP = "drop"           # descartar atributo (si era requerido, lo completa autofill_required_attrs)
+FIX_TRUNCATE = "truncate"   # truncar título
+FIX_AUTOFILL = "autofill"   # lo completa publish_item (autofill_required_attrs / IA)
+
+_NUMBER_RE = re.compile(r"^-?\d+(?:[.,]\d+)?$")
+_NUMBER_UNIT_RE = re.compile(r"^(-?\d+(?:[.,]\d+)?)\s*(.*)$")
+
+# Sinónimos de unidades → id de unidad ML
+UNIT_ALIASES = {
+    "cm": "cm", "cms": "cm", "centimeter": "cm", "centimeters": "cm", "centimetro": "cm", "centimetros": "cm",
+    "mm": "mm", "millimeter": "mm", "millimeters": "mm", "milimetros": "mm",
+    "m": "m", "meter": "m", "meters": "m", "metro": "m", "metros": "m",
+    "in": '"', "inch": '"', "inches": '"', "pulgadas": '"', '"': '"', "''": '"',
+    "ft": "ft", "foot": "ft", "feet": "ft", "pies": "ft",
+    "kg": "kg", "kgs": "kg", "kilogram": "kg", "kilograms": "kg", "kilogramos": "kg",
+    "g": "g", "gr": "g", "gram": "g", "grams": "g", "gramos": "g",
+    "mg": "mg", "milligram": "mg", "milligrams": "mg",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb", "libras": "lb",
+    "oz": "oz", "ounce": "oz", "ounces": "oz", "onzas": "oz",
+    "ml": "mL", "milliliter": "mL", "milliliters": "mL",
+    "l": "L", "liter": "L", "liters": "L", "litros": "L",
+    "fl oz": "fl oz", "fluid ounces": "fl oz",
+    "w": "W", "watts": "W", "v": "V", "volts": "V", "mah": "mAh",
+}
+
+# Factores a unidad base (cm / kg / mL) para convertir entre unidades de la misma familia
+UNIT_FACTORS = {
+    "length": {"mm": 0.1, "cm": 1.0, "m": 100.0, '"': 2.54, "ft": 30.48},
+    "mass": {"mg": 0.000001, "g": 0.001, "kg": 1.0, "oz": 0.028349523125, "lb": 0.45359237},
+    "volume": {"mL": 1.0, "L": 1000.0, "fl oz": 29.5735},
+}
+# Unidad preferida por familia al convertir
+PREFERRED_UNITS = {"length": ["cm", "mm", "m"], "mass": ["kg", "g", "lb"], "volume": ["mL", "L"]}
+# Id de unidad ML → token a escribir en value_name (publish_item quita las comillas: '10 "' → '10')
+UNIT_TOKENS = {'"': "in"}
+
+BOOLEAN_ALIASES = {
+    "yes": "yes", "si": "yes", "sí": "yes", "true": "yes", "1": "yes", "y": "yes",
+    "no": "no", "false": "no", "0": "no", "n": "no",
+}
+
+
+def _unit_family(unit: str) -> Optional[str]:
+    for family, factors in UNIT_FACTORS.items():
+        if unit in factors:
+            return family
+    return None
+
+
+def _unit_token(unit: str) -> str:
+    return UNIT_TOKENS.get(unit, unit)
+
+
+def _fmt_number(num: float) -> str:
+    return f"{round(num, 2):g}"
+
+
+def _normalize_raw_schema(raw: list) -> dict:
+    """Schema crudo de /categories/{id}/attributes → mismo formato que get_category_schema"""
+    schema = {}
+    for a in raw:
+        if isinstance(a, dict) and a.get("id"):
+            schema[a["id"]] = {
+                "value_type": a.get("value_type"),
+                "values": {v["name"].lower(): v["id"] for v in a.get("values", []) if v.get("id") and v.get("name")},
+                "allowed_units": [u["id"] for u in a.get("allowed_units", [])] if a.get("allowed_units") else [],
+                "tags": a.get("tags", {}),
+            }
+    return schema
+
+
+class CategoryValidator:
+    """Schema de una categoría compilado para validar atributos sin I/O"""
+
+    def __init__(self, category_id: str, schema: dict):
+        self.category_id = category_id
+        self.specs: Dict[str, dict] = {}
+        self.required: List[str] = []
+
+        for aid, meta in schema.items():
+            if not isinstance(meta, dict):
+                continue
+            tags = meta.get("tags") or {}
+            if isinstance(tags, list):
+                tags = {t: True for t in tags}
+            values = {str(k).lower().strip(): str(v) for k, v in (meta.get("values") or {}).items()}
+            self.specs[aid] = {
+                "value_type": meta.get("value_type") or "string",
+                "values": values,
+                "value_ids": set(values.values()),
+                "allowed_units": list(meta.get("allowed_units") or []),
+                "read_only": bool(tags.get("read_only")),
+            }
+            if tags.get("required") and not tags.get("read_only"):
+                self.required.append(aid)
+
+    # ---------- Validación ----------
+    def _check_value(self, aid: str, spec: dict, attr: dict) -> Optional[dict]:
+        """Valida un atributo presente. Retorna una violación o None."""
+        vtype = spec["value_type"]
+        value_id = attr.get("value_id")
+        val = attr.get("value_name")
+        if isinstance(val, list):
+            val = val[0] if val else None
+        val = str(val).strip() if val is not None else ""
+
+        if value_id and spec["value_ids"] and str(value_id) not in spec["value_ids"]:
+            return _violation(aid, INVALID_VALUE_ID, f"value_id '{value_id}' no existe en el schema", FIX_DROP)
+
+        if vtype == "number":
+            if not _NUMBER_RE.match(val):
+                return _violation(aid, INVALID_NUMBER, f"'{val}' no es numérico", FIX_DROP)
+
+        elif vtype == "number_unit":
+            m = _NUMBER_UNIT_RE.match(val)
+            if not m:
+                return _violation(aid, INVALID_NUMBER, f"'{val}' no tiene formato '<número> <unidad>'", FIX_DROP)
+            unit_raw = m.group(2).strip()
+            allowed = spec["allowed_units"]
+            if not unit_raw:
+                return _violation(aid, MISSING_UNIT, f"'{val}' sin unidad (permitidas: {allowed})", FIX_DROP)
+            unit = UNIT_ALIASES.get(unit_raw.lower(), unit_raw)
+            if allowed and not (unit in allowed and unit_raw == _unit_token(unit)):
+                fixed = _convert_unit(float(m.group(1).replace(",", ".")), unit_raw, allowed)
+                if fixed:
+                    return _violation(aid, INVALID_UNIT, f"unidad '{unit_raw}' no permitida → '{fixed}'",
+                                      FIX_REPLACE, fixed)
+                return _violation(aid, INVALID_UNIT, f"unidad '{unit_raw}' no permitida (permitidas: {allowed})",
+                                  FIX_DROP)
+
+        elif vtype == "boolean":
+            if not value_id:
+                canon = BOOLEAN_ALIASES.get(val.lower())
+                if canon is None or (spec["values"] and canon not in spec["values"]):
+                    return _violation(aid, INVALID_BOOLEAN, f"'{val}' no es Sí/No", FIX_DROP)
+
+        elif vtype == "list":
+            if not value_id and spec["values"] and val.lower() not in spec["values"]:
+                return _violation(aid, VALUE_NOT_IN_LIST, f"'{val}' no está en la lista cerrada", FIX_DROP)
+
+        return None
+
+    def validate(self, attributes: List[dict], title: str = None) -> List[dict]:
+        """
+        Valida una lista de atributos [{id, value_id?, value_name}] (+ título opcional).
+        Retorna la lista de violaciones (vacía = payload OK para ML).
+        """
+        violations = []
+
+        if title is not None:
+            t = str(title).strip()
+            if not t:
+                violations.append(_violation(None, TITLE_EMPTY, "título vacío", None))
+            elif len(t) > TITLE_MAX_CHARS:
+                violations.append(_violation(None, TITLE_TOO_LONG, f"título de {len(t)} caracteres (máx {TITLE_MAX_CHARS})",
+                                             FIX_TRUNCATE, _truncate_title(t)))
+
+        present = set()
+        for attr in attributes:
+            if not isinstance(attr, dict):
+                continue
+            aid = attr.get("id")
+            if not aid or aid in present:
+                continue
+            present.add(aid)
+
+            spec = self.specs.get(aid)
+            if spec is None:
+                violations.append(_violation(aid, UNKNOWN_ATTRIBUTE, "no existe en el schema de la categoría", FIX_DROP))
+                continue
+            if spec["read_only"]:
+                violations.append(_violation(aid, READ_ONLY, "atributo read_only", FIX_DROP))
+                continue
+            v = self._check_value(aid, spec, attr)
+            if v:
+                violations.append(v)
+
+        dropped = {v["attribute_id"] for v in violations if v["fix"] == FIX_DROP}
+        for aid in self.required:
+            if aid not in present or aid in dropped:
+                violations.append(_violation(aid, MISSING_REQUIRED, "atributo requerido faltante", FIX_AUTOFILL))
+
+        return violations
+
+    # ---------- Autofix ----------
+    def value_id_for(self, aid: str, value_name) -> Optional[str]:
+        spec = self.specs.get(aid)
+        if not spec or not spec["values"] or value_name is None:
+            return None
+        key = str(value_name).lower().strip()
+        if spec["value_type"] == "boolean":
+            key = BOOLEAN_ALIASES.get(key, key)
+        return spec["values"].get(key)
+
+    def autofix(self, attributes: List[dict], violations: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """
+        Aplica las correcciones locales (replace / drop) y agrega value_id cuando el valor
+        está en la lista del schema (lo mismo que fix_attributes_with_value_ids, sin API).
+        Retorna (atributos corregidos, correcciones aplicadas).
+        """
+        by_attr = {v["attribute_id"]: v for v in violations
+                   if v["attribute_id"] and v["fix"] in (FIX_REPLACE, FIX_DROP)}
+        fixed, applied = [], []
+        for attr in attributes:
+            if not isinstance(attr, dict) or not attr.get("id"):
+                continue
+            aid = attr["id"]
+            v = by_attr.get(aid)
+            if v and v["fix"] == FIX_DROP:
+                applied.append(v)
+                continue
+            attr = dict(attr)
+            if v and v["fix"] == FIX_REPLACE:
+                attr["value_name"] = v["value"]
+                attr.pop("value_id", None)
+                applied.append(v)
+            if not attr.get("value_id"):
+                vid = self.value_id_for(aid, attr.get("value_name"))
+                if vid:
+                    attr["value_id"] = vid
+            fixed.append(attr)
+        return fixed, applied
+
+
+def _violation(aid, code, message, fix, value=None) -> dict:
+    return {"attribute_id": aid, "code": code, "message": message, "fix": fix, "value": value}
+
+
+def _truncate_title(title: str, max_chars: int = TITLE_MAX_CHARS) -> str:
+    """Trunca en el último espacio antes del límite (no corta palabras)"""
+    if len(title) <= max_chars:
+        return title
+    cut = title[:max_chars]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip(" ,-/|")
+
+
+def _convert_unit(number: float, unit_raw: str, allowed: List[str]) -> Optional[str]:
+    """Normaliza sinónimos y convierte a una unidad permitida de la misma familia"""
+    unit = UNIT_ALIASES.get(unit_raw.lower(), unit_raw)
+    if unit in allowed:
+        return f"{_fmt_number(number)} {_unit_token(unit)}"
+    family = _unit_family(unit)
+    if family:
+        factors = UNIT_FACTORS[family]
+        targets = [u for u in PREFERRED_UNITS[family] if u in allowed] + \
+                  [u for u in allowed if u in factors and u not in PREFERRED_UNITS[family]]
+        for target in targets:
+            return f"{_fmt_number(number * factors[unit] / factors[target])} {_unit_token(target)}"
+    return None
+
+
+# ---------- Cache de schemas compilados ----------
+_validators: Dict[str, Tuple[str, float, CategoryValidator]] = {}
+_lock = threading.Lock()
+
+
+def _find_schema_path(category_id: str) -> Optional[str]:
+    for d in SCHEMA_DIRS:
+        path = os.path.join(d, f"{category_id}.json")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def get_validator(category_id: str) -> Optional[CategoryValidator]:
+    """
+    Validador compilado para la categoría (None si no hay schema cacheado).
+    Se recompila solo si el archivo del schema cambió.
+    """
+    if not category_id:
+        return None
+    path = _find_schema_path(category_id)
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _validators.get(category_id)
+    if cached and cached[0] == path and cached[1] == mtime:
+        return cached[2]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            schema = json.load(f)
+    except Exception as e:
+        print(f"⚠️ Error al cargar schema {category_id}: {e}")
+        return None
+    if isinstance(schema, list):
+        schema = _normalize_raw_schema(schema)
+    if not isinstance(schema, dict) or not schema:
+        return None
+
+    validator = CategoryValidator(category_id, schema)
+    with _lock:
+        _validators[category_id] = (path, mtime, validator)
+    return validator
+
+
+# ---------- mini_ml ----------
+def mini_ml_attributes(mini: dict) -> List[dict]:
+    """Atributos que publish_item armará a partir del mini_ml (mismo orden y dedup por id)"""
+    attrs = []
+    for aid, info in (mini.get("attributes_mapped") or {}).items():
+        if isinstance(info, dict) and info.get("value_name"):
+            attrs.append({"id": aid, "value_id": info.get("value_id"), "value_name": info["value_name"]})
+
+    gtins = [] if (mini.get("force_no_gtin") or mini.get("last_error") == "GTIN_REUSED") else (mini.get("gtins") or [])
+    if gtins:
+        attrs.append({"id": "GTIN", "value_name": str(gtins[0])})
+
+    pkg = mini.get("package") or {}
+    for pid, key, unit in [("PACKAGE_LENGTH", "length_cm", "cm"), ("PACKAGE_WIDTH", "width_cm", "cm"),
+                           ("PACKAGE_HEIGHT", "height_cm", "cm"), ("PACKAGE_WEIGHT", "weight_kg", "kg")]:
+        if pkg.get(key):
+            attrs.append({"id": pid, "value_name": f"{pkg[key]} {unit}"})
+
+    for block in (mini.get("main_characteristics") or []) + (mini.get("second_characteristics") or []):
+        if isinstance(block, dict) and block.get("id") and block.get("value_name"):
+            attrs.append({"id": block["id"], "value_name": block["value_name"]})
+    return attrs
+
+
+def _apply_to_mini(mini: dict, applied: List[dict], title_fix: Optional[dict]) -> dict:
+    """Refleja las correcciones en los bloques del mini_ml (attributes_mapped + características)"""
+    out = copy.deepcopy(mini)
+    drops = {v["attribute_id"] for v in applied if v["fix"] == FIX_DROP}
+    replaces = {v["attribute_id"]: v["value"] for v in applied if v["fix"] == FIX_REPLACE}
+
+    mapped = out.get("attributes_mapped") or {}
+    for aid in list(mapped):
+        if aid in drops:
+            mapped.pop(aid)
+        elif aid in replaces and isinstance(mapped[aid], dict):
+            mapped[aid]["value_name"] = replaces[aid]
+            mapped[aid].pop("value_id", None)
+
+    for key in ("main_characteristics", "second_characteristics"):
+        blocks = []
+        for block in out.get(key) or []:
+            bid = block.get("id") if isinstance(block, dict) else None
+            if bid in drops:
+                continue
+            if bid in replaces:
+                block["value_name"] = replaces[bid]
+            blocks.append(block)
+        if key in out:
+            out[key] = blocks
+
+    if title_fix:
+        out["title_ai"] = title_fix["value"]
+    return out
+
+
+def preflight_mini_ml(mini: dict, autofix: bool = True) -> dict:
+    """
+    Valida un mini_ml contra el schema cacheado de su categoría.
+
+    Retorna:
+        {
+          "schema_cached": bool,
+          "violations": [...],      # todas las encontradas
+          "blocking": [...],        # las que ni el autofix ni publish_item pueden resolver
+          "applied": [...],         # correcciones aplicadas (si autofix)
+          "mini": dict              # mini_ml corregido (o el original)
+        }
+    """
+    result = {"schema_cached": False, "violations": [], "blocking": [], "applied": [], "mini": mini}
+    validator = get_validator(mini.get("category_id"))
+    title = mini.get("title_ai") or ""
+
+    if validator is None:
+        # Sin schema local: solo el título se puede validar offline
+        if not str(title).strip():
+            result["violations"] = result["blocking"] = [_violation(None, TITLE_EMPTY, "título vacío", None)]
+        return result
+
+    result["schema_cached"] = True
+    attrs = mini_ml_attributes(mini)
+    violations = validator.validate(attrs, title=title)
+    result["violations"] = violations
+
+    # Dimensiones del paquete: publish_item aborta si faltan (no hay autofill posible)
+    pkg_missing = [v for v in violations if v["code"] == MISSING_REQUIRED and v["attribute_id"].startswith("PACKAGE_")]
+    result["blocking"] = [v for v in violations if v["fix"] is None] + pkg_missing
+
+    if autofix:
+        # Los atributos fuera del schema se conservan en el mini_ml: alimentan el prompt de IA
+        # de publish_item, que igual los filtra contra el schema antes del POST
+        fixable = [v for v in violations if v["code"] != UNKNOWN_ATTRIBUTE]
+        _, applied = validator.autofix(attrs, fixable)
+        title_fix = next((v for v in violations if v["code"] == TITLE_TOO_LONG), None)
+        if title_fix:
+            applied.append(title_fix)
+        if applied:
+            result["mini"] = _apply_to_mini(mini, applied, title_fix)
+        result["applied"] = applied
+    return result
+
+
+def preflight_item(body: dict, autofix: bool = True) -> dict:
+    """Igual que preflight_mini_ml pero sobre el payload final de /global/items"""
+    result = {"schema_cached": False, "violations": [], "blocking": [], "applied": [], "body": body}
+    validator = get_validator(body.get("category_id"))
+    if validator is None:
+        return result
+
+    result["schema_cached"] = True
+    attrs = body.get("attributes") or []
+    violations = validator.validate(attrs, title=body.get("title"))
+    result["violations"] = violations
+    # En el payload final ya no hay autofill posterior: un requerido faltante se rechaza en ML
+    result["blocking"] = [v for v in violations if v["fix"] in (None, FIX_AUTOFILL)]
+
+    if autofix:
+        fixed_attrs, applied = validator.autofix(attrs, violations)
+        fixed = dict(body, attributes=fixed_attrs)
+        title_fix = next((v for v in violations if v["code"] == TITLE_TOO_LONG), None)
+        if title_fix:
+            fixed["title"] = title_fix["value"]
+            applied.append(title_fix)
+        result["body"] = fixed
+        result["applied"] = applied
+    return result
+
+
+def format_violations(violations: List[dict], limit: int = 5) -> str:
+    """Resumen corto para logs: 'ATTR: mensaje; ...'"""
+    parts = [f"{v['attribute_id'] or 'TITLE'}: {v['message']}" for v in violations[:limit]]
+    if len(violations) > limit:
+        parts.append(f"(+{len(violations) - limit} más)")
+    return "; ".join(parts)
+
+
+if __name__ == "__main__":
+    # Uso: python3 src/pipeline/preflight_validator.py <mini_ml.json>
+    import sys
+    if len(sys.argv) < 2:
+        print("Uso: python3 src/pipeline/preflight_validator.py <mini_ml.json>")
+        sys.exit(1)
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        mini = json.load(f)
+    res = preflight_mini_ml(mini)
+    if not res["schema_cached"]:
+        print(f"⚠️ Sin schema cacheado para {mini.get('category_id')}")
+    for v in res["violations"]:
+        icon = "❌" if v in res["blocking"] else "🔧"
+        print(f"{icon} [{v['code']}] {v['attribute_id'] or 'TITLE'}: {v['message']}")
+    print(f"📋 {len(res['violations'])} violaciones, {len(res['blocking'])} bloqueantes, {len(res['applied'])} corregidas")
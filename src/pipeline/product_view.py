@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# product_view.py
+# ✅ Vista aplanada e indexada del JSON de Amazon (SP-API)
+# ✅ Se aplana UNA sola vez por ASIN (antes: varias veces por transform)
+# ✅ Índices por clave normalizada y por familia de atributos (identificadores)
+# ✅ Búsquedas memorizadas: misma lista de claves → mismo resultado sin re-escanear
+# ============================================================
+
+import re
+from typing import Any, Dict, List, Tuple
+
+
+def flatten(d, prefix="", out=None):
+    if out is None: out = {}
+    if isinstance(d, dict):
+        for k, v in d.items():
+            flatten(v, f"{prefix}.{k}" if prefix else k, out)
+    elif isinstance(d, list):
+        for i, v in enumerate(d):
+            flatten(v, f"{prefix}[{i}]", out)
+    else:
+        val = str(d).strip()
+        if val and val.lower() not in {"none","null","default","n/a"} and len(val)<=400:
+            out[prefix] = val
+    return out
+
+
+def normalize_key(k: str) -> str:
+    return re.sub(r"[\s_\-\[\]\.]+","", str(k).lower())
+
+
+# Valores que nunca deben devolverse como valor de un atributo
+FIND_INVALID_VALUES = {
+    "en_us", "en-us", "es_mx", "pt_br", "language_tag",
+    "atvpdkikx0der", "a1am78c64um0y8", "marketplace_id",
+    "default", "none", "null", "n/a", "na", "not specified", "unknown",
+    "true", "false", "yes", "no"
+}
+
+FIRST_OF_INVALID_VALUES = FIND_INVALID_VALUES | {
+    # Unidades solas (sin valores numéricos)
+    "kilograms", "grams", "pounds", "ounces", "kg", "g", "lb", "oz",
+    "centimeters", "millimeters", "inches", "meters", "cm", "mm", "in", "m",
+}
+
+_UNIT_ONLY_RE = re.compile(
+    r'^\d+(\.\d+)?\s*(kg|g|lb|oz|cm|mm|in|m|kilograms|grams|pounds|ounces|centimeters|millimeters|inches|meters)$'
+)
+
+# Familias de atributos: subcadenas (sobre la clave normalizada) que las identifican
+FAMILIES = {
+    "identifiers": ("externallyassignedproductidentifier", "upc", "ean", "gtin"),
+}
+
+
+def _memo_key(keys):
+    """Clave hashable para memorizar búsquedas (None si `keys` trae valores no hashables)"""
+    try:
+        key = tuple(keys)
+        hash(key)
+        return key
+    except TypeError:
+        return None
+
+
+def _is_metadata_key(fk: str) -> bool:
+    return "languagetag" in fk or "language_tag" in fk or "marketplaceid" in fk or "marketplace_id" in fk
+
+
+class ProductView:
+    """
+    Vista de solo lectura sobre un amazon_json.
+
+    - `flat`: mismo resultado que flatten(amazon_json)
+    - `norm`: {clave_normalizada: valor} (mismo criterio que el antiguo _find_in_flat)
+    - `family(nombre)`: [(clave, valor)] de la familia (identificadores)
+    - `find(keys)` y `first_of(keys)`: reemplazan a _find_in_flat / first_of
+    """
+
+    def __init__(self, amazon_json: dict):
+        self.source = amazon_json
+        self.flat = flatten(amazon_json)
+
+        self.norm: Dict[str, Any] = {}
+        for k, v in self.flat.items():
+            self.norm[normalize_key(k)] = v
+
+        # Candidatos pre-filtrados una sola vez (en orden de aparición)
+        self._find_items: List[Tuple[str, Any]] = []
+        self._first_of_items: List[Tuple[str, Any]] = []
+        for fk, v in self.norm.items():
+            if _is_metadata_key(fk):
+                continue
+            if "[" in fk:
+                if fk.endswith("value") or fk.endswith("unit"):
+                    self._find_items.append((fk, v))
+                if fk.endswith("value"):
+                    self._first_of_items.append((fk, v))
+            else:
+                self._find_items.append((fk, v))
+                self._first_of_items.append((fk, v))
+
+        # Índices por familia (sobre claves originales del flat)
+        self._families: Dict[str, List[Tuple[str, Any]]] = {name: [] for name in FAMILIES}
+        for k, v in self.flat.items():
+            nk = normalize_key(k)
+            for name, needles in FAMILIES.items():
+                if any(n in nk for n in needles):
+                    self._families[name].append((k, v))
+
+        self._find_memo: Dict[Tuple[str, ...], Any] = {}
+        self._first_of_memo: Dict[Tuple[str, ...], str] = {}
+
+    # ---------- Búsquedas ----------
+    def get(self, key: str, default=None):
+        """Lookup exacto por clave normalizada"""
+        return self.norm.get(normalize_key(key), default)
+
+    def family(self, name: str) -> List[Tuple[str, Any]]:
+        return self._families.get(name, [])
+
+    def find(self, keys: List[str]):
+        """
+        Equivalente a _find_in_flat(flatten(amazon_json), keys):
+        primera coincidencia parcial (en ambos sentidos) por orden de `keys`.
+        """
+        memo_key = _memo_key(keys)
+        if memo_key in self._find_memo:
+            return self._find_memo[memo_key]
+
+        result = None
+        for k in keys:
+            nk = normalize_key(k)
+            for fk, v in self._find_items:
+                if nk in fk or fk in nk:
+                    val = str(v).strip() if v else ""
+                    if val and val.lower() not in FIND_INVALID_VALUES:
+                        result = v
+                        break
+            if result is not None:
+                break
+
+        if memo_key is not None:
+            self._find_memo[memo_key] = result
+        return result
+
+    def first_of(self, keys: List[str]) -> str:
+        """Equivalente a first_of(amazon_json, keys)"""
+        memo_key = _memo_key(keys)
+        if memo_key in self._first_of_memo:
+            return self._first_of_memo[memo_key]
+
+        result = ""
+        for k in keys:
+            nk = normalize_key(k)
+            for fk, v in self._first_of_items:
+                if nk not in fk:
+                    continue
+                val = str(v).strip()
+                if len(val) == 0 or val.lower() in FIRST_OF_INVALID_VALUES:
+                    continue
+                if _UNIT_ONLY_RE.match(val.lower()):
+                    continue
+                # Evitar valores que sean solo IDs de marketplace
+                if len(val) == 14 and val.isalnum() and val.isupper():
+                    continue
+                result = val
+                break
+            if result:
+                break
+
+        if memo_key is not None:
+            self._first_of_memo[memo_key] = result
+        return result
+
+
+def as_view(obj) -> ProductView:
+    """Acepta un amazon_json o una ProductView ya construida"""
+    return obj if isinstance(obj, ProductView) else ProductView(obj)
@@ -12,6 +12,7 @@
 
 import os, sys, re, json, time, requests
 from typing import Dict, List, Any, Tuple
+from collections import ChainMap
 from pathlib import Path
 
 # Logo filter para remover imágenes con marcas
@@ -53,6 +54,18 @@ def qprint(*args, **kwargs):
 from openai import OpenAI
 client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
+# Vista aplanada/indexada del JSON de Amazon (se construye una vez por ASIN)
+try:
+    from src.pipeline.product_view import ProductView, as_view, normalize_key
+except ModuleNotFoundError:
+    from product_view import ProductView, as_view, normalize_key
+
+# Equivalencias Amazon → ML por categoría (store único, compartido entre procesos)
+try:
+    from src.pipeline.equivalence_store import get_equivalence_store
+except ModuleNotFoundError:
+    from equivalence_store import get_equivalence_store
+
 # Category matcher V2 (embeddings + IA)
 try:
     from src.pipeline.category_matcher_v2 import CategoryMatcherV2
@@ -74,22 +87,43 @@ API = "https://api.mercadolibre.com"
 HEADERS = {"Authorization": f"Bearer {ML_ACCESS_TOKEN}"} if ML_ACCESS_TOKEN else {}
 
 # ---------- 2) Cachés ----------
+# Caches persistentes en KV store (SQLite WAL): get/put por clave, seguros entre procesos.
+# Los JSON legacy se importan una sola vez al primer uso.
+try:
+    from src.utils.kv_store import KVStore
+    from src.utils.image_store import canonical_image_url
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from utils.kv_store import KVStore
+    from utils.image_store import canonical_image_url
+
 CACHE_EQ_PATH   = "storage/logs/ai_equivalences_cache.json"
 TITLE_CACHE_PATH= "storage/logs/ai_title_cache.json"
 DESC_CACHE_PATH = "storage/logs/ai_desc_cache.json"
+CAT_CACHE_PATH  = "storage/logs/category_cache.json"
+
+_CACHE_NAMESPACES = {
+    CACHE_EQ_PATH: "ai_equivalences",
+    TITLE_CACHE_PATH: "ai_title",
+    DESC_CACHE_PATH: "ai_desc",
+    CAT_CACHE_PATH: "category",
+}
+_cache_stores = {}
 
 def _load_cache(path, default=None):
-    try:
-        if os.path.exists(path):
-            return json.load(open(path, "r", encoding="utf-8"))
-    except:
-        pass
-    return default if default is not None else {}
+    """Retorna el KVStore asociado al cache legacy `path` (interfaz tipo dict)"""
+    store = _cache_stores.get(path)
+    if store is None:
+        namespace = _CACHE_NAMESPACES.get(path) or Path(path).stem
+        store = KVStore(namespace, legacy_json=path)
+        _cache_stores[path] = store
+    return store
 
 def _save_cache(path, data):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Compatibilidad: los KVStore persisten en cada put; dicts sueltos se vuelcan clave a clave"""
+    if isinstance(data, KVStore):
+        return
+    _load_cache(path).put_many(data)
 
 # ---------- 3) Utils ----------
 def load_json_file(path):
@@ -101,23 +135,6 @@ def save_json_file(path, data):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
-def flatten(d, prefix="", out=None):
-    if out is None: out = {}
-    if isinstance(d, dict):
-        for k, v in d.items():
-            flatten(v, f"{prefix}.{k}" if prefix else k, out)
-    elif isinstance(d, list):
-        for i, v in enumerate(d):
-            flatten(v, f"{prefix}[{i}]", out)
-    else:
-        val = str(d).strip()
-        if val and val.lower() not in {"none","null","default","n/a"} and len(val)<=400:
-            out[prefix] = val
-    return out
-
-def normalize_key(k: str) -> str:
-    return re.sub(r"[\s_\-\[\]\.]+","", str(k).lower())
-
 def _read_number(x, default=None):
     try:
         if isinstance(x, (int, float)): return float(x)
@@ -176,22 +193,13 @@ def load_schema(category_id: str) -> dict:
     return {}
 
 def load_equivalences(category_id: str) -> dict:
-    """Carga equivalencias aprendidas para la categoría"""
-    path = os.path.join(SCHEMAS_DIR, f"{category_id}_equiv.json")
-    if os.path.exists(path):
-        try:
-            return json.load(open(path, "r", encoding="utf-8"))
-        except Exception:
-            pass
-    return {}
+    """Carga equivalencias aprendidas para la categoría (store compartido + LRU)"""
+    return dict(get_equivalence_store().get_category(category_id))
 
 def save_equivalences(category_id: str, data: dict):
-    """Guarda nuevas equivalencias aprendidas por IA"""
-    os.makedirs(SCHEMAS_DIR, exist_ok=True)
-    path = os.path.join(SCHEMAS_DIR, f"{category_id}_equiv.json")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    qprint(f"💾 Equivalencias guardadas → {path}")
+    """Guarda nuevas equivalencias aprendidas por IA (merge con las existentes)"""
+    added = get_equivalence_store().learn(category_id, data)
+    qprint(f"💾 Equivalencias guardadas → {category_id} (+{added} claves)")
 
 PACKAGE_DIMENSION_KEYS = {
     "length": [
@@ -218,7 +226,14 @@ PACKAGE_DIMENSION_KEYS = {
     ]
 }
 
-def _find_in_flat(flat: Dict[str, Any], keys: List[str]):
+def _find_in_flat(flat, keys: List[str]):
+    """
+    Primera coincidencia (parcial, en ambos sentidos) de `keys` en el JSON aplanado.
+    `flat` puede ser una ProductView (recomendado: índices y memo) o un dict de flatten().
+    """
+    if isinstance(flat, ProductView):
+        return flat.find(keys)
+
     norm = {normalize_key(k): v for k, v in flat.items()}
 
     # Lista de valores inválidos que NO debemos retornar
@@ -305,7 +320,7 @@ def get_pkg_dim(flat, kind) -> Dict[str, Any] | None:
     return None
 
 # ---------- 5) Precio + Tax ----------
-def get_amazon_base_price(amazon_json) -> float:
+def get_amazon_base_price(amazon_json, view: ProductView = None) -> float:
     """Extrae el precio base del producto (sin tax)"""
     # Primero buscar en prime_pricing (agregado por main2.py)
     if 'prime_pricing' in amazon_json and 'price' in amazon_json['prime_pricing']:
@@ -314,7 +329,7 @@ def get_amazon_base_price(amazon_json) -> float:
             return round(float(price), 2)
 
     # Si no hay prime_pricing, buscar en el JSON de catálogo (fallback)
-    flat = flatten(amazon_json)
+    flat = as_view(view or amazon_json)
     candidates = [
         "attributes.list_price[0].value",
         "offers.listings[0].price.amount",
@@ -337,12 +352,12 @@ def get_amazon_base_price(amazon_json) -> float:
     print(f"   Usando fallback $10 para evitar crash, pero REVISAR")
     return 10.0
 
-def get_amazon_tax(amazon_json) -> float:
+def get_amazon_tax(amazon_json, view: ProductView = None) -> float:
     """
     Extrae el tax del producto de Amazon.
     El tax es lo que el seller paga por el producto (parte del costo).
     """
-    flat = flatten(amazon_json)
+    flat = as_view(view or amazon_json)
     candidates = [
         "offers.listings[0].price.tax",
         "offers.listings[0].price.sales_tax",
@@ -400,62 +415,12 @@ BASE_EQUIV = {
 }
 
 def first_of(amazon_json, keys):
-    flat = flatten(amazon_json)
-    norm_flat = {normalize_key(k): v for k, v in flat.items()}
-    for k in keys:
-        nk = normalize_key(k)
-        for fk, v in norm_flat.items():
-            # 🔹 CRÍTICO: Solo aceptar valores que vengan de campos "value"
-            # Amazon envía atributos como: {"color":[{"value":"Red","language_tag":"en_US"}]}
-            # Pero a veces envía: {"manufacturer":[{"language_tag":"en_US"}]} SIN el campo "value"
-            # Debemos RECHAZAR estos casos donde solo hay metadata sin valor real
-
-            # Filtrar por nombre de la key - debe contener "value" o el campo específico
-            if "languagetag" in fk or "language_tag" in fk:
-                continue
-            if "marketplaceid" in fk or "marketplace_id" in fk:
-                continue
-
-            # 🔴 NUEVO: Solo aceptar si la key termina en "value" o es el campo directo (sin array)
-            # Esto previene tomar "language_tag" cuando buscamos "color"
-            if "[" in fk:  # Es un array
-                # Debe terminar en ".value" para ser válido
-                if not fk.endswith("value"):
-                    continue
-
-            if not (nk in fk):
-                continue
-
-            val = str(v).strip()
-
-            # Evitar valores triviales, marcadores de idioma, metadata y unidades sin valores
-            invalid_values = {
-                # Language tags y locales
-                "en_us", "en-us", "es_mx", "pt_br", "language_tag",
-                # Marketplace IDs
-                "atvpdkikx0der", "a1am78c64um0y8", "marketplace_id",
-                # Valores vacíos o genéricos
-                "default", "none", "null", "n/a", "na", "not specified", "unknown",
-                # Unidades solas (sin valores numéricos)
-                "kilograms", "grams", "pounds", "ounces", "kg", "g", "lb", "oz",
-                "centimeters", "millimeters", "inches", "meters", "cm", "mm", "in", "m",
-                # Booleanos solos
-                "true", "false", "yes", "no"
-            }
-
-            if val.lower() in invalid_values or len(val) == 0:
-                continue
-
-            # También evitar valores que sean solo unidades (números con unidades pegadas)
-            if re.match(r'^\d+(\.\d+)?\s*(kg|g|lb|oz|cm|mm|in|m|kilograms|grams|pounds|ounces|centimeters|millimeters|inches|meters)$', val.lower()):
-                continue
-
-            # Evitar valores que sean solo IDs de marketplace
-            if len(val) == 14 and val.isalnum() and val.isupper():
-                continue
+    """
+    Primer valor real (campo "value" o directo, sin metadata/unidades sueltas) para `keys`.
+    Acepta el amazon_json o una ProductView ya construida.
+    """
+    return as_view(amazon_json).first_of(keys)
 
-            return val
-    return ""
 def detect_gtin_with_ai(amazon_json):
     """
     Usa OpenAI para detectar GTIN/UPC/EAN en el JSON de Amazon.
@@ -501,7 +466,7 @@ JSON de Amazon:
     return None
 
 
-def extract_gtins(amazon_json)->List[str]:
+def extract_gtins(amazon_json, view: ProductView = None)->List[str]:
     """
     Extrae SOLO GTINs reales (UPC/EAN) del JSON de Amazon SP-API.
     NO extrae classificationId, unspsc_code, ni otros números.
@@ -511,8 +476,8 @@ def extract_gtins(amazon_json)->List[str]:
     out = []
 
     # 1. Buscar en externally_assigned_product_identifier (lugar correcto)
-    flat = flatten(amazon_json)
-    for k, v in flat.items():
+    view = view or as_view(amazon_json)
+    for k, v in view.family("identifiers"):
         lk = normalize_key(k)
         if "externallyassignedproductidentifier" in lk and lk.endswith("value"):
             g = re.sub(r"\D", "", str(v))
@@ -553,13 +518,13 @@ def extract_gtins(amazon_json)->List[str]:
 
     return sorted(clean)
 
-def extract_images(amazon_json, max_images=10):
+def extract_images(amazon_json, max_images=10, view: ProductView = None):
     """
     Extrae imágenes de Amazon agrupadas por variante y devuelve solo
     la de mayor resolución por variante, manteniendo el orden original.
     No incluye imágenes low-res ni duplicadas.
     """
-    flat = flatten(amazon_json)
+    flat = (view or as_view(amazon_json)).flat
     images_raw = []  # (variant, url, width, height, order_index)
 
     # Detectar estructuras típicas de Amazon SP-API
@@ -619,17 +584,22 @@ def extract_images(amazon_json, max_images=10):
             if (w * h) > (old_w * old_h):
                 best_by_variant[variant] = (url, w, h, idx)
 
-    # Mantener orden original según aparición del variant
-    final = [
-        {"variant": variant, "url": data[0]}
-        for variant, data in best_by_variant.items()
-    ]
+    # Mantener orden original según aparición del variant.
+    # La misma foto bajo dos variantes (o en otra resolución) cuenta una sola vez.
+    final = []
+    seen_urls = set()
+    for variant, data in best_by_variant.items():
+        canon = canonical_image_url(data[0])
+        if canon in seen_urls:
+            continue
+        seen_urls.add(canon)
+        final.append({"variant": variant, "url": data[0]})
 
     # Limitar a max_images
     return final[:max_images]
 
 # ---------- 7) AI: equivalencias y copy ----------
-def ask_gpt_equivalences(category_id, missing, amazon_json, cache: dict):
+def ask_gpt_equivalences(category_id, missing, amazon_json, cache: dict, view: ProductView = None):
     """
     Busca equivalencias entre los atributos de MercadoLibre y las claves reales del JSON de Amazon.
     Usa IA solo si no existen en cache. Amplía el contexto a 800 claves y agrega coincidencia parcial.
@@ -644,7 +614,7 @@ def ask_gpt_equivalences(category_id, missing, amazon_json, cache: dict):
         return {}
 
     # 🔹 Flatten del JSON con mayor contexto
-    flat = flatten(amazon_json)
+    flat = (view or as_view(amazon_json)).flat
     sample = "\n".join(f"{k}: {v}" for k, v in list(flat.items())[:800])
 
     prompt = f"""
@@ -677,7 +647,7 @@ def ask_gpt_equivalences(category_id, missing, amazon_json, cache: dict):
         # 🔸 Guardar en cache principal
         for k, v in eqs.items():
             cache[k] = v
-        _save_cache(CACHE_EQ_PATH, cache)
+        _save_cache(CACHE_EQ_PATH, eqs)
         if eqs:
             print(f"💾 Equivalencias aprendidas: +{len(eqs)}")
 
@@ -1448,12 +1418,8 @@ def detect_category(amazon_json, excluded_categories=None)->Tuple[str,str,float]
     else:
         print("🤖 Modo: CategoryMatcherV2 (embeddings + IA)")
 
-    # 📌 Cache por ASIN - DESHABILITADO PERMANENTEMENTE
-    CAT_CACHE_PATH = "storage/logs/category_cache.json"
-    try:
-        cat_cache = json.load(open(CAT_CACHE_PATH, "r", encoding="utf-8"))
-    except:
-        cat_cache = {}
+    # 📌 Cache por ASIN - DESHABILITADO PERMANENTEMENTE (solo se escribe)
+    cat_cache = _load_cache(CAT_CACHE_PATH)
 
     # ❌ CACHÉ DESHABILITADO - Siempre usar CategoryMatcherV2 con fix LEAF
     # if asin in cat_cache:
@@ -1539,9 +1505,6 @@ def detect_category(amazon_json, excluded_categories=None)->Tuple[str,str,float]
 
         # Guardar en cache
         cat_cache[asin] = {"id": cat_id, "name": cat_name, "sim": sim}
-        os.makedirs("storage/logs", exist_ok=True)
-        with open(CAT_CACHE_PATH, "w", encoding="utf-8") as f:
-            json.dump(cat_cache, f, indent=2, ensure_ascii=False)
 
         return cat_id, cat_name, sim
 
@@ -1627,11 +1590,7 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
     cat_id, cat_name, sim = detect_category(amazon_json, excluded_categories)
 
     # ✅ Si la categoría ya está en caché → IA de equivalencias OFF
-    CAT_CACHE_PATH = "storage/logs/category_cache.json"
-    try:
-        cat_cache = json.load(open(CAT_CACHE_PATH, "r", encoding="utf-8"))
-    except:
-        cat_cache = {}
+    cat_cache = _load_cache(CAT_CACHE_PATH)
 
     category_cached = asin in cat_cache
 
@@ -1641,13 +1600,16 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
     else:
         SKIP_EQ_AI = False
 
+    # Aplanar e indexar el JSON UNA sola vez; todos los extractores usan esta vista
+    view = ProductView(amazon_json)
+
     # brand & model por equivalencias base
-    brand = first_of(amazon_json, BASE_EQUIV["BRAND"]) or ""
-    model = first_of(amazon_json, BASE_EQUIV["MODEL"]) or ""
+    brand = first_of(view, BASE_EQUIV["BRAND"]) or ""
+    model = first_of(view, BASE_EQUIV["MODEL"]) or ""
 
     # título/descr (con caché)
-    title_cache = _load_cache(TITLE_CACHE_PATH, {})
-    desc_cache  = _load_cache(DESC_CACHE_PATH, {})
+    title_cache = _load_cache(TITLE_CACHE_PATH)
+    desc_cache  = _load_cache(DESC_CACHE_PATH)
 
     base_title = amazon_json.get("title") or \
         amazon_json.get("product_title") or \
@@ -1668,7 +1630,6 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
     else:
         title_es = ai_title_es(base_title, brand, model, bullets, 60)
         title_cache[asin] = title_es
-        _save_cache(TITLE_CACHE_PATH, title_cache)
 
     # ==== DESCRIPCIÓN ====
     # Preparar datos para descripción con JSON completo de Amazon
@@ -1692,10 +1653,9 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
             desc_es = f"{title_es}. Producto nuevo e importado desde EE.UU."
 
         desc_cache[asin] = desc_es
-        _save_cache(DESC_CACHE_PATH, desc_cache)
 
     # dimensiones del PAQUETE (shipping dimensions, NO product dimensions)
-    flat = flatten(amazon_json)
+    flat = view
     L = get_pkg_dim(flat, "length")
     W = get_pkg_dim(flat, "width")
     H = get_pkg_dim(flat, "height")
@@ -1734,15 +1694,15 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
     }
 
     # precio + tax + 3PL (mini)
-    base_price = get_amazon_base_price(amazon_json)
-    tax = get_amazon_tax(amazon_json)
+    base_price = get_amazon_base_price(amazon_json, view)
+    tax = get_amazon_tax(amazon_json, view)
     price = compute_price(base_price, tax)
 
     qprint(f"💰 Precio: ${base_price} + tax ${price['tax_usd']} + 3PL ${price['fulfillment_fee_usd']} = costo ${price['cost_usd']} → net proceeds ${price['net_proceeds_usd']} (markup {price['markup_pct']}%)")
 
     # ================== IMÁGENES (Amazon → mini_ml imágenes con metadata) ==================
     # Usamos extract_images (una por variante, ordenada, hi-res)
-    images = extract_images(amazon_json, max_images=12)
+    images = extract_images(amazon_json, max_images=12, view=view)
 
     # Si no hay imágenes, dejamos vacío (tu elección fue A)
     if not images:
@@ -1811,7 +1771,7 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
             qprint(f"⚠️  Error filtrando logos: {str(e)[:60]} - manteniendo todas las imágenes")
     # ==============================================================================
     # gtin
-    gtins = extract_gtins(amazon_json)
+    gtins = extract_gtins(amazon_json, view)
 
     # characteristics (IA)
     main_ch, second_ch = ai_characteristics(amazon_json)
@@ -1898,9 +1858,11 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
                 json.dump(schema, f, indent=2, ensure_ascii=False)
             qprint(f"💾 Schema {cat_id} guardado localmente.")
 
-    equivs = load_equivalences(cat_id)
-    cache_eq = _load_cache(CACHE_EQ_PATH, {})
-    merged_equivs = {**BASE_EQUIV, **equivs, **cache_eq}
+    # Equivalencias de la categoría: LRU + re-consulta de lo que otro publicador pudo haber aprendido
+    equivs = get_equivalence_store().resolve(cat_id, schema.keys())
+    # ChainMap: las coincidencias parciales quedan solo en memoria, lo aprendido por IA se persiste.
+    # Incluye las equivalencias de la categoría → la IA solo se consulta por atributos nunca aprendidos.
+    cache_eq = ChainMap({}, _load_cache(CACHE_EQ_PATH), equivs)
     matched, missing = {}, []
     for aid, meta in schema.items():
         if aid in {"PACKAGE_LENGTH","PACKAGE_WIDTH","PACKAGE_HEIGHT","PACKAGE_WEIGHT"}:
@@ -1916,9 +1878,11 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
             matched[aid] = {"value_name": asin}
             continue
 
+        # Prioridad: cache IA > equivalencias de la categoría > BASE_EQUIV (lookup por clave)
         val = None
-        if aid in merged_equivs:
-            val = _find_in_flat(flat, merged_equivs[aid])
+        eq_keys = cache_eq.get(aid) or equivs.get(aid) or BASE_EQUIV.get(aid)
+        if eq_keys:
+            val = _find_in_flat(flat, eq_keys)
 
         # ⚠️ Filtro de valores sospechosos
         if val is not None and is_suspicious_value(val):
@@ -1953,7 +1917,7 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
     # si faltan y hay IA → aprender equivalencias y reintentar
     if missing and client and not SKIP_EQ_AI:
         print(f"🤖 Buscando equivalencias IA para {len(missing)} atributos…")
-        new_eq = ask_gpt_equivalences(cat_id, missing, amazon_json, cache_eq)
+        new_eq = ask_gpt_equivalences(cat_id, missing, amazon_json, cache_eq, view)
         
         if new_eq:
             save_equivalences(cat_id, new_eq)
@@ -2038,7 +2002,6 @@ def build_mini_ml(amazon_json: dict, excluded_categories=None) -> dict:
         })
         # Actualizar caché con la versión final
         desc_cache[asin] = desc_es
-        _save_cache(DESC_CACHE_PATH, desc_cache)
 
     # salida mini-ML (lo que MainGlobal puede “chupar” sin tokens)
     return {
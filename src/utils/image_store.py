@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# image_store.py
+# ✅ Descarga cada imagen UNA sola vez y la comparte entre consumidores
+#    (extract_images, validate_images_with_ai (peek), LogoFilter, fix_paused_pictures)
+# ✅ Pool HTTP con keep-alive + descargas concurrentes acotadas
+# ✅ Variantes de resolución de Amazon (_SL75_, _SX342_, _AC_SL1500_…)
+#    colapsan a la misma URL canónica → un solo fetch
+# ✅ Bytes en disco + metadata (tamaño, dimensiones, dHash) en SQLite
+# ✅ Cache con tope de tamaño (evicción LRU por último acceso; total en una fila de
+#    image_cache_meta, sin SUM(size) por descarga)
+# ✅ Dedup de descargas en vuelo: dos hilos pidiendo la misma URL esperan el mismo fetch
+# ============================================================
+
+import os
+import io
+import re
+import time
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # Sin Pillow: se guardan bytes pero no dimensiones/hash
+
+try:
+    from src.utils.kv_store import get_connection, Transaction, KV_DB_PATH
+except ModuleNotFoundError:
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from utils.kv_store import get_connection, Transaction, KV_DB_PATH
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "storage/image_cache")
+IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "500"))
+IMAGE_FETCH_WORKERS = int(os.getenv("IMAGE_FETCH_WORKERS", "8"))
+FAILED_RETRY_SECONDS = 600  # URLs que fallaron no se reintentan antes de 10 min
+
+# Modificadores de tamaño de Amazon: "71LlZKF47sL._AC_SL1500_.jpg" → "71LlZKF47sL.jpg"
+_AMAZON_SIZE_RE = re.compile(r"\._[A-Za-z0-9_,\-]+_\.(jpe?g|png|gif|webp)$", re.I)
+
+
+def canonical_image_url(url: str) -> str:
+    """URL canónica (máxima resolución) para imágenes de Amazon; otras URLs sin cambios"""
+    if not url:
+        return url
+    url = url.strip()
+    if "media-amazon.com/images/" in url or "images-amazon.com/images/" in url:
+        return _AMAZON_SIZE_RE.sub(r".\1", url)
+    return url
+
+
+def dhash(img, size: int = 8) -> int:
+    """Difference hash de 64 bits: estable ante re-escalados y recompresión JPEG"""
+    gray = img.convert("L").resize((size + 1, size))
+    px = list(gray.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = px[row * (size + 1) + col]
+            right = px[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return bits
+
+
+class ImageStore:
+    """
+    Cache de imágenes compartido.
+
+    - `get(url)`: metadata {url, path, size, width, height, dhash, status} (descarga si hace falta)
+    - `peek(url)`: metadata solo si ya está cacheada (sin descargar)
+    - `get_bytes(url)` / `open_image(url)`: contenido desde disco
+    - `fetch_many(urls)`: descarga en paralelo, devuelve {url: metadata}
+    - `iter_fetch(urls)`: igual pero va entregando (url, metadata) a medida que terminan
+    """
+
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, max_mb: int = IMAGE_CACHE_MAX_MB,
+                 workers: int = IMAGE_FETCH_WORKERS, db_path: str = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.db_path = db_path or KV_DB_PATH
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=1)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image_store")
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._init_schema()
+
+    @property
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _init_schema(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_cache (
+                url TEXT PRIMARY KEY,
+                path TEXT,
+                size INTEGER DEFAULT 0,
+                width INTEGER,
+                height INTEGER,
+                dhash TEXT,
+                content_type TEXT,
+                status INTEGER,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_image_cache_access ON image_cache(last_access)")
+        # Total de bytes en cache (lo mantienen _download / _evict_if_needed); se siembra una vez
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_cache_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO image_cache_meta (key, value) "
+            "SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM image_cache"
+        )
+
+    # ---------- Metadata ----------
+    @staticmethod
+    def _row_to_meta(row) -> dict:
+        url, path, size, width, height, ph, ctype, status, fetched_at = row
+        return {
+            "url": url, "path": path, "size": size, "width": width, "height": height,
+            "dhash": int(ph, 16) if ph else None, "content_type": ctype,
+            "status": status, "fetched_at": fetched_at,
+            "ok": status == 200 and bool(path) and os.path.exists(path),
+        }
+
+    def _lookup(self, url: str) -> Optional[dict]:
+        row = self._conn.execute(
+            "SELECT url, path, size, width, height, dhash, content_type, status, fetched_at "
+            "FROM image_cache WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        meta = self._row_to_meta(row)
+        if meta["ok"]:
+            self._conn.execute("UPDATE image_cache SET last_access = ? WHERE url = ?", (time.time(), url))
+            return meta
+        if meta["status"] != 200 and time.time() - meta["fetched_at"] < FAILED_RETRY_SECONDS:
+            return meta  # fallo reciente: no reintentar todavía
+        return None  # archivo borrado o fallo viejo → volver a descargar
+
+    # ---------- Descarga ----------
+    def _path_for(self, url: str) -> Path:
+        h = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / h[:2] / f"{h}.img"
+
+    def _download(self, url: str) -> dict:
+        now = time.time()
+        path, size, width, height, ph, ctype = None, 0, None, None, None, None
+        try:
+            r = self.session.get(url, timeout=30)
+            status = r.status_code
+            if status == 200 and r.content:
+                content = r.content
+                ctype = r.headers.get("Content-Type")
+                size = len(content)
+                p = self._path_for(url)
+                p.parent.mkdir(parents=True, exist_ok=True)
+                tmp = p.with_suffix(".tmp")
+                tmp.write_bytes(content)
+                os.replace(tmp, p)
+                path = str(p)
+                if Image is not None:
+                    try:
+                        img = Image.open(io.BytesIO(content))
+                        width, height = img.size
+                        ph = f"{dhash(img):016x}"
+                    except Exception:
+                        pass
+        except requests.RequestException:
+            status = 0
+
+        with Transaction(self._conn) as conn:
+            old = conn.execute("SELECT COALESCE(size, 0) FROM image_cache WHERE url = ?", (url,)).fetchone()
+            old_size = old[0] if old else 0
+            conn.execute(
+                "INSERT OR REPLACE INTO image_cache "
+                "(url, path, size, width, height, dhash, content_type, status, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, path, size, width, height, ph, ctype, status, now, now)
+            )
+            conn.execute("UPDATE image_cache_meta SET value = value + ? WHERE key = 'total_bytes'",
+                         (size - old_size,))
+            total = conn.execute("SELECT value FROM image_cache_meta WHERE key = 'total_bytes'").fetchone()[0]
+        if size and total > self.max_bytes:
+            self._evict_if_needed()
+        return self._row_to_meta((url, path, size, width, height, ph, ctype, status, now))
+
+    def _fetch(self, url: str) -> dict:
+        meta = self._lookup(url)
+        if meta is not None:
+            return meta
+        return self._download(url)
+
+    def _submit(self, url: str) -> Future:
+        """Una sola descarga en vuelo por URL canónica"""
+        with self._lock:
+            fut = self._inflight.get(url)
+            if fut is None:
+                fut = self._executor.submit(self._fetch, url)
+                self._inflight[url] = fut
+                fut.add_done_callback(lambda _f, u=url: self._done(u))
+            return fut
+
+    def _done(self, url: str):
+        with self._lock:
+            self._inflight.pop(url, None)
+
+    # ---------- API ----------
+    def get(self, url: str) -> Optional[dict]:
+        """Metadata de la imagen (descarga si no está cacheada). `meta['ok']` indica si hay bytes."""
+        if not url:
+            return None
+        canon = canonical_image_url(url)
+        meta = self._lookup(canon)
+        if meta is not None:
+            return meta
+        return self._submit(canon).result()
+
+    def peek(self, url: str) -> Optional[dict]:
+        """Metadata solo si la imagen ya está en cache con bytes (nunca descarga)"""
+        if not url:
+            return None
+        meta = self._lookup(canonical_image_url(url))
+        return meta if meta and meta["ok"] else None
+
+    def get_bytes(self, url: str) -> Optional[bytes]:
+        meta = self.get(url)
+        if not meta or not meta["ok"]:
+            return None
+        try:
+            return Path(meta["path"]).read_bytes()
+        except OSError:
+            return None
+
+    def open_image(self, url: str):
+        """PIL.Image desde el cache (None si falla o no hay Pillow)"""
+        content = self.get_bytes(url)
+        if content is None or Image is None:
+            return None
+        try:
+            img = Image.open(io.BytesIO(content))
+            img.load()
+            return img
+        except Exception:
+            return None
+
+    def iter_fetch(self, urls: Iterable[str]) -> Iterator[Tuple[str, dict]]:
+        """Descarga en paralelo y entrega (url_original, metadata) a medida que terminan"""
+        by_canon: Dict[str, list] = {}
+        for url in urls:
+            if url:
+                by_canon.setdefault(canonical_image_url(url), []).append(url)
+        futures = {self._submit(canon): canon for canon in by_canon}
+        for fut in as_completed(futures):
+            canon = futures[fut]
+            meta = fut.result()
+            for url in by_canon[canon]:
+                yield url, meta
+
+    def fetch_many(self, urls: Iterable[str]) -> Dict[str, dict]:
+        return dict(self.iter_fetch(urls))
+
+    # ---------- Tope de tamaño ----------
+    def _evict_if_needed(self):
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        with Transaction(self._conn) as conn:
+            # Se relee dentro de la transacción: otro proceso pudo haber evictado ya
+            total = conn.execute("SELECT value FROM image_cache_meta WHERE key = 'total_bytes'").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            freed = 0
+            for url, path, size in conn.execute(
+                "SELECT url, path, size FROM image_cache WHERE size > 0 ORDER BY last_access ASC"
+            ):
+                victims.append((url, path))
+                freed += size
+                if total - freed <= target:
+                    break
+            conn.executemany("DELETE FROM image_cache WHERE url = ?", [(u,) for u, _ in victims])
+            conn.execute("UPDATE image_cache_meta SET value = value - ? WHERE key = 'total_bytes'", (freed,))
+        for url, path in victims:
+            try:
+                if path:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM image_cache WHERE status = 200"
+        ).fetchone()
+        return {"images": count, "bytes": total, "max_bytes": self.max_bytes}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """Singleton por proceso"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ImageStore()
+    return _store
+
+
+if __name__ == "__main__":
+    s = get_image_store().stats()
+    print(f"🖼️  {s['images']} imágenes, {s['bytes'] / 1024 / 1024:.1f} MB de {s['max_bytes'] / 1024 / 1024:.0f} MB")
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# job_queue.py
+# ✅ Cola de trabajos durable sobre SQLite (WAL), segura entre procesos
+# ✅ Productores encolan a medida que tienen resultados (ej: ASINs que pasan filtros)
+# ✅ Workers de larga vida reclaman trabajos con lease (claim → heartbeat → complete/fail)
+# ✅ Leases vencidos se re-asignan solos (worker caído = trabajo no perdido)
+# ✅ Dedup por clave (mismo ASIN no se encola dos veces mientras esté vivo)
+# ✅ Lotes (ej: keyword) con resumen de resultados para feedback al productor
+# ✅ keep_alive(): hilo de heartbeat mientras el worker procesa un trabajo largo
+# ============================================================
+
+import os
+import json
+import time
+import socket
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    from src.utils.kv_store import get_connection, Transaction
+except ModuleNotFoundError:
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from utils.kv_store import get_connection, Transaction
+
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "storage/job_queue.db")
+DEFAULT_LEASE_SECONDS = 600
+
+# Estados
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Cola con nombre dentro de una DB SQLite compartida.
+
+    Ciclo de vida de un trabajo:
+        pending --claim--> running --complete--> done
+                              |--fail(retry)--> pending (hasta max_attempts)
+                              |--fail--------> failed
+                              |--lease vencido--> se puede volver a reclamar (hasta max_attempts)
+    """
+
+    def __init__(self, name: str, db_path: str = None, max_attempts: int = 3,
+                 lease_seconds: int = DEFAULT_LEASE_SECONDS):
+        self.name = name
+        self.db_path = db_path or JOB_QUEUE_DB
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._init_schema()
+
+    @property
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _init_schema(self):
+        conn = self._conn
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                job_key TEXT NOT NULL,
+                payload TEXT,
+                batch TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until REAL,
+                result TEXT,
+                error TEXT,
+                enqueued_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                UNIQUE (queue, job_key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(queue, status, priority DESC, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(queue, status, lease_until)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs(queue, batch, status)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_batches (
+                queue TEXT NOT NULL,
+                batch TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                reported_at REAL,
+                PRIMARY KEY (queue, batch)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_workers (
+                queue TEXT NOT NULL,
+                worker TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                processed INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (queue, worker)
+            )
+        """)
+
+    def _tx(self):
+        return Transaction(self._conn)
+
+    # ---------- Productor ----------
+    def enqueue(self, job_key: str, payload: Any = None, batch: str = None,
+                priority: int = 0, requeue_finished: bool = False) -> bool:
+        """Encola un trabajo. Retorna False si ya estaba pendiente/en curso/hecho (dedup por clave)."""
+        return self.enqueue_many([job_key], payload_by_key={job_key: payload}, batch=batch,
+                                 priority=priority, requeue_finished=requeue_finished) == 1
+
+    def enqueue_many(self, job_keys: Iterable[str], payload_by_key: Dict[str, Any] = None,
+                     batch: str = None, priority: int = 0, requeue_finished: bool = False) -> int:
+        """
+        Encola varios trabajos en una transacción. Retorna cuántos se agregaron.
+        Dedup por job_key contra pending/running/done: un trabajo fallido vuelve a pending
+        (el fallo pudo ser transitorio); con requeue_finished=True también los done.
+        El lote solo se crea si quedó al menos un trabajo en él.
+        """
+        payload_by_key = payload_by_key or {}
+        now = time.time()
+        requeue = (DONE, FAILED) if requeue_finished else (FAILED,)
+        added = 0
+        with self._tx() as conn:
+            for key in job_keys:
+                if not key:
+                    continue
+                payload = json.dumps(payload_by_key.get(key), ensure_ascii=False)
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO jobs (queue, job_key, payload, batch, priority, status, enqueued_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.name, key, payload, batch, priority, PENDING, now)
+                )
+                if cur.rowcount:
+                    added += 1
+                    continue
+                cur = conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = 0, batch = ?, payload = ?, priority = ?, "
+                    "worker = NULL, lease_until = NULL, result = NULL, error = NULL, "
+                    "enqueued_at = ?, started_at = NULL, finished_at = NULL "
+                    f"WHERE queue = ? AND job_key = ? AND status IN ({', '.join('?' for _ in requeue)})",
+                    (PENDING, batch, payload, priority, now, self.name, key, *requeue)
+                )
+                added += cur.rowcount
+            if batch and added:
+                conn.execute(
+                    "INSERT OR IGNORE INTO job_batches (queue, batch, created_at) VALUES (?, ?, ?)",
+                    (self.name, batch, now)
+                )
+        return added
+
+    # ---------- Worker ----------
+    def claim(self, worker: str = None, lease_seconds: int = None) -> Optional[dict]:
+        """
+        Reclama el próximo trabajo (mayor prioridad, más antiguo) o uno con lease vencido.
+        Retorna el trabajo o None si la cola está vacía.
+        """
+        worker = worker or default_worker_id()
+        now = time.time()
+        lease = lease_seconds or self.lease_seconds
+        with self._tx() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE queue = ? AND status = ? ORDER BY priority DESC, id LIMIT 1",
+                (self.name, PENDING)
+            ).fetchone()
+            while row is None:
+                row = conn.execute(
+                    "SELECT id, attempts FROM jobs WHERE queue = ? AND status = ? AND lease_until < ? "
+                    "ORDER BY lease_until LIMIT 1",
+                    (self.name, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[1] >= self.max_attempts:
+                    # El worker se cayó en cada intento: no volver a reclamarlo
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, finished_at = ? WHERE id = ?",
+                        (FAILED, f"Lease vencido {row[1]} veces (worker caído)", now, row[0])
+                    )
+                    row = None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, "
+                "started_at = ? WHERE id = ?",
+                (RUNNING, worker, now + lease, now, row[0])
+            )
+        return self.get(row[0])
+
+    def heartbeat(self, job_id: int, worker: str = None, lease_seconds: int = None) -> bool:
+        """Extiende el lease. False si el trabajo ya no es de este worker (lo reclamó otro)."""
+        worker = worker or default_worker_id()
+        lease = lease_seconds or self.lease_seconds
+        cur = self._conn.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = ?",
+            (time.time() + lease, job_id, worker, RUNNING)
+        )
+        return cur.rowcount == 1
+
+    def keep_alive(self, job_id: int, worker: str = None) -> "_LeaseKeeper":
+        """
+        Context manager: renueva el lease en segundo plano mientras dura el bloque.
+
+            with queue.keep_alive(job["id"], worker_id) as lease:
+                ...trabajo largo...
+                if lease.lost: ...otro worker lo reclamó...
+        """
+        return _LeaseKeeper(self, job_id, worker or default_worker_id())
+
+    def complete(self, job_id: int, result: Any = None, worker: str = None) -> bool:
+        worker = worker or default_worker_id()
+        with self._tx() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, lease_until = NULL, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (DONE, json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id, worker, RUNNING)
+            )
+            self._count_processed(conn, worker)
+        return cur.rowcount == 1
+
+    def fail(self, job_id: int, error: str = None, retry: bool = True, result: Any = None,
+             worker: str = None) -> bool:
+        """Marca fallo. Con retry=True vuelve a pending si quedan intentos."""
+        worker = worker or default_worker_id()
+        now = time.time()
+        with self._tx() as conn:
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND status = ?",
+                               (job_id, worker, RUNNING)).fetchone()
+            if row is None:
+                return False
+            status = PENDING if retry and row[0] < self.max_attempts else FAILED
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, lease_until = NULL, finished_at = ? WHERE id = ?",
+                (status, (error or "")[:1000], json.dumps(result, ensure_ascii=False, default=str),
+                 None if status == PENDING else now, job_id)
+            )
+            self._count_processed(conn, worker)
+        return True
+
+    def register_worker(self, worker: str = None):
+        """Latido del proceso worker (independiente de los trabajos)"""
+        worker = worker or default_worker_id()
+        now = time.time()
+        self._conn.execute(
+            "INSERT INTO job_workers (queue, worker, started_at, last_seen) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(queue, worker) DO UPDATE SET last_seen = excluded.last_seen",
+            (self.name, worker, now, now)
+        )
+
+    def _count_processed(self, conn, worker: str):
+        conn.execute(
+            "UPDATE job_workers SET processed = processed + 1, last_seen = ? WHERE queue = ? AND worker = ?",
+            (time.time(), self.name, worker)
+        )
+
+    def live_workers(self, max_silence_seconds: int = 120) -> List[dict]:
+        rows = self._conn.execute(
+            "SELECT worker, started_at, last_seen, processed FROM job_workers "
+            "WHERE queue = ? AND last_seen >= ?",
+            (self.name, time.time() - max_silence_seconds)
+        ).fetchall()
+        return [{"worker": w, "started_at": s, "last_seen": l, "processed": p} for w, s, l, p in rows]
+
+    # ---------- Consultas ----------
+    def get(self, job_id: int) -> Optional[dict]:
+        row = self._conn.execute(
+            "SELECT id, job_key, payload, batch, priority, status, attempts, worker, lease_until, "
+            "result, error, enqueued_at, started_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ["id", "job_key", "payload", "batch", "priority", "status", "attempts", "worker",
+                "lease_until", "result", "error", "enqueued_at", "started_at", "finished_at"]
+        job = dict(zip(keys, row))
+        for k in ("payload", "result"):
+            if job[k] is not None:
+                try:
+                    job[k] = json.loads(job[k])
+                except (TypeError, ValueError):
+                    pass
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        out = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for status, count in self._conn.execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (self.name,)
+        ):
+            out[status] = count
+        return out
+
+    def keys_by_status(self) -> Dict[str, str]:
+        """job_key → status de todos los jobs de la cola (una sola query)"""
+        return dict(self._conn.execute(
+            "SELECT job_key, status FROM jobs WHERE queue = ?", (self.name,)
+        ))
+
+    def batch_summary(self, batch: str) -> Dict[str, int]:
+        out = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for status, count in self._conn.execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE queue = ? AND batch = ? GROUP BY status",
+            (self.name, batch)
+        ):
+            out[status] = count
+        return out
+
+    def pop_finished_batches(self) -> List[dict]:
+        """
+        Lotes sin trabajos pendientes/en curso que todavía no se reportaron.
+        Los marca como reportados (cada lote se devuelve una sola vez).
+        """
+        out = []
+        with self._tx() as conn:
+            rows = conn.execute(
+                "SELECT b.batch FROM job_batches b WHERE b.queue = ? AND b.reported_at IS NULL "
+                "AND NOT EXISTS (SELECT 1 FROM jobs j WHERE j.queue = b.queue AND j.batch = b.batch "
+                "AND j.status IN (?, ?))",
+                (self.name, PENDING, RUNNING)
+            ).fetchall()
+            now = time.time()
+            for (batch,) in rows:
+                summary = {DONE: 0, FAILED: 0}
+                for status, count in conn.execute(
+                    "SELECT status, COUNT(*) FROM jobs WHERE queue = ? AND batch = ? GROUP BY status",
+                    (self.name, batch)
+                ):
+                    summary[status] = count
+                conn.execute("UPDATE job_batches SET reported_at = ? WHERE queue = ? AND batch = ?",
+                             (now, self.name, batch))
+                # Lote vacío (sus trabajos se re-encolaron en otro lote): se cierra sin reportar
+                if summary[DONE] or summary[FAILED]:
+                    out.append({"batch": batch, "done": summary[DONE], "failed": summary[FAILED]})
+        return out
+
+    def purge(self) -> int:
+        """Borra todos los trabajos, lotes y workers de la cola (ej: colas por corrida al terminar)"""
+        with self._tx() as conn:
+            removed = conn.execute("DELETE FROM jobs WHERE queue = ?", (self.name,)).rowcount
+            conn.execute("DELETE FROM job_batches WHERE queue = ?", (self.name,))
+            conn.execute("DELETE FROM job_workers WHERE queue = ?", (self.name,))
+        return removed
+
+
+class _LeaseKeeper:
+    """Hilo daemon que llama heartbeat() cada lease/3 hasta salir del bloque"""
+
+    def __init__(self, queue: JobQueue, job_id: int, worker: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker = worker
+        self.lost = False
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        interval = max(10, self.queue.lease_seconds // 3)
+        while not self._done.wait(interval):
+            if not self.queue.heartbeat(self.job_id, self.worker):
+                self.lost = True  # Lease perdido: otro worker lo reclamó
+                break
+            self.queue.register_worker(self.worker)
+
+    def __enter__(self) -> "_LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._done.set()
+        return False
+
+
+if __name__ == "__main__":
+    # Uso: python3 src/utils/job_queue.py <cola>  → estado de la cola
+    import sys
+    name = sys.argv[1] if len(sys.argv) > 1 else "publish"
+    q = JobQueue(name)
+    s = q.stats()
+    print(f"📋 Cola '{name}': {s[PENDING]} pendientes | {s[RUNNING]} en curso | {s[DONE]} ok | {s[FAILED]} fallidos")
+    for w in q.live_workers():
+        print(f"   👷 {w['worker']}: {w['processed']} procesados")
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# kv_store.py
+# ✅ Cache clave→valor compartido sobre SQLite (WAL)
+# ✅ get/put atómicos por clave (O(1) amortizado, no reescribe archivos)
+# ✅ Seguro entre procesos (varios publicadores en paralelo)
+# ✅ Migración one-shot desde los caches JSON legacy
+# ✅ Expiración opcional al leer (max_age sobre updated_at) + lectura batch
+# ============================================================
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+KV_DB_PATH = os.getenv("KV_STORE_DB", "storage/cache_store.db")
+
+_local = threading.local()
+
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """Retorna una conexión por hilo y por DB (SQLite no comparte conexiones entre hilos)"""
+    conns = getattr(_local, "conns", None)
+    # Tras un fork el hijo NO debe reusar las conexiones del padre (locks de SQLite compartidos)
+    if conns is None or _local.pid != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(db_path)
+    if conn is None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS kv (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS kv_migrations (
+                namespace TEXT PRIMARY KEY,
+                source_path TEXT,
+                migrated_at REAL NOT NULL,
+                rows INTEGER
+            )
+        """)
+        conns[db_path] = conn
+    return conn
+
+
+class Transaction:
+    """BEGIN IMMEDIATE / COMMIT / ROLLBACK (las conexiones están en autocommit)"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+class KVStore:
+    """
+    Namespace de un cache clave→valor persistente.
+
+    Se usa como un dict (`key in store`, `store[key]`, `store[key] = v`, `store.get(key)`),
+    pero cada operación toca solo una fila: el costo no crece con el tamaño del cache.
+    Los valores se serializan como JSON.
+    """
+
+    def __init__(self, namespace: str, legacy_json: Optional[str] = None, db_path: str = None):
+        self.namespace = namespace
+        self.db_path = db_path or KV_DB_PATH
+        if legacy_json:
+            self.migrate_from_json(legacy_json)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return get_connection(self.db_path)
+
+    # ---------- API tipo dict ----------
+    def get(self, key: str, default: Any = None, max_age: float = None) -> Any:
+        """max_age (segundos): si la clave es más vieja se trata como ausente"""
+        row = self._conn.execute(
+            "SELECT value, updated_at FROM kv WHERE namespace = ? AND key = ?",
+            (self.namespace, str(key))
+        ).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return default
+        try:
+            return json.loads(row[0])
+        except (TypeError, ValueError):
+            return default
+
+    def get_many(self, keys: Iterable[str], max_age: float = None) -> Dict[str, Any]:
+        """Lee varias claves en pocas queries. Retorna solo las presentes (y vigentes)"""
+        keys = list(dict.fromkeys(str(k) for k in keys))
+        min_updated = time.time() - max_age if max_age is not None else None
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT key, value, updated_at FROM kv WHERE namespace = ? "
+                f"AND key IN ({','.join('?' * len(chunk))})",
+                (self.namespace, *chunk)
+            )
+            for key, value, updated_at in rows:
+                if min_updated is not None and updated_at < min_updated:
+                    continue
+                try:
+                    found[key] = json.loads(value)
+                except (TypeError, ValueError):
+                    continue
+        return found
+
+    def put(self, key: str, value: Any):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, str(key), json.dumps(value, ensure_ascii=False), time.time())
+        )
+
+    def put_many(self, items: dict):
+        """Inserta varias claves en una sola transacción"""
+        now = time.time()
+        rows = [
+            (self.namespace, str(k), json.dumps(v, ensure_ascii=False), now)
+            for k, v in items.items()
+        ]
+        if not rows:
+            return
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key: str):
+        self._conn.execute(
+            "DELETE FROM kv WHERE namespace = ? AND key = ?",
+            (self.namespace, str(key))
+        )
+
+    def __contains__(self, key) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM kv WHERE namespace = ? AND key = ?",
+            (self.namespace, str(key))
+        ).fetchone()
+        return row is not None
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+    def __len__(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM kv WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def keys(self) -> Iterator[str]:
+        for (k,) in self._conn.execute(
+            "SELECT key FROM kv WHERE namespace = ?", (self.namespace,)
+        ):
+            yield k
+
+    # ---------- Migración ----------
+    def migrate_from_json(self, path: str) -> int:
+        """
+        Importa (una sola vez por namespace) un cache JSON legacy {clave: valor}.
+        El archivo original no se modifica. Retorna cantidad de claves importadas.
+        """
+        conn = self._conn
+        done = conn.execute(
+            "SELECT 1 FROM kv_migrations WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        if done:
+            return 0
+
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"⚠️ No se pudo leer cache legacy {path}: {e}")
+                data = {}
+        if not isinstance(data, dict):
+            data = {}
+
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-chequear dentro de la transacción: otro proceso pudo migrar antes
+            done = conn.execute(
+                "SELECT 1 FROM kv_migrations WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+            if done:
+                conn.execute("COMMIT")
+                return 0
+            # INSERT OR IGNORE: nunca pisar valores que ya se escribieron en el store
+            conn.executemany(
+                "INSERT OR IGNORE INTO kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                [(self.namespace, str(k), json.dumps(v, ensure_ascii=False), now) for k, v in data.items()]
+            )
+            conn.execute(
+                "INSERT INTO kv_migrations (namespace, source_path, migrated_at, rows) VALUES (?, ?, ?, ?)",
+                (self.namespace, path, now, len(data))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if data:
+            print(f"📦 Cache '{self.namespace}' migrado desde {path}: {len(data)} claves")
+        return len(data)
+
+
+_MISSING = object()
+
+
+if __name__ == "__main__":
+    # Uso: python3 src/utils/kv_store.py <namespace>  → muestra cantidad de claves
+    import sys
+    ns = sys.argv[1] if len(sys.argv) > 1 else None
+    conn = get_connection(KV_DB_PATH)
+    if ns:
+        print(f"{ns}: {len(KVStore(ns))} claves")
+    else:
+        for name, count in conn.execute("SELECT namespace, COUNT(*) FROM kv GROUP BY namespace"):
+            print(f"{name}: {count} claves")
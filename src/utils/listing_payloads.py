@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# listing_payloads.py
+# ✅ Columnas pesadas de listings (mini_ml_data, attributes, main_features,
+#    description, images_urls) en una tabla aparte, comprimidas con zlib
+# ✅ listings queda liviana: las queries calientes (sync, reportes) leen menos páginas
+# ✅ Carga en batch: load_payloads() / attach_payloads() solo para las filas que lo necesitan
+# ✅ Compatibilidad: si un script viejo escribe la columna inline, se lee igual
+#    (inline tiene prioridad) y compact_inline_payloads() la mueve a la tabla
+# ============================================================
+
+import zlib
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+LISTINGS_DB_PATH = "storage/listings_database.db"
+BULKY_COLUMNS = ("mini_ml_data", "attributes", "main_features", "description", "images_urls")
+COMPRESSION_LEVEL = 6
+
+_ready_dbs = set()
+
+
+def compress_text(text: Optional[str]) -> Optional[bytes]:
+    if text is None:
+        return None
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decompress_blob(blob) -> Optional[str]:
+    if blob is None:
+        return None
+    if isinstance(blob, str):  # Valor inline (TEXT) sin comprimir
+        return blob
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def _db_file(conn: sqlite3.Connection) -> str:
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def ensure_listing_payloads(conn: sqlite3.Connection) -> int:
+    """
+    Crea listing_payloads + índices de listings (asin, date_updated) y mueve
+    a la tabla lo que haya quedado inline. Una vez por proceso y DB.
+
+    Returns:
+        int: listings compactados en esta llamada
+    """
+    db_file = _db_file(conn)
+    if db_file in _ready_dbs:
+        return 0
+
+    columns = ",\n".join(f"            {col} BLOB" for col in BULKY_COLUMNS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS listing_payloads (
+            listing_id INTEGER PRIMARY KEY,
+{columns}
+        )
+    """)
+    # DBs reconstruidas con un esquema más corto: las columnas inline deben existir (quedan en NULL)
+    existing = {col[1] for col in conn.execute("PRAGMA table_info(listings)")}
+    for col in BULKY_COLUMNS:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE listings ADD COLUMN {col} TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_asin ON listings(asin)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_date_updated ON listings(date_updated)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_listing_payloads_delete
+        AFTER DELETE ON listings
+        BEGIN
+            DELETE FROM listing_payloads WHERE listing_id = OLD.id;
+        END
+    """)
+    conn.commit()
+
+    moved = compact_inline_payloads(conn)
+    if moved:
+        print(f"🗜️  listing_payloads: {moved} listings compactados (columnas pesadas comprimidas)")
+
+    _ready_dbs.add(db_file)
+    return moved
+
+
+def _upsert_sql() -> str:
+    cols = ", ".join(BULKY_COLUMNS)
+    placeholders = ", ".join("?" * (len(BULKY_COLUMNS) + 1))
+    updates = ", ".join(f"{col} = COALESCE(excluded.{col}, listing_payloads.{col})" for col in BULKY_COLUMNS)
+    return (f"INSERT INTO listing_payloads (listing_id, {cols}) VALUES ({placeholders}) "
+            f"ON CONFLICT(listing_id) DO UPDATE SET {updates}")
+
+
+def compact_inline_payloads(conn: sqlite3.Connection, batch_size: int = 500) -> int:
+    """Mueve (comprimidas) las columnas pesadas que estén inline en listings → listing_payloads"""
+    cols = ", ".join(BULKY_COLUMNS)
+    inline = " OR ".join(f"{col} IS NOT NULL" for col in BULKY_COLUMNS)
+    clear = ", ".join(f"{col} = NULL" for col in BULKY_COLUMNS)
+    upsert = _upsert_sql()
+
+    moved = 0
+    while True:
+        rows = conn.execute(f"SELECT id, {cols} FROM listings WHERE {inline} LIMIT ?", (batch_size,)).fetchall()
+        if not rows:
+            break
+        conn.executemany(upsert, [(row[0], *(compress_text(v) for v in row[1:])) for row in rows])
+        conn.executemany(f"UPDATE listings SET {clear} WHERE id = ?", [(row[0],) for row in rows])
+        conn.commit()
+        moved += len(rows)
+    return moved
+
+
+def store_payload(conn: sqlite3.Connection, listing_id: int, values: Dict[str, Optional[str]]):
+    """
+    Guarda columnas pesadas de un listing (solo las presentes en `values`) y las
+    deja en NULL inline. No hace commit: va en la transacción del llamador.
+    """
+    row = [compress_text(values.get(col)) for col in BULKY_COLUMNS]
+    conn.execute(_upsert_sql(), (listing_id, *row))
+    present = [col for col in BULKY_COLUMNS if col in values]
+    if present:
+        conn.execute(f"UPDATE listings SET {', '.join(f'{col} = NULL' for col in present)} WHERE id = ?",
+                     (listing_id,))
+
+
+def load_payloads(conn: sqlite3.Connection, listing_ids: Iterable[int],
+                  fields: Iterable[str] = BULKY_COLUMNS) -> Dict[int, Dict[str, Optional[str]]]:
+    """
+    {listing_id: {campo: texto}} descomprimido, en batch.
+    Si la columna está inline (escrita por un script viejo) tiene prioridad.
+    """
+    fields = [f for f in fields if f in BULKY_COLUMNS]
+    ensure_listing_payloads(conn)
+    ids = list(dict.fromkeys(listing_ids))
+    select = ", ".join(f"l.{f}, p.{f}" for f in fields)
+
+    out = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        for row in conn.execute(
+            f"SELECT l.id, {select} FROM listings l LEFT JOIN listing_payloads p ON p.listing_id = l.id "
+            f"WHERE l.id IN ({','.join('?' * len(chunk))})",
+            chunk
+        ):
+            values = row[1:]
+            out[row[0]] = {
+                f: values[2 * n] if values[2 * n] is not None else decompress_blob(values[2 * n + 1])
+                for n, f in enumerate(fields)
+            }
+    return out
+
+
+def attach_payloads(conn: sqlite3.Connection, listings: List[dict], fields: Iterable[str] = BULKY_COLUMNS,
+                    id_key: str = "id") -> List[dict]:
+    """Completa los dicts de listings (con su `id`) con las columnas pesadas, en una pasada"""
+    fields = list(fields)
+    payloads = load_payloads(conn, [l[id_key] for l in listings], fields)
+    for listing in listings:
+        listing.update(payloads.get(listing[id_key], {f: None for f in fields}))
+    return listings
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# phrase_matcher.py
+# ✅ N frases buscadas en un texto sin recorrer la lista entera
+# ✅ Se compila una vez (miles de marcas/keywords) y se reusa
+# ✅ Índice por trigrama "ancla": cada frase se indexa por su trigrama más raro;
+#    del texto solo se verifican las frases cuyo ancla aparece (verificación en C)
+# ✅ Modo substring (equivale a `frase in texto`) o palabra completa
+#    (equivale a re.search(r'\b' + re.escape(frase) + r'\b', texto))
+# ✅ Índice de cada frase = orden original → permite "primera de la lista que matchea"
+# ✅ text_grams(texto) se puede calcular una vez y pasar a varios matchers
+#
+# Nota: un autómata Aho-Corasick en Python puro recorre el texto carácter a
+# carácter en el intérprete y resulta MÁS lento que N `in` (que corren en C)
+# para listas de cientos de frases; el ancla mantiene el trabajo en C.
+# ============================================================
+
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+GRAM = 3  # text_grams asume trigramas (zip de 3 desplazamientos)
+
+
+def text_grams(text: str) -> Set[str]:
+    """Trigramas de un texto (reusable entre varios matchers sobre el mismo texto)"""
+    return set(map("".join, zip(text, text[1:], text[2:])))
+
+
+def _is_word_char(ch: str) -> bool:
+    """Misma definición de carácter de palabra que \\w de `re` (unicode)"""
+    return ch.isalnum() or ch == "_"
+
+
+class PhraseMatcher:
+    """
+    Matcher multi-frase.
+
+        m = PhraseMatcher(["nike", "tom ford"])
+        m.search("tom ford noir")     → "tom ford"
+        m.indices("nike by tom ford") → {0, 1}
+        m.first("nike by tom ford")   → 0  (menor índice = primera de la lista)
+
+    Las frases y el texto se comparan tal cual: normalizar (lower, etc.) es
+    responsabilidad del llamador, igual que con `in`.
+    """
+
+    def __init__(self, phrases: Iterable[str], word_boundary: bool = False):
+        self.word_boundary = word_boundary
+        self.phrases: List[str] = list(dict.fromkeys(p for p in phrases if p))
+
+        # Frecuencia de cada trigrama entre las frases → el ancla es el menos común
+        gram_sets = [{p[i:i + GRAM] for i in range(len(p) - GRAM + 1)} for p in self.phrases]
+        freq = Counter(g for grams in gram_sets for g in grams)
+
+        self._short: List[int] = []             # Frases < GRAM: siempre candidatas
+        self._by_anchor: Dict[str, List[int]] = {}
+        for idx, grams in enumerate(gram_sets):
+            if not grams:
+                self._short.append(idx)
+                continue
+            anchor = min(grams, key=lambda g: (freq[g], g))
+            self._by_anchor.setdefault(anchor, []).append(idx)
+        self._anchors = set(self._by_anchor)
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    # ---------- Internos ----------
+    def _candidates(self, text: str, grams: Set[str] = None) -> List[int]:
+        """Índices (ordenados) de frases cuyo ancla aparece en el texto"""
+        anchors = self._anchors
+        if grams is not None:
+            hits = anchors & grams
+        elif len(anchors) * 2 <= len(text):
+            hits = [a for a in anchors if a in text]
+        else:
+            hits = anchors.intersection(text_grams(text))
+        if not hits and not self._short:
+            return []
+        candidates = list(self._short)
+        for anchor in hits:
+            candidates.extend(self._by_anchor[anchor])
+        candidates.sort()
+        return candidates
+
+    def _boundary_ok(self, text: str, start: int, end: int) -> bool:
+        n = len(text)
+        left_in = _is_word_char(text[start])
+        left_out = start > 0 and _is_word_char(text[start - 1])
+        right_in = _is_word_char(text[end - 1])
+        right_out = end < n and _is_word_char(text[end])
+        return left_in != left_out and right_in != right_out
+
+    def _occurrences(self, text: str, idx: int) -> Iterator[int]:
+        """Posiciones de inicio válidas de la frase idx (respeta word_boundary)"""
+        phrase = self.phrases[idx]
+        size = len(phrase)
+        pos = text.find(phrase)
+        while pos != -1:
+            if not self.word_boundary or self._boundary_ok(text, pos, pos + size):
+                yield pos
+            pos = text.find(phrase, pos + 1)
+
+    def _matches(self, text: str, idx: int) -> bool:
+        if not self.word_boundary:
+            return self.phrases[idx] in text
+        for _ in self._occurrences(text, idx):
+            return True
+        return False
+
+    # ---------- API ----------
+    def finditer(self, text: str, grams: Set[str] = None) -> Iterator[Tuple[int, int, int]]:
+        """Todas las ocurrencias como (inicio, fin, índice_de_frase), ordenadas por inicio"""
+        if not text or not self.phrases:
+            return iter(())
+        found = []
+        for idx in self._candidates(text, grams):
+            size = len(self.phrases[idx])
+            found.extend((pos, pos + size, idx) for pos in self._occurrences(text, idx))
+        found.sort()
+        return iter(found)
+
+    def indices(self, text: str, grams: Set[str] = None) -> Set[int]:
+        """Índices de todas las frases presentes en el texto"""
+        if not text or not self.phrases:
+            return set()
+        return {idx for idx in self._candidates(text, grams) if self._matches(text, idx)}
+
+    def first(self, text: str, grams: Set[str] = None) -> Optional[int]:
+        """Menor índice presente (= primera frase de la lista original que matchea)"""
+        if not text or not self.phrases:
+            return None
+        for idx in self._candidates(text, grams):
+            if self._matches(text, idx):
+                return idx
+        return None
+
+    def search(self, text: str, grams: Set[str] = None) -> Optional[str]:
+        """Frase que aparece primero en el texto (la más a la izquierda)"""
+        for _, _, idx in self.finditer(text, grams):
+            return self.phrases[idx]
+        return None
+
+    def found_phrases(self, text: str, grams: Set[str] = None) -> List[str]:
+        """Frases presentes, en el orden original de la lista"""
+        return [self.phrases[idx] for idx in sorted(self.indices(text, grams))]
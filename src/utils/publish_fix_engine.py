@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# publish_fix_engine.py
+# ✅ Motor de correcciones para errores de publicación en ML
+# ✅ Reglas deterministas: (category_id, error, atributo) → fix
+# ✅ Memoria local de fixes (SQLite): qué funcionó y qué no, por categoría
+# ✅ IA solo para errores/atributos nunca vistos; lo que la IA resuelve
+#    se aprende (clave de origen en el JSON de Amazon) para la próxima vez
+# ============================================================
+
+import os
+import re
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from src.utils.kv_store import get_connection, KV_DB_PATH
+    from src.pipeline.equivalence_store import get_equivalence_store
+    from src.pipeline.product_view import as_view
+except ModuleNotFoundError:
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from utils.kv_store import get_connection, KV_DB_PATH
+    from pipeline.equivalence_store import get_equivalence_store
+    from pipeline.product_view import as_view
+
+# Tipos de fix
+FIX_DROP_GTIN = "drop_gtin"              # GTIN reutilizado → publicar sin GTIN
+FIX_BLOCK_CATEGORY = "block_category"    # Categoría no sirve → regenerar con otra
+FIX_FILL_ATTRIBUTE = "fill_attribute"    # Atributo faltante → completar desde JSON de Amazon
+FIX_NORMALIZE_FORMAT = "normalize_format"  # Formato inválido → normalizar valor
+FIX_SOURCE_KEY = "source_key"            # Memoria: attr se resuelve con una clave del JSON de Amazon
+FIX_CONSTANT = "constant_value"          # Memoria: attr se resolvió con el mismo valor en la categoría
+
+# Firmas de error conocidas → (error_key, fix)
+# Se evalúan en orden; cause_id y code vienen del JSON de ML, `text` es fallback por substring
+ERROR_RULES = [
+    {"key": "gtin_reused", "cause_ids": {3701}, "codes": {"item.attribute.invalid_product_identifier"},
+     "text": ("invalid_product_identifier",), "fix": FIX_DROP_GTIN},
+    {"key": "gtin_required", "cause_ids": {7810}, "codes": set(),
+     "text": ("7810",), "fix": FIX_BLOCK_CATEGORY},
+    {"key": "category_not_allowed", "cause_ids": {126}, "codes": {"item.not_allowed", "item.category_id.invalid"},
+     "text": ("not_allowed", "Title and photos did not match"), "fix": FIX_BLOCK_CATEGORY},
+    {"key": "brand_invalid", "cause_ids": {147, 3250}, "codes": set(),
+     "text": (), "fix": FIX_BLOCK_CATEGORY},
+    {"key": "missing_attribute", "cause_ids": {3704}, "codes": {"item.attributes.missing_required",
+                                                               "item.attributes.missing_catalog_required"},
+     "text": ("missing_required", "missing_catalog_required", "is missing", "was omitted"), "fix": FIX_FILL_ATTRIBUTE},
+    {"key": "invalid_attribute_format", "cause_ids": {3708}, "codes": set(),
+     "text": ("invalid_format",), "fix": FIX_NORMALIZE_FORMAT},
+]
+
+_ATTR_PATTERNS = [
+    re.compile(r'attribute\s+\[(\w+)\]\s+is\s+missing', re.IGNORECASE),
+    re.compile(r'Attribute\s+(\w+)\s+with\s+value\s+Default', re.IGNORECASE),
+    re.compile(r'Attribute\s+(\w+)\s+.*?was\s+omitted', re.IGNORECASE),
+    re.compile(r'attribute["\s:]+([A-Z][A-Z0-9_]+)'),
+    re.compile(r'attributes?\s*\[?([A-Z][A-Z0-9_]{2,})\]?'),
+]
+
+# Un valor constante se reutiliza sin IA solo si funcionó en varios productos y nunca falló
+CONSTANT_MIN_SUCCESSES = 2
+# Solo atributos que no dependen del producto pueden aprenderse como constante de la categoría
+# (COLOR, MODEL, etc. se vuelven a extraer por producto: un "Black" aprendido terminaría en un item rojo)
+CONSTANT_ATTRIBUTES = {"ITEM_CONDITION", "SALE_FORMAT", "EMPTY_GTIN_REASON"}
+
+
+def _json_objects(text: str) -> List[dict]:
+    """Extrae todos los objetos JSON embebidos en un string de error ("POST url → 400 {...} | {...}")"""
+    decoder = json.JSONDecoder()
+    out, i = [], 0
+    while True:
+        i = text.find("{", i)
+        if i < 0:
+            break
+        try:
+            obj, end = decoder.raw_decode(text, i)
+            if isinstance(obj, dict):
+                out.append(obj)
+            i = end
+        except ValueError:
+            i += 1
+    return out
+
+
+def _attributes_in(text: str) -> List[str]:
+    found = []
+    for pattern in _ATTR_PATTERNS:
+        for m in pattern.findall(text or ""):
+            if m not in found and m.isupper():
+                found.append(m)
+    return found
+
+
+def parse_ml_error(error_text: str) -> List[dict]:
+    """
+    Convierte el texto de una excepción de publicación en una lista de causas:
+    [{"cause_id": int|None, "code": str, "message": str, "attributes": [..]}]
+    """
+    causes = []
+    for obj in _json_objects(error_text or ""):
+        raw_causes = obj.get("cause") or []
+        if isinstance(raw_causes, dict):
+            raw_causes = [raw_causes]
+        for c in raw_causes:
+            if not isinstance(c, dict):
+                continue
+            msg = str(c.get("message", ""))
+            causes.append({
+                "cause_id": c.get("cause_id"),
+                "code": str(c.get("code", "")),
+                "message": msg,
+                "attributes": _attributes_in(msg),
+            })
+        if not raw_causes and (obj.get("message") or obj.get("error")):
+            msg = str(obj.get("message") or obj.get("error"))
+            causes.append({"cause_id": None, "code": str(obj.get("error", "")), "message": msg,
+                           "attributes": _attributes_in(msg)})
+
+    if not causes and error_text:
+        causes.append({"cause_id": None, "code": "", "message": error_text[:500],
+                       "attributes": _attributes_in(error_text)})
+    return causes
+
+
+def classify_error(error_text: str) -> List[dict]:
+    """
+    Aplica ERROR_RULES. Retorna [{"error_key", "fix", "attribute", "cause_id"}] (sin duplicados).
+    Lista vacía = error desconocido (candidato a IA / log).
+    """
+    causes = parse_ml_error(error_text)
+    out, seen = [], set()
+
+    def add(rule, attribute, cause_id):
+        k = (rule["key"], attribute)
+        if k not in seen:
+            seen.add(k)
+            out.append({"error_key": rule["key"], "fix": rule["fix"],
+                        "attribute": attribute, "cause_id": cause_id})
+
+    for cause in causes:
+        for rule in ERROR_RULES:
+            hit = (cause["cause_id"] in rule["cause_ids"]) or (cause["code"] in rule["codes"])
+            if not hit and rule["text"]:
+                hit = any(t in cause["message"] or t in cause["code"] for t in rule["text"])
+            if hit:
+                for attr in (cause["attributes"] or [None]):
+                    add(rule, attr, cause["cause_id"])
+                break
+
+    # Fallback por substring sobre el texto completo (errores sin JSON parseable)
+    if not out and error_text:
+        for rule in ERROR_RULES:
+            if any(t in error_text for t in rule["text"]):
+                for attr in (_attributes_in(error_text) if rule["fix"] == FIX_FILL_ATTRIBUTE else []) or [None]:
+                    add(rule, attr, None)
+                break
+    return out
+
+
+class PublishFixEngine:
+    """Reglas deterministas + memoria de fixes por categoría"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or KV_DB_PATH
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS publish_fix_memory (
+                category_id TEXT NOT NULL,
+                error_key TEXT NOT NULL,
+                attribute_id TEXT NOT NULL DEFAULT '',
+                fix_type TEXT NOT NULL,
+                fix_value TEXT NOT NULL DEFAULT '',
+                successes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (category_id, error_key, attribute_id, fix_type, fix_value)
+            ) WITHOUT ROWID
+        """)
+
+    @property
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    # ---------- Memoria ----------
+    def _touch(self, category_id, error_key, attribute_id, fix_type, fix_value="", success=None):
+        s = 1 if success is True else 0
+        f = 1 if success is False else 0
+        self._conn.execute("""
+            INSERT INTO publish_fix_memory
+                (category_id, error_key, attribute_id, fix_type, fix_value, successes, failures, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (category_id, error_key, attribute_id, fix_type, fix_value) DO UPDATE SET
+                successes = successes + excluded.successes,
+                failures = failures + excluded.failures,
+                updated_at = excluded.updated_at
+        """, (category_id or "", error_key, attribute_id or "", fix_type, fix_value or "", s, f, time.time()))
+
+    def record_outcome(self, category_id: str, applied: List[dict], success: bool, error_text: str = None):
+        """
+        Registra si los fixes aplicados en el intento anterior funcionaron.
+        Con success=False y el error del nuevo intento (`error_text`), un fix solo cuenta como
+        fallido si su mismo error (error_key, y atributo si tiene) vuelve a aparecer; si el
+        intento falló por otra cosa no se registra nada para ese fix.
+        """
+        recurring = None
+        if not success and error_text is not None:
+            recurring = classify_error(error_text)
+        for fx in applied or []:
+            if recurring is not None and not any(
+                r["error_key"] == fx["error_key"] and (not fx.get("attribute") or r["attribute"] == fx["attribute"])
+                for r in recurring
+            ):
+                continue
+            self._touch(fx.get("category_id") or category_id, fx["error_key"], fx.get("attribute"),
+                        fx["fix"], fx.get("value", ""), success=success)
+
+    def stats(self, category_id: str, error_key: str, fix_type: str, attribute_id: str = None) -> Tuple[int, int]:
+        row = self._conn.execute("""
+            SELECT COALESCE(SUM(successes), 0), COALESCE(SUM(failures), 0) FROM publish_fix_memory
+            WHERE category_id = ? AND error_key = ? AND attribute_id = ? AND fix_type = ?
+        """, (category_id or "", error_key, attribute_id or "", fix_type)).fetchone()
+        return row[0], row[1]
+
+    def is_known_dead_end(self, category_id: str, error_key: str, fix_type: str,
+                          attribute_id: str = None, max_failures: int = 2) -> bool:
+        """True si ese fix nunca funcionó en la categoría y ya falló `max_failures` veces"""
+        successes, failures = self.stats(category_id, error_key, fix_type, attribute_id)
+        return successes == 0 and failures >= max_failures
+
+    # ---------- Atributos faltantes ----------
+    def resolve_missing_attributes(self, category_id: str, attribute_ids: List[str],
+                                   amazon_json: Optional[dict]) -> Tuple[Dict[str, str], List[str], List[dict]]:
+        """
+        Intenta completar atributos faltantes SIN IA:
+        1. Equivalencias aprendidas de la categoría (clave de origen en el JSON de Amazon)
+        2. Valor constante que ya funcionó varias veces en la categoría (solo CONSTANT_ATTRIBUTES)
+        Retorna (valores, pendientes_para_IA, fixes_aplicados)
+        """
+        values, pending, applied = {}, [], []
+        view = as_view(amazon_json) if amazon_json else None
+        known = get_equivalence_store().resolve(category_id, attribute_ids) if category_id else {}
+
+        for aid in attribute_ids:
+            val = view.find(known[aid]) if (view and aid in known) else None
+            if val:
+                values[aid] = str(val)
+                applied.append({"error_key": "missing_attribute", "attribute": aid, "fix": FIX_SOURCE_KEY})
+                continue
+
+            row = None
+            if aid in CONSTANT_ATTRIBUTES:
+                row = self._conn.execute("""
+                    SELECT fix_value FROM publish_fix_memory
+                    WHERE category_id = ? AND error_key = 'missing_attribute' AND attribute_id = ?
+                      AND fix_type = ? AND failures = 0 AND successes >= ?
+                    ORDER BY successes DESC LIMIT 1
+                """, (category_id or "", aid, FIX_CONSTANT, CONSTANT_MIN_SUCCESSES)).fetchone()
+            if row:
+                values[aid] = row[0]
+                applied.append({"error_key": "missing_attribute", "attribute": aid,
+                                "fix": FIX_CONSTANT, "value": row[0]})
+                continue
+
+            pending.append(aid)
+
+        return values, pending, applied
+
+    def learn_from_ai(self, category_id: str, extracted: Dict[str, object],
+                      amazon_json: Optional[dict]) -> List[dict]:
+        """
+        Aprende de los valores que extrajo la IA:
+        - si el valor aparece en el JSON de Amazon → se guarda la clave de origen como equivalencia
+        - si no y el atributo no depende del producto (CONSTANT_ATTRIBUTES) → se registra como
+          candidato a valor constante de la categoría; si depende, no se aprende nada
+        Retorna los fixes aplicados (para record_outcome).
+        """
+        applied = []
+        view = as_view(amazon_json) if amazon_json else None
+        learned_keys = {}
+        for aid, value in (extracted or {}).items():
+            if value in (None, "", [], {}):
+                continue
+            sval = str(value).strip()
+            source_key = None
+            if view:
+                low = sval.lower()
+                for k, v in view.flat.items():
+                    if str(v).strip().lower() == low:
+                        source_key = k
+                        break
+            if source_key:
+                learned_keys[aid] = [source_key]
+                applied.append({"error_key": "missing_attribute", "attribute": aid, "fix": FIX_SOURCE_KEY})
+            elif aid in CONSTANT_ATTRIBUTES:
+                applied.append({"error_key": "missing_attribute", "attribute": aid,
+                                "fix": FIX_CONSTANT, "value": sval})
+
+        if learned_keys and category_id:
+            get_equivalence_store().learn(category_id, learned_keys)
+        return applied
+
+
+_engine = None
+
+
+def get_fix_engine() -> PublishFixEngine:
+    """Singleton por proceso"""
+    global _engine
+    if _engine is None:
+        _engine = PublishFixEngine()
+    return _engine
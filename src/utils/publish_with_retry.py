@@ -15,6 +15,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.mainglobal import publish_item
 from src.category_validator import validate_and_fix_category
+from src.utils.publish_fix_engine import get_fix_engine, parse_ml_error, classify_error
 
 
 def publish_with_smart_retry(
@@ -47,6 +48,9 @@ def publish_with_smart_retry(
     print(f"   Categoría: {original_category}")
     print(f"   GTINs: {len(original_gtins)}")
 
+    fix_engine = get_fix_engine()
+    applied_fixes = []  # Fixes aplicados antes del intento actual (memoria de fixes)
+
     for attempt in range(max_retries):
         try:
             # Intento de publicación
@@ -54,6 +58,8 @@ def publish_with_smart_retry(
 
             if result:
                 # Éxito
+                if applied_fixes:
+                    fix_engine.record_outcome(original_category, applied_fixes, success=True)
                 print(f"✅ {asin}: Publicado exitosamente")
                 if attempt > 0:
                     print(f"   (Después de {attempt} reintentos)")
@@ -66,6 +72,10 @@ def publish_with_smart_retry(
             error_msg = str(e)
             print(f"❌ {asin}: Error en intento {attempt + 1}: {error_msg[:100]}")
 
+            if applied_fixes:
+                fix_engine.record_outcome(original_category, applied_fixes, success=False, error_text=error_msg)
+                applied_fixes = []
+
             # Analizar error y decidir retry
             should_retry, modified_mini = analyze_error_and_fix(
                 error_msg,
@@ -75,6 +85,10 @@ def publish_with_smart_retry(
             )
 
             if should_retry and modified_mini:
+                applied_fixes = [
+                    {"category_id": mini_ml.get('category_id'), **fx}
+                    for fx in classify_error(error_msg)
+                ]
                 mini_ml = modified_mini
                 print(f"🔄 Reintentando con modificaciones...")
                 continue
@@ -104,31 +118,11 @@ def analyze_error_and_fix(
     """
     asin = mini_ml.get('asin', 'UNKNOWN')
 
-    # Parsear JSON del error si está presente
-    error_data = {}
-    cause_ids = set()
-
-    try:
-        # El error viene como "POST url → 400 {json}"
-        # Extraer el JSON
-        if '{' in error_msg and '}' in error_msg:
-            json_start = error_msg.index('{')
-            json_str = error_msg[json_start:]
-            error_data = json.loads(json_str)
-
-            # Extraer cause_ids
-            for cause in error_data.get('cause', []):
-                cid = cause.get('cause_id')
-                if cid:
-                    cause_ids.add(cid)
-
-            # Debug
-            if cause_ids:
-                print(f"   📋 Error codes detectados: {cause_ids}")
-
-    except json.JSONDecodeError:
-        # Si no puede parsear, usar string matching
-        pass
+    # Parsear JSON(s) del error ("POST url → 400 {json}" o varios unidos por " | ")
+    causes = parse_ml_error(error_msg)
+    cause_ids = {c['cause_id'] for c in causes if c['cause_id']}
+    if cause_ids:
+        print(f"   📋 Error codes detectados: {cause_ids}")
 
     # 1. GTIN duplicado (Error 3701)
     if 3701 in cause_ids or 'invalid_product_identifier' in error_msg:
@@ -182,7 +176,7 @@ def analyze_error_and_fix(
 
         # Detectar qué atributo falta
         missing_attr = None
-        for cause in error_data.get('cause', []):
+        for cause in causes:
             if cause.get('cause_id') == 3704:
                 msg = cause.get('message', '')
                 if 'Color' in msg:
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# quality_scoring.py
+# ✅ Motor de scoring columnar (NumPy): un batch de productos = arrays
+#    (rating, reviews, bsr, price) → scores y tiers en una sola pasada
+# ✅ Curvas de quality_config.json como funciones escalonadas vectorizadas
+# ✅ 100k ASINs en milisegundos (sin loops de Python por producto)
+# ✅ step_up / step_down: bloques para otras curvas (ej: rank_asins_for_publication)
+# ============================================================
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+DEFAULT_THRESHOLDS = {
+    "excellent_rating": 4.3,
+    "good_rating": 3.8,
+    "min_rating": 3.0,
+    "high_reviews": 500,
+    "medium_reviews": 50,
+    "min_reviews": 5,
+    "top_bsr": 50000,
+    "good_bsr": 150000,
+    "medium_bsr": 500000,
+    "min_price": 10,
+    "max_price": 300,
+    "optimal_min_price": 20,
+    "optimal_max_price": 150,
+}
+DEFAULT_WEIGHTS = {"rating": 0.3, "reviews": 0.3, "bsr": 0.25, "price": 0.15}
+# Modo simplificado (sin rating ni reviews, típico del Catalog API): solo BSR + precio
+SIMPLIFIED_WEIGHTS = {"bsr": 0.70, "price": 0.30}
+# (tier, score mínimo) de mayor a menor
+DEFAULT_TIERS = [("EXCELLENT", 90), ("GOOD", 70), ("REGULAR", 50), ("LOW", 30), ("VERY_LOW", 0)]
+
+
+def as_array(values: Iterable) -> np.ndarray:
+    """Lista/array → float64; None/NaN → 0 (mismo trato que 'sin dato')"""
+    if isinstance(values, np.ndarray):
+        arr = values.astype(np.float64, copy=False)
+    else:
+        arr = np.array([0.0 if v is None else v for v in values], dtype=np.float64)
+    return np.nan_to_num(arr, nan=0.0)
+
+
+def step_up(x: np.ndarray, thresholds: Sequence[float], scores: Sequence[float]) -> np.ndarray:
+    """
+    Curva escalonada creciente: scores[i] si x >= thresholds[i-1] (thresholds ascendentes).
+    len(scores) == len(thresholds) + 1; scores[0] = por debajo del primer umbral.
+    """
+    idx = np.searchsorted(np.asarray(thresholds, dtype=np.float64), x, side="right")
+    return np.asarray(scores, dtype=np.float64)[idx]
+
+
+def step_down(x: np.ndarray, thresholds: Sequence[float], scores: Sequence[float]) -> np.ndarray:
+    """
+    Curva escalonada por "menor o igual": scores[i] si x <= thresholds[i] (el primero que cumpla).
+    len(scores) == len(thresholds) + 1; scores[-1] = por encima del último umbral.
+    """
+    idx = np.searchsorted(np.asarray(thresholds, dtype=np.float64), x, side="left")
+    return np.asarray(scores, dtype=np.float64)[idx]
+
+
+class QualityScorer:
+    """
+    Curvas de ProductQualityAnalyzer sobre arrays:
+
+        scorer = QualityScorer.from_config()
+        result = scorer.score(rating, reviews, bsr, price)   # arrays o listas
+        result["total_score"], result["quality_tier"]
+    """
+
+    def __init__(self, thresholds: dict = None, weights: dict = None, tiers: List[tuple] = None):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        tiers = sorted(tiers or DEFAULT_TIERS, key=lambda t: t[1])
+        self._tier_names = np.array([name for name, _ in tiers])
+        self._tier_cuts = np.array([cut for _, cut in tiers[1:]], dtype=np.float64)
+
+    @classmethod
+    def from_config(cls, config: dict = None, config_file: str = "config/quality_config.json") -> "QualityScorer":
+        if config is None:
+            path = Path(config_file)
+            config = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        tiers = [(name, spec.get("min_score", 0)) for name, spec in config.get("quality_tiers", {}).items()]
+        return cls(config.get("thresholds"), config.get("weights"), tiers or None)
+
+    # ---------- Curvas individuales (0-100) ----------
+    def score_rating(self, rating) -> np.ndarray:
+        t = self.thresholds
+        rating = as_array(rating)
+        scores = step_up(rating, [t["min_rating"], t["good_rating"], t["excellent_rating"]], [20, 50, 80, 100])
+        return np.where(rating <= 0, 0.0, scores)
+
+    def score_reviews(self, review_count) -> np.ndarray:
+        t = self.thresholds
+        review_count = as_array(review_count)
+        scores = step_up(review_count, [t["min_reviews"], t["medium_reviews"], t["high_reviews"]], [20, 40, 70, 100])
+        return np.where(review_count <= 0, 0.0, scores)
+
+    def score_bsr(self, bsr) -> np.ndarray:
+        t = self.thresholds
+        bsr = as_array(bsr)
+        scores = step_down(bsr, [t["top_bsr"], t["good_bsr"], t["medium_bsr"]], [100, 80, 60, 30])
+        return np.where(bsr <= 0, 50.0, scores)  # Neutral si no hay BSR
+
+    def score_price(self, price) -> np.ndarray:
+        t = self.thresholds
+        price = as_array(price)
+        optimal = (price >= t["optimal_min_price"]) & (price <= t["optimal_max_price"])
+        out_of_range = (price < t["min_price"]) | (price > t["max_price"])
+        scores = np.where(out_of_range, 20.0, np.where(optimal, 100.0, 60.0))
+        return np.where(price <= 0, 0.0, scores)
+
+    # ---------- Score total ----------
+    def tiers(self, scores) -> np.ndarray:
+        """Tier de cada score según los mínimos de quality_tiers"""
+        return self._tier_names[np.searchsorted(self._tier_cuts, as_array(scores), side="right")]
+
+    def score(self, rating, reviews, bsr, price) -> Dict[str, np.ndarray]:
+        """
+        Scores de un batch. Productos sin rating ni reviews → modo simplificado (BSR 70% + precio 30%).
+
+        Returns:
+            dict de arrays: total_score, rating_score, reviews_score, bsr_score,
+            price_score, quality_tier, simplified_mode
+        """
+        rating, reviews, bsr, price = as_array(rating), as_array(reviews), as_array(bsr), as_array(price)
+        rating_score = self.score_rating(rating)
+        reviews_score = self.score_reviews(reviews)
+        bsr_score = self.score_bsr(bsr)
+        price_score = self.score_price(price)
+
+        w = self.weights
+        full = (rating_score * w["rating"] + reviews_score * w["reviews"] +
+                bsr_score * w["bsr"] + price_score * w["price"])
+        simplified = (bsr_score * SIMPLIFIED_WEIGHTS["bsr"] + price_score * SIMPLIFIED_WEIGHTS["price"])
+        simplified_mode = ~((rating > 0) | (reviews > 0))
+        total = np.round(np.where(simplified_mode, simplified, full), 2)
+
+        return {
+            "total_score": total,
+            "rating_score": rating_score,
+            "reviews_score": reviews_score,
+            "bsr_score": bsr_score,
+            "price_score": price_score,
+            "quality_tier": self.tiers(total),
+            "simplified_mode": simplified_mode,
+        }
+
+
+def extract_quality_metrics(product_data: dict) -> Dict[str, Any]:
+    """
+    (rating, review_count, bsr, price) de un producto, en formato SP-API
+    (salesRanks, attributes.list_price) o directo/legacy (rating, sales_rank, price...).
+    """
+    rating = 0
+    review_count = 0
+    bsr = 0
+    price = 0
+
+    # Formato Amazon SP-API (salesRanks, attributes)
+    if product_data.get("salesRanks"):
+        sales_ranks = product_data["salesRanks"]
+        if isinstance(sales_ranks, list) and sales_ranks:
+            sales_ranks = sales_ranks[0]
+
+        # BSR viene de classificationRanks
+        classification_ranks = sales_ranks.get("classificationRanks") if isinstance(sales_ranks, dict) else None
+        if classification_ranks:
+            bsr = classification_ranks[0].get("rank", 0)
+
+    # Precio de attributes
+    attrs = product_data.get("attributes")
+    if attrs and attrs.get("list_price"):
+        price_data = attrs["list_price"][0] if isinstance(attrs["list_price"], list) else attrs["list_price"]
+        price = price_data.get("value", 0)
+
+    # Formato directo (legacy)
+    if not rating:
+        rating = product_data.get("rating", 0)
+    if not review_count:
+        review_count = product_data.get("reviews_count", 0)
+    if not bsr:
+        bsr = product_data.get("sales_rank", 0)
+        if not bsr and "sales_rankings" in product_data:
+            rankings = product_data.get("sales_rankings", [])
+            if rankings:
+                bsr = rankings[0].get("rank", 0)
+    if not price:
+        price = product_data.get("price", 0)
+        if not price and "amount" in product_data:
+            price = product_data.get("amount", 0)
+
+    return {"rating": rating, "review_count": review_count, "bsr": bsr, "price": price}
+
+
+def metrics_to_columns(metrics: List[dict]) -> Dict[str, np.ndarray]:
+    """Lista de métricas (extract_quality_metrics) → columnas para QualityScorer.score"""
+    return {
+        "rating": as_array([m["rating"] for m in metrics]),
+        "reviews": as_array([m["review_count"] for m in metrics]),
+        "bsr": as_array([m["bsr"] for m in metrics]),
+        "price": as_array([m["price"] for m in metrics]),
+    }
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# request_budget.py
+# ✅ Presupuesto de requests COMPARTIDO entre procesos (token bucket en SQLite)
+# ✅ N procesos de búsqueda respetan un único ritmo global (no N ritmos)
+# ✅ Un 429 en cualquier proceso pausa a todos (penalize)
+# ✅ La cuota real (ej: header x-amzn-RateLimit-Limit) se persiste: set_rate() en un
+#    proceso cambia el ritmo de todos
+# ✅ Reemplaza los sleeps escalonados por process_id
+# ============================================================
+
+import os
+import time
+import random
+
+try:
+    from src.utils.kv_store import get_connection, Transaction
+except ModuleNotFoundError:
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from utils.kv_store import get_connection, Transaction
+
+REQUEST_BUDGET_DB = os.getenv("REQUEST_BUDGET_DB", "storage/request_budget.db")
+MAX_SLEEP_SECONDS = 1.0  # Re-chequear seguido: otro proceso pudo liberar/penalizar
+
+
+class RequestBudget:
+    """
+    Token bucket con nombre, persistido en SQLite.
+
+    - `rate`: requests por segundo (global, sumando todos los procesos). Es el default:
+      si algún proceso llamó set_rate(), manda la cuota persistida en la fila
+    - `burst`: máximo de tokens acumulables (ráfaga permitida)
+
+    Uso:
+        budget = RequestBudget("sp_api_catalog", rate=1.0, burst=5)
+        budget.acquire()          # bloquea hasta que haya un token
+        ...request...
+        budget.penalize(30)       # ante un 429: todos los procesos esperan 30s
+    """
+
+    def __init__(self, name: str, rate: float, burst: float = 1, db_path: str = None):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(max(burst, 1))
+        self.db_path = db_path or REQUEST_BUDGET_DB
+        self._init_schema()
+
+    @property
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _init_schema(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS request_budget (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                blocked_until REAL NOT NULL DEFAULT 0,
+                granted INTEGER NOT NULL DEFAULT 0,
+                rate REAL
+            )
+        """)
+        # DBs creadas antes de que la cuota se persistiera
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(request_budget)")}
+        if "rate" not in columns:
+            self._conn.execute("ALTER TABLE request_budget ADD COLUMN rate REAL")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO request_budget (name, tokens, updated_at) VALUES (?, ?, ?)",
+            (self.name, self.burst, time.time())
+        )
+
+    def _try_acquire(self, n: float) -> float:
+        """Toma n tokens si hay. Retorna 0 si los tomó, o los segundos a esperar."""
+        now = time.time()
+        with Transaction(self._conn) as conn:
+            tokens, updated_at, blocked_until, rate = conn.execute(
+                "SELECT tokens, updated_at, blocked_until, rate FROM request_budget WHERE name = ?", (self.name,)
+            ).fetchone()
+            if rate:
+                self.rate = rate  # Cuota ajustada por cualquier proceso
+            tokens = min(self.burst, tokens + max(0.0, now - updated_at) * self.rate)
+
+            if now < blocked_until:
+                wait = blocked_until - now
+            elif tokens >= n:
+                tokens -= n
+                wait = 0.0
+            else:
+                wait = (n - tokens) / self.rate
+
+            conn.execute(
+                "UPDATE request_budget SET tokens = ?, updated_at = ?, "
+                "granted = granted + ? WHERE name = ?",
+                (tokens, now, n if wait == 0.0 else 0, self.name)
+            )
+        return wait
+
+    def acquire(self, n: float = 1, timeout: float = None) -> bool:
+        """
+        Bloquea hasta obtener n tokens (n > burst se limita a burst).
+        Retorna False si se agotó el timeout.
+        """
+        n = min(float(n), self.burst)
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            wait = self._try_acquire(n)
+            if wait == 0.0:
+                return True
+            if deadline is not None and time.time() + wait > deadline:
+                return False
+            # Jitter chico: evita que los procesos despierten sincronizados
+            time.sleep(min(wait, MAX_SLEEP_SECONDS) + random.uniform(0, 0.05))
+
+    def set_rate(self, rate: float):
+        """Cambia la cuota para todos los procesos (queda en la fila del bucket)"""
+        self.rate = float(rate)
+        self._conn.execute("UPDATE request_budget SET rate = ? WHERE name = ?", (self.rate, self.name))
+
+    def penalize(self, seconds: float):
+        """Pausa global (ej: 429): ningún proceso obtiene tokens por `seconds`"""
+        until = time.time() + seconds
+        self._conn.execute(
+            "UPDATE request_budget SET tokens = 0, updated_at = ?, "
+            "blocked_until = MAX(blocked_until, ?) WHERE name = ?",
+            (time.time(), until, self.name)
+        )
+
+    def stats(self) -> dict:
+        tokens, updated_at, blocked_until, granted, rate = self._conn.execute(
+            "SELECT tokens, updated_at, blocked_until, granted, rate FROM request_budget WHERE name = ?",
+            (self.name,)
+        ).fetchone()
+        return {
+            "name": self.name, "rate": rate or self.rate, "burst": self.burst,
+            "tokens": round(tokens, 2), "granted": granted,
+            "blocked_for": max(0.0, round(blocked_until - time.time(), 1)),
+        }
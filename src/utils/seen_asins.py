@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# seen_asins.py
+# ✅ Índice global de ASINs ya vistos: publicados, rechazados o en cola
+# ✅ Se consulta ANTES de cualquier filtro caro (SP-API, Prime/BSR, IA)
+# ✅ Fuentes: listings DB, rejected_asins.json, asins.txt, cola "publish"
+#    y el journal de rechazos que registran los buscadores
+# ✅ Snapshot compacto (ASINs ordenados, registros fijos de 10 bytes por fuente)
+#    → arranque sin releer JSON/DBs que no cambiaron
+# ✅ Cada fuente se recarga sola cuando cambia su mtime/tamaño
+# ============================================================
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from src.utils.job_queue import JobQueue, JOB_QUEUE_DB, PENDING, RUNNING, DONE
+except ModuleNotFoundError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.utils.job_queue import JobQueue, JOB_QUEUE_DB, PENDING, RUNNING, DONE
+
+SEEN_INDEX_PATH = os.getenv("SEEN_ASINS_INDEX", "storage/seen_asins.idx")
+SEEN_JOURNAL_PATH = os.getenv("SEEN_ASINS_JOURNAL", "storage/seen_asins_rejected.log")
+LISTINGS_DB = "storage/listings_database.db"
+REJECTED_FILE = "storage/autonomous_logs/rejected_asins.json"
+ASINS_FILE = "asins.txt"
+PUBLISH_QUEUE = "publish"
+REFRESH_CHECK_SECONDS = 30  # Cada cuánto mirar si cambió alguna fuente como máximo
+
+KIND_PUBLISHED = "publicado"
+KIND_QUEUED = "en cola"
+KIND_REJECTED = "rechazado"
+
+# Solo rechazos PROPIOS del producto (marca, categoría, seguridad).
+# Errores de red/429, datos faltantes o "no seleccionado para esta keyword" NO marcan el ASIN.
+PERMANENT_REJECTION_MARKERS = (
+    "Marca prohibida", "Categoría prohibida", "Categoría restringida",
+    "Keyword prohibida", "Keyword restringida", "Keyword irrelevante",
+    "Tipo de producto irrelevante", "PROHIBIDO", "MARCA PROHIBIDA", "Safety IA:",
+    "brand_intelligence_ai", "prohibited_category_ai", "safety_ai",
+)
+# Fail-safe de la IA (timeout, caída, sin veredicto, datos faltantes): rechazo de esta
+# corrida, NO del producto → nunca al journal aunque el motivo diga "Safety IA"
+TRANSIENT_REJECTION_MARKERS = ("RECHAZADO por seguridad", "ia_sin_veredicto")
+
+# Fuente (archivo) → sub-conjuntos que produce y su tipo
+_SOURCE_SETS = {
+    "listings": {"listings": KIND_PUBLISHED},
+    "queue": {"queue_done": KIND_PUBLISHED, "queue_pending": KIND_QUEUED},
+    "asins_file": {"asins_file": KIND_QUEUED},
+    "rejected_log": {"rejected_log": KIND_REJECTED},
+    "journal": {"journal": KIND_REJECTED},
+}
+# Orden de consulta: publicado > en cola > rechazado
+_LOOKUP_ORDER = ["listings", "queue_done", "marked_published", "queue_pending", "asins_file",
+                 "marked_queued", "rejected_log", "journal"]
+_MARK_KINDS = {"marked_published": KIND_PUBLISHED, "marked_queued": KIND_QUEUED}
+
+_ASIN_RE = re.compile(r"^[A-Z0-9]{10}$")
+_RECORD = 10  # bytes por ASIN en el snapshot
+
+
+def normalize_asin(asin) -> Optional[str]:
+    if not asin:
+        return None
+    asin = str(asin).strip().upper()
+    return asin if _ASIN_RE.match(asin) else None
+
+
+def is_permanent_rejection(reason: str) -> bool:
+    reason = reason or ""
+    if any(marker in reason for marker in TRANSIENT_REJECTION_MARKERS):
+        return False
+    return any(marker in reason for marker in PERMANENT_REJECTION_MARKERS)
+
+
+class SeenAsinIndex:
+    """
+    Conjunto exacto en memoria de ASINs que no vale la pena volver a procesar.
+
+        index = get_seen_index()
+        nuevos, vistos = index.filter_new(asins)   # antes de cualquier request
+        index.record_rejected(rechazados)           # rechazos permanentes → journal
+        index.mark_queued(aprobados)                # visible de inmediato en este proceso
+    """
+
+    def __init__(self, listings_db: str = LISTINGS_DB, rejected_file: str = REJECTED_FILE,
+                 asins_file: str = ASINS_FILE, queue_db: str = None, queue_name: str = PUBLISH_QUEUE,
+                 index_path: str = SEEN_INDEX_PATH, journal_path: str = SEEN_JOURNAL_PATH):
+        self.index_path = Path(index_path)
+        self.journal_path = Path(journal_path)
+        self.queue_name = queue_name
+        self._files = {
+            "listings": str(listings_db),
+            "queue": str(queue_db or JOB_QUEUE_DB),
+            "asins_file": str(asins_file),
+            "rejected_log": str(rejected_file),
+            "journal": str(journal_path),
+        }
+        self._lock = threading.Lock()
+        self._sets: Dict[str, Set[str]] = {"marked_published": set(), "marked_queued": set()}
+        self._signatures: Dict[str, list] = {}
+        self._checked_at = 0.0
+        self._load()
+
+    # ---------- Fuentes ----------
+    def _signature(self, key: str) -> list:
+        """mtime + tamaño del archivo (y de su -wal si es SQLite en WAL)"""
+        sig = []
+        for path in (self._files[key], self._files[key] + "-wal"):
+            try:
+                st = os.stat(path)
+                sig += [st.st_mtime, st.st_size]
+            except OSError:
+                sig += [None, None]
+        return sig
+
+    def _load_source(self, key: str) -> Dict[str, Set[str]]:
+        path = self._files[key]
+        if not os.path.exists(path):
+            return {name: set() for name in _SOURCE_SETS[key]}
+
+        if key == "listings":
+            asins = set()
+            try:
+                conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+                try:
+                    asins = {a for (a,) in conn.execute("SELECT DISTINCT asin FROM listings")}
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"⚠️ Índice de ASINs: no se pudo leer {path}: {e}")
+            return {"listings": self._clean(asins)}
+
+        if key == "queue":
+            by_status = JobQueue(self.queue_name, db_path=path).keys_by_status()
+            return {
+                "queue_done": self._clean(a for a, s in by_status.items() if s == DONE),
+                "queue_pending": self._clean(a for a, s in by_status.items() if s in (PENDING, RUNNING)),
+            }
+
+        if key == "asins_file":
+            with open(path, "r", encoding="utf-8") as f:
+                return {"asins_file": self._clean(f)}
+
+        if key == "rejected_log":
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Índice de ASINs: no se pudo leer {path}: {e}")
+                data = []
+            return {"rejected_log": self._clean(
+                item.get("asin") for item in data
+                if isinstance(item, dict) and is_permanent_rejection(item.get("reason"))
+            )}
+
+        # journal: "ASIN\tmotivo" por línea (append-only). Se re-filtra por motivo:
+        # líneas viejas de fail-safe de la IA no cuentan
+        with open(path, "r", encoding="utf-8") as f:
+            entries = [line.rstrip("\n").split("\t", 1) for line in f]
+        return {"journal": self._clean(
+            entry[0] for entry in entries if len(entry) == 1 or is_permanent_rejection(entry[1])
+        )}
+
+    @staticmethod
+    def _clean(asins: Iterable) -> Set[str]:
+        return {a for a in map(normalize_asin, asins) if a}
+
+    # ---------- Snapshot ----------
+    def _read_snapshot(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path, "rb") as f:
+                header = json.loads(f.readline())
+                blob = f.read()
+        except (OSError, ValueError):
+            return {}
+        if header.get("version") != 1:
+            return {}
+
+        sources = {}
+        for key, info in header.get("sources", {}).items():
+            sets = {}
+            for name, (offset, count) in info["sets"].items():
+                chunk = blob[offset * _RECORD:(offset + count) * _RECORD].decode("ascii")
+                sets[name] = {chunk[i:i + _RECORD] for i in range(0, len(chunk), _RECORD)}
+            sources[key] = {"signature": info["signature"], "sets": sets}
+        return sources
+
+    def _write_snapshot(self):
+        header = {"version": 1, "sources": {}}
+        parts = []
+        offset = 0
+        for key, names in _SOURCE_SETS.items():
+            info = {"signature": self._signatures[key], "sets": {}}
+            for name in names:
+                asins = sorted(self._sets.get(name, ()))
+                info["sets"][name] = [offset, len(asins)]
+                parts.append("".join(asins))
+                offset += len(asins)
+            header["sources"][key] = info
+
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write("".join(parts).encode("ascii"))
+        os.replace(tmp, self.index_path)
+
+    def _load(self):
+        snapshot = self._read_snapshot()
+        changed = False
+        for key in _SOURCE_SETS:
+            signature = self._signature(key)
+            cached = snapshot.get(key)
+            if cached and cached["signature"] == signature:
+                self._sets.update(cached["sets"])
+            else:
+                self._sets.update(self._load_source(key))
+                changed = True
+            self._signatures[key] = signature
+        self._checked_at = time.time()
+        if changed:
+            self._write_snapshot()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Recarga las fuentes que cambiaron. Retorna True si hubo cambios."""
+        now = time.time()
+        if not force and now - self._checked_at < REFRESH_CHECK_SECONDS:
+            return False
+        with self._lock:
+            self._checked_at = now
+            changed = False
+            for key in _SOURCE_SETS:
+                signature = self._signature(key)
+                if signature != self._signatures.get(key):
+                    self._sets.update(self._load_source(key))
+                    self._signatures[key] = signature
+                    changed = True
+            if changed:
+                self._write_snapshot()
+            return changed
+
+    # ---------- Consulta ----------
+    def kind(self, asin: str) -> Optional[str]:
+        """Por qué ya se vio el ASIN (publicado / en cola / rechazado) o None"""
+        asin = normalize_asin(asin)
+        if not asin:
+            return None
+        for name in _LOOKUP_ORDER:
+            if asin in self._sets.get(name, ()):
+                return _MARK_KINDS.get(name) or next(
+                    kinds[name] for kinds in _SOURCE_SETS.values() if name in kinds
+                )
+        return None
+
+    def __contains__(self, asin) -> bool:
+        return self.kind(asin) is not None
+
+    def filter_new(self, asins: Iterable[str]) -> Tuple[List[str], List[dict]]:
+        """(ASINs nunca vistos, [{"asin", "reason"}] de los ya vistos) - sin requests"""
+        self.refresh()
+        new, seen = [], []
+        for asin in asins:
+            kind = self.kind(asin)
+            if kind:
+                seen.append({"asin": asin, "reason": f"ASIN ya {kind}"})
+            else:
+                new.append(asin)
+        return new, seen
+
+    # ---------- Registro ----------
+    def record_rejected(self, rejected: Iterable[dict]) -> int:
+        """Agrega al journal los rechazos permanentes ({"asin", "reason"}). Retorna cuántos."""
+        lines = []
+        with self._lock:
+            journal = self._sets.setdefault("journal", set())
+            for item in rejected:
+                asin = normalize_asin(item.get("asin"))
+                reason = str(item.get("reason") or "")
+                if asin and asin not in journal and is_permanent_rejection(reason):
+                    journal.add(asin)
+                    lines.append(f"{asin}\t{' '.join(reason.split())[:200]}\n")
+            if lines:
+                self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+        return len(lines)
+
+    def mark_queued(self, asins: Iterable[str]):
+        """Visible al instante en este proceso (la fuente real es la cola / asins.txt)"""
+        self._sets["marked_queued"].update(self._clean(asins))
+
+    def mark_published(self, asins: Iterable[str]):
+        self._sets["marked_published"].update(self._clean(asins))
+
+    def stats(self) -> Dict[str, int]:
+        counts = {KIND_PUBLISHED: set(), KIND_QUEUED: set(), KIND_REJECTED: set()}
+        for name in _LOOKUP_ORDER:
+            kind = _MARK_KINDS.get(name) or next(k[name] for k in _SOURCE_SETS.values() if name in k)
+            counts[kind] |= self._sets.get(name, set())
+        published = counts[KIND_PUBLISHED]
+        queued = counts[KIND_QUEUED] - published
+        rejected = counts[KIND_REJECTED] - published - queued
+        return {
+            KIND_PUBLISHED: len(published),
+            KIND_QUEUED: len(queued),
+            KIND_REJECTED: len(rejected),
+            "total": len(published) + len(queued) + len(rejected),
+        }
+
+
+_index: Optional[SeenAsinIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_seen_index(**kwargs) -> SeenAsinIndex:
+    """Índice compartido dentro del proceso (los kwargs solo aplican en la primera llamada)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SeenAsinIndex(**kwargs)
+    return _index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Índice global de ASINs ya vistos")
+    parser.add_argument("asins", nargs="*", help="ASINs a consultar")
+    parser.add_argument("--rebuild", action="store_true", help="Ignorar snapshot y releer todas las fuentes")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(SEEN_INDEX_PATH):
+        os.remove(SEEN_INDEX_PATH)
+
+    start = time.time()
+    index = SeenAsinIndex()
+    print(f"📇 Índice cargado en {(time.time() - start) * 1000:.0f} ms: {index.stats()}")
+    for asin in args.asins:
+        print(f"   {asin}: {index.kind(asin) or 'nuevo'}")
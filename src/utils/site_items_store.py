@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# site_items_store.py
+# ✅ Tabla normalizada site_items (un registro por país de cada listing)
+#    en lugar de parsear listings.site_items (JSON) en cada lectura
+# ✅ Se mantiene sola: triggers sobre listings (INSERT / UPDATE / DELETE)
+#    → cualquier script que escriba el JSON la actualiza (save_listing, sync, fixes)
+# ✅ Migración: al crearse la tabla se carga desde el JSON existente
+#    (rebuild_site_items() la regenera completa)
+# ✅ Local → global → ASIN y "países faltantes" = queries indexadas
+# ============================================================
+
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+LISTINGS_DB_PATH = "storage/listings_database.db"
+
+# Filas de site_items a partir del JSON de un listing (mismo SELECT en triggers y migración)
+_ROWS_FROM_JSON = """
+    SELECT {listing_id}, {item_id},
+           json_extract(j.value, '$.site_id'),
+           json_extract(j.value, '$.item_id'),
+           json_extract(j.value, '$.logistic_type'),
+           json_extract(j.value, '$.status'),
+           CAST(json_extract(j.value, '$.seller_id') AS TEXT),
+           CASE
+               WHEN json_type(j.value, '$.error') IS NULL OR json_type(j.value, '$.error') = 'null' THEN NULL
+               WHEN json_type(j.value, '$.error') = 'object'
+                   THEN COALESCE(CAST(json_extract(j.value, '$.error.code') AS TEXT), 'error')
+               ELSE CAST(json_extract(j.value, '$.error') AS TEXT)
+           END
+    FROM {source}json_each(CASE WHEN json_valid({site_items}) THEN {site_items} ELSE '[]' END) j
+    WHERE j.type = 'object'
+"""
+_INSERT_COLUMNS = ("listing_id, global_item_id, site_id, local_item_id, logistic_type, "
+                   "status, seller_id, error_code")
+
+_ready_dbs = set()
+
+
+def _db_file(conn: sqlite3.Connection) -> str:
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def ensure_site_items_table(conn: sqlite3.Connection) -> bool:
+    """
+    Crea site_items + índices + triggers (una vez por proceso y DB).
+    Si la tabla no existía, la carga desde listings.site_items (migración).
+
+    Returns:
+        bool: True si en esta llamada se hizo la migración
+    """
+    db_file = _db_file(conn)
+    if db_file in _ready_dbs:
+        return False
+
+    try:
+        conn.execute("SELECT json_valid('[]')")
+    except sqlite3.OperationalError:
+        raise RuntimeError("❌ SQLite sin JSON1: no se puede mantener la tabla site_items")
+
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'site_items'"
+    ).fetchone() is not None
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS site_items (
+            listing_id INTEGER NOT NULL,
+            global_item_id TEXT,
+            site_id TEXT,
+            local_item_id TEXT,
+            logistic_type TEXT,
+            status TEXT,
+            seller_id TEXT,
+            error_code TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_site_items_local ON site_items(local_item_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_site_items_site ON site_items(site_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_site_items_global ON site_items(global_item_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_site_items_listing ON site_items(listing_id)")
+
+    rows_from_new = _ROWS_FROM_JSON.format(listing_id="NEW.id", item_id="NEW.item_id",
+                                           site_items="NEW.site_items", source="")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_site_items_insert
+        AFTER INSERT ON listings
+        WHEN json_valid(NEW.site_items)
+        BEGIN
+            INSERT INTO site_items ({_INSERT_COLUMNS}) {rows_from_new};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_site_items_update
+        AFTER UPDATE OF site_items, item_id ON listings
+        BEGIN
+            DELETE FROM site_items WHERE listing_id = OLD.id;
+            INSERT INTO site_items ({_INSERT_COLUMNS}) {rows_from_new};
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_site_items_delete
+        AFTER DELETE ON listings
+        BEGIN
+            DELETE FROM site_items WHERE listing_id = OLD.id;
+        END
+    """)
+    conn.commit()
+
+    migrated = False
+    if not existed:
+        count = rebuild_site_items(conn)
+        print(f"🗂️  Tabla site_items creada: {count} registros migrados desde listings.site_items")
+        migrated = True
+
+    _ready_dbs.add(db_file)
+    return migrated
+
+
+def rebuild_site_items(conn: sqlite3.Connection) -> int:
+    """Regenera site_items completa desde listings.site_items (JSON). Retorna cantidad de filas."""
+    rows_from_listing = _ROWS_FROM_JSON.format(listing_id="l.id", item_id="l.item_id",
+                                               site_items="l.site_items", source="listings l, ")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM site_items")
+        conn.execute(f"""
+            INSERT INTO site_items ({_INSERT_COLUMNS}) {rows_from_listing}
+        """)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return conn.execute("SELECT COUNT(*) FROM site_items").fetchone()[0]
+
+
+def connect(db_path: str = None) -> sqlite3.Connection:
+    """Conexión a la BD de listings con site_items lista para usar"""
+    conn = sqlite3.connect(db_path or LISTINGS_DB_PATH, timeout=30)
+    ensure_site_items_table(conn)
+    return conn
+
+
+def _as_site_item(site_id, local_item_id, logistic_type, status, seller_id, error_code) -> dict:
+    """Fila → dict con la forma del JSON original ({site_id, item_id, ..., error: {code}})"""
+    item = {"site_id": site_id, "item_id": local_item_id}
+    if logistic_type is not None:
+        item["logistic_type"] = logistic_type
+    if status is not None:
+        item["status"] = status
+    if seller_id is not None:
+        item["seller_id"] = seller_id
+    if error_code is not None:
+        item["error"] = {"code": error_code}
+    return item
+
+
+def load_site_items(conn: sqlite3.Connection, global_item_ids: Iterable[str] = None) -> Dict[str, List[dict]]:
+    """
+    {global_item_id: [site_item, ...]} (mismo formato que el JSON de listings.site_items).
+    Sin `global_item_ids` → todos los listings en una sola query.
+    """
+    ensure_site_items_table(conn)
+    query = ("SELECT global_item_id, site_id, local_item_id, logistic_type, status, seller_id, error_code "
+             "FROM site_items")
+    if global_item_ids is None:
+        rows = conn.execute(query + " ORDER BY listing_id, rowid").fetchall()
+    else:
+        ids = list(dict.fromkeys(global_item_ids))
+        rows = []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows.extend(conn.execute(
+                query + " WHERE global_item_id IN (%s) ORDER BY listing_id, rowid" % ",".join("?" * len(chunk)),
+                chunk
+            ).fetchall())
+
+    out: Dict[str, List[dict]] = {}
+    for global_item_id, *fields in rows:
+        out.setdefault(global_item_id, []).append(_as_site_item(*fields))
+    return out
+
+
+def resolve_local_item(conn: sqlite3.Connection, local_item_id: str) -> Optional[dict]:
+    """
+    Item local de un país (ej: MLA123) → listing global que lo contiene.
+
+    Returns:
+        dict: {global_item_id, site_id, asin, title} o None
+    """
+    ensure_site_items_table(conn)
+    row = conn.execute("""
+        SELECT s.global_item_id, s.site_id, l.asin, l.title
+        FROM site_items s
+        JOIN listings l ON l.id = s.listing_id
+        WHERE s.local_item_id = ? AND s.global_item_id IS NOT NULL AND s.global_item_id != s.local_item_id
+        ORDER BY s.listing_id
+        LIMIT 1
+    """, (local_item_id,)).fetchone()
+    if row is None:
+        return None
+    return {"global_item_id": row[0], "site_id": row[1], "asin": row[2], "title": row[3]}
+
+
+def find_missing_sites(conn: sqlite3.Connection, sites: Iterable[str], limit: int = None) -> List[tuple]:
+    """
+    Listings que no están publicados (item local sin error) en todos los `sites`.
+
+    Returns:
+        list: [(global_item_id, {sites_faltantes}), ...]
+    """
+    ensure_site_items_table(conn)
+    sites = set(sites)
+    placeholders = ",".join("?" * len(sites))
+    query = f"""
+        SELECT l.item_id, GROUP_CONCAT(DISTINCT s.site_id)
+        FROM listings l
+        LEFT JOIN site_items s
+               ON s.listing_id = l.id
+              AND s.local_item_id IS NOT NULL
+              AND s.error_code IS NULL
+              AND s.site_id IN ({placeholders})
+        WHERE l.item_id IS NOT NULL
+          -- JSON corrupto: no se sabe dónde está publicado → no proponerlo (evita duplicar)
+          AND (l.site_items IS NULL OR l.site_items = '' OR json_valid(l.site_items))
+        GROUP BY l.id
+        HAVING COUNT(DISTINCT s.site_id) < ?
+        ORDER BY l.id
+    """
+    params = list(sites) + [len(sites)]
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return [
+        (item_id, sites - set(published.split(",") if published else []))
+        for item_id, published in conn.execute(query, params)
+    ]
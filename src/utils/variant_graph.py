@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ============================================================
+# variant_graph.py
+# ✅ Grafo persistente padre → variantes (SQLite WAL, compartido entre procesos)
+# ✅ Lo alimentan la búsqueda (glow search), el sync (Glow API) y SP-API (relationships)
+# ✅ Hermanos / padre / variante comprable de un ASIN = lookup local, sin requests
+# ✅ Invalidación por TTL (last_seen del padre) o cuando cambia el mapa del twister
+# ✅ parse_twister_html(): mapa de variantes desde el JSON embebido de una página /dp/
+# ============================================================
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from src.utils.kv_store import get_connection, Transaction
+except ModuleNotFoundError:
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from utils.kv_store import get_connection, Transaction
+
+VARIANT_GRAPH_DB = os.getenv("VARIANT_GRAPH_DB", "storage/variant_graph.db")
+VARIANT_GRAPH_TTL_HOURS = float(os.getenv("VARIANT_GRAPH_TTL_HOURS", "72"))
+
+ASIN_RE = re.compile(r'^[A-Z0-9]{10}$')
+# Orden de preferencia de los mapas del twister embebidos en la página
+TWISTER_KEYS = ("dimensionValuesDisplayData", "asinVariationValues", "asinToDimensionIndexMap")
+_PARENT_ASIN_RE = re.compile(r'"parentAsin"\s*:\s*"([A-Z0-9]{10})"')
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _embedded_json(html: str, key: str):
+    """Objeto JSON asignado a `"key":` dentro del HTML (sin parsear el DOM)"""
+    match = re.search(r'"%s"\s*:\s*' % re.escape(key), html)
+    if not match:
+        return None
+    try:
+        obj, _ = _JSON_DECODER.raw_decode(html, match.end())
+        return obj
+    except ValueError:
+        return None
+
+
+def parse_twister_html(html: str) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Familia de variantes de una página /dp/ leyendo el JSON del twister.
+
+    Returns:
+        (parent_asin o None, {asin_variante: valores_de_dimensión}) — vacío si no tiene variantes
+    """
+    parent = _PARENT_ASIN_RE.search(html)
+    parent_asin = parent.group(1) if parent else None
+    for key in TWISTER_KEYS:
+        data = _embedded_json(html, key)
+        if isinstance(data, dict):
+            variants = {a: v for a, v in data.items() if ASIN_RE.match(a)}
+            if variants:
+                return parent_asin, variants
+    return parent_asin, {}
+
+
+def _children_hash(children) -> str:
+    return hashlib.sha1(",".join(sorted(children)).encode()).hexdigest()
+
+
+class VariantGraph:
+    """
+    Tablas:
+        variant_parents  (parent_asin, children_hash, source, last_seen)
+        variant_children (child_asin, parent_asin, dimensions JSON, buyable 1/0/NULL, last_seen)
+
+    Un padre sin hijos registrado = "producto sin variantes" (también evita volver a pedir su página).
+    """
+
+    def __init__(self, db_path: str = None, ttl_hours: float = VARIANT_GRAPH_TTL_HOURS):
+        self.db_path = db_path or VARIANT_GRAPH_DB
+        self.max_age = ttl_hours * 3600
+        self._init_schema()
+
+    @property
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _init_schema(self):
+        conn = self._conn
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS variant_parents (
+                parent_asin TEXT PRIMARY KEY,
+                children_hash TEXT NOT NULL,
+                source TEXT,
+                last_seen REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS variant_children (
+                child_asin TEXT PRIMARY KEY,
+                parent_asin TEXT NOT NULL,
+                dimensions TEXT,
+                buyable INTEGER,
+                last_seen REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_variant_children_parent ON variant_children(parent_asin)")
+
+    def _tx(self):
+        return Transaction(self._conn)
+
+    def _oldest(self, max_age: float = None) -> float:
+        max_age = self.max_age if max_age is None else max_age
+        return time.time() - max_age if max_age > 0 else float("inf")
+
+    # ---------- Escritura ----------
+    def record_family(self, parent_asin: str, children: Dict[str, Any], source: str = "") -> bool:
+        """
+        Registra la familia completa de un padre. `children`: {hijo: dimensiones o None}.
+        Si el conjunto de hijos cambió (twister distinto) se descartan los hijos que ya no están.
+
+        Returns:
+            bool: True si la familia es nueva o cambió
+        """
+        parent_asin = parent_asin.strip().upper()
+        children = {c.strip().upper(): d for c, d in children.items() if c and c.strip().upper() != parent_asin}
+        new_hash = _children_hash(children)
+        now = time.time()
+
+        with self._tx() as conn:
+            row = conn.execute("SELECT children_hash FROM variant_parents WHERE parent_asin = ?",
+                               (parent_asin,)).fetchone()
+            changed = row is None or row[0] != new_hash
+            if changed and row is not None:
+                stale = [r[0] for r in conn.execute(
+                    "SELECT child_asin FROM variant_children WHERE parent_asin = ?", (parent_asin,)
+                ) if r[0] not in children]
+                conn.executemany("DELETE FROM variant_children WHERE child_asin = ?", [(c,) for c in stale])
+
+            conn.execute("""
+                INSERT INTO variant_parents (parent_asin, children_hash, source, last_seen)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(parent_asin) DO UPDATE SET
+                    children_hash = excluded.children_hash, source = excluded.source, last_seen = excluded.last_seen
+            """, (parent_asin, new_hash, source, now))
+            conn.executemany("""
+                INSERT INTO variant_children (child_asin, parent_asin, dimensions, buyable, last_seen)
+                VALUES (?, ?, ?, NULL, ?)
+                ON CONFLICT(child_asin) DO UPDATE SET
+                    parent_asin = excluded.parent_asin,
+                    dimensions = COALESCE(excluded.dimensions, variant_children.dimensions),
+                    last_seen = excluded.last_seen
+            """, [
+                (child, parent_asin, json.dumps(dims, ensure_ascii=False) if dims is not None else None, now)
+                for child, dims in children.items()
+            ])
+        return changed
+
+    def record_page(self, page_asin: str, parent_asin: Optional[str], children: Dict[str, Any],
+                    source: str = "") -> bool:
+        """
+        Registra lo que mostró la página /dp/ de `page_asin` (ver parse_twister_html).
+        Sin twister → el ASIN queda como producto sin variantes.
+        """
+        page_asin = page_asin.strip().upper()
+        if not children:
+            return self.record_family(page_asin, {}, source)
+        if not parent_asin:
+            if page_asin in children:
+                return False  # Página de un hijo sin parentAsin visible: no sabemos a quién colgarla
+            parent_asin = page_asin
+        return self.record_family(parent_asin, children, source)
+
+    def link_child(self, parent_asin: str, child_asin: str):
+        """Relación suelta hijo → padre (ej: SP-API de un hijo solo trae parentAsins)"""
+        with self._tx() as conn:
+            conn.execute("""
+                INSERT INTO variant_children (child_asin, parent_asin, dimensions, buyable, last_seen)
+                VALUES (?, ?, NULL, NULL, ?)
+                ON CONFLICT(child_asin) DO UPDATE SET
+                    parent_asin = excluded.parent_asin, last_seen = excluded.last_seen
+            """, (child_asin.strip().upper(), parent_asin.strip().upper(), time.time()))
+
+    def mark_buyable(self, asin: str, buyable: bool):
+        """Resultado de visitar la variante (precio + entrega visibles)"""
+        self._conn.execute("UPDATE variant_children SET buyable = ? WHERE child_asin = ?",
+                           (int(bool(buyable)), asin.strip().upper()))
+
+    def invalidate(self, asin: str):
+        """Olvida la familia del ASIN (padre o hijo): la próxima visita la vuelve a leer"""
+        asin = asin.strip().upper()
+        with self._tx() as conn:
+            row = conn.execute("SELECT parent_asin FROM variant_children WHERE child_asin = ?", (asin,)).fetchone()
+            parent = row[0] if row else asin
+            conn.execute("DELETE FROM variant_parents WHERE parent_asin = ?", (parent,))
+            conn.execute("DELETE FROM variant_children WHERE parent_asin = ?", (parent,))
+
+    # ---------- Lectura ----------
+    def parent_of(self, asin: str, max_age: float = None) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT parent_asin FROM variant_children WHERE child_asin = ? AND last_seen >= ?",
+            (asin.strip().upper(), self._oldest(max_age))
+        ).fetchone()
+        return row[0] if row else None
+
+    def children(self, parent_asin: str, max_age: float = None) -> Optional[Dict[str, Any]]:
+        """
+        {hijo: dimensiones} del padre, {} si no tiene variantes,
+        None si no se conoce o venció el TTL.
+        """
+        parent_asin = parent_asin.strip().upper()
+        conn = self._conn
+        row = conn.execute("SELECT 1 FROM variant_parents WHERE parent_asin = ? AND last_seen >= ?",
+                           (parent_asin, self._oldest(max_age))).fetchone()
+        if row is None:
+            return None
+        return {
+            child: json.loads(dims) if dims else None
+            for child, dims in conn.execute(
+                "SELECT child_asin, dimensions FROM variant_children WHERE parent_asin = ? ORDER BY child_asin",
+                (parent_asin,)
+            )
+        }
+
+    def family(self, asin: str, max_age: float = None) -> Optional[Dict]:
+        """
+        Familia vigente del ASIN, sea padre o hijo:
+        {"parent": padre, "children": {hijo: dimensiones}} o None si no se conoce.
+        """
+        asin = asin.strip().upper()
+        children = self.children(asin, max_age)
+        if children is not None:
+            return {"parent": asin, "children": children}
+        parent = self.parent_of(asin, max_age)
+        if parent:
+            children = self.children(parent, max_age)
+            if children is not None:
+                return {"parent": parent, "children": children}
+        return None
+
+    def siblings(self, asin: str, max_age: float = None) -> Optional[List[str]]:
+        """Las otras variantes de la familia del ASIN (None si no se conoce)"""
+        family = self.family(asin, max_age)
+        if family is None:
+            return None
+        asin = asin.strip().upper()
+        return [c for c in family["children"] if c != asin]
+
+    def resolve_buyable_child(self, asin: str, max_age: float = None) -> Optional[str]:
+        """
+        Variante comprable para un ASIN: él mismo si es hijo no marcado como no comprable;
+        si es padre, el primer hijo comprable (o sin verificar). None si no se conoce.
+        """
+        asin = asin.strip().upper()
+        family = self.family(asin, max_age)
+        if family is None or not family["children"]:
+            return None
+        rows = self._conn.execute(
+            "SELECT child_asin, buyable FROM variant_children WHERE parent_asin = ?", (family["parent"],)
+        ).fetchall()
+        buyable = {child: flag for child, flag in rows}
+        if asin in buyable and buyable[asin] != 0:
+            return asin
+        # Comprables verificados primero, luego sin verificar
+        candidates = sorted((c for c, flag in buyable.items() if flag != 0), key=lambda c: (buyable[c] != 1, c))
+        return candidates[0] if candidates else None
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._conn
+        oldest = self._oldest()
+        return {
+            "parents": conn.execute("SELECT COUNT(*) FROM variant_parents").fetchone()[0],
+            "fresh_parents": conn.execute("SELECT COUNT(*) FROM variant_parents WHERE last_seen >= ?",
+                                          (oldest,)).fetchone()[0],
+            "children": conn.execute("SELECT COUNT(*) FROM variant_children").fetchone()[0],
+        }
+
+
+_graph: Optional[VariantGraph] = None
+_graph_lock = threading.Lock()
+
+
+def get_variant_graph() -> VariantGraph:
+    """Grafo único por proceso (la DB es compartida entre procesos)"""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = VariantGraph()
+    return _graph